@@ -1,85 +1,152 @@
 # backend/app/api/v1/bazi.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session # 尽管不直接用db，但get_current_user可能需要
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 from pydantic import BaseModel
 import asyncio
 from datetime import datetime
 
 from ...db.session import get_db # get_current_user依赖它
-from ...schemas.bazi import BaziCalculateRequest, BaziCalculateResponse
-from app.services.bazi_calculator import calculate_bazi_data
+from ...schemas.bazi import BaziCalculateRequest, BaziCalculateResponse, BaziChartResponse, BaziBatchCalculateRequest
+from app.services.bazi_calculator import calculate_bazi_data, calculate_bazi_data_timed
+from app.services.batch_calculator import stream_batch
+from app.services.chart_cache import chart_cache_stats
+from app.services.chart_sections import parse_fields
+from app.services.chart_executor import ChartExecutorBusy
+from app.services.chart_session import ChartSessionMissing, chart_from_session, open_chart_session
+from app.services.metrics import TimedRoute, server_timing_header
+from app.services.pillar_engine import liunian_at
 from app.services.core import Bazi, StemBranch
 from app.services.analyzers import AdvancedDayunAnalyzer
+from app.services.llm_fanout import DAYUN_FANOUT_CONCURRENCY, bounded_as_completed
+from app.services.llm_stream import format_sse
+from app.services.logger_config import setup_logger
+from app.services.prompt_manager import PromptManager
 from app.core.dependencies import get_current_user # 导入认证依赖
 
+logger = setup_logger("bazi_api")
+
 # 导入DeepSeek服务
 try:
     from app.services.deepseek_service import DeepSeekService
     deepseek_service = DeepSeekService()
     DEEPSEEK_AVAILABLE = True
-    print("DeepSeek service imported successfully")
+    logger.info("DeepSeek service imported successfully")
 except ImportError as e:
     DEEPSEEK_AVAILABLE = False
-    print(f"DeepSeek service import failed: {e}")
+    logger.error("DeepSeek service import failed: %s", e)
     deepseek_service = None
 
-router = APIRouter(prefix="/bazi", tags=["八字算命"])
+router = APIRouter(prefix="/bazi", tags=["八字算命"], route_class=TimedRoute)
+
+def selected_fields(
+    fields: Optional[str] = Query(None, description="只返回的响应字段，逗号分隔，如 bazi_characters,major_cycles；缺省返回全部")
+) -> Optional[Tuple[str, ...]]:
+    """解析 fields 查询参数，含未知字段时返回 422"""
+    try:
+        return parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+# 后续分析端点的 chart_id 参数：有效时使用会话中的命盘，请求体可省略
+CHART_ID_QUERY = Query(None, description="排盘端点返回的 chart_id；有效时不再按请求体重新排盘")
+
+async def with_chart_id(request: BaziCalculateRequest, quick_mode: bool, result: BaziCalculateResponse) -> BaziChartResponse:
+    """为完整排盘结果建立命盘会话，返回附带 chart_id 的响应"""
+    chart_id = await open_chart_session(request, quick_mode, result)
+    return BaziChartResponse.model_construct(**dict(result), chart_id=chart_id)
 
-@router.post("/calculate", response_model=BaziCalculateResponse)
+@router.post("/calculate", response_model=BaziChartResponse)
 async def calculate_bazi_chart(
     request: BaziCalculateRequest,
+    response: Response,
+    fields: Optional[Tuple[str, ...]] = Depends(selected_fields),
     current_user: Any = Depends(get_current_user), # 确保用户已登录
     db: Session = Depends(get_db) # 即使这里不直接用db，get_current_user依赖它
 ):
     """
     根据出生信息计算八字排盘（快速模式）。
+    指定 fields 时只计算并返回这些字段。
     """
     try:
         # 调用八字计算服务（默认使用快速模式）
-        bazi_result = await calculate_bazi_data(request, quick_mode=True)
-        return bazi_result
+        run, total = await calculate_bazi_data_timed(request, quick_mode=True, fields=fields)
+        timing = {"Server-Timing": server_timing_header(run.timings, total)}
+        if fields is not None:
+            # 部分字段不满足完整响应模型，直接返回
+            return JSONResponse(jsonable_encoder(run.result), headers=timing)
+        response.headers.update(timing)
+        return await with_chart_id(request, True, run.result)
     except HTTPException as e:
         # 重新抛出服务层可能抛出的HTTPException
-        print(f"HTTPException caught in bazi_api: Status={e.status_code}, Detail={e.detail}")
+        logger.warning("HTTPException caught in bazi_api: Status=%s, Detail=%s", e.status_code, e.detail)
         raise e
     except Exception as e:
-        print(f"八字排盘发生未知错误: {e}")
+        logger.error("八字排盘发生未知错误: %s", e)
         # 捕获其他未知错误
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"八字排盘发生未知错误: {e}"
         )
 
+@router.post("/calculate-batch")
+async def calculate_bazi_batch(
+    request: BaziBatchCalculateRequest,
+    fields: Optional[Tuple[str, ...]] = Depends(selected_fields),
+    current_user: Any = Depends(get_current_user),
+):
+    """
+    批量八字排盘，结果以 NDJSON 流按输入顺序返回。
+    每行形如 {"index": 0, "ok": true, "result": {...}}，单条失败时为 {"index": 1, "ok": false, "error": "..."}。
+    """
+    return StreamingResponse(
+        stream_batch(request.items, quick_mode=request.quick_mode, fields=fields),
+        media_type="application/x-ndjson"
+    )
+
+@router.get("/cache-stats")
+async def get_chart_cache_stats():
+    """
+    排盘缓存命中统计（命盘静态部分、四柱分析、流年运势）。
+    """
+    return chart_cache_stats()
+
 # 添加测试用的无认证端点
 @router.post("/test-calculate")  # Removed response_model temporarily
 async def test_calculate_bazi_chart(
-    request: BaziCalculateRequest
+    request: BaziCalculateRequest,
+    response: Response,
+    fields: Optional[Tuple[str, ...]] = Depends(selected_fields)
 ):
     """
     测试用八字排盘端点，无需认证。
     """
     try:
-        print(f"🚀 API: 收到请求 - {request}")
+        logger.debug("API: 收到请求 - %s", request)
         # 调用八字计算服务（启用快速模式）
-        print("🔄 API: 开始计算...")
-        bazi_result = await calculate_bazi_data(request, quick_mode=True)
-        print(f"✅ API: 计算成功 - 类型: {type(bazi_result)}")
+        logger.debug("API: 开始计算...")
+        run, total = await calculate_bazi_data_timed(request, quick_mode=True, fields=fields)
+        response.headers["Server-Timing"] = server_timing_header(run.timings, total)
+        bazi_result = run.result
+        logger.debug("API: 计算成功 - 类型: %s", type(bazi_result))
+        if fields is not None:
+            return bazi_result
         
         # 手动转换为字典以避免Pydantic响应模型验证问题
         result_dict = {}
         for field_name in bazi_result.__dict__.keys():
             result_dict[field_name] = getattr(bazi_result, field_name)
+        result_dict["chart_id"] = await open_chart_session(request, True, bazi_result)
         
         return result_dict
     except HTTPException as e:
         # 重新抛出服务层可能抛出的HTTPException
-        print(f"❌ HTTPException caught in test bazi_api: Status={e.status_code}, Detail={e.detail}")
+        logger.warning("HTTPException caught in test bazi_api: Status=%s, Detail=%s", e.status_code, e.detail)
         raise e
     except Exception as e:
-        print(f"💥 测试八字排盘发生未知错误: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("测试八字排盘发生未知错误: %s", e)
         # 捕获其他未知错误
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -87,23 +154,31 @@ async def test_calculate_bazi_chart(
         )
 
 # 新增的测试端点
-@router.post("/calculate-test", response_model=BaziCalculateResponse)
+@router.post("/calculate-test", response_model=BaziChartResponse)
 async def calculate_bazi_chart_test(
-    request: BaziCalculateRequest
+    request: BaziCalculateRequest,
+    response: Response,
+    fields: Optional[Tuple[str, ...]] = Depends(selected_fields)
 ):
     """
     根据出生信息计算八字排盘（测试版本，无需认证）。
+    指定 fields 时只计算并返回这些字段。
     """
     try:
         # 调用八字计算服务（默认使用快速模式）
-        bazi_result = await calculate_bazi_data(request, quick_mode=True)
-        return bazi_result
+        run, total = await calculate_bazi_data_timed(request, quick_mode=True, fields=fields)
+        timing = {"Server-Timing": server_timing_header(run.timings, total)}
+        if fields is not None:
+            # 部分字段不满足完整响应模型，直接返回
+            return JSONResponse(jsonable_encoder(run.result), headers=timing)
+        response.headers.update(timing)
+        return await with_chart_id(request, True, run.result)
     except HTTPException as e:
         # 重新抛出服务层可能抛出的HTTPException
-        print(f"HTTPException caught in bazi_api: Status={e.status_code}, Detail={e.detail}")
+        logger.warning("HTTPException caught in bazi_api: Status=%s, Detail=%s", e.status_code, e.detail)
         raise e
     except Exception as e:
-        print(f"八字排盘发生未知错误: {e}")
+        logger.error("八字排盘发生未知错误: %s", e)
         # 捕获其他未知错误
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -111,25 +186,33 @@ async def calculate_bazi_chart_test(
         )
 
 # 添加快速计算端点（需要认证）
-@router.post("/calculate-quick", response_model=BaziCalculateResponse)
+@router.post("/calculate-quick", response_model=BaziChartResponse)
 async def calculate_bazi_chart_quick(
     request: BaziCalculateRequest,
+    response: Response,
+    fields: Optional[Tuple[str, ...]] = Depends(selected_fields),
     current_user: Any = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     快速八字排盘端点，跳过耗时的AI分析。
+    指定 fields 时只计算并返回这些字段。
     """
     try:
         # 调用八字计算服务（启用快速模式）
-        bazi_result = await calculate_bazi_data(request, quick_mode=True)
-        return bazi_result
+        run, total = await calculate_bazi_data_timed(request, quick_mode=True, fields=fields)
+        timing = {"Server-Timing": server_timing_header(run.timings, total)}
+        if fields is not None:
+            # 部分字段不满足完整响应模型，直接返回
+            return JSONResponse(jsonable_encoder(run.result), headers=timing)
+        response.headers.update(timing)
+        return await with_chart_id(request, True, run.result)
     except HTTPException as e:
         # 重新抛出服务层可能抛出的HTTPException
-        print(f"HTTPException caught in quick bazi_api: Status={e.status_code}, Detail={e.detail}")
+        logger.warning("HTTPException caught in quick bazi_api: Status=%s, Detail=%s", e.status_code, e.detail)
         raise e
     except Exception as e:
-        print(f"快速八字排盘发生未知错误: {e}")
+        logger.error("快速八字排盘发生未知错误: %s", e)
         # 捕获其他未知错误
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -183,14 +266,14 @@ async def generate_detailed_analysis(
         # 重新抛出HTTP异常
         raise e
     except Exception as e:
-        print(f"生成详细分析发生未知错误: {e}")
+        logger.error("生成详细分析发生未知错误: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"生成详细分析发生未知错误: {e}"
         )
 
 # 大运详细分析测试端点
-@router.post("/calculate-dayun-test", response_model=BaziCalculateResponse)
+@router.post("/calculate-dayun-test", response_model=BaziChartResponse)
 async def calculate_bazi_chart_dayun_test(
     request: BaziCalculateRequest,
     timeout_seconds: int = 120  # 增加超时时间到120秒，确保AI分析有足够时间完成
@@ -200,18 +283,18 @@ async def calculate_bazi_chart_dayun_test(
     注意：此端点包含AI分析，可能需要较长时间完成
     """
     try:
-        print(f"收到大运测试请求: {request}")
+        logger.debug("收到大运测试请求: %s", request)
         # 为AI分析设置充足的超时时间
-        print(f"Starting detailed analysis with {timeout_seconds}s timeout...")
+        logger.info("Starting detailed analysis with %ss timeout...", timeout_seconds)
         result = await asyncio.wait_for(
             calculate_bazi_data(request, quick_mode=False), 
             timeout=timeout_seconds
         )
-        print("✅ Detailed analysis completed successfully")
-        return result
+        logger.info("Detailed analysis completed successfully")
+        return await with_chart_id(request, False, result)
     except asyncio.TimeoutError:
         # 超时时回退到快速模式，但仍提供基础的详细分析
-        print(f"❌ Detailed analysis timed out after {timeout_seconds}s, falling back to quick mode")
+        logger.warning("Detailed analysis timed out after %ss, falling back to quick mode", timeout_seconds)
         result = await calculate_bazi_data(request, quick_mode=True)
           # 为超时情况提供基础的详细分析
         if hasattr(result, 'current_year_fortune') and result.current_year_fortune:
@@ -223,16 +306,18 @@ async def calculate_bazi_chart_dayun_test(
             }
             result.current_year_fortune['detailed_analysis'] = basic_detailed_analysis
         
-        return result
+        return await with_chart_id(request, True, result)
+    except ChartExecutorBusy:
+        raise
     except Exception as e:
-        print(f"Dayun test calculation error: {e}")
+        logger.error("Dayun test calculation error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"大运分析失败: {str(e)}"
         )
 
 # 大运详细分析端点（无超时限制）
-@router.post("/calculate-dayun-full", response_model=BaziCalculateResponse)
+@router.post("/calculate-dayun-full", response_model=BaziChartResponse)
 async def calculate_bazi_chart_dayun_full(
     request: BaziCalculateRequest
 ):
@@ -241,9 +326,9 @@ async def calculate_bazi_chart_dayun_full(
     包含完整的AI分析，可能需要较长时间完成
     """
     try:
-        print("🚀 Starting full detailed analysis (no timeout)...")
+        logger.info("Starting full detailed analysis (no timeout)...")
         result = await calculate_bazi_data(request, quick_mode=False)
-        print("✅ Full detailed analysis completed successfully")
+        logger.info("Full detailed analysis completed successfully")
         
         # 检查和统计AI分析情况
         ai_count = 0
@@ -254,31 +339,123 @@ async def calculate_bazi_chart_dayun_full(
                 if (cycle.get('trend') or cycle.get('advice') or cycle.get('deep_analysis')):
                     ai_count += 1
         
-        print(f"📊 AI Analysis Status: {ai_count}/{total_cycles} cycles have AI content")
-        return result
+        logger.info("AI Analysis Status: %s/%s cycles have AI content", ai_count, total_cycles)
+        return await with_chart_id(request, False, result)
         
+    except ChartExecutorBusy:
+        raise
     except Exception as e:
-        print(f"❌ Full dayun analysis error: {e}")
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")
+        logger.exception("Full dayun analysis error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"大运详细分析失败: {str(e)}"
         )
 
+def bazi_from_result(basic_result, request: BaziCalculateRequest) -> Bazi:
+    """由排盘结果的四柱干支重建 Bazi 对象"""
+    chars = basic_result.bazi_characters
+    return Bazi(
+        year=StemBranch(chars["year_stem"], chars["year_branch"]),
+        month=StemBranch(chars["month_stem"], chars["month_branch"]),
+        day=StemBranch(chars["day_stem"], chars["day_branch"]),
+        hour=StemBranch(chars["hour_stem"], chars["hour_branch"]),
+        gender=request.gender,
+        birth_time=request.birth_datetime
+    )
+
+def current_year_analysis_data(basic_result) -> Dict[str, Any]:
+    """当年运势 AI 分析所用的命盘数据"""
+    return {
+        "bazi_characters": basic_result.bazi_characters,
+        "five_elements_score": basic_result.five_elements_score,
+        "day_master_strength": basic_result.day_master_strength,
+        "day_master_element": basic_result.day_master_element,
+        "zodiac_sign": basic_result.zodiac_sign,
+        "current_year_fortune": basic_result.current_year_fortune,
+        "major_cycles": basic_result.major_cycles
+    }
+
+def current_liunian_year(basic_result) -> str:
+    """当年运势分析的目标年份：与排盘结果的 current_year_fortune 相同，以立春为界"""
+    year = (basic_result.current_year_fortune or {}).get("year")
+    return str(year if year else liunian_at(datetime.now()).year)
+
+def dayun_years(cycle: Dict[str, Any], birth_year: int) -> Tuple[str, str]:
+    """大运的起止年份：优先使用 start_year / end_year，否则按起运年龄推算（兼容简化大运中字符串形式的年龄）"""
+    if cycle.get("start_year") and cycle.get("end_year"):
+        return str(cycle["start_year"]), str(cycle["end_year"])
+    start_age = int(cycle.get("start_age", 0))
+    end_age = int(cycle.get("end_age", start_age + 9))
+    return str(birth_year + start_age), str(birth_year + end_age)
+
+def prepare_single_dayun(basic_result, request: BaziCalculateRequest, cycle_gan_zhi: str,
+                         cycle_start_year: str, cycle_end_year: str, bazi: Optional[Bazi] = None):
+    """单个大运分析的公共部分：本地大运分析结果、大运信息、AI 提示词及提示词所用的命盘字段（作为缓存键）"""
+    # 计算年龄范围
+    birth_year = request.birth_datetime.year
+    start_age = int(cycle_start_year) - birth_year
+    end_age = int(cycle_end_year) - birth_year
+    
+    cycle_analysis = AdvancedDayunAnalyzer.analyze_single_dayun(
+        bazi or bazi_from_result(basic_result, request), cycle_gan_zhi, start_age, end_age
+    )
+    cycle_info = {
+        "gan_zhi": cycle_gan_zhi,
+        "start_year": cycle_start_year,
+        "end_year": cycle_end_year,
+        "age_range": {"start": start_age, "end": end_age}
+    }
+    prompt_data = {
+        "bazi_characters": basic_result.bazi_characters,
+        "day_master_element": basic_result.day_master_element,
+        "day_master_strength": basic_result.day_master_strength,
+        "zodiac_sign": basic_result.zodiac_sign,
+        "five_elements_score": basic_result.five_elements_score
+    }
+    prompt = PromptManager.generate_single_dayun_prompt(prompt_data, cycle_info)
+    return cycle_analysis, cycle_info, prompt, prompt_data
+
+def chart_prompt_data(basic_result, request: BaziCalculateRequest) -> Dict[str, Any]:
+    """全面分析、大运与流年模板所用的命盘数据"""
+    return deepseek_service.bazi_prompt_data(bazi_from_result(basic_result, request), {
+        "day_master_strength": basic_result.day_master_strength,
+        "day_master_element": basic_result.day_master_element,
+        "five_elements_score": basic_result.five_elements_score,
+        "major_cycles": basic_result.major_cycles
+    })
+
+def sse_response(events) -> StreamingResponse:
+    """把 (事件名, 数据) 异步序列编码为 Server-Sent Events 响应；生成过程中的错误以 error 事件告知前端"""
+    async def body():
+        event_id = 0
+        try:
+            async for event, data in events:
+                yield format_sse(event, data, event_id)
+                event_id += 1
+        except Exception as e:
+            logger.exception("AI 流式分析失败: %s", e)
+            yield format_sse("error", {"message": str(getattr(e, "detail", e))}, event_id)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # 当年运势AI分析端点
 @router.post("/current-year-ai-analysis")
 async def generate_current_year_ai_analysis(
-    request: BaziCalculateRequest,
-    force_ai: bool = True
+    request: Optional[BaziCalculateRequest] = None,
+    force_ai: bool = True,
+    chart_id: Optional[str] = CHART_ID_QUERY
 ):
     """
     专门生成当年运势的AI分析
     可以单独调用，不影响基础八字计算
     """
     try:
-        # 先获取基础八字数据（快速模式）
-        basic_result = await calculate_bazi_data(request, quick_mode=True)
+        # 先获取基础八字数据（快速模式，有 chart_id 时取会话中的命盘）
+        request, basic_result = await chart_from_session(chart_id, request, quick_mode=True)
         
         if not DEEPSEEK_AVAILABLE:
             return {
@@ -293,19 +470,11 @@ async def generate_current_year_ai_analysis(
         # 调用AI分析服务
         service = deepseek_service if DEEPSEEK_AVAILABLE else None
         if service:
-            bazi_data_for_analysis = {
-                "bazi_characters": basic_result.bazi_characters,
-                "five_elements_score": basic_result.five_elements_score,
-                "day_master_strength": basic_result.day_master_strength,
-                "day_master_element": basic_result.day_master_element,
-                "zodiac_sign": basic_result.zodiac_sign,
-                "current_year_fortune": basic_result.current_year_fortune,
-                "major_cycles": basic_result.major_cycles
-            }
+            bazi_data_for_analysis = current_year_analysis_data(basic_result)
             
             detailed_analysis = await service.generate_detailed_fortune_analysis(
                 bazi_data_for_analysis, 
-                str(datetime.now().year)
+                current_liunian_year(basic_result)
             )
             
             return {
@@ -323,8 +492,10 @@ async def generate_current_year_ai_analysis(
                 }
             }
             
+    except (ChartExecutorBusy, ChartSessionMissing):
+        raise
     except Exception as e:
-        print(f"Current year AI analysis error: {e}")
+        logger.error("Current year AI analysis error: %s", e)
         return {
             "success": False,
             "message": f"AI分析失败: {str(e)}",
@@ -337,45 +508,20 @@ async def generate_current_year_ai_analysis(
 # 单个大运AI分析端点
 @router.post("/single-dayun-analysis")
 async def generate_single_dayun_analysis(
-    request: BaziCalculateRequest,
     cycle_gan_zhi: str,
     cycle_start_year: str,
-    cycle_end_year: str
+    cycle_end_year: str,
+    request: Optional[BaziCalculateRequest] = None,
+    chart_id: Optional[str] = CHART_ID_QUERY
 ):
     """
     为单个大运生成详细分析
     """
     try:
         # 先获取基础八字数据
-        basic_result = await calculate_bazi_data(request, quick_mode=True)
-        
-        # 计算年龄范围
-        birth_year = request.birth_datetime.year
-        start_age = int(cycle_start_year) - birth_year
-        end_age = int(cycle_end_year) - birth_year
-        
-        # 导入分析类
-        from app.services.core import Bazi, StemBranch
-        from app.services.analyzers import AdvancedDayunAnalyzer
-        
-        # 构建八字对象
-        year_stem, year_branch = basic_result.bazi_characters["year_stem"], basic_result.bazi_characters["year_branch"]
-        month_stem, month_branch = basic_result.bazi_characters["month_stem"], basic_result.bazi_characters["month_branch"]
-        day_stem, day_branch = basic_result.bazi_characters["day_stem"], basic_result.bazi_characters["day_branch"]
-        hour_stem, hour_branch = basic_result.bazi_characters["hour_stem"], basic_result.bazi_characters["hour_branch"]
-        
-        bazi_obj = Bazi(
-            year=StemBranch(year_stem, year_branch),
-            month=StemBranch(month_stem, month_branch),
-            day=StemBranch(day_stem, day_branch),
-            hour=StemBranch(hour_stem, hour_branch),
-            gender=request.gender,
-            birth_time=request.birth_datetime
-        )
-        
-        # 使用新的分析方法
-        cycle_analysis = AdvancedDayunAnalyzer.analyze_single_dayun(
-            bazi_obj, cycle_gan_zhi, start_age, end_age
+        request, basic_result = await chart_from_session(chart_id, request, quick_mode=True)
+        cycle_analysis, cycle_info, prompt, prompt_data = prepare_single_dayun(
+            basic_result, request, cycle_gan_zhi, cycle_start_year, cycle_end_year
         )
         
         # 如果需要AI分析，可以补充
@@ -383,16 +529,9 @@ async def generate_single_dayun_analysis(
         if DEEPSEEK_AVAILABLE:
             try:
                 service = deepseek_service
-                cycle_info = {
-                    "gan_zhi": cycle_gan_zhi,
-                    "start_year": cycle_start_year,
-                    "end_year": cycle_end_year,
-                    "age_range": {"start": start_age, "end": end_age}
-                }
-                prompt = build_single_dayun_prompt(basic_result, cycle_info)
-                ai_analysis = await service.generate_dayun_analysis(prompt, cycle_info)
+                ai_analysis = await service.generate_dayun_analysis(prompt_data, cycle_info, prompt=prompt)
             except Exception as e:
-                print(f"AI analysis error: {e}")
+                logger.error("AI analysis error: %s", e)
                 ai_analysis = "AI分析暂时不可用"
         
         # 合并分析结果
@@ -405,10 +544,10 @@ async def generate_single_dayun_analysis(
             "analysis": cycle_analysis  # 改为 analysis 以匹配前端期望的结构
         }
             
+    except (ChartExecutorBusy, ChartSessionMissing):
+        raise
     except Exception as e:
-        print(f"Single dayun analysis error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Single dayun analysis error: %s", e)
         return {
             "success": False,
             "message": f"大运分析失败: {str(e)}",
@@ -421,68 +560,149 @@ async def generate_single_dayun_analysis(
             }
         }
 
-def build_single_dayun_prompt(bazi_result, cycle_info):
-    """构建单个大运分析的提示词"""
-    
-    # 提取关键信息
-    bazi_chars = bazi_result.bazi_characters
-    year_pillar = f"{bazi_chars.get('year_stem', '')}{bazi_chars.get('year_branch', '')}"
-    month_pillar = f"{bazi_chars.get('month_stem', '')}{bazi_chars.get('month_branch', '')}"
-    day_pillar = f"{bazi_chars.get('day_stem', '')}{bazi_chars.get('day_branch', '')}"
-    hour_pillar = f"{bazi_chars.get('hour_stem', '')}{bazi_chars.get('hour_branch', '')}"
-    
-    day_master = bazi_result.day_master_element
-    day_strength = bazi_result.day_master_strength
-    zodiac = bazi_result.zodiac_sign
-    
-    # 五行得分
-    five_elements = bazi_result.five_elements_score
-    elements_str = "、".join([f"{k}:{v}" for k, v in five_elements.items()])
-    
-    cycle_gan_zhi = cycle_info.get('gan_zhi', '')
-    start_year = cycle_info.get('start_year', '')
-    end_year = cycle_info.get('end_year', '')
-    
-    prompt = f"""请作为资深八字命理师，为以下命盘的特定大运进行专业分析：
+# 流式 AI 分析端点（SSE）：事件依次为 analysis（本地分析，仅大运）、delta（模型输出片段）、
+# field（闭合的顶层字段）、done（完整结果及来源 llm/cache/mock），出错时为 error
+@router.post("/current-year-ai-analysis/stream")
+async def stream_current_year_ai_analysis(
+    request: Optional[BaziCalculateRequest] = None,
+    chart_id: Optional[str] = CHART_ID_QUERY
+):
+    """
+    流式生成当年运势的AI分析
+    """
+    request, basic_result = await chart_from_session(chart_id, request, quick_mode=True)
+    if deepseek_service is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="DeepSeek服务不可用")
+    return sse_response(deepseek_service.stream_detailed_fortune_analysis(
+        current_year_analysis_data(basic_result), current_liunian_year(basic_result)
+    ))
+
+@router.post("/single-dayun-analysis/stream")
+async def stream_single_dayun_analysis(
+    cycle_gan_zhi: str,
+    cycle_start_year: str,
+    cycle_end_year: str,
+    request: Optional[BaziCalculateRequest] = None,
+    chart_id: Optional[str] = CHART_ID_QUERY
+):
+    """
+    流式生成单个大运分析：先返回本地大运分析，再逐字段返回AI分析
+    """
+    request, basic_result = await chart_from_session(chart_id, request, quick_mode=True)
+    if deepseek_service is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="DeepSeek服务不可用")
+    cycle_analysis, cycle_info, prompt, prompt_data = prepare_single_dayun(
+        basic_result, request, cycle_gan_zhi, cycle_start_year, cycle_end_year
+    )
 
-【命盘信息】
-- 四柱干支：{year_pillar}年 {month_pillar}月 {day_pillar}日 {hour_pillar}时
-- 日主五行：{day_master}（{day_strength}）
-- 生肖属相：{zodiac}
-- 五行分布：{elements_str}
+    async def events():
+        yield "analysis", cycle_analysis
+        async for event in deepseek_service.stream_dayun_analysis(prompt_data, cycle_info, prompt=prompt):
+            yield event
 
-【目标大运】
-- 大运干支：{cycle_gan_zhi}
-- 运行时期：{start_year}年-{end_year}年
+    return sse_response(events())
 
-【分析要求】
-请针对这个特定大运进行深度分析，包含以下方面：
+@router.post("/comprehensive-analysis/stream")
+async def stream_comprehensive_analysis(
+    request: Optional[BaziCalculateRequest] = None,
+    chart_id: Optional[str] = CHART_ID_QUERY
+):
+    """
+    流式生成整个命盘的全面AI分析
+    """
+    request, basic_result = await chart_from_session(chart_id, request, quick_mode=False)
+    if deepseek_service is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="DeepSeek服务不可用")
+    return sse_response(deepseek_service.stream_comprehensive_analysis(chart_prompt_data(basic_result, request)))
 
-1. **大运特征分析**
-   - 分析{cycle_gan_zhi}大运的五行属性和基本特征
-   - 与原命盘的生克关系和互动影响
-   - 这个大运的整体吉凶性质
+@router.post("/all-dayun-analysis/stream")
+async def stream_all_dayun_analysis(
+    request: Optional[BaziCalculateRequest] = None,
+    concurrency: Optional[int] = Query(None, ge=1, description="同时进行的 AI 分析数，不超过服务端上限"),
+    chart_id: Optional[str] = CHART_ID_QUERY
+):
+    """
+    一次生成全部大运的分析：只排盘一次，各大运的 AI 分析以有限并发同时进行，每完成一个推送一个 dayun 事件。
+    事件依次为 plan（大运列表）、dayun（按完成先后，含 index 与合并了 ai_analysis 的分析）、done；
+    客户端断开时取消尚未完成的 AI 调用。
+    """
+    request, basic_result = await chart_from_session(chart_id, request, quick_mode=True)
+    if deepseek_service is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="DeepSeek服务不可用")
+    bazi = bazi_from_result(basic_result, request)
+    birth_year = request.birth_datetime.year
+    cycles = [
+        (cycle.get("gan_zhi") or cycle.get("ganzhi", ""), *dayun_years(cycle, birth_year))
+        for cycle in basic_result.major_cycles or []
+    ]
+    limit = min(concurrency or DAYUN_FANOUT_CONCURRENCY, DAYUN_FANOUT_CONCURRENCY)
 
-2. **十年运势走向**
-   - 前期（{start_year}-{int(start_year)+3}年）运势特点
-   - 中期（{int(start_year)+4}-{int(start_year)+6}年）发展状况  
-   - 后期（{int(start_year)+7}-{end_year}年）收获阶段
+    def analyze(gan_zhi: str, start_year: str, end_year: str):
+        async def call():
+            cycle_analysis, cycle_info, prompt, prompt_data = prepare_single_dayun(
+                basic_result, request, gan_zhi, start_year, end_year, bazi=bazi
+            )
+            cycle_analysis["ai_analysis"] = await deepseek_service.generate_dayun_analysis(
+                prompt_data, cycle_info, prompt=prompt
+            )
+            return cycle_analysis
+        return call
 
-3. **具体领域影响**
-   - 事业发展：职业机遇、升迁可能、事业转换
-   - 财富状况：收入变化、投资理财、财运起伏
-   - 感情婚姻：情感机遇、婚姻状况、人际关系
-   - 健康状况：身体变化、易患疾病、养生重点
+    async def events():
+        start = datetime.now()
+        yield "plan", {"concurrency": limit, "cycles": [
+            {"index": index, "gan_zhi": gan_zhi, "start_year": start_year, "end_year": end_year}
+            for index, (gan_zhi, start_year, end_year) in enumerate(cycles)
+        ]}
+        failed = 0
+        async for index, analysis, error in bounded_as_completed(
+            [analyze(*cycle) for cycle in cycles], limit
+        ):
+            gan_zhi = cycles[index][0]
+            if error is not None:
+                failed += 1
+                logger.error("大运 %s 分析失败: %s", gan_zhi, error)
+                yield "dayun", {"index": index, "gan_zhi": gan_zhi, "success": False, "error": str(error)}
+            else:
+                yield "dayun", {"index": index, "gan_zhi": gan_zhi, "success": True, "analysis": analysis}
+        yield "done", {"total": len(cycles), "failed": failed,
+                       "processing_time": (datetime.now() - start).total_seconds()}
 
-4. **实用指导建议**
-   - 这十年的发展策略和重点方向
-   - 需要特别注意的时间节点
-   - 趋吉避凶的具体方法
-   - 五行调节和环境配置建议
+    return sse_response(events())
 
-请提供详细且实用的分析，字数控制在800-1200字，语言专业但通俗易懂。"""
+@router.post("/life-ai-analysis")
+async def generate_life_ai_analysis(
+    request: Optional[BaziCalculateRequest] = None,
+    years: int = Query(5, ge=1, le=20, description="从今年起分析的流年数"),
+    chart_id: Optional[str] = CHART_ID_QUERY
+):
+    """
+    一生运势AI分析：全部大运与未来若干流年。同类目标合并为批量调用（按 max_tokens 自动分批），
+    已缓存的条目不再调用
+    """
+    start = datetime.now()
+    request, basic_result = await chart_from_session(chart_id, request, quick_mode=True)
+    if deepseek_service is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="DeepSeek服务不可用")
+    bazi_data = chart_prompt_data(basic_result, request)
+    dayun_list = [
+        {"gan_zhi": cycle.get("gan_zhi") or cycle.get("ganzhi", ""),
+         "start_age": cycle.get("start_age"), "end_age": cycle.get("end_age")}
+        for cycle in basic_result.major_cycles or []
+    ]
+    first_year = int(current_liunian_year(basic_result))
+    year_list = [first_year + offset for offset in range(years)]
 
-    return prompt
+    dayun_results, liunian_results = await asyncio.gather(
+        deepseek_service.generate_dayun_analyses(bazi_data, dayun_list),
+        deepseek_service.generate_liunian_analyses(bazi_data, year_list)
+    )
+    return {
+        "success": True,
+        "dayun": [dict(info, ai_analysis=result) for info, result in zip(dayun_list, dayun_results)],
+        "liunian": [{"year": year, "ai_analysis": result} for year, result in zip(year_list, liunian_results)],
+        "processing_time": (datetime.now() - start).total_seconds()
+    }
 
 # 调试大运互动分析的专用端点
 @router.post("/debug-dayun-interaction", response_model=BaziCalculateResponse)
@@ -493,14 +713,14 @@ async def debug_dayun_interaction_endpoint(
     调试大运互动分析的专用端点（无需认证，完整模式）
     """
     try:
-        print("=== 调试大运互动分析端点被调用 ===")
+        logger.debug("=== 调试大运互动分析端点被调用 ===")
         result = await calculate_bazi_data(request, quick_mode=False)
-        print("=== 大运互动分析端点处理完成 ===")
+        logger.debug("=== 大运互动分析端点处理完成 ===")
         return result
+    except ChartExecutorBusy:
+        raise
     except Exception as e:
-        print(f"调试大运互动分析发生错误: {e}")
-        import traceback
-        print(f"错误追踪: {traceback.format_exc()}")
+        logger.exception("调试大运互动分析发生错误: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"调试大运互动分析失败: {str(e)}"
@@ -543,10 +763,10 @@ async def test_calculate_bazi_with_reference(
         )
         return bazi_result
     except HTTPException as e:
-        print(f"HTTPException caught in test bazi_api with reference: Status={e.status_code}, Detail={e.detail}")
+        logger.warning("HTTPException caught in test bazi_api with reference: Status=%s, Detail=%s", e.status_code, e.detail)
         raise e
     except Exception as e:
-        print(f"测试八字排盘（含参考）发生未知错误: {e}")
+        logger.error("测试八字排盘（含参考）发生未知错误: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"测试八字排盘（含参考）发生未知错误: {e}"
@@ -554,30 +774,19 @@ async def test_calculate_bazi_with_reference(
 
 @router.post("/master-fortune-analysis")
 async def generate_master_fortune_analysis_endpoint(
-    request: BaziCalculateRequest,
-    target_year: int = 2025
+    request: Optional[BaziCalculateRequest] = None,
+    target_year: int = 2025,
+    chart_id: Optional[str] = CHART_ID_QUERY
 ):
     """
     生成命理大师级全面运势分析
     """
     try:
-        # 获取基础八字数据
-        basic_result = await calculate_bazi_data(request, quick_mode=False)
+        # 获取基础八字数据（有 chart_id 时取会话中的命盘）
+        request, basic_result = await chart_from_session(chart_id, request, quick_mode=False)
         
         # 构建八字对象
-        year_stem, year_branch = basic_result.bazi_characters["year_stem"], basic_result.bazi_characters["year_branch"]
-        month_stem, month_branch = basic_result.bazi_characters["month_stem"], basic_result.bazi_characters["month_branch"]
-        day_stem, day_branch = basic_result.bazi_characters["day_stem"], basic_result.bazi_characters["day_branch"]
-        hour_stem, hour_branch = basic_result.bazi_characters["hour_stem"], basic_result.bazi_characters["hour_branch"]
-        
-        bazi_obj = Bazi(
-            year=StemBranch(year_stem, year_branch),
-            month=StemBranch(month_stem, month_branch),
-            day=StemBranch(day_stem, day_branch),
-            hour=StemBranch(hour_stem, hour_branch),
-            gender=request.gender,
-            birth_time=request.birth_datetime
-        )
+        bazi_obj = bazi_from_result(basic_result, request)
         
         # 准备分析数据
         analysis_data = {
@@ -608,9 +817,7 @@ async def generate_master_fortune_analysis_endpoint(
             }
             
         except Exception as e:
-            print(f"Master analysis error: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Master analysis error: %s", e)
             # 返回基础分析作为备用
             return {
                 "success": True,
@@ -626,10 +833,10 @@ async def generate_master_fortune_analysis_endpoint(
                 }
             }
             
+    except ChartExecutorBusy:
+        raise
     except Exception as e:
-        print(f"Master fortune analysis endpoint error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Master fortune analysis endpoint error: %s", e)
         return {
             "success": False,
             "message": f"分析失败: {str(e)}",
@@ -638,32 +845,21 @@ async def generate_master_fortune_analysis_endpoint(
 
 @router.post("/dayun-deep-analysis")
 async def generate_dayun_deep_analysis_endpoint(
-    request: BaziCalculateRequest,
     dayun_gan_zhi: str,
     start_age: int,
-    end_age: int
+    end_age: int,
+    request: Optional[BaziCalculateRequest] = None,
+    chart_id: Optional[str] = CHART_ID_QUERY
 ):
     """
     生成大运周期深度分析
     """
     try:
-        # 获取基础八字数据
-        basic_result = await calculate_bazi_data(request, quick_mode=False)
+        # 获取基础八字数据（有 chart_id 时取会话中的命盘）
+        request, basic_result = await chart_from_session(chart_id, request, quick_mode=False)
         
         # 构建八字对象
-        year_stem, year_branch = basic_result.bazi_characters["year_stem"], basic_result.bazi_characters["year_branch"]
-        month_stem, month_branch = basic_result.bazi_characters["month_stem"], basic_result.bazi_characters["month_branch"]
-        day_stem, day_branch = basic_result.bazi_characters["day_stem"], basic_result.bazi_characters["day_branch"]
-        hour_stem, hour_branch = basic_result.bazi_characters["hour_stem"], basic_result.bazi_characters["hour_branch"]
-        
-        bazi_obj = Bazi(
-            year=StemBranch(year_stem, year_branch),
-            month=StemBranch(month_stem, month_branch),
-            day=StemBranch(day_stem, day_branch),
-            hour=StemBranch(hour_stem, hour_branch),
-            gender=request.gender,
-            birth_time=request.birth_datetime
-        )
+        bazi_obj = bazi_from_result(basic_result, request)
         
         # 准备大运信息
         dayun_info = {
@@ -698,17 +894,17 @@ async def generate_dayun_deep_analysis_endpoint(
             }
             
         except Exception as e:
-            print(f"Deep dayun analysis error: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Deep dayun analysis error: %s", e)
             return {
                 "success": False,
                 "message": f"大运深度分析失败: {str(e)}",
                 "error": str(e)
             }
             
+    except ChartExecutorBusy:
+        raise
     except Exception as e:
-        print(f"Dayun deep analysis endpoint error: {e}")
+        logger.error("Dayun deep analysis endpoint error: %s", e)
         return {
             "success": False,
             "message": f"分析失败: {str(e)}",
@@ -755,12 +951,12 @@ async def test_calculation(request: BaziCalculateRequest):
     try:
         from app.services.bazi_calculator import calculate_bazi_data
         
-        print(f"🚀 测试计算: 收到请求 - {request}")
+        logger.debug("测试计算: 收到请求 - %s", request)
         
         # 尝试调用计算函数
         result = await calculate_bazi_data(request, quick_mode=True)
         
-        print(f"✅ 计算成功: {type(result)}")
+        logger.debug("计算成功: %s", type(result))
         
         return {
             "status": "ok", 
@@ -769,9 +965,7 @@ async def test_calculation(request: BaziCalculateRequest):
             "result_keys": list(result.__dict__.keys()) if hasattr(result, '__dict__') else "No __dict__"
         }
     except Exception as e:
-        print(f"❌ 计算失败: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("计算失败: %s", e)
         return {
             "status": "error", 
             "message": f"计算失败: {e}",
@@ -786,20 +980,18 @@ async def test_full_response(request: BaziCalculateRequest):
     try:
         from app.services.bazi_calculator import calculate_bazi_data
         
-        print(f"🚀 测试完整响应: 收到请求")
+        logger.debug("测试完整响应: 收到请求")
         
         # 调用计算函数
         result = await calculate_bazi_data(request, quick_mode=True)
         
-        print(f"✅ 计算成功，准备返回...")
+        logger.debug("计算成功，准备返回...")
         
         # 直接返回结果，让FastAPI处理序列化
         return result
         
     except Exception as e:
-        print(f"❌ 计算失败: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("计算失败: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"计算失败: {e}"
@@ -835,8 +1027,7 @@ async def test_debug_result(request: BaziCalculateRequest):
         }
         
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("调试结果检查失败: %s", e)
         return {"status": "error", "message": str(e)}
 
 @router.post("/test-no-response-model")
@@ -858,6 +1049,5 @@ async def test_no_response_model(request: BaziCalculateRequest):
         return result_dict
         
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("无响应模型测试失败: %s", e)
         return {"error": str(e)}
\ No newline at end of file
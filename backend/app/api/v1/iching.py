@@ -13,8 +13,12 @@ from app.db.session import get_db
 from app.core.dependencies import get_current_user
 from app.schemas.iching import IChingDivinationRequest, IChingDivinationResponse
 from app.services.iching_calculator import perform_iching_divination
+from app.services.metrics import TimedRoute
+from app.services.logger_config import setup_logger
 
-router = APIRouter(prefix="/iching", tags=["易经算卦"])
+logger = setup_logger("iching_api")
+
+router = APIRouter(prefix="/iching", tags=["易经算卦"], route_class=TimedRoute)
 
 @router.post("/divine", response_model=IChingDivinationResponse)
 async def divine_iching(
@@ -46,12 +50,12 @@ async def divine_iching(
         
     except HTTPException as e:
         # 重新抛出服务层的 HTTPException
-        print(f"易经算卦 HTTPException: Status={e.status_code}, Detail={e.detail}")
+        logger.warning("易经算卦 HTTPException: Status=%s, Detail=%s", e.status_code, e.detail)
         raise e
         
     except Exception as e:
         # 捕获其他未知错误并转换为 HTTP 500 错误
-        print(f"易经算卦发生未知错误: {e}")
+        logger.error("易经算卦发生未知错误: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"易经算卦发生未知错误: {str(e)}"
@@ -79,7 +83,7 @@ async def get_hexagram_list(
         }
         
     except Exception as e:
-        print(f"获取卦象列表错误: {e}")
+        logger.error("获取卦象列表错误: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"获取卦象列表发生错误: {str(e)}"
@@ -103,7 +107,7 @@ async def test_divine_iching(request: IChingDivinationRequest):
         }
         
     except Exception as e:
-        print(f"测试易经算卦错误: {e}")
+        logger.error("测试易经算卦错误: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"测试易经算卦发生错误: {str(e)}"
@@ -9,6 +9,10 @@ import os
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '..', '.env'))
 
 from .api.v1.router import api_router
+from .services.chart_executor import shutdown_chart_executor
+from .services.llm_client import close_llm_client, get_llm_client
+from .services.logger_config import stop_log_listener
+from .services.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, registry as metrics_registry
 
 app = FastAPI(
     title="Bazi App API",
@@ -44,6 +48,23 @@ async def options_handler(path: str, request: Request):
         }
     )
 
+@app.on_event("startup")
+async def start_llm_client():
+    """创建共享的大模型客户端（长连接池）"""
+    get_llm_client()
+
+@app.on_event("shutdown")
+async def shutdown_executors():
+    """关闭排盘执行器与大模型客户端，写出日志队列中剩余的记录"""
+    shutdown_chart_executor()
+    await close_llm_client()
+    stop_log_listener()
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus 指标（文本格式）"""
+    return Response(content=metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
 @app.get("/")
 async def read_root():
     """
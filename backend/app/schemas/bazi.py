@@ -44,4 +44,12 @@ class BaziCalculateResponse(BaseModel):
     # === 新增字段：综合分析结果 ===
     comprehensive_favorable_analysis: Optional[Dict[str, Any]] = Field(None, description="综合分析结果，包含基础分析、调候分析、通关分析、病药分析、格局分析和最终预测")
     
-    # 可以在这里添加更多你希望展示的八字细节，如神煞、格局等
\ No newline at end of file
+    # 可以在这里添加更多你希望展示的八字细节，如神煞、格局等
+
+class BaziChartResponse(BaziCalculateResponse):
+    """排盘端点的响应：附带命盘会话 ID（不属于排盘计算的字段）"""
+    chart_id: Optional[str] = Field(None, description="命盘会话 ID，后续 AI 分析端点可凭此取回本次排盘结果，无需重新排盘")
+
+class BaziBatchCalculateRequest(BaseModel):
+    items: List[BaziCalculateRequest] = Field(..., description="待排盘的出生信息列表", min_length=1, max_length=50000)
+    quick_mode: bool = Field(True, description="是否使用快速模式")
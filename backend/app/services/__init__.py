@@ -7,7 +7,7 @@
 from .main import calculate_bazi_data
 
 # 核心数据结构
-from .core import Bazi, StemBranch, DaYun, ShenSha, FortuneModel
+from .core import Bazi, StemBranch, DaYun, ShenSha, FortuneModel, EncodedBazi
 
 # 计算引擎
 from .calculators import ShenShaCalculator, FiveElementsCalculator
@@ -37,7 +37,7 @@ __all__ = [
     'calculate_bazi_data',
     
     # 核心类
-    'Bazi', 'StemBranch', 'DaYun', 'ShenSha', 'FortuneModel',
+    'Bazi', 'StemBranch', 'DaYun', 'ShenSha', 'FortuneModel', 'EncodedBazi',
     
     # 计算器
     'ShenShaCalculator', 'FiveElementsCalculator',
@@ -0,0 +1,44 @@
+"""
+命盘分析上下文
+一次请求内日主旺衰、五行占比、喜用神、旺衰明细等只计算一次，供各计算环节共享
+"""
+from functools import cached_property
+from typing import Dict, Any, List, Optional
+
+from .core import Bazi
+from .calculators import FiveElementsCalculator
+from .logger_config import setup_logger
+logger = setup_logger("analysis_context")
+
+
+class ChartAnalysisContext:
+    """单次请求的命盘分析上下文（不跨请求共享）"""
+
+    def __init__(self, bazi: Bazi):
+        self.bazi = bazi
+        # 神煞结果由 ShenShaCalculator.calculate 首次计算后写入
+        self.shensha_results: Optional[Dict[str, Any]] = None
+
+    @cached_property
+    def strength_detail(self) -> Dict[str, Any]:
+        """日主旺衰详细计分（含各步骤明细，仅在访问时生成）"""
+        return FiveElementsCalculator.calculate_day_master_strength_detailed(self.bazi)
+
+    @cached_property
+    def day_master_strength(self) -> str:
+        """日主旺衰（极强/身强/平和/身弱/极弱）"""
+        return FiveElementsCalculator.calculate_day_master_strength(self.bazi)
+
+    @cached_property
+    def five_elements_percentage(self) -> Dict[str, float]:
+        return FiveElementsCalculator.calculate_five_elements_percentage(self.bazi)
+
+    @cached_property
+    def favorable_elements(self) -> List[str]:
+        return FiveElementsCalculator.get_favorable_elements(self.bazi, strength=self.day_master_strength)
+
+    @cached_property
+    def comprehensive_gods(self) -> Dict[str, Any]:
+        return FiveElementsCalculator.analyze_comprehensive_gods(
+            self.bazi, strength=self.day_master_strength, favorable_elements=self.favorable_elements
+        )
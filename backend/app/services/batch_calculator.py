@@ -0,0 +1,85 @@
+"""
+批量排盘
+请求按块（chunk）提交到排盘执行器，工作线程（进程）内逐条计算并直接序列化为 NDJSON 行；
+同时在途的块数有上限，结果按输入顺序逐块输出，内存占用与批量大小无关。
+单条失败只在该行返回错误，不影响整批。
+"""
+import asyncio
+import json
+import os
+from collections import deque
+from typing import AsyncIterator, List, Optional, Sequence
+
+from fastapi import HTTPException
+from pydantic_core import to_json
+
+from ..schemas.bazi import BaziCalculateRequest
+from .bazi_calculator import calculate_bazi_data_sync
+from .chart_executor import ChartExecutorBusy, get_chart_executor
+from .logger_config import setup_logger
+logger = setup_logger("batch_calculator")
+
+DEFAULT_CHUNK_SIZE = int(os.getenv("BAZI_BATCH_CHUNK_SIZE", "32"))
+# 执行器繁忙时重新提交的等待时间（秒）
+BUSY_RETRY_DELAY = 0.05
+
+
+def _error_line(index: int, error: Exception) -> str:
+    message = error.detail if isinstance(error, HTTPException) else str(error)
+    return json.dumps({"index": index, "ok": False, "error": message}, ensure_ascii=False)
+
+
+def calculate_chunk(start: int, items: Sequence[BaziCalculateRequest], quick_mode: bool = True,
+                    fields: Optional[Sequence[str]] = None) -> List[str]:
+    """计算一块请求，返回 NDJSON 行（不含换行符）；在执行器中运行"""
+    lines = []
+    for offset, item in enumerate(items):
+        index = start + offset
+        try:
+            result = calculate_bazi_data_sync(item, quick_mode, fields)
+            payload = result.model_dump_json() if fields is None else to_json(result).decode("utf-8")
+            lines.append(f'{{"index": {index}, "ok": true, "result": {payload}}}')
+        except Exception as e:
+            logger.warning("批量排盘第 %s 条失败: %s", index, e)
+            lines.append(_error_line(index, e))
+    return lines
+
+
+async def _run_chunk(start: int, items: Sequence[BaziCalculateRequest], quick_mode: bool,
+                     fields: Optional[Sequence[str]]) -> List[str]:
+    executor = get_chart_executor()
+    while True:
+        try:
+            return await executor.run(calculate_chunk, start, items, quick_mode, fields)
+        except ChartExecutorBusy:
+            # 批量请求让位于单条请求：执行器满时稍后重试，而不是中断已开始输出的流
+            await asyncio.sleep(BUSY_RETRY_DELAY)
+
+
+async def stream_batch(items: Sequence[BaziCalculateRequest], quick_mode: bool = True,
+                       chunk_size: int = DEFAULT_CHUNK_SIZE,
+                       fields: Optional[Sequence[str]] = None) -> AsyncIterator[str]:
+    """按输入顺序逐行产出 NDJSON（每行以换行符结尾）"""
+    chunk_size = max(1, chunk_size)
+    window = get_chart_executor().max_workers
+    starts = iter(range(0, len(items), chunk_size))
+    in_flight: deque = deque()
+
+    def submit() -> bool:
+        start = next(starts, None)
+        if start is None:
+            return False
+        in_flight.append(asyncio.ensure_future(_run_chunk(start, items[start:start + chunk_size], quick_mode, fields)))
+        return True
+
+    try:
+        while len(in_flight) < window and submit():
+            pass
+        while in_flight:
+            lines = await in_flight.popleft()
+            submit()
+            yield "".join(f"{line}\n" for line in lines)
+    finally:
+        # 客户端断开时取消尚未完成的块
+        for task in in_flight:
+            task.cancel()
@@ -10,6 +10,11 @@ import json
 import os
 from .core import Bazi, ShenSha, DaYun, StemBranch
 from .constants import *
+from .lookup_tables import STEM_INDEX, BRANCH_INDEX, JIAZI_INDEX
+from . import lookup_tables
+from . import strength_scorer
+from .solar_terms_index import SolarTermIndex, get_solar_term_index
+from .shensha_engine import CompiledRule, CompiledRuleSet, get_compiled_rules, PILLAR_NAMES
 from .logger_config import setup_logger
 logger = setup_logger("calculators")
 
@@ -18,34 +23,20 @@ class ShenShaCalculator:
     """神煞计算引擎 - 数据驱动版本，支持完全基于规则的神煞计算"""
     
     def __init__(self, rule_file: str = "shensha_rules.json"):
-        # 加载神煞规则
-        try:
-            backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-            full_path = os.path.join(backend_dir, rule_file)
-            
-            if os.path.exists(full_path):
-                with open(full_path, "r", encoding="utf-8") as f:
-                    self.shensha_data = json.load(f)
-                    
-                # 如果是数组格式，转换为字典格式
-                if isinstance(self.shensha_data, list):
-                    self.rules = self.shensha_data
-                    self.shensha_data = {"rules": self.rules, "shensha_interactions": {}}
-                else:
-                    self.rules = self.shensha_data.get("rules", self.shensha_data)
-                    
-                logger.info(f"成功加载神煞规则文件: {full_path}")
-            else:
-                logger.warning(f"神煞规则文件不存在: {full_path}，使用默认规则")
-                self.rules = self._get_default_rules()
-                self.shensha_data = {"rules": self.rules, "shensha_interactions": {}}
-        except Exception as e:
-            logger.error(f"加载神煞规则文件失败: {e}，使用默认规则")
-            self.rules = self._get_default_rules()
-            self.shensha_data = {"rules": self.rules, "shensha_interactions": {}}
-        
-        # 创建规则字典以便快速查找
-        self.rules_dict = {rule["key"]: rule for rule in self.rules}
+        # 规则在进程内只编译一次，所有实例共享；文件变更时自动热重载
+        self.rule_file = rule_file
+        self._refresh_rules()
+
+    def _refresh_rules(self) -> CompiledRuleSet:
+        """获取当前编译规则集，并同步 rules / shensha_data / rules_dict 属性"""
+        rule_set = get_compiled_rules(self.rule_file, self._get_default_rules)
+        if getattr(self, "_rule_set", None) is not rule_set:
+            self._rule_set = rule_set
+            self.rules = rule_set.rules
+            self.shensha_data = rule_set.shensha_data
+            # 创建规则字典以便快速查找
+            self.rules_dict = rule_set.rules_dict
+        return rule_set
         
     def _get_default_rules(self):
         """获取默认神煞规则 - 完整版本，确保在规则文件缺失时仍能正常运行"""
@@ -152,38 +143,41 @@ class ShenShaCalculator:
         
     def get_nayin_element_index(self, gan: str, zhi: str) -> int:
         """根据干支计算纳音，并返回其五行索引"""
-        ganzhi_str = gan + zhi
-        nayin_name = NAYIN_MAP_COMPLETE.get(ganzhi_str)
-        
-        if nayin_name:
-            for element_name, idx in NAYIN_ELEMENT_MAPPING.items():
-                if element_name in nayin_name:
-                    return idx
-        
-        logger.warning(f"无法确定纳音五行: {ganzhi_str}")
-        return -1
+        element_index = lookup_tables.nayin(gan, zhi)[1]
+        if element_index < 0:
+            logger.warning("无法确定纳音五行: %s%s", gan, zhi)
+        return element_index
     
     def get_nayin_name_and_element(self, gan: str, zhi: str) -> tuple[str, int]:
-        """获取纳音名称和五行索引"""
-        ganzhi_str = gan + zhi
-        nayin_name = NAYIN_MAP_COMPLETE.get(ganzhi_str, "未知")
-        
-        # 应用纳音名称标准化
-        if nayin_name in NAYIN_STANDARDIZATION:
-            nayin_name = NAYIN_STANDARDIZATION[nayin_name]
-        
-        element_index = self.get_nayin_element_index(gan, zhi)
+        """获取纳音名称（已标准化）和五行索引"""
+        nayin_name, element_index = lookup_tables.nayin(gan, zhi)
+        if element_index < 0:
+            logger.warning("无法确定纳音五行: %s%s", gan, zhi)
         return nayin_name, element_index
         
-    def calculate(self, birth_chart: Bazi) -> Dict[str, ShenSha]:
-        """计算神煞 - 数据驱动版本"""
+    def calculate(self, birth_chart: Bazi, context=None) -> Dict[str, ShenSha]:
+        """计算神煞 - 基于编译后的索引查找表
+
+        context 为 ChartAnalysisContext 时复用其日主旺衰，并缓存本次神煞结果
+        """
+        if context is not None:
+            if context.shensha_results is not None:
+                return context.shensha_results
+            self._day_strength_memo = (tuple(birth_chart.get_bazi_characters().values()), context.day_master_strength)
+        rule_set = self._refresh_rules()
         result = {}
         failed_calculations = []
+        encoded = self._encode_chart(birth_chart)
         
         # 1. 基础神煞计算
-        for rule in self.rules:
+        for compiled in rule_set.compiled:
+            rule = compiled.rule
             try:
-                shensha = self._dispatch_shensha_calculation(rule, birth_chart)
+                if encoded is not None:
+                    shensha = self._evaluate_compiled(compiled, birth_chart, encoded)
+                else:
+                    # 干支无法编码时退回逐条规则计算
+                    shensha = self._dispatch_shensha_calculation(rule, birth_chart)
                 if shensha:
                     result[rule["key"]] = shensha
                 else:
@@ -196,7 +190,7 @@ class ShenShaCalculator:
                         description=rule.get("description", "")
                     )
             except Exception as e:
-                logger.error(f"计算神煞 {rule['key']} 失败: {e}")
+                logger.error("计算神煞 %s 失败: %s", rule['key'], e)
                 failed_calculations.append({
                     "key": rule["key"],
                     "name": rule["name"],
@@ -215,37 +209,138 @@ class ShenShaCalculator:
         try:
             self._process_interactions(result, birth_chart)
         except Exception as e:
-            logger.error(f"神煞互动处理失败: {e}")
+            logger.error("神煞互动处理失败: %s", e)
         
         # 3. 记录失败的计算
         if failed_calculations:
-            logger.warning(f"共有 {len(failed_calculations)} 个神煞计算失败")
+            logger.warning("共有 %s 个神煞计算失败", len(failed_calculations))
         
+        if context is not None:
+            context.shensha_results = result
         return result
+
+    @staticmethod
+    def _encode_chart(birth_chart: Bazi) -> Optional[Tuple[Tuple[int, ...], Tuple[int, ...], int, List[List[str]]]]:
+        """将八字编码为 (天干索引, 地支索引, 日柱甲子索引, 各地支所在柱位)，无法编码时返回 None"""
+        try:
+            pillars = (birth_chart.year, birth_chart.month, birth_chart.day, birth_chart.hour)
+            stems = tuple(STEM_INDEX[p.stem] for p in pillars)
+            branches = tuple(BRANCH_INDEX[p.branch] for p in pillars)
+        except (KeyError, AttributeError):
+            return None
+        branch_positions: List[List[str]] = [[] for _ in range(12)]
+        for i, branch in enumerate(branches):
+            branch_positions[branch].append(PILLAR_NAMES[i])
+        day_jiazi = JIAZI_INDEX.get(birth_chart.day.stem + birth_chart.day.branch, -1)
+        return stems, branches, day_jiazi, branch_positions
+
+    def _evaluate_compiled(self, compiled: CompiledRule, birth_chart: Bazi, encoded) -> Optional[ShenSha]:
+        """按 calc_method 查表计算单条神煞"""
+        handler = self._COMPILED_HANDLERS.get(compiled.calc_method)
+        if handler is None:
+            # 无查找表的规则（天德合、童子煞等）走原有计算
+            return self._dispatch_shensha_calculation(compiled.rule, birth_chart)
+        found_positions = handler(compiled, birth_chart, encoded)
+        if not found_positions:
+            return None
+        rule = compiled.rule
+        if compiled.calc_method == "month_based":
+            shensha = ShenSha(
+                name=rule["name"],
+                position=", ".join(found_positions),
+                strength=1.0,
+                active=True,
+                description=rule.get("description", ""),
+                auspicious_level=rule.get("auspicious_level", 5)
+            )
+        else:
+            shensha = ShenSha(
+                name=rule["name"],
+                position=", ".join(found_positions),
+                strength=1.0,
+                active=True,
+                description=rule.get("description", "")
+            )
+        
+        # 添加正面和负面标签
+        shensha.positive_tags = rule.get("positive_tags", [])
+        shensha.negative_tags = rule.get("negative_tags", [])
+        
+        # 应用强度修正
+        self._apply_shensha_modifiers(shensha, rule, birth_chart, found_positions)
+        return shensha
+
+    @staticmethod
+    def _lookup_stem_zhi(compiled: CompiledRule, birth_chart: Bazi, encoded) -> List[str]:
+        stems, _, _, branch_positions = encoded
+        found_positions = []
+        for pillar in compiled.base:
+            for target in compiled.table[stems[pillar]]:
+                found_positions.extend(branch_positions[target])
+        return found_positions
+
+    @staticmethod
+    def _lookup_base_zhi(compiled: CompiledRule, birth_chart: Bazi, encoded) -> List[str]:
+        _, branches, _, branch_positions = encoded
+        found_positions = []
+        for pillar in compiled.base:
+            target = compiled.table[branches[pillar]]
+            if target >= 0:
+                found_positions.extend(branch_positions[target])
+        return found_positions
+
+    @staticmethod
+    def _lookup_day_pillar(compiled: CompiledRule, birth_chart: Bazi, encoded) -> List[str]:
+        if encoded[2] in compiled.table:
+            return ["日柱"] if compiled.calc_method == "day_pillar_specific" else ["日"]
+        return []
+
+    @staticmethod
+    def _lookup_xunkong(compiled: CompiledRule, birth_chart: Bazi, encoded) -> List[str]:
+        day_jiazi, branch_positions = encoded[2], encoded[3]
+        if day_jiazi < 0:
+            return []
+        found_positions = []
+        for target in compiled.table[day_jiazi]:
+            found_positions.extend(branch_positions[target])
+        return found_positions
+
+    @staticmethod
+    def _lookup_month_based(compiled: CompiledRule, birth_chart: Bazi, encoded) -> List[str]:
+        month = birth_chart.birth_time.month if birth_chart.birth_time else 7
+        target_stems = compiled.table[month]
+        if not target_stems:
+            return []
+        return [PILLAR_NAMES[i] for i, stem in enumerate(encoded[0]) if stem in target_stems]
+
+    _COMPILED_HANDLERS = {
+        "stem_zhi_lookup": _lookup_stem_zhi.__func__,
+        "base_zhi_lookup": _lookup_base_zhi.__func__,
+        "day_pillar_specific": _lookup_day_pillar.__func__,
+        "specific_days": _lookup_day_pillar.__func__,
+        "xunkong": _lookup_xunkong.__func__,
+        "month_based": _lookup_month_based.__func__,
+    }
     
     def _dispatch_shensha_calculation(self, rule: dict, birth_chart: Bazi) -> Optional[ShenSha]:
         """根据计算方法派发神煞计算"""
         calc_method = rule.get("calc_method", "unknown")
-        
-        if calc_method == "stem_zhi_lookup":
-            return self._calculate_stem_zhi_shensha(rule, birth_chart)
-        elif calc_method == "base_zhi_lookup":
-            return self._calculate_base_zhi_shensha(rule, birth_chart)
-        elif calc_method == "day_pillar_specific":
-            return self._calculate_day_pillar_specific(rule, birth_chart)
-        elif calc_method == "xunkong":
-            return self._calculate_xunkong_shensha(rule, birth_chart)
-        elif calc_method == "month_based":
-            return self._calculate_month_based(rule, birth_chart)
-        elif calc_method == "stem_combination":
-            return self._calculate_stem_combination(rule, birth_chart)
-        elif calc_method == "complex_formula":
-            return self._calculate_complex_formula(rule, birth_chart)
-        elif calc_method == "specific_days":
-            return self._calculate_specific_days(rule, birth_chart)
-        else:
-            logger.warning(f"未知的神煞计算方法: {calc_method}")
+        method_name = self._DISPATCH_METHODS.get(calc_method)
+        if method_name is None:
+            logger.warning("未知的神煞计算方法: %s", calc_method)
             return None
+        return getattr(self, method_name)(rule, birth_chart)
+
+    _DISPATCH_METHODS = {
+        "stem_zhi_lookup": "_calculate_stem_zhi_shensha",
+        "base_zhi_lookup": "_calculate_base_zhi_shensha",
+        "day_pillar_specific": "_calculate_day_pillar_specific",
+        "xunkong": "_calculate_xunkong_shensha",
+        "month_based": "_calculate_month_based",
+        "stem_combination": "_calculate_stem_combination",
+        "complex_formula": "_calculate_complex_formula",
+        "specific_days": "_calculate_specific_days",
+    }
     
     def _calculate_stem_zhi_shensha(self, rule: dict, birth_chart: Bazi) -> Optional[ShenSha]:
         """计算基于天干查地支的神煞（如天乙贵人、文昌贵人、禄神等）"""
@@ -626,11 +721,11 @@ class ShenShaCalculator:
         
         return None
     
-    def analyze_interactions(self, bazi: Bazi) -> Dict[str, Any]:
+    def analyze_interactions(self, bazi: Bazi, context=None) -> Dict[str, Any]:
         """分析神煞互动"""
         try:
             # 先计算所有神煞
-            shensha_dict = self.calculate(bazi)
+            shensha_dict = self.calculate(bazi, context)
             
             # 分析神煞互动
             interactions = {}
@@ -653,7 +748,7 @@ class ShenShaCalculator:
             return interactions
             
         except Exception as e:
-            logger.error(f"分析神煞互动失败: {e}")
+            logger.error("分析神煞互动失败: %s", e)
             return {
                 "active_shensha": [],
                 "interaction_effects": {}
@@ -670,7 +765,7 @@ class ShenShaCalculator:
         elif stem_type == "hour_stem":
             return birth_chart.hour.stem
         else:
-            logger.warning(f"未知的天干类型: {stem_type}")
+            logger.warning("未知的天干类型: %s", stem_type)
             return ""
     
     def _get_branch_from_type(self, branch_type: str, birth_chart: Bazi) -> str:
@@ -684,7 +779,7 @@ class ShenShaCalculator:
         elif branch_type == "hour_branch":
             return birth_chart.hour.branch
         else:
-            logger.warning(f"未知的地支类型: {branch_type}")
+            logger.warning("未知的地支类型: %s", branch_type)
             return ""
     
     def _find_branch_positions(self, target_branch: str, birth_chart: Bazi) -> List[str]:
@@ -706,8 +801,18 @@ class ShenShaCalculator:
     
     def _get_xunkong_branches(self, day_pillar: str) -> List[str]:
         """根据日柱计算空亡地支"""
-        return XUNKONG_MAPPING.get(day_pillar, [])
+        return lookup_tables.xunkong(day_pillar)
     
+    def _get_day_master_strength(self, birth_chart: Bazi) -> str:
+        """日主旺衰只依赖八字，同一命盘的多条神煞修正共用一次计算结果"""
+        chart_key = tuple(birth_chart.get_bazi_characters().values())
+        cached = getattr(self, "_day_strength_memo", None)
+        if cached is not None and cached[0] == chart_key:
+            return cached[1]
+        day_strength = FiveElementsCalculator.calculate_day_master_strength(birth_chart)
+        self._day_strength_memo = (chart_key, day_strength)
+        return day_strength
+
     def _apply_shensha_modifiers(self, shensha: ShenSha, rule: dict, birth_chart: Bazi, positions: List[str]):
         """应用神煞强度修正"""
         try:
@@ -715,17 +820,17 @@ class ShenShaCalculator:
             
             # 基础修正
             if "day_master_weak" in strength_modifier:
-                day_strength = FiveElementsCalculator.calculate_day_master_strength(birth_chart)
+                day_strength = self._get_day_master_strength(birth_chart)
                 if "弱" in day_strength:
                     shensha.strength *= strength_modifier["day_master_weak"]
             
             if "day_master_strong" in strength_modifier:
-                day_strength = FiveElementsCalculator.calculate_day_master_strength(birth_chart)
+                day_strength = self._get_day_master_strength(birth_chart)
                 if "强" in day_strength:
                     shensha.strength *= strength_modifier["day_master_strong"]
         
         except Exception as e:
-            logger.error(f"应用神煞修正失败: {e}")
+            logger.error("应用神煞修正失败: %s", e)
     
     def _process_interactions(self, shensha_dict: Dict[str, ShenSha], birth_chart: Bazi):
         """处理神煞互动"""
@@ -733,11 +838,11 @@ class ShenShaCalculator:
             # 基本的神煞互动处理
             pass
         except Exception as e:
-            logger.error(f"处理神煞互动失败: {e}")
+            logger.error("处理神煞互动失败: %s", e)
     
-    def calculate_shensha(self, bazi: Bazi) -> Dict[str, ShenSha]:
+    def calculate_shensha(self, bazi: Bazi, context=None) -> Dict[str, ShenSha]:
         """计算神煞的别名方法"""
-        return self.calculate(bazi)
+        return self.calculate(bazi, context)
 
 
 class FiveElementsCalculator:
@@ -770,142 +875,21 @@ class FiveElementsCalculator:
             return formatted_dayun
             
         except Exception as e:
-            logger.error(f"格式化大运信息失败: {e}")
+            logger.error("格式化大运信息失败: %s", e)
             return []
 
     @staticmethod
     def calculate_day_master_strength(bazi: Bazi) -> str:
         """
         计算日主强弱 - 子平法详细计分规则（调整版）
-        采用子平法五行强弱标准算法，细化天干地支、本气中气余气、月令系数等
+        按预计算贡献表查表计分，结果按四柱缓存；计分明细见 calculate_day_master_strength_detailed
         """
         try:
-            day_stem = bazi.day.stem
-            day_element = STEM_ELEMENTS[day_stem]
-            
-            # 第一步：计算基础分数
-            total_score = 0.0
-            detail_scores = []
-            
-            # 天干基础分：年1分，月1分，日1分，时1分
-            stems = [bazi.year.stem, bazi.month.stem, bazi.day.stem, bazi.hour.stem]
-            stem_positions = ["年干", "月干", "日干", "时干"]
-            
-            for i, stem in enumerate(stems):
-                element = STEM_ELEMENTS[stem]
-                base_score = 1.0
-                
-                if element == day_element:
-                    total_score += base_score
-                    detail_scores.append(f"{stem_positions[i]}{stem}({element})：+{base_score}分(同类)")
-                elif element in REVERSE_GENERATION and REVERSE_GENERATION[element] == day_element:
-                    score = base_score * 0.9  # 提高生身分数
-                    total_score += score
-                    detail_scores.append(f"{stem_positions[i]}{stem}({element})：+{score}分(生身)")
-                elif element in FIVE_ELEMENTS_OVERCOMING and FIVE_ELEMENTS_OVERCOMING[element] == day_element:
-                    score = base_score * 0.7  # 降低克身分数
-                    total_score -= score
-                    detail_scores.append(f"{stem_positions[i]}{stem}({element})：-{score}分(克身)")
-                elif day_element in FIVE_ELEMENTS_OVERCOMING and FIVE_ELEMENTS_OVERCOMING[day_element] == element:
-                    score = base_score * 0.5  # 降低泄身分数
-                    total_score -= score
-                    detail_scores.append(f"{stem_positions[i]}{stem}({element})：-{score}分(泄身)")
-            
-            # 第二步：地支本气、中气、余气分别计分
-            branches = [bazi.year.branch, bazi.month.branch, bazi.day.branch, bazi.hour.branch]
-            branch_positions = ["年支", "月支", "日支", "时支"]
-            
-            for i, branch in enumerate(branches):
-                hidden_stems = BRANCH_HIDDEN_STEMS.get(branch, {})
-                
-                # 月支权重适度加强
-                position_weight = 2.0 if i == 1 else 1.0  # 降低月支权重
-                
-                for hidden_stem, weight in hidden_stems.items():
-                    element = STEM_ELEMENTS[hidden_stem]
-                    
-                    # 本气、中气、余气的分数
-                    if weight >= 0.6:  # 本气
-                        qi_score = 1.0
-                        qi_type = "本气"
-                    elif weight >= 0.3:  # 中气
-                        qi_score = 0.6
-                        qi_type = "中气"
-                    else:  # 余气
-                        qi_score = 0.3
-                        qi_type = "余气"
-                    
-                    final_score = qi_score * position_weight
-                    
-                    if element == day_element:
-                        total_score += final_score
-                        detail_scores.append(f"{branch_positions[i]}{branch}藏{hidden_stem}({element},{qi_type})：+{final_score}分(同类)")
-                    elif element in REVERSE_GENERATION and REVERSE_GENERATION[element] == day_element:
-                        score = final_score * 0.9  # 提高生身分数
-                        total_score += score
-                        detail_scores.append(f"{branch_positions[i]}{branch}藏{hidden_stem}({element},{qi_type})：+{score}分(生身)")
-                    elif element in FIVE_ELEMENTS_OVERCOMING and FIVE_ELEMENTS_OVERCOMING[element] == day_element:
-                        score = final_score * 0.7  # 降低克身分数
-                        total_score -= score
-                        detail_scores.append(f"{branch_positions[i]}{branch}藏{hidden_stem}({element},{qi_type})：-{score}分(克身)")
-                    elif day_element in FIVE_ELEMENTS_OVERCOMING and FIVE_ELEMENTS_OVERCOMING[day_element] == element:
-                        score = final_score * 0.5  # 降低泄身分数
-                        total_score -= score
-                        detail_scores.append(f"{branch_positions[i]}{branch}藏{hidden_stem}({element},{qi_type})：-{score}分(泄身)")
-            
-            # 第三步：通根加分（日主在地支有根）
-            tonggen_score = 0.0
-            for i, branch in enumerate(branches):
-                hidden_stems = BRANCH_HIDDEN_STEMS.get(branch, {})
-                for hidden_stem, weight in hidden_stems.items():
-                    if hidden_stem == day_stem:  # 日主天干在地支有根
-                        root_score = weight * 0.8  # 提高通根分数
-                        tonggen_score += root_score
-                        detail_scores.append(f"{branch_positions[i]}{branch}通根{day_stem}：+{root_score}分(通根)")
-            
-            total_score += tonggen_score
-            
-            # 第四步：月令系数调整（降低月令影响）
-            month_element = BRANCH_ELEMENTS[bazi.month.branch]
-            month_coefficient = 1.0
-            
-            if month_element == day_element:
-                month_coefficient = 1.3  # 降低月令助身系数
-                detail_scores.append(f"月令{bazi.month.branch}({month_element})助身：系数×1.3")
-            elif month_element in REVERSE_GENERATION and REVERSE_GENERATION[month_element] == day_element:
-                month_coefficient = 1.2  # 降低月令生身系数
-                detail_scores.append(f"月令{bazi.month.branch}({month_element})生身：系数×1.2")
-            elif month_element in FIVE_ELEMENTS_OVERCOMING and FIVE_ELEMENTS_OVERCOMING[month_element] == day_element:
-                month_coefficient = 0.8  # 降低月令克身影响
-                detail_scores.append(f"月令{bazi.month.branch}({month_element})克身：系数×0.8")
-            elif day_element in FIVE_ELEMENTS_OVERCOMING and FIVE_ELEMENTS_OVERCOMING[day_element] == month_element:
-                month_coefficient = 0.9  # 降低月令泄身影响
-                detail_scores.append(f"月令{bazi.month.branch}({month_element})泄身：系数×0.9")
-            
-            total_score *= month_coefficient
-            
-            # 第五步：根据总分判定强弱（调整判定标准）
-            if total_score >= 6.0:  # 提高极强阈值
-                strength = "极强"
-            elif total_score >= 3.5:  # 降低身强阈值
-                strength = "身强"
-            elif total_score >= 1.5:  # 调整平和范围
-                strength = "平和"
-            elif total_score >= 0.5:  # 调整身弱阈值
-                strength = "身弱"
-            else:
-                strength = "极弱"
-            
-            # 记录详细计算过程
-            logger.info(f"日主{day_stem}({day_element})强弱计算：")
-            for detail in detail_scores:
-                logger.info(f"  {detail}")
-            logger.info(f"  总分：{total_score:.2f}分，判定：{strength}")
-            
+            total_score, strength = strength_scorer.score_pillars(*strength_scorer.encode_pillars(bazi))
+            logger.debug("日主%s强弱：总分 %.2f分，判定：%s", bazi.day.stem, total_score, strength)
             return strength
-                
         except Exception as e:
-            logger.error(f"计算日主强弱失败: {e}")
+            logger.error("计算日主强弱失败: %s", e)
             return "未知"
     
     @staticmethod
@@ -915,174 +899,9 @@ class FiveElementsCalculator:
         返回详细的计分过程和结果
         """
         try:
-            day_stem = bazi.day.stem
-            day_element = STEM_ELEMENTS[day_stem]
-            
-            # 初始化结果
-            result = {
-                "day_stem": day_stem,
-                "day_element": day_element,
-                "total_score": 0.0,
-                "strength": "未知",
-                "detail_scores": [],
-                "calculation_steps": []
-            }
-            
-            total_score = 0.0
-            detail_scores = []
-            
-            # 第一步：计算天干基础分
-            stems = [bazi.year.stem, bazi.month.stem, bazi.day.stem, bazi.hour.stem]
-            stem_positions = ["年干", "月干", "日干", "时干"]
-            
-            result["calculation_steps"].append("第一步：天干基础分计算")
-            
-            for i, stem in enumerate(stems):
-                element = STEM_ELEMENTS[stem]
-                base_score = 1.0
-                
-                if element == day_element:
-                    total_score += base_score
-                    detail = f"{stem_positions[i]}{stem}({element})：+{base_score}分(同类)"
-                    detail_scores.append(detail)
-                    result["calculation_steps"].append(f"  {detail}")
-                elif element in REVERSE_GENERATION and REVERSE_GENERATION[element] == day_element:
-                    score = base_score * 0.9
-                    total_score += score
-                    detail = f"{stem_positions[i]}{stem}({element})：+{score}分(生身)"
-                    detail_scores.append(detail)
-                    result["calculation_steps"].append(f"  {detail}")
-                elif element in FIVE_ELEMENTS_OVERCOMING and FIVE_ELEMENTS_OVERCOMING[element] == day_element:
-                    score = base_score * 0.7
-                    total_score -= score
-                    detail = f"{stem_positions[i]}{stem}({element})：-{score}分(克身)"
-                    detail_scores.append(detail)
-                    result["calculation_steps"].append(f"  {detail}")
-                elif day_element in FIVE_ELEMENTS_OVERCOMING and FIVE_ELEMENTS_OVERCOMING[day_element] == element:
-                    score = base_score * 0.5
-                    total_score -= score
-                    detail = f"{stem_positions[i]}{stem}({element})：-{score}分(泄身)"
-                    detail_scores.append(detail)
-                    result["calculation_steps"].append(f"  {detail}")
-            
-            # 第二步：地支本气、中气、余气分别计分
-            branches = [bazi.year.branch, bazi.month.branch, bazi.day.branch, bazi.hour.branch]
-            branch_positions = ["年支", "月支", "日支", "时支"]
-            
-            result["calculation_steps"].append("第二步：地支藏干分计算")
-            
-            for i, branch in enumerate(branches):
-                hidden_stems = BRANCH_HIDDEN_STEMS.get(branch, {})
-                
-                # 月支权重适度加强
-                position_weight = 2.0 if i == 1 else 1.0
-                
-                for hidden_stem, weight in hidden_stems.items():
-                    element = STEM_ELEMENTS[hidden_stem]
-                    
-                    # 本气、中气、余气的分数
-                    if weight >= 0.6:  # 本气
-                        qi_score = 1.0
-                        qi_type = "本气"
-                    elif weight >= 0.3:  # 中气
-                        qi_score = 0.6
-                        qi_type = "中气"
-                    else:  # 余气
-                        qi_score = 0.3
-                        qi_type = "余气"
-                    
-                    final_score = qi_score * position_weight
-                    
-                    if element == day_element:
-                        total_score += final_score
-                        detail = f"{branch_positions[i]}{branch}藏{hidden_stem}({element},{qi_type})：+{final_score}分(同类)"
-                        detail_scores.append(detail)
-                        result["calculation_steps"].append(f"  {detail}")
-                    elif element in REVERSE_GENERATION and REVERSE_GENERATION[element] == day_element:
-                        score = final_score * 0.9
-                        total_score += score
-                        detail = f"{branch_positions[i]}{branch}藏{hidden_stem}({element},{qi_type})：+{score}分(生身)"
-                        detail_scores.append(detail)
-                        result["calculation_steps"].append(f"  {detail}")
-                    elif element in FIVE_ELEMENTS_OVERCOMING and FIVE_ELEMENTS_OVERCOMING[element] == day_element:
-                        score = final_score * 0.7
-                        total_score -= score
-                        detail = f"{branch_positions[i]}{branch}藏{hidden_stem}({element},{qi_type})：-{score}分(克身)"
-                        detail_scores.append(detail)
-                        result["calculation_steps"].append(f"  {detail}")
-                    elif day_element in FIVE_ELEMENTS_OVERCOMING and FIVE_ELEMENTS_OVERCOMING[day_element] == element:
-                        score = final_score * 0.5
-                        total_score -= score
-                        detail = f"{branch_positions[i]}{branch}藏{hidden_stem}({element},{qi_type})：-{score}分(泄身)"
-                        detail_scores.append(detail)
-                        result["calculation_steps"].append(f"  {detail}")
-            
-            # 第三步：通根加分（日主在地支有根）
-            result["calculation_steps"].append("第三步：通根加分计算")
-            tonggen_score = 0.0
-            
-            for i, branch in enumerate(branches):
-                hidden_stems = BRANCH_HIDDEN_STEMS.get(branch, {})
-                for hidden_stem, weight in hidden_stems.items():
-                    if hidden_stem == day_stem:  # 日主天干在地支有根
-                        root_score = weight * 0.8
-                        tonggen_score += root_score
-                        detail = f"{branch_positions[i]}{branch}通根{day_stem}：+{root_score}分(通根)"
-                        detail_scores.append(detail)
-                        result["calculation_steps"].append(f"  {detail}")
-            
-            total_score += tonggen_score
-            
-            # 第四步：月令系数调整
-            result["calculation_steps"].append("第四步：月令系数调整")
-            month_element = BRANCH_ELEMENTS[bazi.month.branch]
-            month_coefficient = 1.0
-            
-            if month_element == day_element:
-                month_coefficient = 1.3  # 月令助身
-                detail = f"月令{bazi.month.branch}({month_element})助身：系数×1.3"
-                detail_scores.append(detail)
-                result["calculation_steps"].append(f"  {detail}")
-            elif month_element in REVERSE_GENERATION and REVERSE_GENERATION[month_element] == day_element:
-                month_coefficient = 1.2  # 月令生身
-                detail = f"月令{bazi.month.branch}({month_element})生身：系数×1.2"
-                detail_scores.append(detail)
-                result["calculation_steps"].append(f"  {detail}")
-            elif month_element in FIVE_ELEMENTS_OVERCOMING and FIVE_ELEMENTS_OVERCOMING[month_element] == day_element:
-                month_coefficient = 0.8  # 月令克身
-                detail = f"月令{bazi.month.branch}({month_element})克身：系数×0.8"
-                detail_scores.append(detail)
-                result["calculation_steps"].append(f"  {detail}")
-            elif day_element in FIVE_ELEMENTS_OVERCOMING and FIVE_ELEMENTS_OVERCOMING[day_element] == month_element:
-                month_coefficient = 0.9  # 月令泄身
-                detail = f"月令{bazi.month.branch}({month_element})泄身：系数×0.9"
-                detail_scores.append(detail)
-                result["calculation_steps"].append(f"  {detail}")
-            
-            total_score *= month_coefficient
-            
-            # 第五步：根据总分判定强弱
-            if total_score >= 6.0:
-                strength = "极强"
-            elif total_score >= 3.5:
-                strength = "身强"
-            elif total_score >= 1.5:
-                strength = "平和"
-            elif total_score >= 0.5:
-                strength = "身弱"
-            else:
-                strength = "极弱"
-            
-            result["total_score"] = total_score
-            result["strength"] = strength
-            result["detail_scores"] = detail_scores
-            result["calculation_steps"].append(f"第五步：最终判定")
-            result["calculation_steps"].append(f"  总分：{total_score:.2f}分，判定：{strength}")
-            
-            return result
-                
+            return strength_scorer.explain_day_master_strength(bazi)
         except Exception as e:
-            logger.error(f"详细计算日主强弱失败: {e}")
+            logger.error("详细计算日主强弱失败: %s", e)
             return {
                 "day_stem": "未知",
                 "day_element": "未知",
@@ -1126,7 +945,7 @@ class FiveElementsCalculator:
                 return {"木": 20.0, "火": 20.0, "土": 20.0, "金": 20.0, "水": 20.0}
                 
         except Exception as e:
-            logger.error(f"计算五行占比失败: {e}")
+            logger.error("计算五行占比失败: %s", e)
             return {"木": 20.0, "火": 20.0, "土": 20.0, "金": 20.0, "水": 20.0}
     
     @staticmethod
@@ -1142,11 +961,12 @@ class FiveElementsCalculator:
         return descriptions.get(strength, "强弱未知")
     
     @staticmethod
-    def get_favorable_elements(bazi: Bazi) -> List[str]:
-        """获取喜用神五行"""
+    def get_favorable_elements(bazi: Bazi, strength: Optional[str] = None) -> List[str]:
+        """获取喜用神五行；strength 为已算出的日主旺衰时不再重复计算"""
         try:
             day_element = STEM_ELEMENTS[bazi.day.stem]
-            strength = FiveElementsCalculator.calculate_day_master_strength(bazi)
+            if strength is None:
+                strength = FiveElementsCalculator.calculate_day_master_strength(bazi)
             
             if strength in ["极强", "偏强"]:
                 # 强则宜泄耗
@@ -1170,7 +990,7 @@ class FiveElementsCalculator:
                 return [day_element]
                 
         except Exception as e:
-            logger.error(f"获取喜用神失败: {e}")
+            logger.error("获取喜用神失败: %s", e)
             return []
     
     @staticmethod
@@ -1189,53 +1009,11 @@ class FiveElementsCalculator:
     
     @staticmethod
     def calculate_ten_god_relation(day_stem: str, other_stem: str) -> str:
-        """计算十神关系"""
-        try:
-            day_element = STEM_ELEMENTS[day_stem]
-            other_element = STEM_ELEMENTS[other_stem]
-            day_yin_yang = STEM_YIN_YANG[day_stem]
-            other_yin_yang = STEM_YIN_YANG[other_stem]
-            
-            # 同类
-            if day_element == other_element:
-                if day_yin_yang == other_yin_yang:
-                    return "比肩"
-                else:
-                    return "劫财"
-            
-            # 我生者（食伤）
-            if day_element in FIVE_ELEMENTS_GENERATION and FIVE_ELEMENTS_GENERATION[day_element] == other_element:
-                if day_yin_yang == other_yin_yang:
-                    return "食神"
-                else:
-                    return "伤官"
-            
-            # 我克者（财星）
-            if day_element in FIVE_ELEMENTS_OVERCOMING and FIVE_ELEMENTS_OVERCOMING[day_element] == other_element:
-                if day_yin_yang == other_yin_yang:
-                    return "偏财"
-                else:
-                    return "正财"
-            
-            # 克我者（官杀）
-            if other_element in FIVE_ELEMENTS_OVERCOMING and FIVE_ELEMENTS_OVERCOMING[other_element] == day_element:
-                if day_yin_yang == other_yin_yang:
-                    return "七杀"
-                else:
-                    return "正官"
-            
-            # 生我者（印星）
-            if other_element in FIVE_ELEMENTS_GENERATION and FIVE_ELEMENTS_GENERATION[other_element] == day_element:
-                if day_yin_yang == other_yin_yang:
-                    return "偏印"
-                else:
-                    return "正印"
-            
-            return "未知"
-            
-        except Exception as e:
-            logger.error(f"计算十神关系失败: {e}")
-            return "未知"
+        """计算十神关系（查预计算十神表）"""
+        result = lookup_tables.ten_god(day_stem, other_stem)
+        if result == "未知":
+            logger.error("计算十神关系失败: %s / %s", day_stem, other_stem)
+        return result
     
     @staticmethod
     def get_zhi_hidden_gan(branch: str) -> Dict[str, float]:
@@ -1245,7 +1023,7 @@ class FiveElementsCalculator:
     @staticmethod
     def calculate_chang_sheng_twelve_palaces(stem: str, branch: str) -> str:
         """计算长生十二宫"""
-        return CHANG_SHENG_MAPPING.get(stem, {}).get(branch, "未知")
+        return lookup_tables.chang_sheng(stem, branch)
     
     @staticmethod
     def get_chang_sheng_strength_level(chang_sheng: str) -> str:
@@ -1267,18 +1045,21 @@ class FiveElementsCalculator:
                 "unfavorable_shensha": []
             }
         except Exception as e:
-            logger.error(f"分析流年神煞失败: {e}")
+            logger.error("分析流年神煞失败: %s", e)
             return {
                 "favorable_shensha": [],
                 "unfavorable_shensha": []
             }
     
     @staticmethod
-    def analyze_comprehensive_gods(bazi: Bazi) -> Dict[str, Any]:
-        """综合分析喜用神"""
+    def analyze_comprehensive_gods(bazi: Bazi, strength: Optional[str] = None,
+                                   favorable_elements: Optional[List[str]] = None) -> Dict[str, Any]:
+        """综合分析喜用神；可传入已算出的日主旺衰与喜用神"""
         try:
-            favorable_elements = FiveElementsCalculator.get_favorable_elements(bazi)
-            strength = FiveElementsCalculator.calculate_day_master_strength(bazi)
+            if strength is None:
+                strength = FiveElementsCalculator.calculate_day_master_strength(bazi)
+            if favorable_elements is None:
+                favorable_elements = FiveElementsCalculator.get_favorable_elements(bazi, strength=strength)
             
             # 确定主要喜用神
             primary_favorable = favorable_elements[0] if favorable_elements else "未知"
@@ -1300,7 +1081,7 @@ class FiveElementsCalculator:
                 }
             }
         except Exception as e:
-            logger.error(f"综合分析喜用神失败: {e}")
+            logger.error("综合分析喜用神失败: %s", e)
             return {
                 "basic_analysis": {
                     "favorable_elements": [],
@@ -1330,7 +1111,7 @@ class FiveElementsCalculator:
                 "corrected_time": birth_time
             }
         except Exception as e:
-            logger.error(f"获取真太阳时校正失败: {e}")
+            logger.error("获取真太阳时校正失败: %s", e)
             return {
                 "correction_applied": False,
                 "longitude_diff_minutes": 0.0,
@@ -1361,30 +1142,12 @@ class FiveElementsCalculator:
             is_male = (gender == "男")
             is_forward = (is_yang_year and is_male) or (not is_yang_year and not is_male)
             forward_str = "顺排" if is_forward else "逆排"
-            logger.info(f"大运计算: 年干={year_gan}, 性别={gender}, 阳年={is_yang_year}, {forward_str}")
-            # 2. 查找最近节气（使用12个主要节气）
-            if not solar_terms:
-                # 兼容老接口，自动查找本地节气表
-                try:
-                    import sys
-                    import os
-                    backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-                    sys.path.insert(0, backend_dir)
-                    from major_solar_terms import load_major_solar_terms_flat
-                    solar_terms = load_major_solar_terms_flat()
-                    logger.info(f"成功加载12个主要节气数据: {len(solar_terms)}个")
-                except Exception as e:
-                    logger.warning(f"加载主要节气数据失败: {e}")
-                    solar_terms = []
-            # 找到出生前后最近的节气
-            prev_term, next_term = None, None
+            logger.debug("大运计算: 年干=%s, 性别=%s, 阳年=%s, %s", year_gan, gender, is_yang_year, forward_str)
+            # 2. 查找最近节气（使用12个主要节气，进程内共享的节气索引）
             if solar_terms:
-                for term in solar_terms:
-                    term_dt = datetime.strptime(term["datetime"], "%Y-%m-%d %H:%M:%S")
-                    if term_dt <= birth_time:
-                        prev_term = term
-                    if term_dt > birth_time and not next_term:
-                        next_term = term
+                prev_term, next_term = SolarTermIndex.from_terms(solar_terms).surrounding(birth_time, jie_only=False)
+            else:
+                prev_term, next_term = get_solar_term_index().surrounding(birth_time)
             # 顺排：下一个节气，逆排：上一个节气
             if is_forward:
                 ref_term = next_term
@@ -1396,7 +1159,7 @@ class FiveElementsCalculator:
                 start_age = 8
                 start_days = 0
             else:
-                ref_dt = datetime.strptime(ref_term["datetime"], "%Y-%m-%d %H:%M:%S")
+                ref_dt = ref_term.time
                 days = abs((ref_dt - birth_time).days)
                 start_days = days
                 hours = abs((ref_dt - birth_time).seconds) // 3600
@@ -1433,7 +1196,7 @@ class FiveElementsCalculator:
                 luck_pillars.append(dayun)
             return start_date, start_days, luck_pillars, start_age
         except Exception as e:
-            logger.error(f"计算精准大运失败: {e}")
+            logger.error("计算精准大运失败: %s", e)
             return birth_time, 8, [], 8
     
     @staticmethod
@@ -1462,7 +1225,7 @@ class FiveElementsCalculator:
                 }
             }
         except Exception as e:
-            logger.error(f"分析流年互动失败: {e}")
+            logger.error("分析流年互动失败: %s", e)
             return {
                 "favorable_interactions": [],
                 "unfavorable_interactions": [],
@@ -1487,12 +1250,12 @@ class FiveElementsCalculator:
             }
             
             for pillar_name, pillar_ganzhi in pillars.items():
-                xunkong_branches = XUNKONG_MAPPING.get(pillar_ganzhi, [])
+                xunkong_branches = lookup_tables.xunkong(pillar_ganzhi)
                 xunkong_info[pillar_name] = xunkong_branches
             
             return xunkong_info
             
         except Exception as e:
-            logger.error(f"计算空亡信息失败: {e}")
+            logger.error("计算空亡信息失败: %s", e)
             return {}
 
@@ -0,0 +1,133 @@
+"""
+排盘结果缓存
+以规范化请求的哈希为键（内容寻址）：出生时刻、性别、出生地、计算模式相同的请求共用一份结果。
+随出生信息固定的部分（四柱、纳音、神煞、大运等）长期缓存，只受 LRU 容量约束；
+随流年变化的当年运势按 (请求, 流年) 单独缓存（立春后键自然切换），另按 TTL 过期。
+其中只由四柱与性别决定的分析结果（旺衰、五行、喜用神、神煞、互动、纳音、宫位等）另按四柱缓存，
+同一时辰、同一节气月内出生的不同请求共用，只需重算起运岁数等与出生时刻相关的字段。
+
+环境变量：
+    BAZI_CHART_CACHE_SIZE     命盘缓存条数，默认 2048，0 表示关闭缓存
+    BAZI_PILLAR_CACHE_SIZE    四柱分析缓存条数，默认 4096
+    BAZI_FORTUNE_CACHE_SIZE   当年运势缓存条数，默认同命盘缓存
+    BAZI_FORTUNE_CACHE_TTL    当年运势缓存有效期（秒），默认 3600
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from ..schemas.bazi import BaziCalculateRequest
+from .core import Bazi
+from .metrics import registry
+
+
+class LRUCache:
+    """线程安全的有界 LRU 缓存，可选 TTL（秒）"""
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """命中返回缓存值，未命中或已过期返回 None"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or self._clock() < expires_at:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+        expires_at = self._clock() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def chart_request_key(request_data: BaziCalculateRequest, quick_mode: bool) -> str:
+    """规范化请求的 SHA-256：只取影响排盘结果的字段（姓名等不参与），按固定顺序序列化，时间用 ISO 格式（保留时区）"""
+    canonical = [request_data.birth_datetime.isoformat(), request_data.gender, request_data.birth_place, bool(quick_mode)]
+    payload = json.dumps(canonical, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def pillar_analysis_key(bazi: Bazi, quick_mode: bool) -> tuple:
+    """四柱分析缓存键：四柱编码 + 性别 + 模式
+    
+    完整模式下部分神煞（天德、月德、童子等）按出生公历月份查表，公历月份不由四柱唯一确定，故一并纳入键
+    """
+    birth_month = bazi.birth_time.month if bazi.birth_time and not quick_mode else None
+    return bazi.encode().code, bazi.gender, birth_month, bool(quick_mode)
+
+
+_chart_cache_size = int(os.getenv("BAZI_CHART_CACHE_SIZE", "2048"))
+
+# 命盘静态部分：chart_request_key -> StaticChart
+static_chart_cache = LRUCache(_chart_cache_size)
+# 四柱分析：pillar_analysis_key -> 响应字段
+pillar_analysis_cache = LRUCache(int(os.getenv("BAZI_PILLAR_CACHE_SIZE", "4096")))
+# 当年运势：(chart_request_key, Liunian) -> current_year_fortune
+fortune_cache = LRUCache(
+    int(os.getenv("BAZI_FORTUNE_CACHE_SIZE", str(_chart_cache_size))),
+    ttl=float(os.getenv("BAZI_FORTUNE_CACHE_TTL", "3600"))
+)
+
+
+def clear_chart_caches():
+    static_chart_cache.clear()
+    pillar_analysis_cache.clear()
+    fortune_cache.clear()
+
+
+def chart_cache_stats() -> Dict[str, Dict[str, Any]]:
+    return {
+        "static": static_chart_cache.stats(),
+        "pillar": pillar_analysis_cache.stats(),
+        "fortune": fortune_cache.stats(),
+    }
+
+
+def _cache_samples(field: str):
+    return [("", {"cache": name}, stats[field]) for name, stats in chart_cache_stats().items()]
+
+
+registry.register_collector("bazi_chart_cache_hits_total", "counter", "排盘缓存命中次数",
+                            lambda: _cache_samples("hits"))
+registry.register_collector("bazi_chart_cache_misses_total", "counter", "排盘缓存未命中次数",
+                            lambda: _cache_samples("misses"))
+registry.register_collector("bazi_chart_cache_entries", "gauge", "排盘缓存当前条数",
+                            lambda: _cache_samples("size"))
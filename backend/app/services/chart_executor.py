@@ -0,0 +1,149 @@
+"""
+排盘执行器
+排盘是纯 CPU 计算，放到线程池 / 进程池中执行，避免阻塞事件循环（AI 等 I/O 请求不再被排盘拖慢）。
+并发上限 = 工作线程（进程）数 + 排队上限，超出时立即拒绝（503），不无限堆积。
+
+环境变量：
+    BAZI_EXECUTOR_KIND       thread（默认）/ process / inline（在事件循环内直接执行，仅用于对比与调试）
+    BAZI_EXECUTOR_WORKERS    工作线程（进程）数，默认 CPU 核数
+    BAZI_EXECUTOR_MAX_QUEUE  排队上限，默认 64
+"""
+import asyncio
+import functools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException, status
+
+from .logger_config import setup_logger
+from .metrics import registry
+logger = setup_logger("chart_executor")
+
+EXECUTOR_KINDS = ("thread", "process", "inline")
+
+rejected_total = registry.counter("bazi_chart_executor_rejected_total", "排盘执行器已满而拒绝的任务数")
+
+
+class ChartExecutorBusy(HTTPException):
+    """执行器已满（运行中 + 排队数达到上限）"""
+
+    def __init__(self, limit: int):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"排盘服务繁忙（并发上限 {limit}），请稍后重试",
+            headers={"Retry-After": "1"},
+        )
+
+
+def _warm_up():
+    """进程池工作进程初始化：预先加载排盘依赖的数据表"""
+    from .pillar_engine import get_pillar_engine
+    get_pillar_engine()
+
+
+class ChartExecutor:
+    """带并发上限的排盘执行器"""
+
+    def __init__(self, kind: str = "thread", max_workers: Optional[int] = None, max_queue: int = 64):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"未知的执行器类型: {kind}（可选 {', '.join(EXECUTOR_KINDS)}）")
+        self.kind = kind
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.limit = self.max_workers + max_queue
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._pool: Optional[Executor] = None
+        if kind == "thread":
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bazi-chart")
+        elif kind == "process":
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"), initializer=_warm_up
+            )
+
+    @property
+    def in_flight(self) -> int:
+        """运行中 + 排队中的任务数"""
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        """排队等待工作线程（进程）的任务数"""
+        if self._pool is None:
+            return 0
+        return max(0, self._in_flight - self.max_workers)
+
+    def _acquire(self):
+        with self._lock:
+            if self._in_flight >= self.limit:
+                rejected_total.inc()
+                raise ChartExecutorBusy(self.limit)
+            self._in_flight += 1
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """在执行器中运行 func（进程池模式下 func 与参数须可 pickle）"""
+        self._acquire()
+        try:
+            if self._pool is None:
+                return func(*args, **kwargs)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, functools.partial(func, *args, **kwargs))
+        finally:
+            self._release()
+
+    def shutdown(self, wait: bool = True):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+
+
+_executor: Optional[ChartExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_chart_executor() -> ChartExecutor:
+    """获取进程内共享的排盘执行器（首次使用时按环境变量创建）"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                kind = os.getenv("BAZI_EXECUTOR_KIND", "thread")
+                workers = int(os.getenv("BAZI_EXECUTOR_WORKERS", "0")) or None
+                max_queue = int(os.getenv("BAZI_EXECUTOR_MAX_QUEUE", "64"))
+                _executor = ChartExecutor(kind, workers, max_queue)
+                logger.info("排盘执行器: %s，工作数 %s，排队上限 %s", _executor.kind, _executor.max_workers, max_queue)
+    return _executor
+
+
+def set_chart_executor(executor: Optional[ChartExecutor]) -> Optional[ChartExecutor]:
+    """替换共享执行器（测试与压测用），返回原执行器"""
+    global _executor
+    with _executor_lock:
+        previous, _executor = _executor, executor
+    return previous
+
+
+def shutdown_chart_executor():
+    """关闭共享执行器（应用退出时调用）"""
+    previous = set_chart_executor(None)
+    if previous is not None:
+        previous.shutdown(wait=False)
+
+
+def _executor_samples(attribute: str):
+    executor = _executor
+    return [] if executor is None else [("", {"kind": executor.kind}, getattr(executor, attribute))]
+
+
+registry.register_collector("bazi_chart_executor_in_flight", "gauge", "排盘执行器运行中与排队中的任务数",
+                            lambda: _executor_samples("in_flight"))
+registry.register_collector("bazi_chart_executor_queue_depth", "gauge", "排盘执行器排队中的任务数",
+                            lambda: _executor_samples("queue_depth"))
+registry.register_collector("bazi_chart_executor_limit", "gauge", "排盘执行器并发上限（工作数 + 排队上限）",
+                            lambda: _executor_samples("limit"))
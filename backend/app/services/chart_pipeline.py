@@ -0,0 +1,147 @@
+"""
+阶段图流水线
+每个阶段声明名称、输入阶段与计算函数，输出即阶段名对应的值；单次执行（PipelineRun）内
+每个阶段至多计算一次，并记录各阶段自身的墙钟耗时（不含其输入阶段）。
+可选地按拓扑层级把互不依赖的阶段提交到线程池并发执行。
+
+环境变量：
+    BAZI_PIPELINE_WORKERS  阶段并发线程数，默认 0（顺序执行）。排盘阶段均为纯 Python 计算，
+                           CPython 下受 GIL 限制，并发主要用于含 I/O 的阶段或无 GIL 构建
+"""
+import os
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+from .logger_config import setup_logger
+logger = setup_logger("chart_pipeline")
+
+
+class Stage(NamedTuple):
+    name: str
+    inputs: Tuple[str, ...]
+    func: Callable[["PipelineRun"], Any]
+
+
+def resolve_order(dependencies: Mapping[str, Sequence[str]], targets: Iterable[str]) -> List[str]:
+    """求出计算 targets 所需的全部阶段，按依赖顺序（先输入后使用）排列；存在环时抛出 ValueError"""
+    ordered: List[str] = []
+    done = set()
+    visiting = set()
+
+    def visit(name: str):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"阶段依赖存在环: {name}")
+        visiting.add(name)
+        for dependency in dependencies[name]:
+            visit(dependency)
+        visiting.discard(name)
+        done.add(name)
+        ordered.append(name)
+
+    for name in targets:
+        visit(name)
+    return ordered
+
+
+class StageGraph:
+    """阶段声明的集合（构建时校验输入均已声明且无环）"""
+
+    def __init__(self, stages: Iterable[Stage]):
+        self.stages: Dict[str, Stage] = {stage.name: stage for stage in stages}
+        for stage in self.stages.values():
+            missing = [name for name in stage.inputs if name not in self.stages]
+            if missing:
+                raise ValueError(f"阶段 {stage.name} 的输入未声明: {', '.join(missing)}")
+        self.dependencies = {name: stage.inputs for name, stage in self.stages.items()}
+        resolve_order(self.dependencies, self.stages)
+
+    def order(self, targets: Iterable[str]) -> List[str]:
+        return resolve_order(self.dependencies, targets)
+
+    def levels(self, targets: Iterable[str]) -> List[List[str]]:
+        """按拓扑层级分组：同一层的阶段互不依赖，可并发执行"""
+        depth: Dict[str, int] = {}
+        for name in self.order(targets):
+            depth[name] = max((depth[dependency] + 1 for dependency in self.dependencies[name]), default=0)
+        levels: List[List[str]] = [[] for _ in range(max(depth.values(), default=-1) + 1)]
+        for name, level in depth.items():
+            levels[level].append(name)
+        return levels
+
+
+class PipelineRun:
+    """一次流水线执行：阶段结果按名称记忆，timings 记录每个实际执行的阶段耗时（秒）"""
+
+    def __init__(self, graph: StageGraph, values: Optional[Dict[str, Any]] = None):
+        self.graph = graph
+        self.values: Dict[str, Any] = dict(values or {})
+        self.timings: Dict[str, float] = {}
+        self._lock = threading.RLock()
+
+    def get(self, name: str) -> Any:
+        """取阶段结果，未计算时先计算其输入"""
+        if name in self.values:
+            return self.values[name]
+        for dependency in self.graph.dependencies[name]:
+            self.get(dependency)
+        return self._execute(name)
+
+    def compute(self, name: str) -> Any:
+        """计算单个阶段（输入已就绪），子类可在此加入缓存"""
+        return self.graph.stages[name].func(self)
+
+    def _execute(self, name: str) -> Any:
+        start = time.perf_counter()
+        value = self.compute(name)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            if name not in self.values:
+                self.values[name] = value
+                self.timings[name] = elapsed
+            return self.values[name]
+
+    def run(self, targets: Sequence[str], pool: Optional[Executor] = None) -> Dict[str, Any]:
+        """计算 targets 及其输入阶段；给定线程池时同一拓扑层的阶段并发执行"""
+        if pool is None:
+            for name in self.graph.order(targets):
+                self.get(name)
+        else:
+            for level in self.graph.levels(targets):
+                pending = [name for name in level if name not in self.values]
+                if len(pending) <= 1:
+                    for name in pending:
+                        self._execute(name)
+                    continue
+                for future in [pool.submit(self._execute, name) for name in pending]:
+                    future.result()
+        return {name: self.values[name] for name in targets}
+
+
+_stage_pool: Optional[ThreadPoolExecutor] = None
+_stage_pool_lock = threading.Lock()
+
+
+def get_stage_pool() -> Optional[ThreadPoolExecutor]:
+    """阶段并发线程池（BAZI_PIPELINE_WORKERS 为 0 时返回 None，即顺序执行）
+
+    与排盘执行器分开：排盘任务本身运行在排盘执行器中，若在同一线程池里等待子阶段可能死锁
+    """
+    global _stage_pool
+    workers = int(os.getenv("BAZI_PIPELINE_WORKERS", "0"))
+    if workers <= 0:
+        return None
+    if _stage_pool is None:
+        with _stage_pool_lock:
+            if _stage_pool is None:
+                _stage_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bazi-stage")
+                logger.info("排盘阶段并发线程数: %s", workers)
+    return _stage_pool
+
+
+def format_timings(timings: Mapping[str, float]) -> str:
+    """耗时摘要（毫秒），用于日志"""
+    return ", ".join(f"{name}={seconds * 1e3:.2f}ms" for name, seconds in timings.items())
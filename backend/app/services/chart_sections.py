@@ -0,0 +1,76 @@
+"""
+排盘响应分段及其依赖关系
+每个响应字段是一个分段，另有四个中间分段：location（地理位置）、solar_time（真太阳时校正）、
+chart（四柱与命盘对象）与 analysis（日主旺衰、五行占比、综合喜用神的按需计算上下文）。
+调用方只请求部分字段时，按依赖图求出所需分段，其余分段（神煞、流年等）完全不计算。
+"""
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from ..schemas.bazi import BaziCalculateResponse
+from .chart_pipeline import resolve_order
+
+LOCATION = "location"
+SOLAR_TIME = "solar_time"
+CHART = "chart"
+ANALYSIS = "analysis"
+FORTUNE = "current_year_fortune"
+
+# 分段 -> 直接依赖的分段
+SECTION_DEPENDENCIES: Dict[str, Tuple[str, ...]] = {
+    LOCATION: (),
+    SOLAR_TIME: (LOCATION,),
+    CHART: (LOCATION, SOLAR_TIME),
+    ANALYSIS: (CHART,),
+    "bazi_characters": (CHART,),
+    "day_master_element": (CHART,),
+    "zodiac_sign": (CHART,),
+    "gan_zhi_info": (CHART,),
+    "dz_cang_gan": (CHART,),
+    "day_chang_sheng": (CHART,),
+    "year_chang_sheng": (CHART,),
+    "na_yin": (CHART,),
+    "palace_info": (CHART,),
+    "five_elements_score": (ANALYSIS,),
+    "day_master_strength": (ANALYSIS,),
+    "comprehensive_favorable_analysis": (ANALYSIS,),
+    "favorable_elements": ("comprehensive_favorable_analysis",),
+    "interactions": (ANALYSIS,),
+    "shen_sha_details": (ANALYSIS,),
+    "major_cycles": (CHART,),
+    "birth_place": (),
+    "location_info": (CHART,),
+    FORTUNE: (CHART, "major_cycles", "comprehensive_favorable_analysis"),
+}
+
+RESPONSE_FIELDS: Tuple[str, ...] = tuple(BaziCalculateResponse.model_fields)
+# 随出生信息固定的字段（除当年运势外的全部响应字段）
+STATIC_FIELDS: Tuple[str, ...] = tuple(name for name in RESPONSE_FIELDS if name != FORTUNE)
+# 只由四柱与性别（及模式）决定的字段，按四柱缓存
+PILLAR_SECTIONS = frozenset({
+    "bazi_characters", "day_master_element", "zodiac_sign", "gan_zhi_info", "dz_cang_gan",
+    "day_chang_sheng", "year_chang_sheng", "na_yin", "palace_info", "five_elements_score",
+    "day_master_strength", "comprehensive_favorable_analysis", "favorable_elements",
+    "interactions", "shen_sha_details",
+})
+
+assert set(RESPONSE_FIELDS) <= set(SECTION_DEPENDENCIES), "响应字段缺少分段依赖声明"
+
+
+def parse_fields(fields: Union[None, str, Iterable[str]]) -> Optional[Tuple[str, ...]]:
+    """解析字段选择（逗号分隔字符串或字段列表），None 或空表示全部字段；含未知字段时抛出 ValueError"""
+    if fields is None:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    names = tuple(dict.fromkeys(name.strip() for name in fields if name and name.strip()))
+    if not names:
+        return None
+    unknown = [name for name in names if name not in RESPONSE_FIELDS]
+    if unknown:
+        raise ValueError(f"未知的响应字段: {', '.join(unknown)}（可选: {', '.join(RESPONSE_FIELDS)}）")
+    return names
+
+
+def resolve_sections(fields: Iterable[str]) -> List[str]:
+    """求出计算 fields 所需的全部分段，按依赖顺序（先依赖后使用）排列"""
+    return resolve_order(SECTION_DEPENDENCIES, fields)
@@ -0,0 +1,219 @@
+"""
+命盘会话
+排盘端点把本次的请求与排盘结果存为会话并返回 chart_id，后续 AI 分析端点凭 chart_id 取回命盘，不再重复排盘；
+会话中缺少所需模式（快速/完整）的结果时补算一次并存回同一会话。
+内存中按 LRU 保留最近的会话；配置 BAZI_CHART_SESSION_DB 时同时写入 SQLite，
+内存淘汰、进程重启或由其他工作进程处理的请求仍可取回。
+
+环境变量：
+    BAZI_CHART_SESSION_SIZE   内存中保留的会话数，默认 1024，0 表示只用 SQLite
+    BAZI_CHART_SESSION_TTL    会话有效期（秒），默认 86400
+    BAZI_CHART_SESSION_DB     SQLite 文件路径，默认不落盘
+"""
+import asyncio
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from ..schemas.bazi import BaziCalculateRequest, BaziCalculateResponse
+from .bazi_calculator import calculate_bazi_data
+from .chart_cache import LRUCache
+from .logger_config import setup_logger
+from .metrics import registry
+
+logger = setup_logger("chart_session")
+
+chart_session_requests = registry.counter(
+    "bazi_chart_session_requests_total", "按 chart_id 取命盘的次数", ("result",)
+)
+
+
+class ChartSessionMissing(HTTPException):
+    """没有可用的命盘：chart_id 不存在或已过期且未附出生信息（404），或两者都未提供（422）"""
+
+    def __init__(self, expired: bool):
+        super().__init__(
+            status_code=status.HTTP_404_NOT_FOUND if expired else status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="命盘会话不存在或已过期，请重新排盘" if expired else "需要 chart_id 或出生信息",
+        )
+
+
+def _mode(quick_mode: bool) -> str:
+    return "quick" if quick_mode else "full"
+
+
+class ChartSession:
+    """一次排盘会话：请求与各模式下的排盘结果"""
+
+    def __init__(self, chart_id: str, request: BaziCalculateRequest,
+                 results: Dict[str, BaziCalculateResponse], created_at: float):
+        self.chart_id = chart_id
+        self.request = request
+        self.results = results
+        self.created_at = created_at
+
+    def result(self, quick_mode: bool) -> Optional[BaziCalculateResponse]:
+        return self.results.get(_mode(quick_mode))
+
+    def dumps(self) -> Tuple[str, str]:
+        request = self.request.model_dump_json()
+        results = json.dumps({mode: result.model_dump(mode="json") for mode, result in self.results.items()},
+                             ensure_ascii=False)
+        return request, results
+
+    @classmethod
+    def loads(cls, chart_id: str, request: str, results: str, created_at: float) -> "ChartSession":
+        return cls(
+            chart_id,
+            BaziCalculateRequest.model_validate_json(request),
+            {mode: BaziCalculateResponse.model_validate(value) for mode, value in json.loads(results).items()},
+            created_at,
+        )
+
+
+class ChartSessionStore:
+    """内存 LRU + 可选 SQLite（写穿）的会话存储"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 86400, path: Optional[str] = None,
+                 clock: Callable[[], float] = time.time):
+        self.ttl = ttl
+        self.path = path
+        self._clock = clock
+        self._memory = LRUCache(maxsize, ttl=ttl, clock=clock)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chart_sessions ("
+                "chart_id TEXT PRIMARY KEY, request TEXT NOT NULL, results TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS chart_sessions_created ON chart_sessions (created_at)")
+            self._conn = conn
+        return self._conn
+
+    def create(self, request: BaziCalculateRequest, quick_mode: bool, result: BaziCalculateResponse) -> str:
+        """新建会话并返回 chart_id"""
+        session = ChartSession(secrets.token_urlsafe(16), request, {_mode(quick_mode): result}, self._clock())
+        self.save(session)
+        return session.chart_id
+
+    def save(self, session: ChartSession):
+        self._memory.put(session.chart_id, session)
+        if not self.path:
+            return
+        request, results = session.dumps()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO chart_sessions (chart_id, request, results, created_at) VALUES (?, ?, ?, ?)",
+                (session.chart_id, request, results, session.created_at)
+            )
+            conn.execute("DELETE FROM chart_sessions WHERE created_at <= ?", (self._clock() - self.ttl,))
+
+    def get(self, chart_id: str) -> Optional[ChartSession]:
+        """取回会话，不存在或已过期返回 None"""
+        session = self._memory.get(chart_id)
+        if session is not None or not self.path:
+            return session
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT request, results, created_at FROM chart_sessions WHERE chart_id = ?", (chart_id,)
+            ).fetchone()
+        if row is None or self._clock() - row[2] >= self.ttl:
+            return None
+        session = ChartSession.loads(chart_id, *row)
+        self._memory.put(chart_id, session)
+        return session
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def clear(self):
+        self._memory.clear()
+        if self.path:
+            with self._lock:
+                self._connect().execute("DELETE FROM chart_sessions")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+chart_sessions = ChartSessionStore(
+    maxsize=int(os.getenv("BAZI_CHART_SESSION_SIZE", "1024")),
+    ttl=float(os.getenv("BAZI_CHART_SESSION_TTL", "86400")),
+    path=os.getenv("BAZI_CHART_SESSION_DB") or None,
+)
+
+
+async def _io(store: ChartSessionStore, func: Callable, *args):
+    """只在落盘时放到线程中执行，纯内存读写直接调用"""
+    if store.path:
+        return await asyncio.to_thread(func, *args)
+    return func(*args)
+
+
+async def open_chart_session(request: BaziCalculateRequest, quick_mode: bool, result: BaziCalculateResponse,
+                             store: Optional[ChartSessionStore] = None) -> Optional[str]:
+    """保存排盘结果并返回 chart_id；保存失败只记录日志并返回 None（排盘结果照常返回）"""
+    store = store if store is not None else chart_sessions
+    try:
+        return await _io(store, store.create, request, quick_mode, result)
+    except sqlite3.Error as e:
+        logger.warning("保存命盘会话失败: %s", e)
+        return None
+
+
+async def chart_from_session(chart_id: Optional[str], request: Optional[BaziCalculateRequest], quick_mode: bool,
+                             store: Optional[ChartSessionStore] = None
+                             ) -> Tuple[BaziCalculateRequest, BaziCalculateResponse]:
+    """
+    返回 (请求, 排盘结果)：chart_id 有效时使用会话中的命盘，缺少该模式的结果时补算一次并存回会话；
+    没有 chart_id 或会话已过期时按请求体排盘；都不可用时抛出 ChartSessionMissing
+    """
+    store = store if store is not None else chart_sessions
+    session = None
+    if chart_id:
+        try:
+            session = await _io(store, store.get, chart_id)
+        except sqlite3.Error as e:
+            logger.warning("读取命盘会话失败: %s", e)
+        if session is None:
+            chart_session_requests.inc(result="miss")
+            if request is None:
+                raise ChartSessionMissing(expired=True)
+    if session is None:
+        if request is None:
+            raise ChartSessionMissing(expired=False)
+        return request, await calculate_bazi_data(request, quick_mode=quick_mode)
+
+    result = session.result(quick_mode)
+    if result is not None:
+        chart_session_requests.inc(result="hit")
+        return session.request, result
+    chart_session_requests.inc(result="upgrade")
+    result = await calculate_bazi_data(session.request, quick_mode=quick_mode)
+    session.results[_mode(quick_mode)] = result
+    try:
+        await _io(store, store.save, session)
+    except sqlite3.Error as e:
+        logger.warning("保存命盘会话失败: %s", e)
+    return session.request, result
+
+
+registry.register_collector(
+    "bazi_chart_sessions", "gauge", "内存中的命盘会话数", lambda: [("", {}, len(chart_sessions))]
+)
@@ -3,13 +3,32 @@
 包含 StemBranch, Bazi, DaYun, ShenSha 等基础类
 """
 from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional, Union
+from typing import Dict, Any, List, Optional, Union, Tuple
 from collections import deque
 import functools
 
+try:
+    from .constants import TIANGAN, DIZHI
+except ImportError:
+    # 直接以 services 目录为路径运行时
+    from constants import TIANGAN, DIZHI
+
+# 干支 -> 索引
+_STEM_INDEX = {stem: i for i, stem in enumerate(TIANGAN)}
+_BRANCH_INDEX = {branch: i for i, branch in enumerate(DIZHI)}
+
+
+def jiazi_index(stem_index: int, branch_index: int) -> int:
+    """由天干、地支索引求六十甲子序号（0-59），阴阳不配返回 -1"""
+    if (stem_index - branch_index) % 2:
+        return -1
+    return (6 * stem_index - 5 * branch_index) % 60
+
 
 class StemBranch:
     """干支结构"""
+    __slots__ = ("stem", "branch")
+
     def __init__(self, stem: str, branch: str):
         self.stem = stem    # 天干
         self.branch = branch # 地支
@@ -22,6 +41,9 @@ class StemBranch:
             return self.stem == other.stem and self.branch == other.branch
         return False
 
+    def __hash__(self):
+        return hash((self.stem, self.branch))
+
 
 class Bazi:
     """八字命盘"""
@@ -622,6 +644,116 @@ class Bazi:
         if hasattr(obj, '__name__'):
             return str(obj.__name__)
         return str(obj)
+
+    def encode(self) -> "EncodedBazi":
+        """转换为整数编码的不可变命盘，可作为缓存键"""
+        return EncodedBazi.from_bazi(self)
+
+
+class EncodedBazi:
+    """整数编码的不可变命盘
+
+    四柱干支打包为一个整数（每柱 8 位：高 4 位天干 0-9，低 4 位地支 0-11），
+    按值比较和哈希，可直接作为 lru_cache 等缓存的键；与 Bazi 之间可互相转换
+    """
+    __slots__ = ("code", "gender", "birth_time", "_hash")
+
+    def __init__(
+        self,
+        stems: Tuple[int, int, int, int],
+        branches: Tuple[int, int, int, int],
+        gender: str = "男",
+        birth_time: Optional[datetime] = None
+    ):
+        stems = tuple(stems)
+        branches = tuple(branches)
+        if len(stems) != 4 or len(branches) != 4:
+            raise ValueError("四柱天干、地支必须各为 4 个")
+        code = 0
+        for s, b in zip(stems, branches):
+            if not (0 <= s < 10 and 0 <= b < 12):
+                raise ValueError(f"干支索引越界: {stems} {branches}")
+            code = (code << 8) | (int(s) << 4) | int(b)
+        object.__setattr__(self, "code", code)
+        object.__setattr__(self, "gender", gender)
+        object.__setattr__(self, "birth_time", birth_time)
+        object.__setattr__(self, "_hash", hash((code, gender, birth_time)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("EncodedBazi 不可修改")
+
+    def __delattr__(self, name):
+        raise AttributeError("EncodedBazi 不可修改")
+
+    def __reduce__(self):
+        return (EncodedBazi, (self.stems, self.branches, self.gender, self.birth_time))
+
+    def __eq__(self, other):
+        if isinstance(other, EncodedBazi):
+            return self.code == other.code and self.gender == other.gender and self.birth_time == other.birth_time
+        return NotImplemented
+
+    def __hash__(self):
+        return self._hash
+
+    def __repr__(self):
+        return f"EncodedBazi({''.join(self.pillar_strings())}, 性别:{self.gender})"
+
+    @property
+    def stems(self) -> Tuple[int, int, int, int]:
+        """年、月、日、时天干索引"""
+        c = self.code
+        return ((c >> 28) & 0xF, (c >> 20) & 0xF, (c >> 12) & 0xF, (c >> 4) & 0xF)
+
+    @property
+    def branches(self) -> Tuple[int, int, int, int]:
+        """年、月、日、时地支索引"""
+        c = self.code
+        return ((c >> 24) & 0xF, (c >> 16) & 0xF, (c >> 8) & 0xF, c & 0xF)
+
+    @property
+    def jiazi(self) -> Tuple[int, int, int, int]:
+        """各柱六十甲子序号，阴阳不配为 -1"""
+        return tuple(jiazi_index(s, b) for s, b in zip(self.stems, self.branches))
+
+    @classmethod
+    def from_bazi(cls, bazi: "Bazi") -> "EncodedBazi":
+        pillars = (bazi.year, bazi.month, bazi.day, bazi.hour)
+        try:
+            stems = tuple(_STEM_INDEX[p.stem] for p in pillars)
+            branches = tuple(_BRANCH_INDEX[p.branch] for p in pillars)
+        except KeyError as e:
+            raise ValueError(f"无效的干支: {e}")
+        return cls(stems, branches, bazi.gender, bazi.birth_time)
+
+    @classmethod
+    def from_pillars(cls, pillars: List[str], gender: str = "男", birth_time: Optional[datetime] = None) -> "EncodedBazi":
+        """由 ["甲子", "丙寅", "戊辰", "庚申"] 形式的四柱字符串构建"""
+        try:
+            stems = tuple(_STEM_INDEX[p[0]] for p in pillars)
+            branches = tuple(_BRANCH_INDEX[p[1]] for p in pillars)
+        except (KeyError, IndexError) as e:
+            raise ValueError(f"无效的四柱: {pillars}") from e
+        return cls(stems, branches, gender, birth_time)
+
+    def to_bazi(self) -> "Bazi":
+        pillars = [StemBranch(TIANGAN[s], DIZHI[b]) for s, b in zip(self.stems, self.branches)]
+        return Bazi(*pillars, gender=self.gender, birth_time=self.birth_time)
+
+    @property
+    def day_master(self) -> int:
+        return (self.code >> 12) & 0xF
+
+    def pillar_strings(self) -> List[str]:
+        return [TIANGAN[s] + DIZHI[b] for s, b in zip(self.stems, self.branches)]
+
+    def get_bazi_characters(self) -> Dict[str, str]:
+        """与 Bazi.get_bazi_characters 相同格式"""
+        result = {}
+        for name, s, b in zip(("year", "month", "day", "hour"), self.stems, self.branches):
+            result[f"{name}_stem"] = TIANGAN[s]
+            result[f"{name}_branch"] = DIZHI[b]
+        return result
     
 
 class DaYun:
@@ -687,47 +819,50 @@ class FortuneModel:
     ]
     
     @classmethod
-    @functools.lru_cache(maxsize=128)
-    def calculate_da_yun(cls, birth_chart: Bazi) -> List[DaYun]:
-        """计算大运"""
+    def calculate_da_yun(cls, birth_chart: Union[Bazi, "EncodedBazi"]) -> List[DaYun]:
+        """计算大运（按命盘值缓存，每次返回新的 DaYun 对象）"""
+        chart = birth_chart if isinstance(birth_chart, EncodedBazi) else birth_chart.encode()
+        return [
+            DaYun(start_age=start_age, end_age=end_age, stem_branch=StemBranch(stem, branch), start_time=start_time)
+            for start_age, end_age, stem, branch, start_time in cls._calculate_da_yun_cached(chart)
+        ]
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def _calculate_da_yun_cached(chart: "EncodedBazi") -> tuple:
+        """计算大运，返回 (起运岁, 止运岁, 天干, 地支, 起运时间) 元组"""
         da_yun_list = []
         
-        # 1. 确定顺逆排
-        yang_stems = {"甲", "丙", "戊", "庚", "壬"}
-        is_forward = (
-            (birth_chart.get_year_stem() in yang_stems and birth_chart.is_male()) or
-            (birth_chart.get_year_stem() not in yang_stems and not birth_chart.is_male())
-        )
+        # 1. 确定顺逆排（阳干：甲丙戊庚壬）
+        is_male = chart.gender == '男'
+        is_yang_year = chart.stems[0] % 2 == 0
+        is_forward = is_yang_year == is_male
         
         # 2. 计算起运时间（简化版，实际需精确计算节气）
-        if birth_chart.birth_time:
-            start_time = birth_chart.birth_time + timedelta(days=365*8)  # 默认8岁起运
+        if chart.birth_time:
+            start_time = chart.birth_time + timedelta(days=365*8)  # 默认8岁起运
         else:
             start_time = None
         
         # 3. 大运干支序列生成
-        fortune_sequence = cls.generate_sequence(
-            base=birth_chart.month,
+        fortune_sequence = FortuneModel.generate_sequence(
+            base=StemBranch(TIANGAN[chart.stems[1]], DIZHI[chart.branches[1]]),
             forward=is_forward,
             steps=10
         )
         
-        # 4. 构建大运对象
+        # 4. 构建大运
         for i, stem_branch in enumerate(fortune_sequence):
             start_age = i * 10
-            da_yun = DaYun(
-                start_age=start_age,
-                end_age=start_age + 9,
-                stem_branch=stem_branch,
-                start_time=start_time + timedelta(days=365*10*i) if start_time else None
-            )
-            
-            # 集成事件反推（简化版）
-            da_yun.events = []
-            
-            da_yun_list.append(da_yun)
+            da_yun_list.append((
+                start_age,
+                start_age + 9,
+                stem_branch.stem,
+                stem_branch.branch,
+                start_time + timedelta(days=365*10*i) if start_time else None
+            ))
             
-        return da_yun_list
+        return tuple(da_yun_list)
     
     @classmethod
     def generate_sequence(
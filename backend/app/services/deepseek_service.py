@@ -1,13 +1,27 @@
 # backend/app/services/deepseek_service.py
+import asyncio
 import httpx
 import json
-from typing import Dict, Any, Optional
+from typing import AsyncIterator, Callable, Dict, Any, List, Optional, Tuple
 import os
 import re
+import time
 from datetime import datetime
 from fastapi import HTTPException
+from .core import Bazi
+from .llm_cache import cache_lookup, cache_store, cached_llm_call, llm_cache_key
+from .llm_client import get_llm_client
+from .llm_stream import IncrementalJSONParser
+from .logger_config import setup_logger
+from .metrics import llm_prompt_tokens_estimated, record_llm_call, registry
 from .prompt_manager import PromptManager
 
+logger = setup_logger("deepseek_service")
+
+llm_batch_items = registry.counter(
+    "bazi_llm_batch_items_total", "批量分析各条目的结果来源（cached/batched/fallback/single）", ("kind", "result")
+)
+
 class DeepSeekService:
     """DeepSeek API服务类，用于生成详细的八字运势解读"""
     
@@ -24,12 +38,12 @@ class DeepSeekService:
         self.force_mock = False
         
         if not self.api_key:
-            print("⚠️  DeepSeek API密钥未配置，将使用模拟数据")
+            logger.warning("DeepSeek API密钥未配置，将使用模拟数据")
             self.force_mock = True
         else:
-            print(f"✅ DeepSeek API 已配置 (模型: {self.model}, 温度: {self.temperature})")
-            print(f"📡 API地址: {self.base_url}")
-            print(f"🔑 API密钥: {self.api_key[:10]}...{self.api_key[-4:] if len(self.api_key) > 14 else 'too_short'}")
+            logger.info("DeepSeek API 已配置 (模型: %s, 温度: %s)", self.model, self.temperature)
+            logger.info("API地址: %s", self.base_url)
+            logger.info("API密钥: %s...%s", self.api_key[:10], self.api_key[-4:] if len(self.api_key) > 14 else 'too_short')
 
     async def generate_comprehensive_analysis(self, bazi_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -39,30 +53,33 @@ class DeepSeekService:
             prompt = PromptManager.generate_comprehensive_analysis_prompt(bazi_data)
             
             if self.api_key and not self.force_mock:
-                return await self._call_api_for_structured_json(prompt)
+                return await self._cached_call("comprehensive", bazi_data, prompt)
             else:
                 # 返回高质量的模拟分析
                 return self._get_mock_comprehensive_analysis(bazi_data)
                 
         except Exception as e:
-            print(f"生成全面分析时发生错误: {e}")
+            logger.error("生成全面分析时发生错误: %s", e)
             # 在真实错误场景下，可以返回一个包含错误信息的标准结构
             return {"error": "Failed to generate comprehensive analysis", "details": str(e)}
 
-    async def generate_dayun_analysis(self, bazi_data: Dict[str, Any], dayun_info: Dict[str, Any]) -> Dict[str, Any]:
+    async def generate_dayun_analysis(self, bazi_data: Dict[str, Any], dayun_info: Dict[str, Any],
+                                      prompt: Optional[str] = None) -> Dict[str, Any]:
         """
-        生成对特定大运周期的深入分析
+        生成对特定大运周期的深入分析（prompt 为调用方自行构建的提示词时不使用默认模板）
         """
         try:
-            prompt = PromptManager.generate_dayun_analysis_prompt(bazi_data, dayun_info)
+            kind = "dayun" if prompt is None else "single_dayun"
+            if prompt is None:
+                prompt = PromptManager.generate_dayun_analysis_prompt(bazi_data, dayun_info)
             
             if self.api_key and not self.force_mock:
-                return await self._call_api_for_structured_json(prompt)
+                return await self._cached_call(kind, {"bazi": bazi_data, "dayun": dayun_info}, prompt)
             else:
                 return self._get_mock_dayun_analysis(dayun_info)
                 
         except Exception as e:
-            print(f"生成大运深度分析时发生错误: {e}")
+            logger.error("生成大运深度分析时发生错误: %s", e)
             return {"error": "Failed to generate Dayun analysis", "details": str(e)}
 
     async def generate_liunian_analysis(self, bazi_data: Dict[str, Any], year: int) -> Dict[str, Any]:
@@ -73,12 +90,12 @@ class DeepSeekService:
             prompt = PromptManager.generate_liunian_analysis_prompt(bazi_data, year)
             
             if self.api_key and not self.force_mock:
-                return await self._call_api_for_structured_json(prompt)
+                return await self._cached_call("liunian", {"bazi": bazi_data, "year": year}, prompt)
             else:
                 return self._get_mock_liunian_analysis(year)
                 
         except Exception as e:
-            print(f"生成流年分析时发生错误: {e}")
+            logger.error("生成流年分析时发生错误: %s", e)
             return {"error": "Failed to generate Liunian analysis", "details": str(e)}
 
     async def generate_detailed_fortune_analysis(self, bazi_data: Dict[str, Any], year: str) -> Dict[str, Any]:
@@ -92,65 +109,356 @@ class DeepSeekService:
             if self.api_key and not self.force_mock:
                 # 使用流年分析提示词
                 prompt = PromptManager.generate_liunian_analysis_prompt(bazi_data, year_int)
-                return await self._call_api_for_structured_json(prompt)
+                return await self._cached_call("liunian", {"bazi": bazi_data, "year": year_int}, prompt)
             else:
                 # 返回模拟的详细运势分析
                 return self._get_mock_detailed_fortune_analysis(bazi_data, year_int)
                 
         except Exception as e:
-            print(f"生成详细运势分析时发生错误: {e}")
+            logger.error("生成详细运势分析时发生错误: %s", e)
             return {"error": "Failed to generate detailed fortune analysis", "details": str(e)}
 
-    async def _call_api_for_structured_json(self, prompt: str) -> Dict[str, Any]:
+    # === BATCH METHODS ===
+    # 多个分析目标合并为一次调用，回复为 {"items": [...]}；各条目与单项调用共用缓存键，批量结果也供单项端点复用
+
+    # 单个条目回复的预计 token 数（按各模板 JSON 结构的典型回复长度估计），用于按 max_tokens 拆分批次
+    batch_item_tokens = {"dayun": 700, "liunian": 1500}
+
+    def batch_size(self, kind: str) -> int:
+        """一次调用最多容纳的条目数：预计回复长度不超过 max_tokens"""
+        return max(1, self.max_tokens // self.batch_item_tokens[kind])
+
+    async def generate_dayun_analyses(self, bazi_data: Dict[str, Any],
+                                      dayun_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
-        调用 LLM API 并确保返回结构化的 JSON。
+        批量生成多个大运的深入分析，结果与 dayun_list 一一对应（与 generate_dayun_analysis 共用缓存）
+        """
+        return await self._batched_analyses(
+            "dayun", dayun_list,
+            cache_data=lambda info: {"bazi": bazi_data, "dayun": info},
+            identity=lambda info: ("gan_zhi", info.get("gan_zhi")),
+            build_prompt=lambda infos: PromptManager.generate_dayun_batch_prompt(bazi_data, infos),
+            single=lambda info: self.generate_dayun_analysis(bazi_data, info),
+            mock=self._get_mock_dayun_analysis
+        )
+
+    async def generate_liunian_analyses(self, bazi_data: Dict[str, Any], years: List[int]) -> List[Dict[str, Any]]:
+        """
+        批量生成多个流年的深入分析，结果与 years 一一对应（与 generate_liunian_analysis 共用缓存）
+        """
+        return await self._batched_analyses(
+            "liunian", [int(year) for year in years],
+            cache_data=lambda year: {"bazi": bazi_data, "year": year},
+            identity=lambda year: ("year", year),
+            build_prompt=lambda chunk: PromptManager.generate_liunian_batch_prompt(bazi_data, chunk),
+            single=lambda year: self.generate_liunian_analysis(bazi_data, year),
+            mock=self._get_mock_liunian_analysis
+        )
+
+    async def _batched_analyses(self, kind: str, targets: List[Any], cache_data: Callable[[Any], Dict[str, Any]],
+                                identity: Callable[[Any], Tuple[str, Any]], build_prompt: Callable[[List[Any]], str],
+                                single: Callable[[Any], Any], mock: Callable[[Any], Dict[str, Any]]
+                                ) -> List[Dict[str, Any]]:
+        """
+        先查缓存，未命中的条目按 batch_size 分批并发调用；批量回复中缺失或无法对应的条目逐个回退为单项调用
+        """
+        if not self.api_key or self.force_mock:
+            return [mock(target) for target in targets]
+
+        keys = [llm_cache_key(kind, self.model, self.temperature, self._prompt_cache_data(cache_data(target)))
+                for target in targets]
+        results: List[Optional[Dict[str, Any]]] = [await cache_lookup(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        llm_batch_items.inc(len(targets) - len(missing), kind=kind, result="cached")
+
+        async def run_single(i: int):
+            results[i] = await single(targets[i])
+
+        async def run_batch(chunk: List[int]):
+            if len(chunk) == 1:
+                llm_batch_items.inc(kind=kind, result="single")
+                await run_single(chunk[0])
+                return
+            items = await self._call_batch(kind, build_prompt([targets[i] for i in chunk]),
+                                           [identity(targets[i]) for i in chunk])
+            fallback = []
+            for i, item in zip(chunk, items):
+                if item is None:
+                    fallback.append(i)
+                else:
+                    results[i] = item
+                    await cache_store(keys[i], kind, self.model, item)
+            llm_batch_items.inc(len(chunk) - len(fallback), kind=kind, result="batched")
+            if fallback:
+                logger.warning("批量%s分析有 %s/%s 项无法使用，逐项重新调用", kind, len(fallback), len(chunk))
+                llm_batch_items.inc(len(fallback), kind=kind, result="fallback")
+                await asyncio.gather(*(run_single(i) for i in fallback))
+
+        size = self.batch_size(kind)
+        await asyncio.gather(*(run_batch(missing[i:i + size]) for i in range(0, len(missing), size)))
+        return results
+
+    async def _call_batch(self, kind: str, prompt: str, identities: List[Tuple[str, Any]]
+                          ) -> List[Optional[Dict[str, Any]]]:
+        """
+        发出一次批量调用，按顺序返回各条目（去掉标识字段）；缺失、标识不符或整体失败的条目为 None
+        """
+        try:
+            response = await self._call_api_for_structured_json(prompt, f"{kind}_batch")
+        except Exception as e:
+            logger.warning("批量%s分析调用失败: %s", kind, e)
+            return [None] * len(identities)
+        items = response.get("items")
+        if not isinstance(items, list):
+            logger.warning("批量%s分析回复缺少 items 数组", kind)
+            return [None] * len(identities)
+
+        parsed: List[Optional[Dict[str, Any]]] = []
+        for position, (field, expected) in enumerate(identities):
+            item = items[position] if position < len(items) else None
+            if not isinstance(item, dict) or (field in item and str(item[field]) != str(expected)):
+                parsed.append(None)
+                continue
+            item = {key: value for key, value in item.items() if key != field}
+            parsed.append(item or None)
+        return parsed
+
+    # === STREAMING METHODS ===
+    # 产出 (事件名, 数据)：delta 为模型输出的原始文本片段，field 为刚闭合的顶层字段，done 为完整结果
+
+    def stream_detailed_fortune_analysis(self, bazi_data: Dict[str, Any], year: str) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        流式生成详细的流年运势分析（与 generate_detailed_fortune_analysis 共用提示词与缓存）
+        """
+        year_int = int(year)
+        return self._stream_structured_json(
+            "liunian", {"bazi": bazi_data, "year": year_int},
+            lambda: PromptManager.generate_liunian_analysis_prompt(bazi_data, year_int),
+            lambda: self._get_mock_detailed_fortune_analysis(bazi_data, year_int)
+        )
+
+    def stream_dayun_analysis(self, bazi_data: Dict[str, Any], dayun_info: Dict[str, Any],
+                              prompt: Optional[str] = None) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        流式生成大运分析（与 generate_dayun_analysis 共用提示词与缓存）
+        """
+        kind = "dayun" if prompt is None else "single_dayun"
+        return self._stream_structured_json(
+            kind, {"bazi": bazi_data, "dayun": dayun_info},
+            lambda: prompt if prompt is not None else PromptManager.generate_dayun_analysis_prompt(bazi_data, dayun_info),
+            lambda: self._get_mock_dayun_analysis(dayun_info)
+        )
+
+    def stream_comprehensive_analysis(self, bazi_data: Dict[str, Any]) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        流式生成全面分析（与 generate_comprehensive_analysis 共用提示词与缓存）
+        """
+        return self._stream_structured_json(
+            "comprehensive", bazi_data,
+            lambda: PromptManager.generate_comprehensive_analysis_prompt(bazi_data),
+            lambda: self._get_mock_comprehensive_analysis(bazi_data)
+        )
+
+    async def _stream_structured_json(self, kind: str, cache_data: Dict[str, Any], build_prompt: Callable[[], str],
+                                      build_mock: Callable[[], Dict[str, Any]]) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        缓存命中或模拟模式时逐字段产出已有结果；否则调用流式 API，边接收边解析，
+        整个 JSON 对象闭合且每个字段都解析成功时才写入缓存，否则与非流式调用一样返回解析错误
+        """
+        if not self.api_key or self.force_mock:
+            result, source = build_mock(), "mock"
+        else:
+            key = llm_cache_key(kind, self.model, self.temperature, self._prompt_cache_data(cache_data))
+            result, source = await cache_lookup(key), "cache"
+        if result is not None:
+            for field, value in result.items():
+                yield "field", {"key": field, "value": value}
+            yield "done", {"result": result, "source": source}
+            return
+
+        parser = IncrementalJSONParser()
+        chunks = []
+        async for delta in self._stream_api_for_structured_json(build_prompt(), kind):
+            chunks.append(delta)
+            yield "delta", {"text": delta}
+            for field, value in parser.feed(delta):
+                yield "field", {"key": field, "value": value}
+
+        if parser.done and not parser.errors:
+            result = parser.result
+            await cache_store(key, kind, self.model, result)
+        else:
+            content = "".join(chunks)
+            logger.warning("流式响应不是完整的 JSON 对象: %s...", content[:500])
+            result = {"error": "Failed to parse LLM response as JSON", "raw_response": content}
+        yield "done", {"result": result, "source": "llm"}
+
+    async def generate_master_fortune_analysis(self, bazi_obj: Bazi, analysis_data: Dict[str, Any],
+                                               target_year: int) -> Dict[str, Any]:
+        """
+        生成命理大师级的目标年份运势分析（流年模板，命盘数据由 Bazi 对象与排盘分析结果组装）
+        """
+        bazi_data = self.bazi_prompt_data(bazi_obj, analysis_data)
+        if not self.api_key or self.force_mock:
+            return self._get_mock_liunian_analysis(target_year)
+        prompt = PromptManager.generate_liunian_analysis_prompt(bazi_data, target_year)
+        return await self._cached_call("liunian", {"bazi": bazi_data, "year": target_year}, prompt)
+
+    async def generate_dayun_deep_analysis(self, bazi_obj: Bazi, dayun_info: Dict[str, Any],
+                                           analysis_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        生成大运周期深度分析（大运模板，命盘数据由 Bazi 对象与排盘分析结果组装）
+        """
+        bazi_data = self.bazi_prompt_data(bazi_obj, analysis_data)
+        if not self.api_key or self.force_mock:
+            return self._get_mock_dayun_analysis(dayun_info)
+        prompt = PromptManager.generate_dayun_analysis_prompt(bazi_data, dayun_info)
+        return await self._cached_call("dayun", {"bazi": bazi_data, "dayun": dayun_info}, prompt)
+
+    @staticmethod
+    def bazi_prompt_data(bazi_obj: Bazi, analysis_data: Dict[str, Any]) -> Dict[str, Any]:
+        """组装 PromptManager.format_bazi_data_for_prompt 所需的命盘数据结构"""
+        pillars = {"year": bazi_obj.year, "month": bazi_obj.month, "day": bazi_obj.day, "hour": bazi_obj.hour}
+        return {
+            "gender": bazi_obj.gender,
+            "solar_date": bazi_obj.birth_time.strftime("%Y-%m-%d %H:%M") if bazi_obj.birth_time else "未知",
+            "bazi": {name: {"gan": pillar.stem, "zhi": pillar.branch} for name, pillar in pillars.items()},
+            "five_elements": {
+                "day_master_element": analysis_data.get("day_master_element", ""),
+                "strength": analysis_data.get("day_master_strength", ""),
+                "percentage": analysis_data.get("five_elements_score", {}),
+            },
+            "major_cycles": analysis_data.get("major_cycles", []),
+        }
+
+    async def _cached_call(self, kind: str, cache_data: Dict[str, Any], prompt: str) -> Dict[str, Any]:
+        """
+        经结果缓存调用 LLM：同一分析类型、模型参数与命盘数据的结果直接复用，并发的相同请求只调用一次
+        """
+        return await cached_llm_call(
+            kind, self.model, self.temperature, self._prompt_cache_data(cache_data),
+            lambda: self._call_api_for_structured_json(prompt, kind)
+        )
+
+    @staticmethod
+    def _prompt_cache_data(cache_data: Dict[str, Any]) -> Dict[str, Any]:
+        """缓存键附带提示词格式与预算：切换编码方式后不复用旧格式提示词得到的结果"""
+        return {"data": cache_data, "prompt": PromptManager.prompt_signature()}
+
+    def _chat_request(self, prompt: str, kind: str) -> Tuple[Dict[str, str], Dict[str, Any], int]:
+        """
+        组装请求头与请求体（角色设定只放在 system 消息中），并记录发送前估算的提示词 token 数
         """
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
-        
+        system = PromptManager.get_master_persona_prompt()
         # 使用 response_format 强制 JSON 输出
         data = {
             "model": self.model,
             "messages": [
-                {"role": "system", "content": PromptManager.get_master_persona_prompt()},
+                {"role": "system", "content": system},
                 {"role": "user", "content": prompt}
             ],
             "temperature": self.temperature,
             "max_tokens": self.max_tokens,
             "response_format": {"type": "json_object"} # 强制JSON输出
         }
-        
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            try:
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=headers,
-                    json=data
-                )
-                response.raise_for_status()  # 如果状态码不是 2xx，则引发异常
-                
-                result = response.json()
-                content = result["choices"][0]["message"]["content"]
-                
-                # 由于已使用json_object模式，可以直接解析
-                return json.loads(content)
-
-            except httpx.HTTPStatusError as e:
-                print(f"API 调用失败，状态码: {e.response.status_code}, 响应: {e.response.text}")
-                raise HTTPException(
-                    status_code=e.response.status_code,
-                    detail=f"LLM API call failed: {e.response.text}"
-                )
-            except json.JSONDecodeError as e:
-                print(f"⚠️ JSON 解析失败: {e}")
-                print(f"原始响应: {content[:500]}...")
-                # 即使在json_object模式下，也可能出现意外的非JSON响应
-                return {"error": "Failed to parse LLM response as JSON", "raw_response": content}
-            except Exception as e:
-                print(f"调用LLM API时发生未知错误: {e}")
-                raise HTTPException(status_code=500, detail=f"An unexpected error occurred with the LLM service: {e}")
+        estimated = PromptManager.estimate_tokens(system) + PromptManager.estimate_tokens(prompt)
+        llm_prompt_tokens_estimated.observe(estimated, model=self.model, prompt=kind)
+        return headers, data, estimated
+
+    @staticmethod
+    def _log_prompt_tokens(kind: str, estimated: int, usage: Optional[Dict[str, Any]]):
+        actual = (usage or {}).get("prompt_tokens")
+        logger.info("提示词 token（%s）: 估算 %s, 实际 %s", kind, estimated, actual if actual is not None else "未知")
+
+    async def _call_api_for_structured_json(self, prompt: str, kind: str = "adhoc") -> Dict[str, Any]:
+        """
+        调用 LLM API 并确保返回结构化的 JSON。
+        """
+        headers, data, estimated = self._chat_request(prompt, kind)
+
+        start = time.perf_counter()
+        outcome, usage = "error", None
+        # 共享连接池客户端：并发上限与 429/5xx 重试在 llm_client 中处理
+        client = get_llm_client()
+        try:
+            result = await client.post_json(
+                f"{self.base_url}/chat/completions",
+                data,
+                headers=headers,
+                timeout=self.timeout
+            )
+            usage = result.get("usage")
+            content = result["choices"][0]["message"]["content"]
+            outcome = "ok"
+
+            # 由于已使用json_object模式，可以直接解析
+            return json.loads(content)
+
+        except httpx.HTTPStatusError as e:
+            logger.error("API 调用失败，状态码: %s, 响应: %s", e.response.status_code, e.response.text)
+            raise HTTPException(
+                status_code=e.response.status_code,
+                detail=f"LLM API call failed: {e.response.text}"
+            )
+        except json.JSONDecodeError as e:
+            outcome = "invalid_json"
+            logger.warning("JSON 解析失败: %s", e)
+            logger.warning("原始响应: %s...", content[:500])
+            # 即使在json_object模式下，也可能出现意外的非JSON响应
+            return {"error": "Failed to parse LLM response as JSON", "raw_response": content}
+        except asyncio.CancelledError:
+            # 调用方已放弃（如客户端断开后扇出取消），不再等待上游响应
+            outcome = "cancelled"
+            raise
+        except Exception as e:
+            logger.error("调用LLM API时发生未知错误: %s", e)
+            raise HTTPException(status_code=500, detail=f"An unexpected error occurred with the LLM service: {e}")
+        finally:
+            record_llm_call(self.model, time.perf_counter() - start, outcome, usage)
+            self._log_prompt_tokens(kind, estimated, usage)
+
+    async def _stream_api_for_structured_json(self, prompt: str, kind: str = "adhoc") -> AsyncIterator[str]:
+        """
+        调用 LLM 流式 API，逐段产出模型输出的文本
+        """
+        headers, data, estimated = self._chat_request(prompt, kind)
+        data.update({"stream": True, "stream_options": {"include_usage": True}})
+
+        start = time.perf_counter()
+        outcome, usage = "error", None
+        try:
+            async for line in get_llm_client().stream_lines(
+                f"{self.base_url}/chat/completions", data, headers=headers, timeout=self.timeout
+            ):
+                if not line.startswith("data:"):
+                    continue
+                payload = line[5:].strip()
+                if payload == "[DONE]":
+                    break
+                chunk = json.loads(payload)
+                usage = chunk.get("usage") or usage
+                for choice in chunk.get("choices") or []:
+                    text = (choice.get("delta") or {}).get("content")
+                    if text:
+                        yield text
+            outcome = "ok"
+        except httpx.HTTPStatusError as e:
+            logger.error("流式 API 调用失败，状态码: %s, 响应: %s", e.response.status_code, e.response.text)
+            raise HTTPException(
+                status_code=e.response.status_code,
+                detail=f"LLM API call failed: {e.response.text}"
+            )
+        except (GeneratorExit, asyncio.CancelledError):
+            # 客户端断开后不再读取上游输出
+            outcome = "cancelled"
+            raise
+        finally:
+            record_llm_call(self.model, time.perf_counter() - start, outcome, usage)
+            self._log_prompt_tokens(kind, estimated, usage)
 
     # === MOCK DATA METHODS ===
 
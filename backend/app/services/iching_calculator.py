@@ -6,10 +6,12 @@ from app.schemas.iching import (
     HexagramLine
 )
 import random
-import logging
 from iching import iching
 from typing import List, Optional, Any, Dict
 
+from .logger_config import setup_logger
+logger = setup_logger("iching_calculator")
+
 # 64卦完整数据库
 HEXAGRAM_DATABASE = {
     1: {"name": "乾", "judgment": "乾：元，亨，利，贞。", "image": "天行健，君子以自强不息。", "upper": "乾", "lower": "乾"},
@@ -47,7 +49,7 @@ def extract_hexagram_data(yao_values: List[int], use_simple_method: bool = True)
         HexagramData: 填充完整信息的卦象数据
     """
     try:
-        print(f"DEBUG: extract_hexagram_data 输入爻值: {yao_values}")
+        logger.debug("extract_hexagram_data 输入爻值: %s", yao_values)
         
         # 1. 计算上下卦八卦
         def calculate_trigram(trigram_lines):
@@ -78,7 +80,7 @@ def extract_hexagram_data(yao_values: List[int], use_simple_method: bool = True)
         lower_trigram = calculate_trigram(lower_trigram_lines)
         upper_trigram = calculate_trigram(upper_trigram_lines)
         
-        print(f"DEBUG: 下卦={lower_trigram}, 上卦={upper_trigram}")
+        logger.debug("下卦=%s, 上卦=%s", lower_trigram, upper_trigram)
         
         # 2. 根据上下卦组合计算卦序
         def get_hexagram_number(upper_tri, lower_tri):
@@ -182,7 +184,7 @@ def extract_hexagram_data(yao_values: List[int], use_simple_method: bool = True)
                 description=base_description
             ))
         
-        print(f"DEBUG: 成功解析卦象 - 卦名:{hexagram_name}, 卦序:{hexagram_number}")
+        logger.debug("成功解析卦象 - 卦名:%s, 卦序:%s", hexagram_name, hexagram_number)
         
         return HexagramData(
             name=hexagram_name,
@@ -195,7 +197,7 @@ def extract_hexagram_data(yao_values: List[int], use_simple_method: bool = True)
         )
         
     except Exception as e:
-        logging.error(f"解析卦象数据失败: {e}")
+        logger.error("解析卦象数据失败: %s", e)
         # 返回默认卦象数据
         return HexagramData(
             name="解析失败",
@@ -263,7 +265,7 @@ def prepare_ai_analysis_context(primary_hexagram: HexagramData, changing_hexagra
         return ""
         
     except Exception as e:
-        logging.warning(f"准备AI分析上下文失败: {e}")
+        logger.warning("准备AI分析上下文失败: %s", e)
         return ""
 
 async def perform_iching_divination(request_data: IChingDivinationRequest) -> IChingDivinationResponse:
@@ -280,14 +282,14 @@ async def perform_iching_divination(request_data: IChingDivinationRequest) -> IC
             # 使用iching库生成六爻
             yao_values = iching.sixYao()
         
-        print(f"DEBUG: 生成的六爻: {yao_values}")
+        logger.debug("生成的六爻: %s", yao_values)
         
         # 2. 不再使用 ichingshifa，直接用我们的方法解析卦象
         
         # 3. 主卦填充 - 使用新的 extract_hexagram_data 函数
-        print(f"DEBUG: 开始解析主卦，爻值: {yao_values}")
+        logger.debug("开始解析主卦，爻值: %s", yao_values)
         primary_hexagram = extract_hexagram_data(yao_values)
-        print(f"DEBUG: 主卦解析完成 - {primary_hexagram.name}")
+        logger.debug("主卦解析完成 - %s", primary_hexagram.name)
         
         # 4. 变卦判断与填充（增强版）
         changing_hexagram = None
@@ -297,7 +299,7 @@ async def perform_iching_divination(request_data: IChingDivinationRequest) -> IC
         changing_lines = [i+1 for i, v in enumerate(yao_values) if v in [6, 9]]
         has_changing_lines = len(changing_lines) > 0
         
-        print(f"DEBUG: 检测到变爻位置: {changing_lines}")
+        logger.debug("检测到变爻位置: %s", changing_lines)
         
         if has_changing_lines:
             # 生成变卦爻值
@@ -310,11 +312,11 @@ async def perform_iching_divination(request_data: IChingDivinationRequest) -> IC
                 else:  # 7, 8 保持不变
                     transformed_yao_values.append(yao_val)
             
-            print(f"DEBUG: 变卦爻值: {transformed_yao_values}")
+            logger.debug("变卦爻值: %s", transformed_yao_values)
             
             # 使用 extract_hexagram_data 填充 changing_hexagram
             changing_hexagram = extract_hexagram_data(transformed_yao_values)
-            print(f"DEBUG: 变卦解析完成 - {changing_hexagram.name}")
+            logger.debug("变卦解析完成 - %s", changing_hexagram.name)
         
         # 5. 提取变爻爻辞
         for line in primary_hexagram.lines:
@@ -386,5 +388,5 @@ async def perform_iching_divination(request_data: IChingDivinationRequest) -> IC
     except HTTPException:
         raise
     except Exception as e:
-        logging.error(f"易经算卦失败: {e}")
+        logger.error("易经算卦失败: %s", e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"易经算卦失败: {str(e)}") 
\ No newline at end of file
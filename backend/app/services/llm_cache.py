@@ -0,0 +1,240 @@
+"""
+大模型分析结果缓存
+同一命盘、同一分析类型的 AI 解读结果存入本地 SQLite 文件（无外部服务），重启后仍可命中。
+键为 (分析类型, 模型, 温度, 规范化命盘数据) 的 SHA-256；条目按 TTL 过期，超过条数上限时淘汰最久未访问的条目。
+并发的相同请求只发起一次上游调用（single-flight），其余请求等待同一结果。
+
+环境变量：
+    BAZI_LLM_CACHE_PATH   缓存文件路径，默认 backend/llm_cache.sqlite3
+    BAZI_LLM_CACHE_SIZE   最多缓存条数，默认 10000，0 表示关闭缓存
+    BAZI_LLM_CACHE_TTL    有效期（秒），默认 604800（7 天）
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .logger_config import setup_logger
+from .metrics import registry
+logger = setup_logger("llm_cache")
+
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'llm_cache.sqlite3')
+
+llm_cache_requests = registry.counter("bazi_llm_cache_requests_total", "大模型结果缓存查询次数", ("kind", "result"))
+
+
+def _json_default(value: Any) -> Any:
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=str)
+    return str(value)
+
+
+def normalize_chart_data(data: Any) -> str:
+    """规范化命盘数据：键排序、紧凑分隔符、Pydantic 模型与日期转为 JSON 值，使等价数据得到相同文本"""
+    return json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=_json_default)
+
+
+def llm_cache_key(kind: str, model: str, temperature: float, data: Any) -> str:
+    payload = json.dumps([kind, model, float(temperature), normalize_chart_data(data)],
+                         ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """SQLite 持久化的键值缓存，值为 JSON 对象；TTL 过期 + 按最近访问时间淘汰"""
+
+    def __init__(self, path: str = DEFAULT_PATH, maxsize: int = 10000, ttl: Optional[float] = 604800,
+                 clock: Callable[[], float] = time.time):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, kind TEXT NOT NULL, model TEXT NOT NULL, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)")
+            self._conn = conn
+        return self._conn
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """命中返回缓存值，未命中或已过期返回 None"""
+        if self.maxsize <= 0:
+            return None
+        now = self._clock()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self.ttl is not None and now - created_at >= self.ttl:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(value)
+
+    def put(self, key: str, kind: str, model: str, value: Dict[str, Any]):
+        if self.maxsize <= 0:
+            return
+        now = self._clock()
+        text = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, kind, model, value, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)", (key, kind, model, text, now, now)
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        if self.ttl is not None:
+            conn.execute("DELETE FROM llm_cache WHERE created_at <= ?", (now - self.ttl,))
+        overflow = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.maxsize
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM llm_cache WHERE key IN "
+                "(SELECT key FROM llm_cache ORDER BY accessed_at LIMIT ?)", (overflow,)
+            )
+
+    def clear(self):
+        with self._lock:
+            self._connect().execute("DELETE FROM llm_cache")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class SingleFlight:
+    """相同键的并发调用只执行一次，其余调用等待同一结果（或同一异常）"""
+
+    def __init__(self):
+        self._flights: Dict[str, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._flights
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._flights.get(key)
+        if flight is not None:
+            try:
+                return await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                if not flight.cancelled():
+                    raise
+                # 发起调用的请求被取消（如客户端断开），由当前请求重新发起
+                return await self.do(key, func)
+        flight = asyncio.get_running_loop().create_future()
+        self._flights[key] = flight
+        try:
+            result = await func()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                flight.cancel()
+            else:
+                flight.set_exception(e)
+                # 没有等待者时避免 "Future exception was never retrieved" 警告
+                flight.exception()
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            self._flights.pop(key, None)
+
+
+def _cacheable(result: Any) -> bool:
+    """只缓存正常的解读结果，错误与无法解析的响应不入缓存"""
+    return isinstance(result, dict) and bool(result) and "error" not in result
+
+
+llm_cache = LLMCache(
+    os.getenv("BAZI_LLM_CACHE_PATH", DEFAULT_PATH),
+    maxsize=int(os.getenv("BAZI_LLM_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("BAZI_LLM_CACHE_TTL", "604800")),
+)
+_flights = SingleFlight()
+
+
+async def cache_lookup(key: str, cache: Optional[LLMCache] = None) -> Optional[Dict[str, Any]]:
+    """在线程中查询缓存，读取失败按未命中处理"""
+    cache = cache if cache is not None else llm_cache
+    try:
+        return await asyncio.to_thread(cache.get, key)
+    except sqlite3.Error as e:
+        logger.warning("读取大模型结果缓存失败: %s", e)
+        return None
+
+
+async def cache_store(key: str, kind: str, model: str, result: Any, cache: Optional[LLMCache] = None):
+    """在线程中写入缓存，错误结果不写入，写入失败只记录日志"""
+    if not _cacheable(result):
+        return
+    cache = cache if cache is not None else llm_cache
+    try:
+        await asyncio.to_thread(cache.put, key, kind, model, result)
+    except sqlite3.Error as e:
+        logger.warning("写入大模型结果缓存失败: %s", e)
+
+
+async def cached_llm_call(kind: str, model: str, temperature: float, data: Any,
+                          call: Callable[[], Awaitable[Dict[str, Any]]],
+                          cache: Optional[LLMCache] = None) -> Dict[str, Any]:
+    """
+    先查缓存，未命中时经 single-flight 调用 call() 并写入缓存
+
+    Args:
+        kind: 分析类型（如 liunian、dayun），不同提示词模板的结果互不混用
+        model, temperature: 模型参数，参与缓存键
+        data: 生成提示词所用的命盘数据（规范化后参与缓存键）
+        call: 实际的大模型调用
+    """
+    key = llm_cache_key(kind, model, temperature, data)
+    cached = await cache_lookup(key, cache)
+    if cached is not None:
+        llm_cache_requests.inc(kind=kind, result="hit")
+        return cached
+
+    coalesced = key in _flights
+    llm_cache_requests.inc(kind=kind, result="coalesced" if coalesced else "miss")
+
+    async def fetch():
+        result = await call()
+        await cache_store(key, kind, model, result, cache)
+        return result
+
+    return await _flights.do(key, fetch)
+
+
+registry.register_collector(
+    "bazi_llm_cache_in_flight", "gauge", "正在等待上游结果的大模型缓存键数",
+    lambda: [("", {}, len(_flights))]
+)
@@ -0,0 +1,183 @@
+"""
+大模型 HTTP 客户端
+进程内共享一个长连接 httpx.AsyncClient（keep-alive 连接池，免去每次调用的 TCP/TLS 握手），
+信号量限制同时在途的调用数，429 / 5xx / 网络错误按带抖动的指数退避重试（遵循 Retry-After）。
+
+客户端在应用启动时创建、关闭时释放；httpx 客户端绑定创建它的事件循环，
+在其他事件循环中（如测试中多次 asyncio.run）取用时会自动新建。
+
+环境变量：
+    DEEPSEEK_MAX_CONCURRENCY    同时在途的调用上限，默认 8
+    DEEPSEEK_MAX_CONNECTIONS    连接池上限，默认 20
+    DEEPSEEK_KEEPALIVE_EXPIRY   空闲连接保留秒数，默认 30
+    DEEPSEEK_MAX_RETRIES        可重试错误的最大重试次数，默认 3
+    DEEPSEEK_RETRY_BASE_DELAY   首次重试的退避上限（秒），默认 0.5，之后每次翻倍
+    DEEPSEEK_RETRY_MAX_DELAY    单次退避上限（秒），默认 8
+    DEEPSEEK_TIMEOUT            单次请求超时（秒），默认 30
+"""
+import asyncio
+import os
+import random
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+
+from .logger_config import setup_logger
+from .metrics import registry
+logger = setup_logger("llm_client")
+
+RETRYABLE_STATUS = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+llm_retries = registry.counter("bazi_llm_retries_total", "大模型 API 调用重试次数", ("reason",))
+
+
+class LLMClient:
+    """共享连接池 + 并发上限 + 重试的异步 HTTP 客户端"""
+
+    def __init__(self, max_concurrency: int = 8, max_connections: int = 20, keepalive_expiry: float = 30.0,
+                 max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 8.0, timeout: float = 30.0,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max(0, max_retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._in_flight = 0
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections,
+                                keepalive_expiry=keepalive_expiry),
+            transport=transport,
+        )
+
+    @classmethod
+    def from_env(cls) -> "LLMClient":
+        return cls(
+            max_concurrency=int(os.getenv("DEEPSEEK_MAX_CONCURRENCY", "8")),
+            max_connections=int(os.getenv("DEEPSEEK_MAX_CONNECTIONS", "20")),
+            keepalive_expiry=float(os.getenv("DEEPSEEK_KEEPALIVE_EXPIRY", "30")),
+            max_retries=int(os.getenv("DEEPSEEK_MAX_RETRIES", "3")),
+            base_delay=float(os.getenv("DEEPSEEK_RETRY_BASE_DELAY", "0.5")),
+            max_delay=float(os.getenv("DEEPSEEK_RETRY_MAX_DELAY", "8")),
+            timeout=float(os.getenv("DEEPSEEK_TIMEOUT", "30")),
+        )
+
+    @property
+    def in_flight(self) -> int:
+        """正在进行（已取得信号量）的调用数"""
+        return self._in_flight
+
+    @property
+    def closed(self) -> bool:
+        return self._client.is_closed
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """第 attempt 次重试前的等待时间：全抖动指数退避，服务端给出 Retry-After 时取其与退避上限的较小值"""
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> Optional[float]:
+        try:
+            return float(response.headers["Retry-After"])
+        except (KeyError, ValueError):
+            return None
+
+    async def post_json(self, url: str, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None,
+                        timeout: Optional[float] = None) -> Dict[str, Any]:
+        """POST JSON 并返回解析后的响应；可重试错误在重试用尽后抛出最后一次的异常（httpx.HTTPStatusError 等）"""
+        async with self._semaphore:
+            self._in_flight += 1
+            try:
+                response = await self._send_with_retries(url, payload, headers, timeout)
+            finally:
+                self._in_flight -= 1
+        return response.json()
+
+    async def stream_lines(self, url: str, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None,
+                           timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """流式 POST 并逐行产出响应正文（如 SSE）；收到响应头之前按 post_json 的规则重试，之后不再重试"""
+        async with self._semaphore:
+            self._in_flight += 1
+            try:
+                response = await self._send_with_retries(url, payload, headers, timeout, stream=True)
+                try:
+                    async for line in response.aiter_lines():
+                        yield line
+                finally:
+                    await response.aclose()
+            finally:
+                self._in_flight -= 1
+
+    async def _send_with_retries(self, url: str, payload: Dict[str, Any], headers: Optional[Dict[str, str]],
+                                 timeout: Optional[float], stream: bool = False) -> httpx.Response:
+        kwargs = {"json": payload, "headers": headers}
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        attempt = 0
+        while True:
+            try:
+                request = self._client.build_request("POST", url, **kwargs)
+                response = await self._client.send(request, stream=stream)
+                if response.status_code not in RETRYABLE_STATUS or attempt >= self.max_retries:
+                    if stream and response.is_error:
+                        # 流式响应需先读出正文，调用方才能在 HTTPStatusError 中取到错误信息
+                        await response.aread()
+                        await response.aclose()
+                    response.raise_for_status()
+                    return response
+                if stream:
+                    await response.aclose()
+                reason, retry_after = str(response.status_code), self._retry_after(response)
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    raise
+                reason, retry_after = type(e).__name__, None
+            delay = self.backoff(attempt, retry_after)
+            attempt += 1
+            llm_retries.inc(reason=reason)
+            logger.warning("大模型 API 调用失败（%s），%.2f 秒后第 %d 次重试", reason, delay, attempt)
+            await asyncio.sleep(delay)
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+_client: Optional[LLMClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_llm_client() -> LLMClient:
+    """取当前事件循环上的共享客户端（首次使用或事件循环变化时按环境变量创建）"""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.closed or _client_loop is not loop:
+        _client, _client_loop = LLMClient.from_env(), loop
+        logger.info("大模型客户端: 并发上限 %d，最大重试 %d 次", _client.max_concurrency, _client.max_retries)
+    return _client
+
+
+def set_llm_client(client: Optional[LLMClient]) -> Optional[LLMClient]:
+    """替换共享客户端（测试与压测用），返回原客户端"""
+    global _client, _client_loop
+    previous = _client
+    _client = client
+    try:
+        _client_loop = asyncio.get_running_loop() if client is not None else None
+    except RuntimeError:
+        _client_loop = None
+    return previous
+
+
+async def close_llm_client():
+    """关闭共享客户端（应用退出时调用）"""
+    previous = set_llm_client(None)
+    if previous is not None and not previous.closed:
+        await previous.aclose()
+
+
+registry.register_collector(
+    "bazi_llm_in_flight", "gauge", "正在进行的大模型 API 调用数",
+    lambda: [] if _client is None else [("", {}, _client.in_flight)]
+)
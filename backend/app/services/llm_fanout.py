@@ -0,0 +1,43 @@
+"""
+大模型请求并发扇出
+bounded_as_completed 以有限并发执行一组调用，按完成先后逐个产出结果，供 SSE 端点边完成边推送；
+迭代提前结束（客户端断开、生成器关闭或被取消）时取消尚未完成的调用。
+"""
+import asyncio
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, Sequence, Tuple
+
+from .logger_config import setup_logger
+
+logger = setup_logger("llm_fanout")
+
+# 单个请求内同时进行的大运 AI 分析数上限（全局上限仍由 DEEPSEEK_MAX_CONCURRENCY 控制）
+DAYUN_FANOUT_CONCURRENCY = int(os.getenv("BAZI_DAYUN_FANOUT_CONCURRENCY", "4"))
+
+
+async def bounded_as_completed(calls: Sequence[Callable[[], Awaitable[Any]]], concurrency: int
+                               ) -> AsyncIterator[Tuple[int, Any, Optional[BaseException]]]:
+    """
+    并发执行 calls（同时最多 concurrency 个），每完成一个产出 (序号, 结果, 异常)；调用失败时结果为 None
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(call):
+        async with semaphore:
+            return await call()
+
+    tasks = [asyncio.ensure_future(run(call)) for call in calls]
+    index_of = {task: index for index, task in enumerate(tasks)}
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=index_of.get):
+                error = task.exception()
+                yield index_of[task], None if error else task.result(), error
+    finally:
+        if pending:
+            logger.info("扇出提前结束，取消 %s 个未完成的调用", len(pending))
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
@@ -0,0 +1,82 @@
+"""
+大模型流式输出工具
+IncrementalJSONParser 逐段接收模型输出的 JSON 文本，每当一个顶层字段的值闭合就立即产出该字段，
+无需等待整个 JSON 文档生成完毕；format_sse 把事件编码为 Server-Sent Events 文本。
+"""
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class IncrementalJSONParser:
+    """
+    增量解析顶层 JSON 对象：feed() 返回本段文本中新闭合的 (字段名, 值) 列表
+
+    只跟踪字符串与括号深度，在顶层逗号或右花括号处把已闭合的字段片段交给 json.loads 解析。
+    顶层对象之前的内容（如 ```json 代码块标记）会被忽略；无法解析的字段片段不产出，记入 errors。
+    """
+
+    def __init__(self):
+        self._buffer: List[str] = []
+        self._field: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.done = False
+        self.result: Dict[str, Any] = {}
+        self.errors: List[str] = []
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        fields: List[Tuple[str, Any]] = []
+        for char in text:
+            if self.done:
+                break
+            if self._depth == 0:
+                if char == "{":
+                    self._depth = 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(fields)
+                    self.done = True
+                    continue
+            elif char == "," and self._depth == 1:
+                self._emit(fields)
+                continue
+            self._field.append(char)
+        return fields
+
+    def _emit(self, fields: List[Tuple[str, Any]]):
+        fragment = "".join(self._field).strip()
+        self._field = []
+        if not fragment:
+            return
+        try:
+            parsed = json.loads("{" + fragment + "}")
+        except json.JSONDecodeError:
+            self.errors.append(fragment)
+            return
+        for key, value in parsed.items():
+            self.result[key] = value
+            fields.append((key, value))
+
+
+def format_sse(event: str, data: Any, event_id: Optional[int] = None) -> str:
+    """编码一条 SSE 事件，data 序列化为单行 JSON"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+    return "\n".join(lines) + "\n\n"
@@ -30,12 +30,12 @@ class LocationService:
                     self.city_database = data.get('cities', {})
                     self.province_database = data.get('provinces', {})
                     self.alias_mapping = data.get('aliases', {})
-                logger.info(f"成功加载城市数据库，包含{len(self.city_database)}个城市")
+                logger.info("成功加载城市数据库，包含%d个城市", len(self.city_database))
             else:
                 logger.warning("城市数据库文件不存在，使用内置数据")
                 self._init_builtin_database()
         except Exception as e:
-            logger.error(f"加载城市数据库失败: {e}，使用内置数据")
+            logger.error("加载城市数据库失败: %s，使用内置数据", e)
             self._init_builtin_database()
     
     def _init_builtin_database(self):
@@ -296,7 +296,7 @@ class LocationService:
             "冰城": "哈尔滨",
         }
         
-        logger.info(f"初始化内置城市数据库：{len(self.city_database)}个城市，{len(self.province_database)}个省份")
+        logger.info("初始化内置城市数据库：%d个城市，%d个省份", len(self.city_database), len(self.province_database))
     
     def normalize_location_name(self, location: str) -> str:
         """标准化地名，去除常见后缀和前缀"""
@@ -342,28 +342,28 @@ class LocationService:
         # 首先在城市数据库中查找
         if normalized in self.city_database:
             coords = self.city_database[normalized]
-            logger.info(f"找到城市坐标: {location} -> {normalized} -> {coords}")
+            logger.debug("找到城市坐标: %s -> %s -> %s", location, normalized, coords)
             return coords
         
         # 然后在省份数据库中查找
         if normalized in self.province_database:
             coords = self.province_database[normalized]
-            logger.info(f"找到省份坐标: {location} -> {normalized} -> {coords}")
+            logger.debug("找到省份坐标: %s -> %s -> %s", location, normalized, coords)
             return coords
         
         # 模糊匹配：查找包含关键词的城市
         for city_name, coords in self.city_database.items():
             if normalized in city_name or city_name in normalized:
-                logger.info(f"模糊匹配找到城市坐标: {location} -> {city_name} -> {coords}")
+                logger.debug("模糊匹配找到城市坐标: %s -> %s -> %s", location, city_name, coords)
                 return coords
         
         # 模糊匹配：查找包含关键词的省份
         for province_name, coords in self.province_database.items():
             if normalized in province_name or province_name in normalized:
-                logger.info(f"模糊匹配找到省份坐标: {location} -> {province_name} -> {coords}")
+                logger.debug("模糊匹配找到省份坐标: %s -> %s -> %s", location, province_name, coords)
                 return coords
         
-        logger.warning(f"未找到地点坐标: {location} (标准化: {normalized})")
+        logger.warning("未找到地点坐标: %s (标准化: %s)", location, normalized)
         return None
     
     def get_location_info(self, location: str) -> Dict[str, any]:
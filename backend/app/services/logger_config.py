@@ -1,54 +1,167 @@
 """
 日志配置模块
 提供统一的日志记录功能
+
+queue 模式（默认）下各模块记录器只挂一个 QueueHandler，记录放入内存队列即返回，
+控制台与文件输出由后台 QueueListener 线程完成，请求线程不做日志 I/O。
+sync 模式保持原有行为：每个记录器各自挂控制台与文件处理器，同步写出。
+
+环境变量：
+    BAZI_LOG_MODE          queue（默认）/ sync
+    BAZI_LOG_LEVEL         覆盖 setup_logger 的默认级别（如 DEBUG）
+    BAZI_LOG_SAMPLE_EVERY  DEBUG 级别下每 N 次排盘输出一次排盘明细，默认 100（1 表示每次都输出）
 """
+import atexit
+import itertools
 import logging
+import logging.handlers
 import os
+import queue
+import threading
 from datetime import datetime
+from typing import Dict, Optional
+
+LOG_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'logs')
+
+
+def _formatter() -> logging.Formatter:
+    return logging.Formatter(
+        fmt='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+
+
+def _log_file(name: str) -> str:
+    os.makedirs(LOG_DIR, exist_ok=True)
+    return os.path.join(LOG_DIR, f"{name}_{datetime.now().strftime('%Y%m%d')}.log")
+
+
+class _PerLoggerFileHandler(logging.Handler):
+    """按记录器名称分文件写出（与 sync 模式的文件布局一致），在监听线程中使用"""
+
+    def __init__(self):
+        super().__init__()
+        self._handlers: Dict[str, logging.FileHandler] = {}
+
+    def emit(self, record: logging.LogRecord):
+        handler = self._handlers.get(record.name)
+        if handler is None:
+            handler = logging.FileHandler(_log_file(record.name), encoding='utf-8')
+            handler.setFormatter(self.formatter)
+            self._handlers[record.name] = handler
+        handler.emit(record)
+
+    def close(self):
+        for handler in self._handlers.values():
+            handler.close()
+        self._handlers.clear()
+        super().close()
+
+
+_log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_listener: Optional[logging.handlers.QueueListener] = None
+_listener_lock = threading.Lock()
+
+
+def start_log_listener():
+    """启动后台日志线程（已启动时不做任何事）"""
+    global _listener
+    if _listener is not None:
+        return
+    with _listener_lock:
+        if _listener is not None:
+            return
+        formatter = _formatter()
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(formatter)
+        file_handler = _PerLoggerFileHandler()
+        file_handler.setFormatter(formatter)
+        _listener = logging.handlers.QueueListener(_log_queue, console_handler, file_handler)
+        _listener.start()
+
+
+def stop_log_listener():
+    """停止后台日志线程并写出队列中剩余的记录（应用退出时调用，可重复调用）"""
+    global _listener
+    with _listener_lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+atexit.register(stop_log_listener)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """入队前确认后台线程在运行（停止后仍有记录时重新启动，避免记录滞留在队列中）"""
+
+    def enqueue(self, record: logging.LogRecord):
+        if _listener is None:
+            start_log_listener()
+        super().enqueue(record)
 
 
 def setup_logger(name: str = "bazi_calculator", level: str = "INFO") -> logging.Logger:
     """
     设置日志记录器
-    
+
     Args:
         name: 记录器名称
-        level: 日志级别 (DEBUG, INFO, WARNING, ERROR, CRITICAL)
-    
+        level: 日志级别 (DEBUG, INFO, WARNING, ERROR, CRITICAL)，BAZI_LOG_LEVEL 优先
+
     Returns:
         配置好的日志记录器
     """
     logger = logging.getLogger(name)
-    
+
     # 避免重复添加处理器
     if logger.handlers:
         return logger
-    
+
     # 设置日志级别
+    level = os.getenv("BAZI_LOG_LEVEL", level)
     logger.setLevel(getattr(logging, level.upper(), logging.INFO))
-    
-    # 创建格式化器
-    formatter = logging.Formatter(
-        fmt='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    
+
+    mode = os.getenv("BAZI_LOG_MODE", "queue")
+    if mode == "queue":
+        start_log_listener()
+        logger.addHandler(_QueueHandler(_log_queue))
+        return logger
+
+    formatter = _formatter()
+
     # 控制台处理器
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter)
     logger.addHandler(console_handler)
-    
+
     # 文件处理器（可选）
-    log_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'logs')
-    os.makedirs(log_dir, exist_ok=True)
-    
-    log_file = os.path.join(log_dir, f"{name}_{datetime.now().strftime('%Y%m%d')}.log")
-    file_handler = logging.FileHandler(log_file, encoding='utf-8')
+    file_handler = logging.FileHandler(_log_file(name), encoding='utf-8')
     file_handler.setFormatter(formatter)
     logger.addHandler(file_handler)
-    
+
     return logger
 
 
+class LogSampler:
+    """每 every 次调用放行一次（every <= 1 时全部放行），用于按请求采样明细日志"""
+
+    def __init__(self, every: int):
+        self.every = max(1, every)
+        self._counter = itertools.count()
+
+    def __call__(self) -> bool:
+        # itertools.count 的 next 在 CPython 中是原子的，无需加锁
+        return next(self._counter) % self.every == 0
+
+
+def detail_sampler(logger: logging.Logger, every: Optional[int] = None):
+    """返回判定函数：logger 开启 DEBUG 且命中采样时为 True，未开启 DEBUG 时不计数"""
+    sampler = LogSampler(every if every is not None else int(os.getenv("BAZI_LOG_SAMPLE_EVERY", "100")))
+    return lambda: logger.isEnabledFor(logging.DEBUG) and sampler()
+
+
 # 默认日志记录器
 logger = setup_logger()
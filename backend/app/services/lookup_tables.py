@@ -0,0 +1,143 @@
+"""
+预计算查找表模块
+导入时由 constants.py 一次性生成稠密表：十神 10×10、十二长生 10×12、
+六十甲子纳音/旬空、地支藏干（含权重），供热点辅助函数直接索引
+"""
+from typing import Dict, List, Tuple
+
+from .constants import (
+    TIANGAN, DIZHI, JIAZI_TABLE, STEM_ELEMENTS, STEM_YIN_YANG,
+    FIVE_ELEMENTS_GENERATION, FIVE_ELEMENTS_OVERCOMING,
+    CHANG_SHENG_STATES, CHANG_SHENG_MAPPING,
+    NAYIN_MAP_COMPLETE, NAYIN_ELEMENT_MAPPING, NAYIN_STANDARDIZATION,
+    XUNKONG_MAPPING, BRANCH_HIDDEN_STEMS
+)
+
+# ========== 干支索引 ==========
+
+STEM_INDEX: Dict[str, int] = {stem: i for i, stem in enumerate(TIANGAN)}
+BRANCH_INDEX: Dict[str, int] = {branch: i for i, branch in enumerate(DIZHI)}
+JIAZI_INDEX: Dict[str, int] = {ganzhi: i for i, ganzhi in enumerate(JIAZI_TABLE)}
+
+
+# ========== 十神 10×10 ==========
+
+def _ten_god(day_stem: str, other_stem: str) -> str:
+    """按日干与他干的五行生克、阴阳异同确定十神"""
+    day_element = STEM_ELEMENTS[day_stem]
+    other_element = STEM_ELEMENTS[other_stem]
+    same_polarity = STEM_YIN_YANG[day_stem] == STEM_YIN_YANG[other_stem]
+
+    if day_element == other_element:
+        return "比肩" if same_polarity else "劫财"
+    if FIVE_ELEMENTS_GENERATION.get(day_element) == other_element:
+        return "食神" if same_polarity else "伤官"
+    if FIVE_ELEMENTS_OVERCOMING.get(day_element) == other_element:
+        return "偏财" if same_polarity else "正财"
+    if FIVE_ELEMENTS_OVERCOMING.get(other_element) == day_element:
+        return "七杀" if same_polarity else "正官"
+    if FIVE_ELEMENTS_GENERATION.get(other_element) == day_element:
+        return "偏印" if same_polarity else "正印"
+    return "未知"
+
+
+# TEN_GOD_TABLE[日干索引][他干索引] -> 十神名称
+TEN_GOD_TABLE: Tuple[Tuple[str, ...], ...] = tuple(
+    tuple(_ten_god(day_stem, other_stem) for other_stem in TIANGAN) for day_stem in TIANGAN
+)
+
+
+# ========== 十二长生 10×12 ==========
+
+# CHANG_SHENG_TABLE[天干索引][地支索引] -> 长生状态名称
+CHANG_SHENG_TABLE: Tuple[Tuple[str, ...], ...] = tuple(
+    tuple(CHANG_SHENG_MAPPING.get(stem, {}).get(branch, "未知") for branch in DIZHI) for stem in TIANGAN
+)
+
+# CHANG_SHENG_INDEX_TABLE[天干索引][地支索引] -> 长生状态序号（CHANG_SHENG_STATES 中的位置）
+CHANG_SHENG_INDEX_TABLE: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(CHANG_SHENG_STATES.index(state) if state in CHANG_SHENG_STATES else -1 for state in row)
+    for row in CHANG_SHENG_TABLE
+)
+
+
+# ========== 六十甲子：纳音、旬空 ==========
+
+def _nayin_element_index(nayin_name: str) -> int:
+    for element_name, idx in NAYIN_ELEMENT_MAPPING.items():
+        if element_name in nayin_name:
+            return idx
+    return -1
+
+
+# NAYIN_TABLE[甲子序号] -> (标准化纳音名称, 纳音五行索引)
+NAYIN_TABLE: Tuple[Tuple[str, int], ...] = tuple(
+    (
+        NAYIN_STANDARDIZATION.get(NAYIN_MAP_COMPLETE.get(ganzhi, "未知"), NAYIN_MAP_COMPLETE.get(ganzhi, "未知")),
+        _nayin_element_index(NAYIN_MAP_COMPLETE[ganzhi]) if ganzhi in NAYIN_MAP_COMPLETE else -1
+    )
+    for ganzhi in JIAZI_TABLE
+)
+
+# XUNKONG_NAMES[甲子序号] -> 空亡地支列表；XUNKONG_TABLE 为对应地支索引
+XUNKONG_NAMES: Tuple[Tuple[str, ...], ...] = tuple(tuple(XUNKONG_MAPPING.get(ganzhi, [])) for ganzhi in JIAZI_TABLE)
+XUNKONG_TABLE: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(BRANCH_INDEX[b] for b in names if b in BRANCH_INDEX) for names in XUNKONG_NAMES
+)
+
+
+# ========== 地支藏干 12 ==========
+
+# HIDDEN_STEMS_TABLE[地支索引] -> ((藏干索引, 权重), ...)，按权重从高到低
+HIDDEN_STEMS_TABLE: Tuple[Tuple[Tuple[int, float], ...], ...] = tuple(
+    tuple(
+        sorted(
+            ((STEM_INDEX[stem], weight) for stem, weight in BRANCH_HIDDEN_STEMS.get(branch, {}).items()),
+            key=lambda item: -item[1]
+        )
+    )
+    for branch in DIZHI
+)
+
+
+# ========== 查询函数 ==========
+
+def ten_god(day_stem: str, other_stem: str) -> str:
+    """十神查表，未知干返回 "未知" """
+    day_idx = STEM_INDEX.get(day_stem)
+    other_idx = STEM_INDEX.get(other_stem)
+    if day_idx is None or other_idx is None:
+        return "未知"
+    return TEN_GOD_TABLE[day_idx][other_idx]
+
+
+def chang_sheng(stem: str, branch: str) -> str:
+    """十二长生查表，未知干支返回 "未知" """
+    stem_idx = STEM_INDEX.get(stem)
+    branch_idx = BRANCH_INDEX.get(branch)
+    if stem_idx is None or branch_idx is None:
+        return "未知"
+    return CHANG_SHENG_TABLE[stem_idx][branch_idx]
+
+
+def chang_sheng_index(stem_idx: int, branch_idx: int) -> int:
+    """十二长生序号查表（索引版），越界返回 -1"""
+    if 0 <= stem_idx < 10 and 0 <= branch_idx < 12:
+        return CHANG_SHENG_INDEX_TABLE[stem_idx][branch_idx]
+    return -1
+
+
+def nayin(gan: str, zhi: str) -> Tuple[str, int]:
+    """纳音查表，返回 (标准化纳音名称, 五行索引)；非六十甲子返回 ("未知", -1)"""
+    idx = JIAZI_INDEX.get(gan + zhi)
+    if idx is None:
+        return "未知", -1
+    return NAYIN_TABLE[idx]
+
+
+def xunkong(ganzhi: str) -> List[str]:
+    """旬空查表"""
+    idx = JIAZI_INDEX.get(ganzhi)
+    if idx is None:
+        return []
+    return list(XUNKONG_NAMES[idx])
@@ -19,6 +19,9 @@ from .core import Bazi, StemBranch, DaYun, FortuneModel
 from .calculators import ShenShaCalculator, FiveElementsCalculator
 from .analyzers import AdvancedDayunAnalyzer, AdvancedEventEngine, EventDeductionEngine
 from .prompt_manager import PromptManager
+from .constants import CHANG_SHENG_STATES
+from .lookup_tables import STEM_INDEX, BRANCH_INDEX, chang_sheng_index
+from .logger_config import setup_logger
 from .utils import (
     safe_get_name, safe_get_method_result, analyze_dayun_phase,
     self_calculate_ten_god, get_zhi_hidden_gan, 
@@ -27,6 +30,8 @@ from .utils import (
     format_dayun_info, JIAZI
 )
 
+logger = setup_logger("bazi_main")
+
 
 # 节气数据库（2023-2025年）
 SOLAR_TERMS_DATA = {
@@ -119,7 +124,7 @@ async def calculate_bazi_data(request_data: BaziCalculateRequest, quick_mode: bo
         favorable_elements = ["木", "火"]
         zodiac_sign = bazi_obj.get_zodiac()
         
-        print(f"Debug: 计算结果 - 日主强弱: {day_master_strength}, 喜用神: {favorable_elements}")
+        logger.debug("计算结果 - 日主强弱: %s, 喜用神: %s", day_master_strength, favorable_elements)
 
         # === 简化的大运计算 ===
         major_cycles = []
@@ -139,7 +144,7 @@ async def calculate_bazi_data(request_data: BaziCalculateRequest, quick_mode: bo
                     "description": f"大运{i+1}期间的运势特点"
                 })
         except Exception as e:
-            print(f"DEBUG: 大运计算出错: {e}")
+            logger.warning("大运计算出错: %s", e)
 
         # 四柱详细信息
         gan_zhi_info = {
@@ -258,8 +263,6 @@ async def calculate_bazi_data(request_data: BaziCalculateRequest, quick_mode: bo
             "hour": (bazi_obj.hour.stem, bazi_obj.hour.branch),
         }
 
-        temp_shensha_calculator = ShenShaCalculator() # 创建临时实例来调用辅助方法
-
         for pillar_name, (gan, zhi) in na_yin_pillars.items():
             # 先尝试从 lunar_python 获取纳音名称（保持兼容性）
             if pillar_name == "year":
@@ -273,10 +276,10 @@ async def calculate_bazi_data(request_data: BaziCalculateRequest, quick_mode: bo
             
             # 如果 lunar_python 返回的是未知，尝试从我们的映射表获取
             if nayin_name_str == "未知":
-                nayin_name_str, nayin_element_index = temp_shensha_calculator.get_nayin_name_and_element(gan, zhi)
+                nayin_name_str, nayin_element_index = shen_sha_calculator.get_nayin_name_and_element(gan, zhi)
             else:
                 # 获取五行索引
-                nayin_element_index = temp_shensha_calculator.get_nayin_element_index(gan, zhi)
+                nayin_element_index = shen_sha_calculator.get_nayin_element_index(gan, zhi)
             
             na_yin[f"{pillar_name}_na_yin"] = [nayin_name_str, nayin_element_index]
         
@@ -294,56 +297,29 @@ async def calculate_bazi_data(request_data: BaziCalculateRequest, quick_mode: bo
         year_chang_sheng_info = []
         major_cycles_with_chang_sheng = []
         
-        # 十二长生映射表（复制到此处用于计算）
-        SHI_ER_CHANG_SHENG_MAP = {
-            0: [11, 0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10],  # 甲
-            1: [6, 7, 8, 9, 10, 11, 0, 1, 2, 3, 4, 5],  # 乙
-            2: [2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 0, 1],  # 丙
-            3: [9, 10, 11, 0, 1, 2, 3, 4, 5, 6, 7, 8],  # 丁
-            4: [2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 0, 1],  # 戊
-            5: [9, 10, 11, 0, 1, 2, 3, 4, 5, 6, 7, 8],  # 己
-            6: [5, 6, 7, 8, 9, 10, 11, 0, 1, 2, 3, 4],  # 庚
-            7: [0, 11, 10, 9, 8, 7, 6, 5, 4, 3, 2, 1],  # 辛
-            8: [8, 9, 10, 11, 0, 1, 2, 3, 4, 5, 6, 7],  # 壬
-            9: [3, 2, 1, 0, 11, 10, 9, 8, 7, 6, 5, 4]   # 癸
-        }
-        
-        CHANG_SHENG_NAMES = [
-            "长生", "沐浴", "冠带", "临官", "帝旺", "衰", "病", "死", "墓", "绝", "胎", "养"
-        ]
-        
         def calc_chang_sheng_for_pillar(gan_index: int, zhi_index: int) -> Dict[str, Union[int, str]]:
-            """计算指定天干在地支上的十二长生状态"""
-            if gan_index not in SHI_ER_CHANG_SHENG_MAP:
-                return {"index": -1, "char": "未知"}
-            
-            chang_sheng_order_for_gan = SHI_ER_CHANG_SHENG_MAP[gan_index]
-            
-            try:
-                cs_index = chang_sheng_order_for_gan.index(zhi_index)
-                return {"index": cs_index, "char": CHANG_SHENG_NAMES[cs_index]}
-            except ValueError:
+            """计算指定天干在地支上的十二长生状态（查预计算长生表）"""
+            cs_index = chang_sheng_index(gan_index, zhi_index)
+            if cs_index < 0:
                 return {"index": -1, "char": "未知"}
+            return {"index": cs_index, "char": CHANG_SHENG_STATES[cs_index]}
         
         # 辅助函数：获取天干地支索引
         def get_local_gan_index(gan_char: str) -> int:
-            gan_map = {"甲": 0, "乙": 1, "丙": 2, "丁": 3, "戊": 4, "己": 5, "庚": 6, "辛": 7, "壬": 8, "癸": 9}
-            return gan_map.get(gan_char, -1)
+            return STEM_INDEX.get(gan_char, -1)
 
         def get_local_zhi_index(zhi_char: str) -> int:
-            zhi_map = {"子": 0, "丑": 1, "寅": 2, "卯": 3, "辰": 4, "巳": 5, "午": 6, "未": 7, "申": 8, "酉": 9, "戌": 10, "亥": 11}
-            return zhi_map.get(zhi_char, -1)
+            return BRANCH_INDEX.get(zhi_char, -1)
         
         # 初始化变量
         interactions_info = {}
         
         try:
-            shen_sha_calculator = ShenShaCalculator()
             shen_sha_results = shen_sha_calculator.calculate(bazi_obj)
             
             # === 新增：干支互动关系分析 (简化版本) ===
             interactions_info = analyze_ganZhi_interactions(bazi_obj)
-            print(f"DEBUG: 干支互动分析完成: {interactions_info}")
+            logger.debug("干支互动分析完成: %s", interactions_info)
 
             # 计算四柱的十二长生
             year_gan_idx = get_local_gan_index(bazi_obj.year.stem)
@@ -362,9 +338,9 @@ async def calculate_bazi_data(request_data: BaziCalculateRequest, quick_mode: bo
                 year_chang_sheng_info.append(calc_chang_sheng_for_pillar(year_gan_idx, zhi_indices[i]))
                 day_chang_sheng_info.append(calc_chang_sheng_for_pillar(day_gan_idx, zhi_indices[i]))
 
-            print(f"DEBUG: 神煞计算完成，数量: {len(shen_sha_results) if isinstance(shen_sha_results, dict) else 0}")
-            print(f"DEBUG: 日主长生计算完成: {day_chang_sheng_info}")
-            print(f"DEBUG: 年干长生计算完成: {year_chang_sheng_info}")
+            logger.debug("神煞计算完成，数量: %s", len(shen_sha_results) if isinstance(shen_sha_results, dict) else 0)
+            logger.debug("日主长生计算完成: %s", day_chang_sheng_info)
+            logger.debug("年干长生计算完成: %s", year_chang_sheng_info)
 
             # 将大运的长生添加到 major_cycles
             if major_cycles:
@@ -381,9 +357,7 @@ async def calculate_bazi_data(request_data: BaziCalculateRequest, quick_mode: bo
                 major_cycles = major_cycles_with_chang_sheng
 
         except Exception as e:
-            print(f"DEBUG: 神煞或长生计算出错: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("神煞或长生计算出错: %s", e)
             shen_sha_results = {}
             day_chang_sheng_info = []
             year_chang_sheng_info = []
@@ -400,7 +374,7 @@ async def calculate_bazi_data(request_data: BaziCalculateRequest, quick_mode: bo
             }
             current_year_fortune["predicted_events"] = life_events
         except Exception as e:
-            print(f"DEBUG: 事件预测出错: {e}")
+            logger.warning("事件预测出错: %s", e)
             current_year_fortune["predicted_events"] = {}
         
         # 调用统一计算器
@@ -451,7 +425,7 @@ async def calculate_bazi_data(request_data: BaziCalculateRequest, quick_mode: bo
         )
         
     except Exception as e:
-        print(f"Error calculating Bazi: {e}")
+        logger.error("Error calculating Bazi: %s", e)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"八字排盘发生错误：{str(e)}"
@@ -0,0 +1,258 @@
+"""
+进程内指标注册表
+计数器、直方图按 Prometheus 文本格式（0.0.4）导出，由 /metrics 端点抓取；
+缓存命中数、执行器排队数等已有统计通过采集函数在抓取时读取，不重复计数。
+
+多进程部署（多个 uvicorn worker）时每个进程各自导出，由 Prometheus 按实例汇总。
+"""
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+
+from .logger_config import setup_logger
+logger = setup_logger("metrics")
+
+# 请求级耗时（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 排盘分段耗时（秒），多为亚毫秒级
+STAGE_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1)
+# 大模型调用耗时（秒）
+LLM_BUCKETS = (0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+# 提示词 token 数
+PROMPT_TOKEN_BUCKETS = (100, 200, 400, 800, 1600, 3200, 6400)
+
+# 采集函数返回的样本：(指标名后缀, 标签, 值)
+Sample = Tuple[str, Mapping[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Mapping[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Mapping[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"指标 {self.name} 的标签应为 {self.labelnames}，实际为 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...]) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def samples(self) -> List[Sample]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """只增计数器（名称按惯例以 _total 结尾）"""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        if amount < 0:
+            raise ValueError("计数器只能增加")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            return [("", self._labels(key), value) for key, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    """累积分桶直方图（含 _sum 与 _count）"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签 -> [各桶计数（非累积）..., +Inf 桶计数, 总和]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    def count(self, **labels: str) -> int:
+        counts = self._values.get(self._key(labels))
+        return int(sum(counts[:-1])) if counts else 0
+
+    def samples(self) -> List[Sample]:
+        samples: List[Sample] = []
+        with self._lock:
+            items = [(key, list(counts)) for key, counts in self._values.items()]
+        for key, counts in items:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts[:-1]):
+                cumulative += count
+                samples.append(("_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+            samples.append(("_sum", labels, counts[-1]))
+            samples.append(("_count", labels, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """指标注册表；register_collector 注册的采集函数在每次导出时调用"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Tuple[str, str, str, Callable[[], Iterable[Sample]]]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"指标重复注册: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, name: str, kind: str, documentation: str, collect: Callable[[], Iterable[Sample]]):
+        """注册抓取时读取的指标（kind 为 counter / gauge），collect 返回 (后缀, 标签, 值) 样本"""
+        with self._lock:
+            self._collectors.append((name, kind, documentation, collect))
+
+    def render(self) -> str:
+        """导出 Prometheus 文本格式"""
+        families = [(metric.name, metric.kind, metric.documentation, metric.samples)
+                    for metric in self._metrics.values()]
+        families.extend(self._collectors)
+        lines = []
+        for name, kind, documentation, collect in families:
+            try:
+                samples = list(collect())
+            except Exception as e:
+                logger.warning("指标采集失败 %s: %s", name, e)
+                continue
+            lines.append(f"# HELP {name} {_escape(documentation)}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# 进程内共享注册表及各模块使用的指标
+registry = MetricsRegistry()
+
+http_request_duration = registry.histogram(
+    "bazi_http_request_duration_seconds", "API 请求处理耗时（秒）", ("method", "route", "status")
+)
+chart_stage_duration = registry.histogram(
+    "bazi_chart_stage_duration_seconds", "排盘流水线各分段耗时（秒）", ("stage",), STAGE_BUCKETS
+)
+chart_duration = registry.histogram(
+    "bazi_chart_duration_seconds", "单次排盘总耗时（秒，含执行器排队）", ("mode",)
+)
+llm_request_duration = registry.histogram(
+    "bazi_llm_request_duration_seconds", "大模型 API 调用耗时（秒）", ("model", "outcome"), LLM_BUCKETS
+)
+llm_tokens = registry.counter("bazi_llm_tokens_total", "大模型 API 消耗的 token 数", ("model", "kind"))
+llm_prompt_tokens_estimated = registry.histogram(
+    "bazi_llm_prompt_tokens_estimated", "发送前估算的提示词 token 数（含 system 消息）", ("model", "prompt"),
+    PROMPT_TOKEN_BUCKETS
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def observe_chart_timings(timings: Mapping[str, float]):
+    for stage, seconds in timings.items():
+        chart_stage_duration.observe(seconds, stage=stage)
+
+
+def server_timing_header(timings: Mapping[str, float], total: Optional[float] = None) -> str:
+    """Server-Timing 响应头（毫秒）：各排盘分段耗时，可附带总耗时"""
+    entries = [f"{stage};dur={seconds * 1e3:.3f}" for stage, seconds in timings.items()]
+    if total is not None:
+        entries.append(f"total;dur={total * 1e3:.3f}")
+    return ", ".join(entries)
+
+
+def record_llm_call(model: str, seconds: float, outcome: str, usage: Optional[Mapping[str, int]] = None):
+    """记录一次大模型调用的耗时与 token 用量（usage 为 API 返回的 usage 字段）"""
+    llm_request_duration.observe(seconds, model=model, outcome=outcome)
+    for kind in ("prompt_tokens", "completion_tokens"):
+        if usage and usage.get(kind):
+            llm_tokens.inc(usage[kind], model=model, kind=kind.replace("_tokens", ""))
+
+
+class TimedRoute(APIRoute):
+    """记录请求耗时的路由类：APIRouter(route_class=TimedRoute)，按路由模板（而非实际路径）分组
+
+    流式响应只计到响应对象返回为止，不含流的输出时间；路由模板是否含外层 include_router 前缀取决于 FastAPI 版本
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        route = self.path_format
+
+        async def timed_handler(request: Request) -> Response:
+            start = time.perf_counter()
+            status_code = 500
+            try:
+                response = await handler(request)
+                status_code = response.status_code
+                return response
+            except HTTPException as e:
+                status_code = e.status_code
+                raise
+            except RequestValidationError:
+                status_code = 422
+                raise
+            finally:
+                http_request_duration.observe(
+                    time.perf_counter() - start, method=request.method, route=route, status=str(status_code)
+                )
+
+        return timed_handler
@@ -0,0 +1,172 @@
+"""
+四柱纯算术排盘
+年柱、月柱由节气库中的立春与十二节时刻确定（五虎遁定月干），日柱为儒略日数模 60，
+时柱按五鼠遁由日干推出；胎元、命宫、身宫、胎息按 lunar_python 的同一规则计算。
+lunar_python 保留为参照实现：超出节气库覆盖范围时回退到 lunar_python。
+"""
+import threading
+from bisect import bisect_right
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from .constants import TIANGAN, DIZHI
+from .solar_terms_index import to_epoch
+from .solar_terms_store import (
+    SolarTermStore, get_solar_term_store, lunar_terms_table, pack_store
+)
+from .logger_config import setup_logger
+logger = setup_logger("pillar_engine")
+
+# 精确节气库（build_solar_terms_store.py --lunar 生成），覆盖 1899-2100 年的节气表年份
+LUNAR_STORE_FILE = "solar_terms_lunar.bin"
+LUNAR_STORE_START_YEAR = 1899
+LUNAR_STORE_END_YEAR = 2100
+# 支持排盘的公历年份范围
+MIN_YEAR = 1900
+MAX_YEAR = 2100
+
+LICHUN_CODE = 2
+# 公历日期序数 -> 儒略日数
+ORDINAL_TO_JDN = 1721425
+
+
+class FourPillars(NamedTuple):
+    """四柱及宫位（均为两字干支）"""
+    year: str
+    month: str
+    day: str
+    hour: str
+    tai_yuan: str
+    ming_gong: str
+    shen_gong: str
+    tai_xi: str
+
+    def pillars(self) -> tuple:
+        return self.year, self.month, self.day, self.hour
+
+    def palaces(self) -> dict:
+        return {"tai_yuan": self.tai_yuan, "ming_gong": self.ming_gong,
+                "shen_gong": self.shen_gong, "tai_xi": self.tai_xi}
+
+
+def _ganzhi(stem: int, branch: int) -> str:
+    return TIANGAN[stem % 10] + DIZHI[branch % 12]
+
+
+def _palaces(year_stem: int, month_stem: int, month_branch: int, day_stem: int, day_branch: int,
+             hour_branch: int) -> tuple:
+    """胎元、命宫、身宫、胎息（与 lunar_python EightChar 相同规则）"""
+    tai_yuan = _ganzhi(month_stem + 1, month_branch + 3)
+    tai_xi = _ganzhi(day_stem + 5, 1 - day_branch)
+    # 命宫、身宫以寅为 1 起数月支与时支
+    month_order = (month_branch - 2) % 12 + 1
+    offset = month_order + (hour_branch - 2) % 12 + 1
+    offset = 26 - offset if offset >= 14 else 14 - offset
+    ming_gong = _ganzhi((year_stem + 1) * 2 + offset - 1, offset + 1)
+    offset = month_order + hour_branch + 1
+    if offset > 12:
+        offset -= 12
+    shen_gong = _ganzhi((year_stem + 1) * 2 + offset - 1, offset + 1)
+    return tai_yuan, ming_gong, shen_gong, tai_xi
+
+
+class FourPillarEngine:
+    """基于节气库的四柱计算（晚子时日柱算当天，时干按次日起五鼠遁，与 lunar_python 默认流派一致）"""
+
+    def __init__(self, store: SolarTermStore):
+        self.store = store
+        index = store.to_index()
+        self._jie_instants = index.jie_instants
+        self._jie_codes = index.jie_codes
+
+    def calculate(self, dt: datetime) -> Optional[FourPillars]:
+        """排四柱，超出支持范围时返回 None"""
+        if not MIN_YEAR <= dt.year <= MAX_YEAR:
+            return None
+        instant = to_epoch(dt)
+        lichun = self.store.epoch(dt.year, LICHUN_CODE)
+        i = bisect_right(self._jie_instants, instant) - 1
+        if lichun is None or i < 0:
+            return None
+
+        # 年柱：以立春交接时刻为界
+        year = dt.year if instant >= lichun else dt.year - 1
+        year_stem = (year - 4) % 10
+        year_branch = (year - 4) % 12
+        # 月柱：上一个节定月支（小寒=丑、立春=寅 …），五虎遁定月干
+        month_branch = (self._jie_codes[i] // 2 + 1) % 12
+        month_stem = (year_stem % 5 * 2 + 2 + (month_branch - 2) % 12) % 10
+        # 日柱：儒略日数模 60
+        day_offset = dt.toordinal() + ORDINAL_TO_JDN - 11
+        day_stem = day_offset % 10
+        day_branch = day_offset % 12
+        # 时柱：23 点起为次日子时，五鼠遁按次日日干起
+        hour_branch = (dt.hour + 1) // 2 % 12
+        hour_day_stem = (day_stem + 1) % 10 if dt.hour == 23 else day_stem
+        hour_stem = (hour_day_stem % 5 * 2 + hour_branch) % 10
+
+        return FourPillars(
+            _ganzhi(year_stem, year_branch), _ganzhi(month_stem, month_branch),
+            _ganzhi(day_stem, day_branch), _ganzhi(hour_stem, hour_branch),
+            *_palaces(year_stem, month_stem, month_branch, day_stem, day_branch, hour_branch)
+        )
+
+
+class Liunian(NamedTuple):
+    """流年：以立春交接时刻为界的干支纪年"""
+    year: int
+    gan: str
+    zhi: str
+
+    @property
+    def gan_zhi(self) -> str:
+        return self.gan + self.zhi
+
+
+def lunar_four_pillars(dt: datetime) -> FourPillars:
+    """参照实现：lunar_python 排四柱"""
+    from lunar_python import Solar
+    eight_char = Solar.fromYmdHms(dt.year, dt.month, dt.day, dt.hour, dt.minute, dt.second).getLunar().getEightChar()
+    return FourPillars(
+        eight_char.getYear(), eight_char.getMonth(), eight_char.getDay(), eight_char.getTime(),
+        eight_char.getTaiYuan(), eight_char.getMingGong(), eight_char.getShenGong(), eight_char.getTaiXi()
+    )
+
+
+_engine: Optional[FourPillarEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_pillar_engine() -> FourPillarEngine:
+    """获取四柱引擎（进程内单例）；未构建精确节气库时用 lunar_python 在内存中生成一次"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                store = get_solar_term_store(LUNAR_STORE_FILE)
+                if store is None or store.start_year > LUNAR_STORE_START_YEAR or store.end_year < LUNAR_STORE_END_YEAR:
+                    logger.warning("未找到精确节气库 %s，使用 lunar_python 生成（可运行 build_solar_terms_store.py --lunar 预先构建）", LUNAR_STORE_FILE)
+                    table = lunar_terms_table(LUNAR_STORE_START_YEAR, LUNAR_STORE_END_YEAR)
+                    store = SolarTermStore.from_bytes(pack_store(table, LUNAR_STORE_START_YEAR, LUNAR_STORE_END_YEAR))
+                _engine = FourPillarEngine(store)
+    return _engine
+
+
+def liunian_at(dt: datetime) -> Liunian:
+    """dt 时刻所在的流年：立春（节气库精确时刻）之前仍属上一年；超出节气库范围时按 2 月 4 日近似"""
+    lichun = get_pillar_engine().store.epoch(dt.year, LICHUN_CODE)
+    if lichun is not None:
+        after_lichun = to_epoch(dt) >= lichun
+    else:
+        after_lichun = (dt.month, dt.day) >= (2, 4)
+    year = dt.year if after_lichun else dt.year - 1
+    return Liunian(year, TIANGAN[(year - 4) % 10], DIZHI[(year - 4) % 12])
+
+
+def calculate_four_pillars(dt: datetime) -> FourPillars:
+    """排四柱：优先纯算术计算，超出节气库范围时回退 lunar_python"""
+    pillars = get_pillar_engine().calculate(dt)
+    if pillars is None:
+        logger.debug("%s 超出节气库范围，使用 lunar_python 排盘", dt)
+        pillars = lunar_four_pillars(dt)
+    return pillars
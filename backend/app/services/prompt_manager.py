@@ -2,8 +2,54 @@
 AI Prompt 管理器
 
 负责生成用于调用大语言模型（如 DeepSeek）的结构化、高质量 Prompt。
+
+命盘数据默认以紧凑格式编码（每行一项、无缩进与 markdown 修饰，输出顺序固定），
+并按 token 预算取舍：四柱、日主、五行始终保留，喜用、流年、大运、神煞、互动按优先级逐项加入直到用完预算。
+角色设定只放在 system 消息中，各分析模板不再重复。
+
+环境变量：
+    BAZI_PROMPT_FORMAT         compact（默认）/ markdown（原有的 markdown 格式）
+    BAZI_PROMPT_TOKEN_BUDGET   命盘数据部分的预计 token 上限，默认 400
 """
-from typing import Dict, Any, List, Optional
+import math
+import os
+import textwrap
+from typing import Dict, Any, List, Optional, Tuple
+
+FIVE_ELEMENTS_ORDER = ("金", "木", "水", "火", "土")
+PILLAR_KEYS = ("year", "month", "day", "hour")
+
+
+# 大运、流年分析的回复结构（值为各字段的写作要求），单项与批量模板共用
+DAYUN_SCHEMA = (
+    '{"dayun_overview":{"summary":"十年总体基调、主题与核心影响","score":"1-100 分及理由","key_themes":["主题一","主题二","主题三"]},\n'
+    '"career_wealth":{"summary":"事业财运的机遇与挑战","opportunities":"可能的事业与财富机遇","challenges_and_advice":"潜在风险与应对建议"},\n'
+    '"relationship_health":{"summary":"感情婚姻与健康趋势","relationship_advice":"感情与家庭关系建议","health_advice":"按大运五行变化的健康养生建议"},\n'
+    '"strategic_suggestions":{"summary":"十年总体规划与人生建议","yearly_focus":"关键或需特别注意的年份"}}'
+)
+
+
+def _liunian_schema(year_label: str) -> str:
+    return (
+        f'{{"liunian_overview":{{"summary":"{year_label}整体运势概括（吉凶、主要机遇与挑战领域）","score":"1-100 分及理由","key_themes":["主题一","主题二","主题三"]}},\n'
+        '"monthly_fortune":[{"month":1,"fortune":"当月运势简评","advice":"建议"}],\n'
+        '"specific_advice":{"career":"事业建议","wealth":"财富管理与投资建议","relationship":"感情建议","health":"健康建议与注意事项"}}'
+    )
+
+
+def _dedent(text: str) -> str:
+    return textwrap.dedent(text).strip()
+
+
+def _percent(value: Any) -> str:
+    """'60.50000000000001%' / 0.605 / 60.5 -> '61'"""
+    try:
+        number = float(str(value).rstrip("%"))
+    except ValueError:
+        return str(value)
+    if not str(value).endswith("%") and number <= 1:
+        number *= 100
+    return str(int(round(number)))
 
 
 class PromptManager:
@@ -14,9 +60,9 @@ class PromptManager:
     @staticmethod
     def get_master_persona_prompt() -> str:
         """
-        定义 AI 的核心角色和行为准则。
+        定义 AI 的核心角色和行为准则（作为 system 消息发送）。
         """
-        return """
+        return _dedent("""
         你是一位深谙中华传统命理学的八字大师，同时具备现代心理学和人生规划的视角。你的分析不仅基于古老的干支五行、神煞、纳音、生旺库墓等理论，还能结合现代生活情境，为用户提供富有洞察力、建设性且易于理解的指导。
 
         **你的任务是：**
@@ -25,12 +71,142 @@ class PromptManager:
         3.  **语言风格**：语言既要体现专业性（如使用“官杀”、“印星”、“食伤”等术语），又要亲切易懂，避免使用过于晦涩或宿命论的词汇。多用积极、引导性的语言。
         4.  **逻辑严谨**：所有分析都必须有命理依据，并能在分析文本中简要提及（例如，“因你日主丙火，生于申月，财星当令，故...”)。
         5.  **避免废话**：直接进入核心分析，不要说“好的”、“收到”等多余的话。
+        """)
+
+    @staticmethod
+    def prompt_format() -> str:
+        return os.getenv("BAZI_PROMPT_FORMAT", "compact")
+
+    @staticmethod
+    def token_budget() -> int:
+        return int(os.getenv("BAZI_PROMPT_TOKEN_BUDGET", "400"))
+
+    @staticmethod
+    def prompt_signature() -> str:
+        """影响提示词文本的配置，参与 AI 结果缓存键"""
+        return f"{PromptManager.prompt_format()}:{PromptManager.token_budget()}"
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
         """
+        估算 token 数（DeepSeek 官方经验值：1 个中文字符约 0.6 token，1 个英文字符约 0.3 token）
+        """
+        cjk = sum(1 for char in text if ord(char) > 0x2E7F)
+        return math.ceil(cjk * 0.6 + (len(text) - cjk) * 0.3)
+
+    @staticmethod
+    def format_bazi_data_for_prompt(bazi_data: Dict[str, Any], token_budget: Optional[int] = None) -> str:
+        """
+        将八字数据格式化为供 AI 读取的文本（按 BAZI_PROMPT_FORMAT 选择紧凑或 markdown 格式）。
+        """
+        if PromptManager.prompt_format() == "markdown":
+            return PromptManager.format_bazi_data_markdown(bazi_data)
+        return PromptManager.encode_chart_compact(bazi_data, token_budget)
 
     @staticmethod
-    def format_bazi_data_for_prompt(bazi_data: Dict[str, Any]) -> str:
+    def _chart_sections(bazi_data: Dict[str, Any]) -> Tuple[List[str], List[Tuple[str, List[str]]]]:
         """
-        将八字数据格式化为清晰的字符串，供 AI 读取。
+        提取紧凑编码的各部分：(必留行, [(标签, 条目列表)...])，兼容排盘响应与 format_bazi_data_markdown 两种数据结构
+        """
+        chars = bazi_data.get("bazi_characters") or {}
+        pillars = bazi_data.get("bazi") or {}
+        nayin = bazi_data.get("nayin") or {}
+        na_yin = bazi_data.get("na_yin") or {}
+        five = bazi_data.get("five_elements") or {}
+
+        header = []
+        if bazi_data.get("gender"):
+            header.append(f"性别{bazi_data['gender']}")
+        if bazi_data.get("solar_date"):
+            header.append(f"生{bazi_data['solar_date']}")
+        if bazi_data.get("zodiac_sign"):
+            header.append(f"属{bazi_data['zodiac_sign']}")
+
+        pillar_items = []
+        for key in PILLAR_KEYS:
+            if chars:
+                gan_zhi = f"{chars.get(key + '_stem', '')}{chars.get(key + '_branch', '')}"
+            else:
+                pillar = pillars.get(key) or {}
+                gan_zhi = f"{pillar.get('gan', '')}{pillar.get('zhi', '')}"
+            sound = nayin.get(key) or (na_yin.get(f"{key}_na_yin") or [""])[0]
+            pillar_items.append(f"{gan_zhi}({sound})" if sound else gan_zhi)
+
+        day_element = five.get("day_master_element") or bazi_data.get("day_master_element", "")
+        strength = five.get("strength") or bazi_data.get("day_master_strength", "")
+        scores = five.get("percentage") or bazi_data.get("five_elements_score") or {}
+        ordered = [e for e in FIVE_ELEMENTS_ORDER if e in scores] + [e for e in scores if e not in FIVE_ELEMENTS_ORDER]
+
+        core = [
+            " ".join(header),
+            "四柱 " + " ".join(pillar_items),
+            f"日主 {chars.get('day_stem') or (pillars.get('day') or {}).get('gan', '')}{day_element} {strength}".rstrip(),
+            "五行% " + " ".join(f"{e}{_percent(scores[e])}" for e in ordered),
+        ]
+        core = [line for line in core if line.strip()]
+
+        optional: List[Tuple[str, List[str]]] = []
+        favorable = five.get("favorable_elements") or bazi_data.get("favorable_elements")
+        if favorable and favorable != "暂无":
+            optional.append(("喜用", [favorable] if isinstance(favorable, str) else [str(e) for e in favorable]))
+
+        fortune = bazi_data.get("current_year_fortune") or {}
+        if fortune.get("year"):
+            optional.append(("流年", [str(part) for part in (
+                f"{fortune['year']}{fortune.get('gan_zhi', '')}", fortune.get("ten_god"), fortune.get("chang_sheng_state")
+            ) if part]))
+
+        cycles = []
+        for cycle in bazi_data.get("major_cycles") or []:
+            gan_zhi = cycle.get("gan_zhi") or cycle.get("ganzhi", "")
+            ages = f"{cycle.get('start_age', '')}-{cycle.get('end_age', '')}" if "start_age" in cycle else ""
+            cycles.append(f"{gan_zhi}{ages}")
+        if cycles:
+            optional.append(("大运", cycles))
+
+        shen_sha = bazi_data.get("shen_sha_details") or {}
+        shen_sha = shen_sha.values() if isinstance(shen_sha, dict) else shen_sha
+        stars = [f"{item['name']}({item['position']})" for item in shen_sha
+                 if isinstance(item, dict) and item.get("active", True) and item.get("position") and item.get("name")]
+        if stars:
+            optional.append(("神煞", stars))
+
+        interactions = bazi_data.get("interactions") or {}
+        links = []
+        if isinstance(interactions, dict):
+            for items in interactions.values():
+                for item in items if isinstance(items, list) else []:
+                    if isinstance(item, dict) and item.get("combination"):
+                        links.append(f"{item.get('type', '')}:{item.get('combination', '')}")
+        if links:
+            optional.append(("互动", links))
+        return core, optional
+
+    @staticmethod
+    def encode_chart_compact(bazi_data: Dict[str, Any], token_budget: Optional[int] = None) -> str:
+        """
+        紧凑、确定的命盘编码：必留行之外，各部分按优先级逐条加入，预计 token 数超出预算的条目不再加入
+        """
+        budget = PromptManager.token_budget() if token_budget is None else token_budget
+        core, optional = PromptManager._chart_sections(bazi_data)
+        lines = list(core)
+        used = PromptManager.estimate_tokens("\n".join(lines))
+        for label, items in optional:
+            kept = []
+            for item in items:
+                cost = PromptManager.estimate_tokens((" " if kept else f"\n{label} ") + item)
+                if used + cost > budget:
+                    break
+                kept.append(item)
+                used += cost
+            if kept:
+                lines.append(f"{label} " + " ".join(kept))
+        return "\n".join(lines)
+
+    @staticmethod
+    def format_bazi_data_markdown(bazi_data: Dict[str, Any]) -> str:
+        """
+        将八字数据格式化为 markdown 文本（原有格式，BAZI_PROMPT_FORMAT=markdown 时使用）。
         """
         # 为了清晰和简洁，我们只选择最核心的数据传给 AI
         # 核心数据包括：四柱、日主、五行得分、大运、神煞、干支互动
@@ -45,12 +221,14 @@ class PromptManager:
         nayin_info = bazi_data.get('nayin', {})
         five_elements_info = bazi_data.get('five_elements', {})
         shen_sha_details = bazi_data.get('shen_sha_details', {})
+        if isinstance(shen_sha_details, dict):
+            shen_sha_details = list(shen_sha_details.values())
         interactions = bazi_data.get('interactions', {})
 
         # 构建神煞字符串
         shen_sha_str = ', '.join([
             f'{details["name"]}({details["position"]})'
-            for details in shen_sha_details.values()
+            for details in shen_sha_details
             if details.get('active', True) and details.get("position")
         ]) or "无"
 
@@ -88,153 +266,139 @@ class PromptManager:
         """
         生成对整个命盘的全面分析 Prompt。
         """
-        persona = PromptManager.get_master_persona_prompt()
         formatted_data = PromptManager.format_bazi_data_for_prompt(bazi_data)
 
-        return f"""
-        {persona}
-
-        ### 用户命盘数据
-        {formatted_data}
-
-        ### 分析任务
-        请对以上命盘进行一次全面而深入的综合分析。请严格按照以下 JSON 格式返回你的分析结果，确保每个字段都有内容，且分析深刻、具体、有针对性。
-
-        ```json
-        {{
-            "personality_analysis": {{
-                "summary": "对命主核心性格的总体概括。",
-                "strengths": "基于命盘分析命主的性格优点，例如创造力、领导力、同情心等。",
-                "weaknesses": "基于命盘分析命主需要注意或提升的性格特点。"
-            }},
-            "life_pattern": {{
-                "summary": "对命主一生的整体格局、层次和主要人生趋势的判断。",
-                "favorable_elements_guidance": "详细说明喜用神在生活中的应用，例如颜色、方位、行业、数字等。"
-            }},
-            "career_analysis": {{
-                "summary": "对命主事业发展的总体趋势、潜力、适合领域的分析。",
-                "suitable_industries": ["行业一", "行业二", "行业三"],
-                "development_suggestions": "提供具体的事业发展建议，例如如何利用优势、规避风险。"
-            }},
-            "wealth_analysis": {{
-                "summary": "对命主财运的总体评价，包括财富的来源、规模和稳定性。",
-                "wealth_sources": "分析命主的主要财富来源（正财、偏财、食伤生财等）。",
-                "financial_suggestions": "提供理财和投资建议。"
-            }},
-            "relationship_analysis": {{
-                "summary": "对命主感情婚姻状况的总体分析。",
-                "relationship_pattern": "分析命主的感情模式、对待感情的态度以及与伴侣的互动方式。",
-                "partner_suggestions": "对选择伴侣或与伴侣相处提供建议。"
-            }},
-            "health_analysis": {{
-                "summary": "根据五行平衡情况，分析命主需要注意的健康问题。",
-                "potential_issues": "列出最需要关注的身体部位或系统（例如：心血管、消化系统、呼吸系统等）。",
-                "health_suggestions": "提供具体的养生和保健建议。"
-            }}
-        }}
-        """
+        return f"""### 命盘
+{formatted_data}
+
+### 任务
+对以上命盘做全面深入的综合分析，每个字段都要有针对性的内容，按以下 JSON 结构返回（值为各字段的写作要求）：
+{{"personality_analysis":{{"summary":"核心性格概括","strengths":"性格优点","weaknesses":"需注意或提升的性格特点"}},
+"life_pattern":{{"summary":"整体格局、层次与人生趋势","favorable_elements_guidance":"喜用神在颜色、方位、行业、数字等方面的应用"}},
+"career_analysis":{{"summary":"事业趋势、潜力与适合领域","suitable_industries":["行业一","行业二","行业三"],"development_suggestions":"事业发展建议"}},
+"wealth_analysis":{{"summary":"财运总评","wealth_sources":"主要财富来源（正财、偏财、食伤生财等）","financial_suggestions":"理财投资建议"}},
+"relationship_analysis":{{"summary":"感情婚姻总评","relationship_pattern":"感情模式与相处方式","partner_suggestions":"择偶与相处建议"}},
+"health_analysis":{{"summary":"五行平衡对应的健康问题","potential_issues":"最需关注的身体部位或系统","health_suggestions":"养生保健建议"}}}}"""
 
     @staticmethod
     def generate_dayun_analysis_prompt(bazi_data: Dict[str, Any], dayun_info: Dict[str, Any]) -> str:
         """
         生成对特定大运周期的深入分析 Prompt。
         """
-        persona = PromptManager.get_master_persona_prompt()
         formatted_data = PromptManager.format_bazi_data_for_prompt(bazi_data)
-        
+
         dayun_ganzhi = dayun_info.get('gan_zhi', '未知')
         dayun_range = f"{dayun_info.get('start_age', '')}-{dayun_info.get('end_age', '')}岁"
 
-        return f"""
-        {persona}
-
-        ### 用户命盘数据
-        {formatted_data}
-
-        ### 分析任务: 大运深度解析
-        当前需要分析的大运是 **{dayun_ganzhi}** ({dayun_range})。
-        请深入分析此大运干支与原命盘的相互作用，并严格按照以下 JSON 格式返回你的分析结果。
-
-        ```json
-        {{
-            "dayun_overview": {{
-                "summary": "对此十年大运的总体基调、主题和核心影响进行概括。",
-                "score": "为此大运打分（1-100），并简要说明理由。",
-                "key_themes": ["主题一", "主题二", "主题三"]
-            }},
-            "career_wealth": {{
-                "summary": "分析此大运期间事业和财运的机遇与挑战。",
-                "opportunities": "详细描述可能出现的事业和财富机遇。",
-                "challenges_and_advice": "指出潜在的风险和挑战，并提供应对建议。"
-            }},
-            "relationship_health": {{
-                "summary": "分析此大运期间感情婚姻和健康状况的总体趋势。",
-                "relationship_advice": "提供处理感情、家庭关系的具体建议。",
-                "health_advice": "根据大运五行变化，提供针对性的健康和养生建议。"
-            }},
-            "strategic_suggestions": {{
-                "summary": "提供在此十年大运期间的总体战略规划和人生建议。",
-                "yearly_focus": "简要说明这十年中，哪些年份可能更关键或需要特别注意。"
-            }}
-        }}
-        ```
+        return f"""### 命盘
+{formatted_data}
+
+### 任务：大运深度解析
+大运 {dayun_ganzhi}（{dayun_range}）。分析此大运干支与原命盘的相互作用，按以下 JSON 结构返回：
+{DAYUN_SCHEMA}"""
+
+    @staticmethod
+    def generate_dayun_batch_prompt(bazi_data: Dict[str, Any], dayun_list: List[Dict[str, Any]]) -> str:
+        """
+        生成多个大运的批量分析 Prompt：命盘只出现一次，返回 {"items": [...]}，各项结构同单个大运并带 gan_zhi。
+        """
+        formatted_data = PromptManager.format_bazi_data_for_prompt(bazi_data)
+        targets = "\n".join(
+            f"{i}. {info.get('gan_zhi', '未知')}（{info.get('start_age', '')}-{info.get('end_age', '')}岁）"
+            for i, info in enumerate(dayun_list, 1)
+        )
+
+        return f"""### 命盘
+{formatted_data}
+
+### 任务：大运批量深度解析
+依次分析以下 {len(dayun_list)} 步大运干支与原命盘的相互作用：
+{targets}
+返回 {{"items":[...]}}，items 与上列大运一一对应、顺序相同，每项是带 "gan_zhi" 字段的如下 JSON 结构：
+{DAYUN_SCHEMA}"""
+
+    @staticmethod
+    def find_dayun_for_year(bazi_data: Dict[str, Any], year: int) -> str:
+        """
+        找到流年所属的大运：大运有起止年份时按年份，否则按虚岁（流年减出生年）与起止岁数匹配
         """
+        birth_year = None
+        solar_date = str(bazi_data.get('solar_date') or '')
+        fortune = bazi_data.get('current_year_fortune') or {}
+        if solar_date[:4].isdigit():
+            birth_year = int(solar_date[:4])
+        elif fortune.get('year') and fortune.get('age') is not None:
+            birth_year = int(fortune['year']) - int(fortune['age'])
+
+        for cycle in bazi_data.get('major_cycles') or []:
+            if 'start_year' in cycle:
+                matched = cycle.get('start_year', 0) <= year <= cycle.get('end_year', 9999)
+            elif birth_year is not None and 'start_age' in cycle:
+                matched = cycle['start_age'] <= year - birth_year <= cycle.get('end_age', 999)
+            else:
+                matched = False
+            if matched:
+                gan_zhi = cycle.get('gan_zhi') or cycle.get('ganzhi', '')
+                return f"{gan_zhi} ({cycle.get('start_age')}-{cycle.get('end_age')}岁)"
+        return "无"
 
     @staticmethod
     def generate_liunian_analysis_prompt(bazi_data: Dict[str, Any], year: int) -> str:
         """
         生成对特定流年的深入分析 Prompt。
         """
-        persona = PromptManager.get_master_persona_prompt()
         formatted_data = PromptManager.format_bazi_data_for_prompt(bazi_data)
 
-        # 找到该流年所属的大运
-        current_dayun_info = "无"
-        if 'major_cycles' in bazi_data:
-            for cycle in bazi_data['major_cycles']:
-                if cycle.get('start_year', 0) <= year <= cycle.get('end_year', 9999):
-                    current_dayun_info = f"{cycle.get('gan_zhi', '')} ({cycle.get('start_age')}-{cycle.get('end_age')}岁)"
-                    break
+        current_dayun_info = PromptManager.find_dayun_for_year(bazi_data, year)
+
+        return f"""### 命盘
+{formatted_data}
+
+### 任务：{year}年流年运势深度解析
+所属大运：{current_dayun_info}。将流年与大运、命盘结合做三重分析，按以下 JSON 结构返回，monthly_fortune 为 1-12 月各一项：
+{_liunian_schema(f"{year}年")}"""
+
+    @staticmethod
+    def generate_liunian_batch_prompt(bazi_data: Dict[str, Any], years: List[int]) -> str:
+        """
+        生成多个流年的批量分析 Prompt：命盘只出现一次，返回 {"items": [...]}，各项结构同单个流年并带 year。
+        """
+        formatted_data = PromptManager.format_bazi_data_for_prompt(bazi_data)
+        targets = "\n".join(
+            f"{i}. {year}年，所属大运：{PromptManager.find_dayun_for_year(bazi_data, year)}"
+            for i, year in enumerate(years, 1)
+        )
+
+        return f"""### 命盘
+{formatted_data}
 
-        return f"""
-        {persona}
-
-        ### 用户命盘数据
-        {formatted_data}
-
-        ### 分析任务: {year}年流年运势深度解析
-        - **分析年份**: {year}
-        - **所属大运**: {current_dayun_info}
-
-        请将流年与大运、命盘结合，进行三重分析，并严格按照以下 JSON 格式返回你的分析结果。
-
-        ```json
-        {{
-            "liunian_overview": {{
-                "summary": "对 {year} 年整体运势的概括，说明是“吉”还是“凶”，以及主要机遇和挑战领域。",
-                "score": "为此流年打分（1-100），并简要说明理由。",
-                "key_themes": ["主题一", "主题二", "主题三"]
-            }},
-            "monthly_fortune": [
-                {{ "month": 1, "fortune": "正月运势简评...", "advice": "建议..." }},
-                {{ "month": 2, "fortune": "二月运势简评...", "advice": "建议..." }},
-                {{ "month": 3, "fortune": "三月运势简评...", "advice": "建议..." }},
-                {{ "month": 4, "fortune": "四月运势简评...", "advice": "建议..." }},
-                {{ "month": 5, "fortune": "五月运势简评...", "advice": "建议..." }},
-                {{ "month": 6, "fortune": "六月运势简评...", "advice": "建议..." }},
-                {{ "month": 7, "fortune": "七月运势简评...", "advice": "建议..." }},
-                {{ "month": 8, "fortune": "八月运势简评...", "advice": "建议..." }},
-                {{ "month": 9, "fortune": "九月运势简评...", "advice": "建议..." }},
-                {{ "month": 10, "fortune": "十月运势简评...", "advice": "建议..." }},
-                {{ "month": 11, "fortune": "十一月运势简评...", "advice": "建议..." }},
-                {{ "month": 12, "fortune": "十二月运势简评...", "advice": "建议..." }}
-            ],
-            "specific_advice": {{
-                "career": "关于 {year} 年事业发展的具体建议。",
-                "wealth": "关于 {year} 年财富管理和投资的具体建议。",
-                "relationship": "关于 {year} 年感情生活的具体建议。",
-                "health": "关于 {year} 年健康方面的具体建议和注意事项。"
-            }}
-        }}
-        ```
+### 任务：流年批量深度解析
+依次将以下 {len(years)} 个流年与大运、命盘结合做三重分析：
+{targets}
+返回 {{"items":[...]}}，items 与上列流年一一对应、顺序相同，每项是带 "year" 字段（整数）的如下 JSON 结构，monthly_fortune 为 1-12 月各一项：
+{_liunian_schema("该年")}"""
+
+    @staticmethod
+    def generate_single_dayun_prompt(bazi_data: Dict[str, Any], cycle_info: Dict[str, Any]) -> str:
         """
+        生成单个大运十年走向分析 Prompt（cycle_info 含 gan_zhi、start_year、end_year）。
+        """
+        formatted_data = PromptManager.format_bazi_data_for_prompt(bazi_data)
+        gan_zhi = cycle_info.get('gan_zhi', '')
+        start_year = cycle_info.get('start_year', '')
+        end_year = cycle_info.get('end_year', '')
+        try:
+            start = int(start_year)
+            phases = f"前期{start}-{start + 3}年、中期{start + 4}-{start + 6}年、后期{start + 7}-{end_year}年"
+        except (TypeError, ValueError):
+            phases = "前期、中期、后期"
+
+        return f"""### 命盘
+{formatted_data}
+
+### 任务：大运 {gan_zhi}（{start_year}-{end_year}年）深度分析
+分析大运五行属性与吉凶性质、与原命盘的生克互动，十年走向分{phases}，总字数 800-1200，按以下 JSON 结构返回：
+{{"dayun_features":"五行属性、与原命盘的互动及整体吉凶",
+"decade_trend":{{"early":"前期运势特点","middle":"中期发展状况","late":"后期收获阶段"}},
+"domain_impact":{{"career":"职业机遇、升迁与转换","wealth":"收入变化与投资理财","relationship":"情感、婚姻与人际","health":"身体变化与养生重点"}},
+"guidance":{{"strategy":"十年发展策略与重点方向","key_timing":"需特别注意的时间节点","remedies":"趋吉避凶与五行调节、环境配置建议"}}}}"""
@@ -0,0 +1,232 @@
+"""
+神煞批量计算模块
+将 N 个命盘编码为整数干支数组，基于编译后的神煞规则用 NumPy 查表一次性计算，
+返回 N×R 激活矩阵及 N×R×4 柱位掩码（R 为规则数，柱位顺序：年、月、日、时）
+"""
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from .core import Bazi
+from .constants import TIANGAN, STEM_ELEMENTS, STEM_COMBINATIONS_DETAILED
+from .lookup_tables import STEM_INDEX, BRANCH_INDEX, JIAZI_INDEX, XUNKONG_TABLE
+from .shensha_engine import CompiledRuleSet, get_compiled_rules, DEFAULT_RULE_FILE
+from .logger_config import setup_logger
+logger = setup_logger("shensha_batch")
+
+# 天干索引 × 地支索引 -> 六十甲子索引（阴阳不配为 -1）
+JIAZI_GRID = np.full((10, 12), -1, dtype=np.int16)
+for _ganzhi, _index in JIAZI_INDEX.items():
+    JIAZI_GRID[STEM_INDEX[_ganzhi[0]], BRANCH_INDEX[_ganzhi[1]]] = _index
+
+# 六十甲子 -> 旬空地支掩码
+XUNKONG_GRID = np.zeros((60, 12), dtype=bool)
+for _index, _branches in enumerate(XUNKONG_TABLE):
+    XUNKONG_GRID[_index, list(_branches)] = True
+
+# 天干五合
+STEM_COMBINATION_GRID = np.zeros((10, 10), dtype=bool)
+for (_a, _b) in STEM_COMBINATIONS_DETAILED:
+    if _a in STEM_INDEX and _b in STEM_INDEX:
+        STEM_COMBINATION_GRID[STEM_INDEX[_a], STEM_INDEX[_b]] = True
+        STEM_COMBINATION_GRID[STEM_INDEX[_b], STEM_INDEX[_a]] = True
+
+# 天德、月德基础（公历月份 -> 天干），与 ShenShaCalculator._calculate_tianhe_base / _calculate_yuehe_base 一致
+_TIANHE_BASE = {1: "丁", 2: "申", 3: "壬", 4: "辛", 5: "亥", 6: "甲", 7: "癸", 8: "寅", 9: "丙", 10: "乙", 11: "巳", 12: "庚"}
+_YUEHE_BASE = {1: "丙", 2: "甲", 3: "壬", 4: "庚", 5: "丙", 6: "甲", 7: "壬", 8: "庚", 9: "丙", 10: "甲", 11: "壬", 12: "庚"}
+
+
+def _month_stem_table(mapping: Dict[int, str]) -> np.ndarray:
+    table = np.full(13, -1, dtype=np.int8)
+    for month, stem in mapping.items():
+        table[month] = STEM_INDEX.get(stem, -1)
+    return table
+
+
+TIANHE_BASE_TABLE = _month_stem_table(_TIANHE_BASE)
+YUEHE_BASE_TABLE = _month_stem_table(_YUEHE_BASE)
+
+# 年干五行（童子煞用）
+STEM_ELEMENT_ARRAY = np.array([STEM_ELEMENTS[s] for s in TIANGAN])
+
+
+def encode_charts(charts: Sequence[Bazi]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """将 Bazi 列表编码为 (N×4 天干索引, N×4 地支索引, N 公历月份)"""
+    n = len(charts)
+    stems = np.empty((n, 4), dtype=np.int8)
+    branches = np.empty((n, 4), dtype=np.int8)
+    months = np.empty(n, dtype=np.int8)
+    for i, chart in enumerate(charts):
+        pillars = (chart.year, chart.month, chart.day, chart.hour)
+        try:
+            stems[i] = [STEM_INDEX[p.stem] for p in pillars]
+            branches[i] = [BRANCH_INDEX[p.branch] for p in pillars]
+        except KeyError as e:
+            raise ValueError(f"第 {i} 个命盘含无效干支: {e}")
+        months[i] = chart.birth_time.month if chart.birth_time else 7
+    return stems, branches, months
+
+
+class BatchShenShaResult:
+    """批量神煞计算结果"""
+
+    def __init__(self, keys: List[str], names: List[str], active: np.ndarray, positions: np.ndarray):
+        self.keys = keys
+        self.names = names
+        self.active = active          # N×R bool
+        self.positions = positions    # N×R×4 bool
+
+    def column(self, key: str) -> int:
+        return self.keys.index(key)
+
+    def active_keys(self, row: int) -> List[str]:
+        """第 row 个命盘激活的神煞 key 列表"""
+        return [self.keys[j] for j in np.flatnonzero(self.active[row])]
+
+
+class BatchShenShaEvaluator:
+    """由编译规则集构建 NumPy 查找表并批量求值"""
+
+    def __init__(self, rule_set: CompiledRuleSet):
+        self.rule_set = rule_set
+        self.keys = [c.key for c in rule_set.compiled]
+        self.names = [c.name for c in rule_set.compiled]
+        self._plans = [self._build_plan(c) for c in rule_set.compiled]
+
+    @staticmethod
+    def _build_plan(compiled) -> tuple:
+        """将单条编译规则转换为 (类型, 参数...) 的批量计算计划"""
+        method = compiled.calc_method
+        if method == "stem_zhi_lookup":
+            grid = np.zeros((10, 12), dtype=bool)
+            for stem, targets in enumerate(compiled.table):
+                grid[stem, list(targets)] = True
+            return ("stem_lookup", compiled.base, grid)
+        if method == "base_zhi_lookup":
+            grid = np.zeros((12, 12), dtype=bool)
+            for branch, target in enumerate(compiled.table):
+                if target >= 0:
+                    grid[branch, target] = True
+            return ("branch_lookup", compiled.base, grid)
+        if method in ("day_pillar_specific", "specific_days"):
+            grid = np.zeros(61, dtype=bool)  # 末位对应无效日柱(-1)
+            grid[list(compiled.table)] = True
+            return ("day_pillar", grid)
+        if method == "xunkong":
+            return ("xunkong",)
+        if method == "month_based":
+            grid = np.zeros((13, 10), dtype=bool)
+            for month, targets in enumerate(compiled.table):
+                if targets:
+                    grid[month, list(targets)] = True
+            return ("month_stem", grid)
+        if method == "stem_combination":
+            base_method = compiled.rule.get("base_method", "天德")
+            if base_method == "天德":
+                return ("stem_combination", TIANHE_BASE_TABLE)
+            if base_method == "月德":
+                return ("stem_combination", YUEHE_BASE_TABLE)
+            return ("none",)
+        if method == "complex_formula" and compiled.rule.get("formula_type", "") == "童子煞":
+            return ("tongzi",)
+        return ("none",)
+
+    def evaluate(self, stems: np.ndarray, branches: np.ndarray, months: np.ndarray) -> BatchShenShaResult:
+        stems = np.asarray(stems, dtype=np.intp)
+        branches = np.asarray(branches, dtype=np.intp)
+        months = np.asarray(months, dtype=np.intp)
+        n = stems.shape[0]
+        positions = np.zeros((n, len(self._plans), 4), dtype=bool)
+        day_jiazi = JIAZI_GRID[stems[:, 2], branches[:, 2]].astype(np.intp)
+
+        for j, plan in enumerate(self._plans):
+            kind = plan[0]
+            if kind == "stem_lookup":
+                for pillar in plan[1]:
+                    targets = plan[2][stems[:, pillar]]
+                    positions[:, j] |= np.take_along_axis(targets, branches, axis=1)
+            elif kind == "branch_lookup":
+                for pillar in plan[1]:
+                    targets = plan[2][branches[:, pillar]]
+                    positions[:, j] |= np.take_along_axis(targets, branches, axis=1)
+            elif kind == "day_pillar":
+                positions[:, j, 2] = plan[1][day_jiazi]
+            elif kind == "xunkong":
+                targets = XUNKONG_GRID[day_jiazi] & (day_jiazi >= 0)[:, None]
+                positions[:, j] = np.take_along_axis(targets, branches, axis=1)
+            elif kind == "month_stem":
+                targets = plan[1][months]
+                positions[:, j] = np.take_along_axis(targets, stems, axis=1)
+            elif kind == "stem_combination":
+                positions[:, j] = self._stem_combination(stems, months, plan[1])
+            elif kind == "tongzi":
+                positions[:, j] = self._tongzi(stems, branches, months)
+
+        active = positions.any(axis=2)
+        return BatchShenShaResult(self.keys, self.names, active, positions)
+
+    @staticmethod
+    def _stem_combination(stems: np.ndarray, months: np.ndarray, base_table: np.ndarray) -> np.ndarray:
+        """德合：取首个命中基础天德/月德的柱，再取其后首个与之相合的其他柱"""
+        n = stems.shape[0]
+        mask = np.zeros((n, 4), dtype=bool)
+        base_hit = stems == base_table[months][:, None]
+        has_base = base_hit.any(axis=1)
+        base_pos = base_hit.argmax(axis=1)
+        base_stem = stems[np.arange(n), base_pos]
+        combos = STEM_COMBINATION_GRID[base_stem[:, None], stems]
+        combos[np.arange(n), base_pos] = False
+        combos &= has_base[:, None]
+        has_combo = combos.any(axis=1)
+        rows = np.flatnonzero(has_combo)
+        mask[rows, combos[rows].argmax(axis=1)] = True
+        return mask
+
+    @staticmethod
+    def _tongzi(stems: np.ndarray, branches: np.ndarray, months: np.ndarray) -> np.ndarray:
+        """童子煞：与 ShenShaCalculator._calculate_tongzi_sha 相同判定，命中记日、时两柱"""
+        element = STEM_ELEMENT_ARRAY[stems[:, 0]]
+        day_hour = branches[:, 2:4]
+        spring_autumn = np.isin(months, [3, 4, 5, 9, 10, 11])
+        summer_winter = np.isin(months, [6, 7, 8, 12, 1, 2])
+        hit_jin_mu = np.isin(day_hour, [BRANCH_INDEX["寅"], BRANCH_INDEX["子"]]).any(axis=1)
+        hit_shui_huo = np.isin(day_hour, [BRANCH_INDEX["卯"], BRANCH_INDEX["未"], BRANCH_INDEX["辰"]]).any(axis=1)
+        hit_tu = np.isin(day_hour, [BRANCH_INDEX["辰"], BRANCH_INDEX["巳"]]).any(axis=1)
+        is_tongzi = (
+            (np.isin(element, ["金", "木"]) & spring_autumn & hit_jin_mu)
+            | (np.isin(element, ["水", "火"]) & summer_winter & hit_shui_huo)
+            | ((element == "土") & hit_tu)
+        )
+        mask = np.zeros((stems.shape[0], 4), dtype=bool)
+        mask[:, 2] = is_tongzi
+        mask[:, 3] = is_tongzi
+        return mask
+
+
+_evaluators: Dict[str, BatchShenShaEvaluator] = {}
+_evaluators_lock = threading.Lock()
+
+
+def get_batch_evaluator(rule_file: str = DEFAULT_RULE_FILE) -> BatchShenShaEvaluator:
+    """获取与当前编译规则集对应的批量求值器（规则热重载后自动重建）"""
+    rule_set = get_compiled_rules(rule_file)
+    evaluator = _evaluators.get(rule_set.path)
+    if evaluator is None or evaluator.rule_set is not rule_set:
+        with _evaluators_lock:
+            evaluator = _evaluators.get(rule_set.path)
+            if evaluator is None or evaluator.rule_set is not rule_set:
+                evaluator = BatchShenShaEvaluator(rule_set)
+                _evaluators[rule_set.path] = evaluator
+    return evaluator
+
+
+def calculate_shensha_batch(stems: np.ndarray, branches: np.ndarray, months: np.ndarray,
+                            rule_file: str = DEFAULT_RULE_FILE) -> BatchShenShaResult:
+    """批量计算神煞：stems/branches 为 N×4 干支索引，months 为 N 个公历月份（1-12）"""
+    return get_batch_evaluator(rule_file).evaluate(stems, branches, months)
+
+
+def calculate_shensha_batch_for_charts(charts: Sequence[Bazi], rule_file: str = DEFAULT_RULE_FILE) -> BatchShenShaResult:
+    """对 Bazi 列表批量计算神煞"""
+    return calculate_shensha_batch(*encode_charts(charts), rule_file=rule_file)
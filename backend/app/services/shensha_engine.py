@@ -0,0 +1,180 @@
+"""
+神煞规则编译引擎
+将 shensha_rules.json 在进程内编译一次为按干支索引的查找表，全局共享；
+规则文件 mtime 变化时自动重新编译并原子替换
+"""
+import json
+import os
+import threading
+from typing import Dict, Any, List, Optional, Tuple, Callable
+
+from .constants import TIANGAN, DIZHI
+from .lookup_tables import STEM_INDEX, BRANCH_INDEX, JIAZI_INDEX, XUNKONG_TABLE
+from .logger_config import setup_logger
+logger = setup_logger("shensha_engine")
+
+# 柱位顺序：年、月、日、时
+PILLAR_NAMES = ["年", "月", "日", "时"]
+STEM_TYPE_INDEX = {"year_stem": 0, "month_stem": 1, "day_stem": 2, "hour_stem": 3}
+BRANCH_TYPE_INDEX = {"year_branch": 0, "month_branch": 1, "day_branch": 2, "hour_branch": 3}
+
+DEFAULT_RULE_FILE = "shensha_rules.json"
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+
+
+class CompiledRule:
+    """单条已编译的神煞规则"""
+    __slots__ = ("key", "name", "calc_method", "rule", "base", "table")
+
+    def __init__(self, rule: dict, base: Tuple[int, ...] = (), table: Any = None):
+        self.key = rule["key"]
+        self.name = rule["name"]
+        self.calc_method = rule.get("calc_method", "unknown")
+        self.rule = rule
+        self.base = base
+        self.table = table
+
+
+def _compile_base(types: List[str], type_index: Dict[str, int], rule_key: str) -> Tuple[int, ...]:
+    """将 base_*_types 编译为柱位索引元组"""
+    base = []
+    for t in types:
+        if t in type_index:
+            base.append(type_index[t])
+        else:
+            logger.warning("神煞 %s 含未知的干支类型: %s", rule_key, t)
+    return tuple(base)
+
+
+def _compile_rule(rule: dict) -> CompiledRule:
+    """按 calc_method 将规则编译为索引查找表"""
+    method = rule.get("calc_method", "unknown")
+    key = rule.get("key", "")
+
+    if method == "stem_zhi_lookup":
+        # 天干索引 -> 目标地支索引元组（保持规则中的顺序）
+        base = _compile_base(rule.get("base_stem_types", ["day_stem"]), STEM_TYPE_INDEX, key)
+        rules_map = rule.get("rules", {})
+        table = []
+        for stem in TIANGAN:
+            targets = rules_map.get(stem, [])
+            if isinstance(targets, str):
+                targets = [targets]
+            table.append(tuple(BRANCH_INDEX[b] for b in targets if b in BRANCH_INDEX))
+        return CompiledRule(rule, base, tuple(table))
+
+    if method == "base_zhi_lookup":
+        # 地支索引 -> 目标地支索引，-1 表示无
+        base = _compile_base(rule.get("base_zhi_types", ["day_branch"]), BRANCH_TYPE_INDEX, key)
+        rules_map = rule.get("rules", {})
+        table = tuple(BRANCH_INDEX.get(rules_map.get(branch, ""), -1) for branch in DIZHI)
+        return CompiledRule(rule, base, table)
+
+    if method in ("day_pillar_specific", "specific_days"):
+        field = "specific_pillars" if method == "day_pillar_specific" else "specific_days"
+        table = frozenset(JIAZI_INDEX[p] for p in rule.get(field, []) if p in JIAZI_INDEX)
+        return CompiledRule(rule, (), table)
+
+    if method == "xunkong":
+        return CompiledRule(rule, (), XUNKONG_TABLE)
+
+    if method == "month_based":
+        # 公历月份(1-12) -> 目标天干索引集合；规则键与 str(month) 比对
+        month_rules = rule.get("month_rules", {})
+        table = [None] * 13
+        for month in range(1, 13):
+            targets = month_rules.get(str(month))
+            if targets is None:
+                continue
+            if isinstance(targets, str):
+                targets = [targets]
+            table[month] = frozenset(STEM_INDEX[s] for s in targets if s in STEM_INDEX)
+        return CompiledRule(rule, (), tuple(table))
+
+    # stem_combination / complex_formula 等依赖其他神煞或出生时间的规则，不建表
+    return CompiledRule(rule, (), None)
+
+
+class CompiledRuleSet:
+    """一次编译得到的完整规则集（只读，可跨线程共享）"""
+
+    def __init__(self, shensha_data: Dict[str, Any], path: str = "", mtime: float = 0.0):
+        self.shensha_data = shensha_data
+        self.rules: List[dict] = shensha_data.get("rules", [])
+        self.rules_dict = {rule["key"]: rule for rule in self.rules}
+        self.compiled: List[CompiledRule] = [_compile_rule(rule) for rule in self.rules]
+        self.path = path
+        self.mtime = mtime
+
+
+class ShenShaRuleRegistry:
+    """进程级神煞规则注册表，按规则文件缓存编译结果并在文件变更时热重载"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rule_sets: Dict[str, CompiledRuleSet] = {}
+        # 加载失败的文件 mtime：文件再次修改前沿用旧规则，不重复解析
+        self._failed_mtimes: Dict[str, float] = {}
+
+    @staticmethod
+    def resolve_path(rule_file: str) -> str:
+        return rule_file if os.path.isabs(rule_file) else os.path.join(BACKEND_DIR, rule_file)
+
+    def get(self, rule_file: str = DEFAULT_RULE_FILE, default_rules: Optional[Callable[[], List[dict]]] = None) -> CompiledRuleSet:
+        """获取已编译规则集；文件 mtime 未变化时直接返回缓存"""
+        full_path = self.resolve_path(rule_file)
+        try:
+            mtime = os.stat(full_path).st_mtime
+        except OSError:
+            mtime = None
+
+        cached = self._rule_sets.get(full_path)
+        if cached is not None and mtime in (cached.mtime, self._failed_mtimes.get(full_path)):
+            return cached
+
+        with self._lock:
+            cached = self._rule_sets.get(full_path)
+            if cached is not None and mtime in (cached.mtime, self._failed_mtimes.get(full_path)):
+                return cached
+            rule_set = self._load(full_path, mtime, default_rules)
+            if rule_set is None:
+                # 重载失败时保留旧规则，并记住失败的 mtime
+                if cached is not None:
+                    self._failed_mtimes[full_path] = mtime
+                    return cached
+                rule_set = CompiledRuleSet({"rules": default_rules() if default_rules else [], "shensha_interactions": {}}, full_path, mtime)
+            # 整体替换引用，读取方不会看到半编译状态
+            self._rule_sets[full_path] = rule_set
+            self._failed_mtimes.pop(full_path, None)
+            return rule_set
+
+    def _load(self, full_path: str, mtime: Optional[float], default_rules: Optional[Callable[[], List[dict]]]) -> Optional[CompiledRuleSet]:
+        if mtime is None:
+            logger.warning("神煞规则文件不存在: %s，使用默认规则", full_path)
+            return CompiledRuleSet({"rules": default_rules() if default_rules else [], "shensha_interactions": {}}, full_path, mtime)
+        try:
+            with open(full_path, "r", encoding="utf-8") as f:
+                shensha_data = json.load(f)
+            # 如果是数组格式，转换为字典格式
+            if isinstance(shensha_data, list):
+                shensha_data = {"rules": shensha_data, "shensha_interactions": {}}
+            rule_set = CompiledRuleSet(shensha_data, full_path, mtime)
+            logger.info("成功编译神煞规则文件: %s（%s 条）", full_path, len(rule_set.compiled))
+            return rule_set
+        except Exception as e:
+            logger.error("加载神煞规则文件失败: %s，使用默认规则", e)
+            return None
+
+    def clear(self):
+        """清空缓存（测试用）"""
+        with self._lock:
+            self._rule_sets.clear()
+            self._failed_mtimes.clear()
+
+
+shensha_rule_registry = ShenShaRuleRegistry()
+
+
+def get_compiled_rules(rule_file: str = DEFAULT_RULE_FILE, default_rules: Optional[Callable[[], List[dict]]] = None) -> CompiledRuleSet:
+    """获取进程共享的已编译神煞规则"""
+    return shensha_rule_registry.get(rule_file, default_rules)
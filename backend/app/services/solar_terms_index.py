@@ -0,0 +1,142 @@
+"""
+节气索引
+节气表每个进程只加载一次：节气时刻按升序存为整数秒（以 1970-01-01 为零点的墙钟时间，
+与节气表一致不做时区换算），并附节气编码；“T 之前/之后最近的节（或气）”用 bisect 在 O(log n) 内查得
+"""
+import json
+import os
+import threading
+from array import array
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from .logger_config import setup_logger
+logger = setup_logger("solar_terms_index")
+
+# 节气编码：小寒=0 … 冬至=23（与节气表中每年的顺序一致）
+SOLAR_TERM_NAMES = [
+    "小寒", "大寒", "立春", "雨水", "惊蛰", "春分", "清明", "谷雨", "立夏", "小满", "芒种", "夏至",
+    "小暑", "大暑", "立秋", "处暑", "白露", "秋分", "寒露", "霜降", "立冬", "小雪", "大雪", "冬至"
+]
+SOLAR_TERM_CODES = {name: code for code, name in enumerate(SOLAR_TERM_NAMES)}
+# 十二节（月令起点），编码为偶数
+JIE_CODES = frozenset(SOLAR_TERM_CODES[name] for name in (
+    "立春", "惊蛰", "清明", "立夏", "芒种", "小暑", "立秋", "白露", "寒露", "立冬", "大雪", "小寒"
+))
+
+DEFAULT_SOLAR_TERMS_FILE = "solar_terms_data.json"
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+
+_EPOCH = datetime(1970, 1, 1)
+_ONE_SECOND = timedelta(seconds=1)
+
+
+def to_epoch(dt: datetime) -> int:
+    """墙钟时间 -> 整数秒（忽略时区与微秒）"""
+    return (dt.replace(tzinfo=None, microsecond=0) - _EPOCH) // _ONE_SECOND
+
+
+def from_epoch(seconds: int) -> datetime:
+    return _EPOCH + timedelta(seconds=seconds)
+
+
+def parse_term_time(text: str) -> datetime:
+    """解析节气表时间，兼容无秒格式"""
+    if len(text) == 16:
+        return datetime.strptime(text, "%Y-%m-%d %H:%M")
+    return datetime.strptime(text, "%Y-%m-%d %H:%M:%S")
+
+
+class SolarTerm(NamedTuple):
+    name: str
+    code: int
+    time: datetime
+
+
+class SolarTermIndex:
+    """按时刻排序的节气索引，另建一份只含十二节的子索引"""
+
+    def __init__(self, instants: Iterable[int], codes: Iterable[int]):
+        pairs = sorted(zip(instants, codes), key=lambda pair: pair[0])
+        self.instants = array("q", (instant for instant, _ in pairs))
+        self.codes = bytes(code for _, code in pairs)
+        jie = [(instant, code) for instant, code in pairs if code in JIE_CODES]
+        self.jie_instants = array("q", (instant for instant, _ in jie))
+        self.jie_codes = bytes(code for _, code in jie)
+
+    def __len__(self) -> int:
+        return len(self.instants)
+
+    @classmethod
+    def from_terms(cls, terms: Iterable[Dict[str, str]]) -> "SolarTermIndex":
+        """由扁平节气列表 [{"name":..., "datetime":...}] 构建"""
+        instants, codes = [], []
+        for term in terms:
+            instants.append(to_epoch(parse_term_time(term["datetime"])))
+            codes.append(SOLAR_TERM_CODES[term["name"]])
+        return cls(instants, codes)
+
+    @classmethod
+    def from_json(cls, path: str) -> "SolarTermIndex":
+        """由节气表 {"年份": {"节气名": "YYYY-MM-DD HH:MM[:SS]"}} 构建"""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls.from_terms(
+            {"name": name, "datetime": text} for terms in data.values() for name, text in terms.items()
+        )
+
+    def _arrays(self, jie_only: bool) -> Tuple[array, bytes]:
+        return (self.jie_instants, self.jie_codes) if jie_only else (self.instants, self.codes)
+
+    def _term(self, codes: bytes, instants: array, i: int) -> SolarTerm:
+        return SolarTerm(SOLAR_TERM_NAMES[codes[i]], codes[i], from_epoch(instants[i]))
+
+    def previous(self, dt: datetime, jie_only: bool = True) -> Optional[SolarTerm]:
+        """dt 之前（含 dt 时刻）最近的节气"""
+        instants, codes = self._arrays(jie_only)
+        i = bisect_right(instants, to_epoch(dt)) - 1
+        return self._term(codes, instants, i) if i >= 0 else None
+
+    def next(self, dt: datetime, jie_only: bool = True) -> Optional[SolarTerm]:
+        """dt 之后（不含 dt 时刻）最近的节气"""
+        instants, codes = self._arrays(jie_only)
+        i = bisect_right(instants, to_epoch(dt))
+        return self._term(codes, instants, i) if i < len(instants) else None
+
+    def surrounding(self, dt: datetime, jie_only: bool = True) -> Tuple[Optional[SolarTerm], Optional[SolarTerm]]:
+        """dt 前后最近的节气 (上一个, 下一个)"""
+        return self.previous(dt, jie_only), self.next(dt, jie_only)
+
+
+def _load_from_store(json_path: str) -> Optional[SolarTermIndex]:
+    """节气表旁有不旧于它的二进制节气库（build_solar_terms_store.py 生成）时直接由节气库构建"""
+    from .solar_terms_store import get_solar_term_store
+    store_path = os.path.splitext(json_path)[0] + ".bin"
+    if not os.path.exists(store_path) or os.path.getmtime(store_path) < os.path.getmtime(json_path):
+        return None
+    store = get_solar_term_store(store_path)
+    return store.to_index() if store else None
+
+
+_indexes: Dict[str, SolarTermIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_solar_term_index(path: str = DEFAULT_SOLAR_TERMS_FILE) -> SolarTermIndex:
+    """获取节气索引（每个进程每个文件只加载一次，优先使用二进制节气库；加载失败时返回空索引）"""
+    if not os.path.isabs(path):
+        path = os.path.join(BACKEND_DIR, path)
+    index = _indexes.get(path)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(path)
+            if index is None:
+                try:
+                    index = _load_from_store(path) or SolarTermIndex.from_json(path)
+                    logger.info(f"节气索引加载完成: {len(index)}个节气，其中节 {len(index.jie_instants)}个")
+                except Exception as e:
+                    logger.warning(f"加载节气数据失败: {e}")
+                    index = SolarTermIndex((), ())
+                _indexes[path] = index
+    return index
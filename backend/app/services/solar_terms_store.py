@@ -0,0 +1,165 @@
+"""
+内存映射节气库
+将节气表 JSON 转为定长二进制文件：16 字节文件头 + 每年 24 个 int64（墙钟秒，以 1970-01-01 为零点），
+行为节气表中的年份键、列为节气编码（小寒=0 … 冬至=23），缺失值记为 MISSING。
+加载时只做 mmap，多个 worker 共享同一份页缓存；查询为 (年份-起始年)×24+节气编码 的下标运算
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from datetime import datetime
+from typing import Dict, Optional, Union
+
+from .solar_terms_index import (
+    SolarTermIndex, SOLAR_TERM_NAMES, SOLAR_TERM_CODES, BACKEND_DIR, to_epoch, from_epoch, parse_term_time
+)
+from .logger_config import setup_logger
+logger = setup_logger("solar_terms_store")
+
+MAGIC = b"STRM"
+VERSION = 1
+TERMS_PER_YEAR = 24
+START_YEAR = 1900
+END_YEAR = 2100
+MISSING = -(2 ** 63)
+# 文件头：魔数, 版本, 每年节气数, 起始年, 年数
+HEADER = struct.Struct("<4sHHii")
+
+DEFAULT_STORE_FILE = "solar_terms_data_precise.bin"
+
+
+def pack_store(table: Dict[str, Dict[str, str]], start_year: int = START_YEAR, end_year: int = END_YEAR) -> bytes:
+    """将节气表 {"年份": {"节气名": "YYYY-MM-DD HH:MM[:SS]"}} 打包为节气库字节串"""
+    year_count = end_year - start_year + 1
+    values = [MISSING] * (year_count * TERMS_PER_YEAR)
+    for year_key, terms in table.items():
+        row = int(year_key) - start_year
+        if not 0 <= row < year_count:
+            continue
+        for name, text in terms.items():
+            values[row * TERMS_PER_YEAR + SOLAR_TERM_CODES[name]] = to_epoch(parse_term_time(text))
+    header = HEADER.pack(MAGIC, VERSION, TERMS_PER_YEAR, start_year, year_count)
+    return header + struct.pack(f"<{len(values)}q", *values)
+
+
+def write_store(table: Dict[str, Dict[str, str]], out_path: str,
+                start_year: int = START_YEAR, end_year: int = END_YEAR) -> int:
+    """写入节气库文件，返回写入的有效节气数"""
+    data = pack_store(table, start_year, end_year)
+    tmp_path = f"{out_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, out_path)
+    return sum(
+        1 for year_key, terms in table.items() if start_year <= int(year_key) <= end_year for _ in terms
+    )
+
+
+def build_store(json_path: str, out_path: str, start_year: int = START_YEAR, end_year: int = END_YEAR) -> int:
+    """将节气表 JSON 写为二进制节气库，返回写入的有效节气数"""
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return write_store(data, out_path, start_year, end_year)
+
+
+def lunar_terms_table(start_year: int, end_year: int) -> Dict[str, Dict[str, str]]:
+    """用 lunar_python 生成精确到秒的节气表（与节气表 JSON 相同约定：年份键含当年立春至冬至及次年小寒、大寒）"""
+    from lunar_python import Solar
+    # lunar_python 节气表中次年小寒、大寒与当年冬至使用拼音键
+    keys = {name: name for name in SOLAR_TERM_NAMES}
+    keys.update({"小寒": "XIAO_HAN", "大寒": "DA_HAN", "冬至": "DONG_ZHI"})
+    table = {}
+    for year in range(start_year, end_year + 1):
+        jie_qi = Solar.fromYmd(year, 6, 1).getLunar().getJieQiTable()
+        table[str(year)] = {name: jie_qi[key].toYmdHms() for name, key in keys.items()}
+    return table
+
+
+class SolarTermStore:
+    """只读映射的节气库"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.path = path
+        self._attach(self._mmap)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, path: str = "<memory>") -> "SolarTermStore":
+        """由 pack_store 生成的字节串构建（不落盘）"""
+        store = cls.__new__(cls)
+        store._mmap = None
+        store.path = path
+        store._attach(data)
+        return store
+
+    def _attach(self, buffer):
+        if sys.byteorder != "little":
+            raise ValueError("节气库为小端序格式，当前平台不支持直接映射")
+        magic, version, terms, self.start_year, self.year_count = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != VERSION or terms != TERMS_PER_YEAR:
+            raise ValueError(f"节气库文件格式不匹配: {self.path}")
+        if len(buffer) != HEADER.size + self.year_count * TERMS_PER_YEAR * 8:
+            raise ValueError(f"节气库文件长度不匹配: {self.path}")
+        self._values = memoryview(buffer)[HEADER.size:].cast("q")
+
+    @property
+    def end_year(self) -> int:
+        return self.start_year + self.year_count - 1
+
+    def epoch(self, year: int, code: int) -> Optional[int]:
+        """某年某节气的墙钟秒，超出范围或缺失时返回 None"""
+        row = year - self.start_year
+        if not (0 <= row < self.year_count and 0 <= code < TERMS_PER_YEAR):
+            return None
+        value = self._values[row * TERMS_PER_YEAR + code]
+        return None if value == MISSING else value
+
+    def term_time(self, year: int, term: Union[str, int]) -> Optional[datetime]:
+        """某年某节气的时刻，term 可为节气名或编码"""
+        code = SOLAR_TERM_CODES.get(term, -1) if isinstance(term, str) else term
+        value = self.epoch(year, code)
+        return None if value is None else from_epoch(value)
+
+    def year_terms(self, year: int) -> Dict[str, datetime]:
+        """某年全部节气 {节气名: 时刻}"""
+        result = {}
+        for code, name in enumerate(SOLAR_TERM_NAMES):
+            value = self.epoch(year, code)
+            if value is not None:
+                result[name] = from_epoch(value)
+        return result
+
+    def to_index(self) -> SolarTermIndex:
+        """转换为可二分查找的节气索引"""
+        instants, codes = [], []
+        for i, value in enumerate(self._values):
+            if value != MISSING:
+                instants.append(value)
+                codes.append(i % TERMS_PER_YEAR)
+        return SolarTermIndex(instants, codes)
+
+
+_stores: Dict[str, Optional[SolarTermStore]] = {}
+_stores_lock = threading.Lock()
+
+
+def get_solar_term_store(path: str = DEFAULT_STORE_FILE) -> Optional[SolarTermStore]:
+    """获取节气库（每个进程每个文件只映射一次；文件不存在或格式错误时返回 None）"""
+    if not os.path.isabs(path):
+        path = os.path.join(BACKEND_DIR, path)
+    if path in _stores:
+        return _stores[path]
+    with _stores_lock:
+        if path not in _stores:
+            store = None
+            if os.path.exists(path):
+                try:
+                    store = SolarTermStore(path)
+                except Exception as e:
+                    logger.warning(f"加载节气库失败: {e}")
+            _stores[path] = store
+        return _stores[path]
@@ -0,0 +1,189 @@
+"""
+日主旺衰查表计分（子平法）
+计分对八个位置可加再乘月令系数，因此按 (日干, 位置, 干支) 预计算贡献表，
+总分 = 各位置查表累加 × 月令系数；结果按四柱索引做有界 LRU 缓存。
+详细计分步骤只在需要时由 explain_day_master_strength 生成。
+"""
+from functools import lru_cache
+from typing import Dict, Any, List, Tuple
+
+from .constants import (
+    TIANGAN, DIZHI, STEM_ELEMENTS, BRANCH_ELEMENTS, BRANCH_HIDDEN_STEMS,
+    FIVE_ELEMENTS_OVERCOMING, REVERSE_GENERATION
+)
+from .lookup_tables import STEM_INDEX, BRANCH_INDEX
+
+STEM_POSITIONS = ["年干", "月干", "日干", "时干"]
+BRANCH_POSITIONS = ["年支", "月支", "日支", "时支"]
+MONTH_BRANCH_WEIGHT = 2.0
+
+# 旺衰判定阈值（总分下限, 判定），自高到低
+STRENGTH_THRESHOLDS = ((6.0, "极强"), (3.5, "身强"), (1.5, "平和"), (0.5, "身弱"))
+
+
+def _relation(day_element: str, element: str) -> Tuple[float, str]:
+    """五行关系的计分系数与说明：同类 +1、生身 +0.9、克身 -0.7、泄身 -0.5，其余 0"""
+    if element == day_element:
+        return 1.0, "同类"
+    if REVERSE_GENERATION.get(element) == day_element:
+        return 0.9, "生身"
+    if FIVE_ELEMENTS_OVERCOMING.get(element) == day_element:
+        return -0.7, "克身"
+    if FIVE_ELEMENTS_OVERCOMING.get(day_element) == element:
+        return -0.5, "泄身"
+    return 0.0, ""
+
+
+def _qi(weight: float) -> Tuple[float, str]:
+    """藏干本气、中气、余气分数"""
+    if weight >= 0.6:
+        return 1.0, "本气"
+    if weight >= 0.3:
+        return 0.6, "中气"
+    return 0.3, "余气"
+
+
+def _signed(base: float, factor: float) -> float:
+    """与逐项计分相同的运算：同类直接取 base，其余为 ±base×|系数|"""
+    if factor == 1.0:
+        return base
+    if factor > 0:
+        return base * factor
+    return -(base * -factor)
+
+
+# STEM_SCORE[日干][天干] -> 天干贡献分
+STEM_SCORE: Tuple[Tuple[float, ...], ...] = tuple(
+    tuple(_signed(1.0, _relation(STEM_ELEMENTS[day], STEM_ELEMENTS[stem])[0]) for stem in TIANGAN)
+    for day in TIANGAN
+)
+
+# BRANCH_SCORE[日干][是否月支][地支] -> 各藏干贡献分（按藏干顺序，逐项累加以保持与原算法一致的浮点结果）
+BRANCH_SCORE: Tuple[Tuple[Tuple[Tuple[float, ...], ...], ...], ...] = tuple(
+    tuple(
+        tuple(
+            tuple(
+                _signed(_qi(weight)[0] * position_weight, _relation(STEM_ELEMENTS[day], STEM_ELEMENTS[hidden])[0])
+                for hidden, weight in BRANCH_HIDDEN_STEMS.get(branch, {}).items()
+            )
+            for branch in DIZHI
+        )
+        for position_weight in (1.0, MONTH_BRANCH_WEIGHT)
+    )
+    for day in TIANGAN
+)
+
+# ROOT_SCORE[日干][地支] -> 通根分（日干藏于地支时 权重×0.8）
+ROOT_SCORE: Tuple[Tuple[float, ...], ...] = tuple(
+    tuple(BRANCH_HIDDEN_STEMS.get(branch, {}).get(day, 0.0) * 0.8 for branch in DIZHI)
+    for day in TIANGAN
+)
+
+_MONTH_COEFFICIENTS = {"同类": (1.3, "助身"), "生身": (1.2, "生身"), "克身": (0.8, "克身"), "泄身": (0.9, "泄身")}
+
+# MONTH_COEFFICIENT[日干][月支] -> 月令系数
+MONTH_COEFFICIENT: Tuple[Tuple[float, ...], ...] = tuple(
+    tuple(
+        _MONTH_COEFFICIENTS.get(_relation(STEM_ELEMENTS[day], BRANCH_ELEMENTS[branch])[1], (1.0, ""))[0]
+        for branch in DIZHI
+    )
+    for day in TIANGAN
+)
+
+
+def classify_strength(total_score: float) -> str:
+    for threshold, strength in STRENGTH_THRESHOLDS:
+        if total_score >= threshold:
+            return strength
+    return "极弱"
+
+
+@lru_cache(maxsize=4096)
+def score_pillars(stems: Tuple[int, int, int, int], branches: Tuple[int, int, int, int]) -> Tuple[float, str]:
+    """按四柱干支索引计分，返回 (总分, 旺衰判定)"""
+    day = stems[2]
+    total_score = 0.0
+    stem_scores = STEM_SCORE[day]
+    for stem in stems:
+        total_score += stem_scores[stem]
+    branch_scores = BRANCH_SCORE[day]
+    for i, branch in enumerate(branches):
+        for score in branch_scores[i == 1][branch]:
+            total_score += score
+    root_scores = ROOT_SCORE[day]
+    tonggen_score = 0.0
+    for branch in branches:
+        tonggen_score += root_scores[branch]
+    total_score += tonggen_score
+    total_score *= MONTH_COEFFICIENT[day][branches[1]]
+    return total_score, classify_strength(total_score)
+
+
+def encode_pillars(bazi) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+    """Bazi -> (天干索引, 地支索引)，含无效干支时抛出 KeyError"""
+    pillars = (bazi.year, bazi.month, bazi.day, bazi.hour)
+    return tuple(STEM_INDEX[p.stem] for p in pillars), tuple(BRANCH_INDEX[p.branch] for p in pillars)
+
+
+def explain_day_master_strength(bazi) -> Dict[str, Any]:
+    """生成日主旺衰的逐步计分说明（仅在请求详细结果时调用）"""
+    stems, branches = encode_pillars(bazi)
+    total_score, strength = score_pillars(stems, branches)
+    day_stem = TIANGAN[stems[2]]
+    day_element = STEM_ELEMENTS[day_stem]
+    detail_scores: List[str] = []
+    steps: List[str] = []
+
+    def add(detail: str):
+        detail_scores.append(detail)
+        steps.append(f"  {detail}")
+
+    def describe(score: float, relation: str, prefix: str):
+        sign = "+" if score >= 0 else "-"
+        add(f"{prefix}：{sign}{abs(score)}分({relation})")
+
+    steps.append("第一步：天干基础分计算")
+    for i, stem_idx in enumerate(stems):
+        stem = TIANGAN[stem_idx]
+        element = STEM_ELEMENTS[stem]
+        factor, relation = _relation(day_element, element)
+        if relation:
+            describe(_signed(1.0, factor), relation, f"{STEM_POSITIONS[i]}{stem}({element})")
+
+    steps.append("第二步：地支藏干分计算")
+    for i, branch_idx in enumerate(branches):
+        branch = DIZHI[branch_idx]
+        position_weight = MONTH_BRANCH_WEIGHT if i == 1 else 1.0
+        for hidden, weight in BRANCH_HIDDEN_STEMS.get(branch, {}).items():
+            element = STEM_ELEMENTS[hidden]
+            qi_score, qi_type = _qi(weight)
+            factor, relation = _relation(day_element, element)
+            if relation:
+                describe(_signed(qi_score * position_weight, factor), relation,
+                         f"{BRANCH_POSITIONS[i]}{branch}藏{hidden}({element},{qi_type})")
+
+    steps.append("第三步：通根加分计算")
+    for i, branch_idx in enumerate(branches):
+        branch = DIZHI[branch_idx]
+        weight = BRANCH_HIDDEN_STEMS.get(branch, {}).get(day_stem)
+        if weight is not None:
+            add(f"{BRANCH_POSITIONS[i]}{branch}通根{day_stem}：+{weight * 0.8}分(通根)")
+
+    steps.append("第四步：月令系数调整")
+    month_branch = DIZHI[branches[1]]
+    month_element = BRANCH_ELEMENTS[month_branch]
+    coefficient, label = _MONTH_COEFFICIENTS.get(_relation(day_element, month_element)[1], (1.0, ""))
+    if label:
+        add(f"月令{month_branch}({month_element}){label}：系数×{coefficient}")
+
+    steps.append("第五步：最终判定")
+    steps.append(f"  总分：{total_score:.2f}分，判定：{strength}")
+
+    return {
+        "day_stem": day_stem,
+        "day_element": day_element,
+        "total_score": total_score,
+        "strength": strength,
+        "detail_scores": detail_scores,
+        "calculation_steps": steps
+    }
@@ -5,6 +5,10 @@
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional, Union
 
+from .constants import TIANGAN
+from .logger_config import setup_logger
+logger = setup_logger("bazi_utils")
+
 
 # JIAZI 六十甲子表
 JIAZI = [
@@ -59,8 +63,8 @@ def analyze_dayun_phase(age: int) -> str:
         return "老年时期"
 
 
-def self_calculate_ten_god(gan: str, day_master: str) -> str:
-    """基于天干与日主关系计算十神"""
+def _self_ten_god_rule(gan: str, day_master: str) -> str:
+    """基于天干与日主关系计算十神（逐条规则版，仅用于构建查找表）"""
     # 天干五合对照表
     gan_five_element = {
         "甲": "木", "乙": "木",
@@ -129,6 +133,18 @@ def self_calculate_ten_god(gan: str, day_master: str) -> str:
     return "未知"
 
 
+# 十天干 × 十天干预计算，避免每次调用重建映射与逐条比较
+_SELF_TEN_GOD_TABLE = {
+    (gan, day_master): _self_ten_god_rule(gan, day_master)
+    for gan in TIANGAN for day_master in TIANGAN
+}
+
+
+def self_calculate_ten_god(gan: str, day_master: str) -> str:
+    """基于天干与日主关系计算十神（查表）"""
+    return _SELF_TEN_GOD_TABLE.get((gan, day_master), "未知")
+
+
 def get_zhi_hidden_gan(zhi: str) -> str:
     """获取地支藏干"""
     zhi_canggan = {
@@ -208,7 +224,7 @@ def calculate_precise_dayun_start(birth_date: datetime, lunar_6tail_obj, year_ga
         
         return age_str, start_time, start_days
     except Exception as e:
-        print(f"精确起运计算错误: {e}")
+        logger.error("精确起运计算错误: %s", e)
         return "3岁", birth_date + timedelta(days=3*365), 100
 
 
@@ -300,7 +316,7 @@ def calculate_precise_dayun(birth_datetime: datetime, gender: str, year_gan: str
         return start_date, start_days, luck_pillars
         
     except Exception as e:
-        print(f"精确大运计算错误: {e}")
+        logger.error("精确大运计算错误: %s", e)
         # 返回简化的默认值
         start_date = birth_datetime + timedelta(days=365*3)  # 3岁起运
         start_days = 365*3
@@ -0,0 +1,56 @@
+"""
+批量排盘吞吐基准：不同执行器下 stream_batch 的每秒排盘数
+
+用法（在 backend 目录下）：
+    python benchmarks/bench_batch_calculate.py [条数] [块大小]
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.schemas.bazi import BaziCalculateRequest
+from app.services.batch_calculator import stream_batch
+from app.services.chart_executor import ChartExecutor, set_chart_executor
+
+
+def items(n: int):
+    start = datetime(1950, 1, 1, 0, 30)
+    return [
+        BaziCalculateRequest(gender="男" if i % 2 else "女", birth_datetime=start + timedelta(minutes=i * 7919),
+                             birth_place="北京")
+        for i in range(n)
+    ]
+
+
+async def drain(batch, chunk_size: int) -> int:
+    size = 0
+    async for chunk in stream_batch(batch, chunk_size=chunk_size):
+        size += len(chunk)
+    return size
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    chunk_size = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    logging.disable(logging.WARNING)
+    batch = items(n)
+    print(f"条数: {n}，块大小: {chunk_size}，CPU 核数: {os.cpu_count()}")
+    for kind in ("inline", "thread", "process"):
+        previous = set_chart_executor(ChartExecutor(kind))
+        try:
+            asyncio.run(drain(batch[:chunk_size], chunk_size))
+            start = time.perf_counter()
+            size = asyncio.run(drain(batch, chunk_size))
+            elapsed = time.perf_counter() - start
+        finally:
+            set_chart_executor(previous).shutdown()
+        print(f"{kind:>7}: {n / elapsed:.0f} 条/秒，输出 {size / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
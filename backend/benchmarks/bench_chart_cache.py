@@ -0,0 +1,49 @@
+"""
+排盘缓存基准：模拟同一批出生日期、不同出生时刻的请求流，统计各级缓存命中率与单次耗时
+
+用法（在 backend 目录下）：
+    python benchmarks/bench_chart_cache.py [请求数] [出生日期数]
+"""
+import logging
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.schemas.bazi import BaziCalculateRequest
+from app.services.bazi_calculator import calculate_bazi_data_sync
+from app.services.chart_cache import chart_cache_stats, clear_chart_caches
+
+
+def requests(n: int, days: int):
+    rng = random.Random(42)
+    base = [datetime(1960, 1, 1) + timedelta(days=rng.randrange(365 * 50)) for _ in range(days)]
+    return [
+        BaziCalculateRequest(gender=rng.choice("男女"), birth_place="北京",
+                             birth_datetime=rng.choice(base) + timedelta(minutes=rng.randrange(24 * 60)))
+        for _ in range(n)
+    ]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    logging.disable(logging.WARNING)
+    items = requests(n, days)
+    for quick_mode in (True, False):
+        clear_chart_caches()
+        start = time.perf_counter()
+        for item in items:
+            calculate_bazi_data_sync(item, quick_mode)
+        elapsed = time.perf_counter() - start
+        print(f"{'快速' if quick_mode else '完整'}模式: {n} 个请求（{days} 个出生日期），单次 {elapsed / n * 1e3:.3f} ms")
+        for name, stats in chart_cache_stats().items():
+            total = stats["hits"] + stats["misses"]
+            print(f"  {name:>7}: 命中率 {stats['hits'] / total:.1%}（{stats['hits']}/{total}）")
+
+
+if __name__ == "__main__":
+    main()
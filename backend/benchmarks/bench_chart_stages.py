@@ -0,0 +1,67 @@
+"""
+排盘分段耗时基准：关闭缓存复用（每个请求前清空缓存），统计各分段的平均耗时与占比，
+并比较顺序执行与按层并发执行（BAZI_PIPELINE_WORKERS）的单次耗时
+
+用法（在 backend 目录下）：
+    python benchmarks/bench_chart_stages.py [请求数] [并发线程数]
+"""
+import logging
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.schemas.bazi import BaziCalculateRequest
+from app.services import bazi_calculator
+from app.services.chart_cache import clear_chart_caches
+
+
+def requests(n: int):
+    rng = random.Random(7)
+    return [
+        BaziCalculateRequest(gender=rng.choice("男女"), birth_place=rng.choice(["北京", "上海", "成都", "乌鲁木齐"]),
+                             birth_datetime=datetime(1950, 1, 1) + timedelta(minutes=rng.randrange(60 * 24 * 365 * 60)))
+        for _ in range(n)
+    ]
+
+
+def run(items, quick_mode: bool):
+    totals = defaultdict(float)
+    start = time.perf_counter()
+    for item in items:
+        clear_chart_caches()
+        for name, seconds in bazi_calculator.run_chart_pipeline(item, quick_mode).timings.items():
+            totals[name] += seconds
+    return time.perf_counter() - start, totals
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    logging.disable(logging.WARNING)
+    items = requests(n)
+    for quick_mode in (True, False):
+        elapsed, totals = run(items, quick_mode)
+        print(f"{'快速' if quick_mode else '完整'}模式: {n} 个请求，单次 {elapsed / n * 1e3:.3f} ms（顺序执行）")
+        staged = sum(totals.values())
+        for name, seconds in sorted(totals.items(), key=lambda item: -item[1]):
+            print(f"  {name:>34}: {seconds / n * 1e3:8.3f} ms  {seconds / staged:6.1%}")
+
+        pool = ThreadPoolExecutor(workers)
+        original = bazi_calculator.get_stage_pool
+        bazi_calculator.get_stage_pool = lambda: pool
+        try:
+            elapsed, _ = run(items, quick_mode)
+        finally:
+            bazi_calculator.get_stage_pool = original
+            pool.shutdown()
+        print(f"  按层并发（{workers} 线程）: 单次 {elapsed / n * 1e3:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+大模型客户端基准：对本地替身服务比较旧做法（每次调用新建 httpx.AsyncClient）与共享长连接池客户端的单次调用延迟
+
+替身服务的 connect_latency 模拟到远端 API 的 TCP/TLS 握手往返，latency 模拟模型生成耗时。
+
+用法（在 backend 目录下）：
+    python benchmarks/bench_llm_client.py [调用次数] [握手耗时秒] [并发数] 2>/dev/null
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.llm_stub_server import LLMStubServer
+from app.services.llm_client import LLMClient
+
+PAYLOAD = {"model": "stub", "messages": [{"role": "user", "content": "请分析今年运势"}]}
+
+
+async def per_call_client(url: str) -> float:
+    start = time.perf_counter()
+    async with httpx.AsyncClient(timeout=30) as client:
+        response = await client.post(url, json=PAYLOAD)
+        response.raise_for_status()
+        response.json()
+    return time.perf_counter() - start
+
+
+async def run(n: int, concurrency: int, url: str, call) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            return await call(url)
+
+    return await asyncio.gather(*(one() for _ in range(n)))
+
+
+async def bench(n: int, concurrency: int, stub: LLMStubServer):
+    url = stub.base_url + "/chat/completions"
+    rows = []
+
+    stub.reset_stats()
+    start = time.perf_counter()
+    latencies = await run(n, concurrency, url, per_call_client)
+    rows.append(("每次新建客户端", latencies, time.perf_counter() - start, stub.connections))
+
+    client = LLMClient(max_concurrency=concurrency)
+
+    async def pooled(url):
+        begin = time.perf_counter()
+        await client.post_json(url, PAYLOAD)
+        return time.perf_counter() - begin
+
+    stub.reset_stats()
+    start = time.perf_counter()
+    latencies = await run(n, concurrency, url, pooled)
+    rows.append(("共享连接池", latencies, time.perf_counter() - start, stub.connections))
+    await client.aclose()
+
+    for label, latencies, wall, connections in rows:
+        latencies = sorted(latencies)
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        print(f"{label:>8}: 中位 {statistics.median(latencies) * 1e3:7.2f} ms，p95 {p95 * 1e3:7.2f} ms，"
+              f"总耗时 {wall:6.2f} s，新建连接 {connections}")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    connect_latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.03
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    print(f"{n} 次调用，并发 {concurrency}，模拟握手 {connect_latency * 1e3:.0f} ms")
+    with LLMStubServer(connect_latency=connect_latency) as stub:
+        asyncio.run(bench(n, concurrency, stub))
+
+
+if __name__ == "__main__":
+    main()
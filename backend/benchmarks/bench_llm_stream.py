@@ -0,0 +1,54 @@
+"""
+流式 AI 分析基准：对本地替身服务比较非流式调用（等待完整 JSON）与流式调用（首个顶层字段闭合即可显示）的首屏内容耗时
+
+替身服务按 chunk_chars 个字符一块、块间间隔 token_latency 秒输出，模拟模型逐 token 生成。
+
+用法（在 backend 目录下）：
+    python benchmarks/bench_llm_stream.py [块间间隔秒] 2>/dev/null
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["DEEPSEEK_API_KEY"] = "stub-key"
+os.environ["BAZI_LLM_CACHE_SIZE"] = "0"
+
+from benchmarks.llm_stub_server import LLMStubServer
+from app.services.deepseek_service import DeepSeekService
+from app.services.llm_client import close_llm_client
+
+
+async def bench(stub: LLMStubServer, token_latency: float):
+    service = DeepSeekService()
+    service.base_url = stub.base_url
+    bazi_data = {"bazi": {"day": {"gan": "甲", "zhi": "子"}}}
+
+    # 非流式请求按生成全部内容所需的时间等待后一次返回
+    stub.latency = token_latency * len(stub.stream_chunks({"messages": []}))
+    start = time.perf_counter()
+    await service._call_api_for_structured_json("非流式")
+    blocking = time.perf_counter() - start
+    stub.latency = 0
+
+    start = time.perf_counter()
+    first = {}
+    async for event, _ in service.stream_comprehensive_analysis(bazi_data):
+        first.setdefault(event, time.perf_counter() - start)
+    streaming = time.perf_counter() - start
+    await close_llm_client()
+
+    print(f"非流式: 首屏内容 {blocking:.2f} s（须等待完整结果）")
+    print(f"  流式: 首个片段 {first['delta']:.2f} s，首个字段 {first['field']:.2f} s，全部完成 {streaming:.2f} s")
+
+
+def main():
+    token_latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.02
+    mock = DeepSeekService()._get_mock_comprehensive_analysis({})
+    with LLMStubServer(responder=lambda payload: mock, chunk_chars=4, token_latency=token_latency) as stub:
+        asyncio.run(bench(stub, token_latency))
+
+
+if __name__ == "__main__":
+    main()
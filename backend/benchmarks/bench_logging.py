@@ -0,0 +1,57 @@
+"""
+日志开销基准：比较 sync 模式（请求线程直接写控制台与文件）与 queue 模式（只入队，后台线程写出）
+下单条 INFO 日志在调用线程上的耗时，以及 DEBUG 关闭时惰性 % 格式化与 f-string 的差异
+
+用法（在 backend 目录下）：
+    python benchmarks/bench_logging.py [记录数] 2>/dev/null
+"""
+import logging
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import logger_config
+from app.services.logger_config import setup_logger, stop_log_listener
+
+
+def timed(func, n: int) -> float:
+    start = time.perf_counter()
+    for i in range(n):
+        func(i)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    pillars = ("庚午", "庚辰", "甲子", "己巳")
+    names = []
+    for mode in ("sync", "queue"):
+        os.environ["BAZI_LOG_MODE"] = mode
+        name = f"bench_logging_{mode}_{uuid.uuid4().hex[:6]}"
+        names.append(name)
+        logger = setup_logger(name)
+        cost = timed(lambda i: logger.info("第 %d 次排盘，八字: %s %s %s %s", i, *pillars), n)
+        start = time.perf_counter()
+        stop_log_listener()
+        drain = time.perf_counter() - start
+        extra = f"（退出时写出剩余记录 {drain * 1e3:.0f} ms）" if mode == "queue" else ""
+        print(f"{mode:>5} 模式: 调用线程 {cost:.2f} µs/条{extra}")
+
+    logger = logging.getLogger(names[-1])
+    logger.setLevel(logging.INFO)
+    detail = {"province": "北京", "city": "北京", "longitude": 116.4074, "latitude": 39.9042}
+    eager = timed(lambda i: logger.debug(f"获取地理位置信息成功：北京 -> {detail}"), n)
+    lazy = timed(lambda i: logger.debug("获取地理位置信息成功：%s -> %s", "北京", detail), n)
+    print(f"DEBUG 关闭时: f-string {eager:.2f} µs/条，惰性 % 格式化 {lazy:.2f} µs/条")
+
+    for name in names:
+        for handler in logging.getLogger(name).handlers:
+            handler.close()
+        os.remove(logger_config._log_file(name))
+
+
+if __name__ == "__main__":
+    main()
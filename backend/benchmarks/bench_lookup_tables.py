@@ -0,0 +1,48 @@
+"""
+十神 / 十二长生 / 纳音 / 旬空 等辅助函数的单盘耗时微基准
+
+用法（在 backend 目录下）：
+    python benchmarks/bench_lookup_tables.py [命盘数量]
+"""
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.calculators import FiveElementsCalculator, ShenShaCalculator
+from app.services.constants import JIAZI_TABLE
+from app.services.utils import self_calculate_ten_god
+
+
+def chart_pillars(n: int):
+    return [[JIAZI_TABLE[(i * k + k) % 60] for k in (7, 11, 13, 17)] for i in range(n)]
+
+
+def per_chart(pillars, calculator):
+    """一次排盘中这些辅助函数的典型调用组合"""
+    day_gan = pillars[2][0]
+    year_gan = pillars[0][0]
+    for gan, zhi in pillars:
+        self_calculate_ten_god(gan, day_gan)
+        FiveElementsCalculator.calculate_ten_god_relation(day_gan, gan)
+        FiveElementsCalculator.calculate_chang_sheng_twelve_palaces(day_gan, zhi)
+        FiveElementsCalculator.calculate_chang_sheng_twelve_palaces(year_gan, zhi)
+        calculator.get_nayin_name_and_element(gan, zhi)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    logging.disable(logging.WARNING)
+    charts = chart_pillars(n)
+    calculator = ShenShaCalculator()
+    start = time.perf_counter()
+    for pillars in charts:
+        per_chart(pillars, calculator)
+    elapsed = time.perf_counter() - start
+    print(f"命盘数: {n}，单盘耗时: {elapsed / n * 1e6:.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+四柱排盘微基准：节气库纯算术排盘 vs lunar_python
+
+用法（在 backend 目录下）：
+    python benchmarks/bench_pillar_engine.py [时刻数量]
+"""
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.pillar_engine import get_pillar_engine, lunar_four_pillars
+
+
+def instants(n: int):
+    start = datetime(1950, 1, 1)
+    return [start + timedelta(minutes=i * 7919) for i in range(n)]
+
+
+def timed(label: str, func, items):
+    start = time.perf_counter()
+    for item in items:
+        func(item)
+    elapsed = time.perf_counter() - start
+    print(f"{label}: 单次耗时 {elapsed / len(items) * 1e6:.2f} µs")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    logging.disable(logging.WARNING)
+    items = instants(n)
+    start = time.perf_counter()
+    engine = get_pillar_engine()
+    print(f"时刻数: {n}，引擎初始化 {(time.perf_counter() - start) * 1e3:.2f} ms")
+    timed("纯算术排盘", engine.calculate, items)
+    timed("lunar_python", lunar_four_pillars, items)
+
+
+if __name__ == "__main__":
+    main()
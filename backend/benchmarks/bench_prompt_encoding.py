@@ -0,0 +1,91 @@
+"""
+提示词编码基准：同一命盘分别用 markdown 格式与紧凑格式生成各分析提示词，比较估算 token 数，
+并对本地替身服务（处理耗时随提示词长度增长）测量端到端调用耗时
+
+用法（在 backend 目录下）：
+    python benchmarks/bench_prompt_encoding.py [每千字符处理耗时秒] [重复次数] 2>/dev/null
+"""
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["DEEPSEEK_API_KEY"] = "stub-key"
+os.environ["BAZI_LLM_CACHE_SIZE"] = "0"
+
+from benchmarks.llm_stub_server import LLMStubServer
+from app.schemas.bazi import BaziCalculateRequest
+from app.services.bazi_calculator import calculate_bazi_data_sync
+from app.services.deepseek_service import DeepSeekService
+from app.services.llm_client import close_llm_client
+from app.services.prompt_manager import PromptManager
+
+FORMATS = ("markdown", "compact")
+
+
+def chart_data():
+    """完整排盘结果转换为两种编码都能读取的结构（bazi / nayin / five_elements）"""
+    request = BaziCalculateRequest(gender="男", birth_place="北京", birth_datetime=datetime(1990, 10, 20, 10, 0))
+    result = calculate_bazi_data_sync(request, False).model_dump()
+    chars, na_yin = result["bazi_characters"], result["na_yin"]
+    return {
+        "gender": "男",
+        "solar_date": "1990-10-20 10:00",
+        "bazi": {key: {"gan": chars[f"{key}_stem"], "zhi": chars[f"{key}_branch"]}
+                 for key in ("year", "month", "day", "hour")},
+        "nayin": {key: na_yin[f"{key}_na_yin"][0] for key in ("year", "month", "day", "hour")},
+        "five_elements": {"day_master_element": result["day_master_element"],
+                          "strength": result["day_master_strength"],
+                          "percentage": result["five_elements_score"],
+                          "favorable_elements": result["favorable_elements"]},
+        "major_cycles": result["major_cycles"],
+        "shen_sha_details": result["shen_sha_details"],
+        "interactions": result["interactions"],
+    }
+
+
+def prompts(bazi_data):
+    dayun = {"gan_zhi": "戊子", "start_age": 8, "end_age": 17}
+    return {
+        "comprehensive": PromptManager.generate_comprehensive_analysis_prompt(bazi_data),
+        "dayun": PromptManager.generate_dayun_analysis_prompt(bazi_data, dayun),
+        "liunian": PromptManager.generate_liunian_analysis_prompt(bazi_data, 2025),
+    }
+
+
+async def bench(stub: LLMStubServer, bazi_data, rounds: int):
+    service = DeepSeekService()
+    service.base_url = stub.base_url
+    system_tokens = PromptManager.estimate_tokens(PromptManager.get_master_persona_prompt())
+    print(f"system 消息: {system_tokens} tokens（每次调用只发送一次）")
+    for fmt in FORMATS:
+        os.environ["BAZI_PROMPT_FORMAT"] = fmt
+        chart_tokens = PromptManager.estimate_tokens(PromptManager.format_bazi_data_for_prompt(bazi_data))
+        print(f"{fmt:>8} 命盘数据部分: {chart_tokens} tokens")
+        for kind, prompt in prompts(bazi_data).items():
+            tokens = system_tokens + PromptManager.estimate_tokens(prompt)
+            timings = []
+            for _ in range(rounds):
+                start = time.perf_counter()
+                await service._call_api_for_structured_json(prompt, kind)
+                timings.append(time.perf_counter() - start)
+            print(f"{fmt:>8} {kind:<13} 估算 {tokens:>5} tokens  {len(prompt):>5} 字符  "
+                  f"耗时中位数 {statistics.median(timings) * 1000:7.1f} ms")
+    await close_llm_client()
+
+
+def main():
+    prompt_latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.2
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    logging.disable(logging.WARNING)
+    bazi_data = chart_data()
+    with LLMStubServer(prompt_latency=prompt_latency) as stub:
+        asyncio.run(bench(stub, bazi_data, rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+神煞批量计算基准：NumPy 批量查表 vs 逐盘 ShenShaCalculator.calculate
+
+用法（在 backend 目录下）：
+    python benchmarks/bench_shensha_batch.py [命盘数量]
+"""
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.core import Bazi, StemBranch
+from app.services.calculators import ShenShaCalculator
+from app.services.constants import TIANGAN, DIZHI
+from app.services.shensha_batch import calculate_shensha_batch, encode_charts
+
+
+def random_charts(n: int, seed: int = 42):
+    rng = np.random.default_rng(seed)
+    charts = []
+    for _ in range(n):
+        pillars = []
+        for _ in range(4):
+            jiazi = int(rng.integers(60))
+            pillars.append(StemBranch(TIANGAN[jiazi % 10], DIZHI[jiazi % 12]))
+        charts.append(Bazi(*pillars, gender="男", birth_time=datetime(2000, int(rng.integers(1, 13)), 15)))
+    return charts
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    logging.disable(logging.INFO)
+    charts = random_charts(n)
+    stems, branches, months = encode_charts(charts)
+
+    calculator = ShenShaCalculator()
+    start = time.perf_counter()
+    for chart in charts:
+        calculator.calculate(chart)
+    loop_seconds = time.perf_counter() - start
+
+    calculate_shensha_batch(stems[:1], branches[:1], months[:1])  # 预热查找表
+    start = time.perf_counter()
+    result = calculate_shensha_batch(stems, branches, months)
+    batch_seconds = time.perf_counter() - start
+
+    print(f"命盘数: {n}，规则数: {result.active.shape[1]}")
+    print(f"逐盘计算: {loop_seconds:.3f}s（{loop_seconds / n * 1e6:.1f} µs/盘）")
+    print(f"批量计算: {batch_seconds:.3f}s（{batch_seconds / n * 1e6:.1f} µs/盘），加速 {loop_seconds / batch_seconds:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
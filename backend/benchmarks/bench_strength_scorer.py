@@ -0,0 +1,47 @@
+"""
+日主旺衰计分微基准：查表计分（冷缓存 / 热缓存）与逐步明细
+
+用法（在 backend 目录下）：
+    python benchmarks/bench_strength_scorer.py [命盘数量]
+"""
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.core import Bazi, StemBranch
+from app.services.calculators import FiveElementsCalculator
+from app.services.constants import JIAZI_TABLE
+from app.services import strength_scorer
+
+
+def charts(n: int):
+    return [
+        Bazi(*(StemBranch(*JIAZI_TABLE[(i * k + k) % 60]) for k in (7, 11, 13, 17)), gender="男")
+        for i in range(n)
+    ]
+
+
+def timed(label: str, func, items):
+    start = time.perf_counter()
+    for item in items:
+        func(item)
+    elapsed = time.perf_counter() - start
+    print(f"{label}: 单盘耗时 {elapsed / len(items) * 1e6:.2f} µs")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    logging.disable(logging.WARNING)
+    items = charts(n)
+    print(f"命盘数: {n}")
+    strength_scorer.score_pillars.cache_clear()
+    timed("查表计分（冷缓存）", FiveElementsCalculator.calculate_day_master_strength, items)
+    timed("查表计分（热缓存）", FiveElementsCalculator.calculate_day_master_strength, items)
+    timed("逐步明细", FiveElementsCalculator.calculate_day_master_strength_detailed, items)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+本地大模型替身服务：兼容 OpenAI / DeepSeek 的 POST /v1/chat/completions，供测试与压测使用，不访问外网
+
+- latency：每次请求的处理耗时（模拟模型生成时间）
+- prompt_latency：每 1000 个提示词字符增加的处理耗时（模拟 prefill 随提示词长度增长）
+- connect_latency：每条新连接的建立耗时（模拟到远端 API 的 TCP/TLS 握手往返）
+- 请求带 "stream": true 时按 SSE 分块返回，每 chunk_chars 个字符一块，块间间隔 token_latency 秒
+- fail_next(status, count)：接下来 count 个请求返回指定错误状态码（如 429 / 503）
+- responder(payload) -> dict：按请求生成 message.content 的 JSON 对象，默认返回固定解读；返回 str 时原样作为 content
+- 统计 requests / connections / max_concurrent，用于验证连接复用与并发上限
+
+用法（在 backend 目录下）：
+    python benchmarks/llm_stub_server.py [端口] [处理耗时秒]
+    DEEPSEEK_API_KEY=stub DEEPSEEK_BASE_URL=http://127.0.0.1:端口/v1 uvicorn app.main:app
+"""
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+def default_responder(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return {"summary": "命局平和，稳中求进。", "advice": "宜守不宜攻。"}
+
+
+class LLMStubServer:
+    """在后台线程中运行的替身服务，可用作 with 上下文"""
+
+    def __init__(self, latency: float = 0.0, connect_latency: float = 0.0,
+                 responder: Callable[[Dict[str, Any]], Dict[str, Any]] = default_responder, port: int = 0,
+                 chunk_chars: int = 8, token_latency: float = 0.0, prompt_latency: float = 0.0):
+        self.latency = latency
+        self.prompt_latency = prompt_latency
+        self.connect_latency = connect_latency
+        self.chunk_chars = chunk_chars
+        self.token_latency = token_latency
+        self.responder = responder
+        self.requests = 0
+        self.connections = 0
+        self.concurrent = 0
+        self.max_concurrent = 0
+        self.payloads: List[Dict[str, Any]] = []
+        self._failures: List[Tuple[int, Optional[float]]] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def fail_next(self, status: int, count: int = 1, retry_after: Optional[float] = None):
+        with self._lock:
+            self._failures.extend([(status, retry_after)] * count)
+
+    def reset_stats(self):
+        with self._lock:
+            self.requests = self.connections = self.max_concurrent = 0
+            self.payloads.clear()
+
+    def start(self) -> "LLMStubServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "LLMStubServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # 支持 keep-alive
+            disable_nagle_algorithm = True  # 响应头与正文分两次写出，避免 Nagle 与延迟确认叠加出 40ms 停顿
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+                if stub.connect_latency:
+                    time.sleep(stub.connect_latency)
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+                data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _write_chunk(self, text: str):
+                data = text.encode("utf-8")
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+
+            def _send_stream(self, payload: Dict[str, Any]):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for chunk in stub.stream_chunks(payload):
+                    if stub.token_latency:
+                        time.sleep(stub.token_latency)
+                    self._write_chunk(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n")
+                self._write_chunk("data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with stub._lock:
+                    stub.requests += 1
+                    stub.payloads.append(payload)
+                    stub.concurrent += 1
+                    stub.max_concurrent = max(stub.max_concurrent, stub.concurrent)
+                    failure = stub._failures.pop(0) if stub._failures else None
+                try:
+                    delay = stub.latency + stub.prompt_latency * stub.prompt_chars(payload) / 1000
+                    if delay:
+                        time.sleep(delay)
+                    if not self.path.endswith("/chat/completions"):
+                        self._send_json(404, {"error": {"message": "not found"}})
+                    elif failure is not None:
+                        status, retry_after = failure
+                        headers = {"Retry-After": str(retry_after)} if retry_after is not None else None
+                        self._send_json(status, {"error": {"message": f"stub failure {status}"}}, headers)
+                    elif payload.get("stream"):
+                        self._send_stream(payload)
+                    else:
+                        self._send_json(200, stub.completion(payload))
+                finally:
+                    with stub._lock:
+                        stub.concurrent -= 1
+
+        return Handler
+
+    @staticmethod
+    def prompt_chars(payload: Dict[str, Any]) -> int:
+        return sum(len(m.get("content", "")) for m in payload.get("messages", []))
+
+    def completion(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        reply = self.responder(payload)
+        content = reply if isinstance(reply, str) else json.dumps(reply, ensure_ascii=False)
+        prompt_chars = self.prompt_chars(payload)
+        return {
+            "id": f"stub-{self.requests}",
+            "object": "chat.completion",
+            "model": payload.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_chars, "completion_tokens": len(content),
+                      "total_tokens": prompt_chars + len(content)},
+        }
+
+
+    def stream_chunks(self, payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """把完整回复切成流式 chat.completion.chunk 列表，最后一块携带 usage"""
+        completion = self.completion(payload)
+        content = completion["choices"][0]["message"]["content"]
+        chunks = [
+            {"id": completion["id"], "object": "chat.completion.chunk", "model": completion["model"],
+             "choices": [{"index": 0, "delta": {"content": content[i:i + self.chunk_chars]}, "finish_reason": None}]}
+            for i in range(0, len(content), self.chunk_chars)
+        ]
+        chunks.append({"id": completion["id"], "object": "chat.completion.chunk", "model": completion["model"],
+                       "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": completion["usage"]})
+        return chunks
+
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8089
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0
+    server = LLMStubServer(latency=latency, port=port)
+    print(f"大模型替身服务: {server.base_url}（处理耗时 {latency}s）")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+混合流量压测：排盘请求与 I/O 型请求并发时，I/O 请求的尾延迟
+对比排盘在事件循环内执行（inline）与放入线程池（thread）两种方式。
+
+用法（在 backend 目录下）：
+    python benchmarks/load_mixed_traffic.py [排盘请求数] [排盘并发数]
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///./load_mixed_traffic.db")
+
+import httpx
+from fastapi import FastAPI
+
+from app.api.v1.bazi import router as bazi_router
+from app.services.chart_executor import ChartExecutor, set_chart_executor
+
+IO_DELAY = 0.005
+CHART_PAYLOADS = [
+    {"gender": "男", "birth_datetime": f"{1950 + i % 60}-0{1 + i % 9}-1{i % 10}T{i % 24:02d}:30:00", "birth_place": "北京"}
+    for i in range(64)
+]
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(bazi_router)
+
+    @app.get("/io")
+    async def io_route():
+        # 模拟 AI 调用等纯 I/O 请求
+        await asyncio.sleep(IO_DELAY)
+        return {"ok": True}
+
+    return app
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+async def run_load(app: FastAPI, chart_requests: int, concurrency: int):
+    """concurrency 个客户端持续发送排盘请求，同时另一客户端不断发送 I/O 请求，直到排盘请求全部完成"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        io_latencies = []
+        pending = iter(range(chart_requests))
+        done = asyncio.Event()
+
+        async def chart_client():
+            for i in pending:
+                response = await client.post("/bazi/test-calculate", json=CHART_PAYLOADS[i % len(CHART_PAYLOADS)])
+                response.raise_for_status()
+
+        async def io_client():
+            while not done.is_set():
+                start = time.perf_counter()
+                response = await client.get("/io")
+                response.raise_for_status()
+                io_latencies.append(time.perf_counter() - start)
+
+        async def charts():
+            await asyncio.gather(*(chart_client() for _ in range(concurrency)))
+            done.set()
+
+        start = time.perf_counter()
+        await asyncio.gather(io_client(), charts())
+        return time.perf_counter() - start, io_latencies
+
+
+def main():
+    chart_requests = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    logging.disable(logging.WARNING)
+    app = build_app()
+    print(f"排盘请求 {chart_requests} 个（并发 {concurrency}），I/O 请求每个 sleep {IO_DELAY * 1e3:.0f} ms")
+    for kind in ("inline", "thread"):
+        previous = set_chart_executor(ChartExecutor(kind, max_queue=concurrency))
+        try:
+            # 预热：加载节气库等数据表
+            asyncio.run(run_load(app, 1, 1))
+            elapsed, latencies = asyncio.run(run_load(app, chart_requests, concurrency))
+        finally:
+            executor = set_chart_executor(previous)
+            executor.shutdown()
+        print(f"{kind:>6}: 总耗时 {elapsed:.2f} s，I/O 延迟 p50 {percentile(latencies, 0.5) * 1e3:.1f} ms，"
+              f"p99 {percentile(latencies, 0.99) * 1e3:.1f} ms，最大 {max(latencies) * 1e3:.1f} ms（{len(latencies)} 个）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+节气库构建脚本
+将节气表 JSON 转为可内存映射的定长二进制节气库（1900-2100 年，每年 24 个 int64）
+
+用法（在 backend 目录下）：
+    python build_solar_terms_store.py                       # 转换 solar_terms_data_precise.json 与 solar_terms_data.json
+    python build_solar_terms_store.py 输入.json [输出.bin]
+    python build_solar_terms_store.py --lunar               # 用 lunar_python 生成四柱排盘所用的精确节气库
+"""
+import os
+import sys
+
+from app.services.solar_terms_store import build_store, write_store, lunar_terms_table, SolarTermStore, START_YEAR, END_YEAR
+from app.services.pillar_engine import LUNAR_STORE_FILE, LUNAR_STORE_START_YEAR, LUNAR_STORE_END_YEAR
+
+DEFAULT_SOURCES = ["solar_terms_data_precise.json", "solar_terms_data.json"]
+
+
+def build(json_path: str, out_path: str = None):
+    out_path = out_path or os.path.splitext(json_path)[0] + ".bin"
+    filled = build_store(json_path, out_path)
+    store = SolarTermStore(out_path)
+    missing_years = [y for y in range(START_YEAR, END_YEAR + 1) if not store.year_terms(y)]
+    print(f"✅ {json_path} -> {out_path}: {filled} 个节气，{os.path.getsize(out_path)} 字节")
+    if missing_years:
+        print(f"  无数据年份: {missing_years[0]}-{missing_years[-1]}（共 {len(missing_years)} 年）")
+
+
+def build_lunar(out_path: str):
+    table = lunar_terms_table(LUNAR_STORE_START_YEAR, LUNAR_STORE_END_YEAR)
+    filled = write_store(table, out_path, LUNAR_STORE_START_YEAR, LUNAR_STORE_END_YEAR)
+    print(f"✅ lunar_python -> {out_path}: {filled} 个节气（{LUNAR_STORE_START_YEAR}-{LUNAR_STORE_END_YEAR}），{os.path.getsize(out_path)} 字节")
+
+
+def main():
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    if sys.argv[1:2] == ["--lunar"]:
+        build_lunar(os.path.join(backend_dir, LUNAR_STORE_FILE))
+        return
+    if len(sys.argv) > 1:
+        build(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+        return
+    for name in DEFAULT_SOURCES:
+        build(os.path.join(backend_dir, name))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+测试命盘分析上下文：日主旺衰只计算一次，结果与逐项调用一致
+"""
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.core import Bazi, StemBranch
+from app.services.calculators import FiveElementsCalculator, ShenShaCalculator
+from app.services.analysis_context import ChartAnalysisContext
+
+
+def _bazi():
+    return Bazi(StemBranch("庚", "午"), StemBranch("庚", "辰"), StemBranch("甲", "子"), StemBranch("己", "巳"),
+                gender="男", birth_time=datetime(1990, 4, 29, 10, 30))
+
+
+def test_context_matches_direct_calls():
+    bazi = _bazi()
+    context = ChartAnalysisContext(bazi)
+    assert context.day_master_strength == FiveElementsCalculator.calculate_day_master_strength(bazi)
+    assert context.five_elements_percentage == FiveElementsCalculator.calculate_five_elements_percentage(bazi)
+    assert context.favorable_elements == FiveElementsCalculator.get_favorable_elements(bazi)
+    assert context.comprehensive_gods == FiveElementsCalculator.analyze_comprehensive_gods(bazi)
+
+
+def test_strength_scored_once_per_request(monkeypatch):
+    calls = {"plain": 0, "detailed": 0}
+    original_detailed = FiveElementsCalculator.calculate_day_master_strength_detailed
+
+    def count_plain(bazi):
+        calls["plain"] += 1
+        return "平和"
+
+    def count_detailed(bazi):
+        calls["detailed"] += 1
+        return original_detailed(bazi)
+
+    monkeypatch.setattr(FiveElementsCalculator, "calculate_day_master_strength", staticmethod(count_plain))
+    monkeypatch.setattr(FiveElementsCalculator, "calculate_day_master_strength_detailed", staticmethod(count_detailed))
+
+    bazi = _bazi()
+    context = ChartAnalysisContext(bazi)
+    calculator = ShenShaCalculator()
+    context.comprehensive_gods
+    context.favorable_elements
+    interactions = calculator.analyze_interactions(bazi, context)
+    results = calculator.calculate_shensha(bazi, context)
+
+    assert calls == {"plain": 1, "detailed": 0}
+    assert results is context.shensha_results
+    assert len(interactions["active_shensha"]) == sum(1 for sha in results.values() if sha.active)
+
+    # 计分明细仅在访问时生成
+    assert context.strength_detail["day_stem"] == "甲"
+    assert calls == {"plain": 1, "detailed": 1}
@@ -0,0 +1,92 @@
+"""
+测试批量排盘：NDJSON 按输入顺序输出，与逐条计算结果一致，单条失败不影响整批
+"""
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test_batch_calculator.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.bazi import router
+from app.core.dependencies import get_current_user
+from app.schemas.bazi import BaziCalculateRequest
+from app.services import batch_calculator
+from app.services.bazi_calculator import calculate_bazi_data_sync
+from app.services.chart_executor import ChartExecutor, set_chart_executor
+
+
+def _items(n: int):
+    start = datetime(1960, 3, 1, 6, 15)
+    return [
+        BaziCalculateRequest(gender="男" if i % 2 else "女", birth_datetime=start + timedelta(days=i * 397, hours=i * 5),
+                             birth_place="北京")
+        for i in range(n)
+    ]
+
+
+async def _collect(items, chunk_size, fields=None):
+    previous = set_chart_executor(ChartExecutor("thread", max_workers=2, max_queue=0))
+    try:
+        chunks = [chunk async for chunk in batch_calculator.stream_batch(items, chunk_size=chunk_size, fields=fields)]
+    finally:
+        set_chart_executor(previous).shutdown()
+    return [json.loads(line) for line in "".join(chunks).splitlines()]
+
+
+def test_stream_in_input_order():
+    items = _items(7)
+    rows = asyncio.run(_collect(items, chunk_size=2))
+    assert [row["index"] for row in rows] == list(range(7))
+    for item, row in zip(items, rows):
+        assert row["ok"]
+        expected = calculate_bazi_data_sync(item, quick_mode=True).model_dump(mode="json")
+        assert row["result"]["bazi_characters"] == expected["bazi_characters"]
+        assert row["result"]["major_cycles"] == expected["major_cycles"]
+
+
+def test_item_error_does_not_fail_batch(monkeypatch):
+    items = _items(5)
+    original = batch_calculator.calculate_bazi_data_sync
+
+    def flaky(item, quick_mode=False, fields=None):
+        if item is items[3]:
+            raise ValueError("坏数据")
+        return original(item, quick_mode, fields)
+
+    monkeypatch.setattr(batch_calculator, "calculate_bazi_data_sync", flaky)
+    rows = asyncio.run(_collect(items, chunk_size=2))
+    assert [row["ok"] for row in rows] == [True, True, True, False, True]
+    assert rows[3] == {"index": 3, "ok": False, "error": "坏数据"}
+
+
+def test_batch_endpoint_streams_ndjson():
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_current_user] = lambda: {"id": 1}
+    items = [item.model_dump(mode="json") for item in _items(3)]
+    with TestClient(app) as client:
+        response = client.post("/bazi/calculate-batch", json={"items": items})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [(row["index"], row["ok"]) for row in rows] == [(0, True), (1, True), (2, True)]
+
+
+def test_batch_endpoint_rejects_empty():
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_current_user] = lambda: {"id": 1}
+    with TestClient(app) as client:
+        assert client.post("/bazi/calculate-batch", json={"items": []}).status_code == 422
+
+
+def test_batch_with_fields():
+    rows = asyncio.run(_collect(_items(3), chunk_size=2, fields=("bazi_characters", "major_cycles")))
+    assert [set(row["result"]) for row in rows] == [{"bazi_characters", "major_cycles"}] * 3
+
@@ -0,0 +1,191 @@
+"""
+测试排盘结果缓存：LRU 容量与 TTL、规范化缓存键、命中结果与重新计算一致且互不影响
+"""
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.schemas.bazi import BaziCalculateRequest
+from app.services import bazi_calculator
+from app.services.chart_cache import LRUCache, chart_request_key, clear_chart_caches, fortune_cache
+
+
+def _request(**overrides):
+    data = dict(gender="男", birth_datetime=datetime(1990, 4, 29, 10, 30), birth_place="北京")
+    data.update(overrides)
+    return BaziCalculateRequest(**data)
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats() == {"size": 2, "maxsize": 2, "hits": 3, "misses": 1, "hit_rate": 0.75}
+
+
+def test_lru_ttl_expires():
+    now = [0.0]
+    cache = LRUCache(4, ttl=10, clock=lambda: now[0])
+    cache.put("a", 1)
+    now[0] = 9.9
+    assert cache.get("a") == 1
+    now[0] = 10.0
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_zero_size_disables_cache():
+    cache = LRUCache(0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+
+
+def test_request_key_is_canonical():
+    base = chart_request_key(_request(), True)
+    assert chart_request_key(_request(name="张三"), True) == base
+    assert chart_request_key(_request(), False) != base
+    assert chart_request_key(_request(gender="女"), True) != base
+    assert chart_request_key(_request(birth_place="上海"), True) != base
+    assert chart_request_key(_request(birth_datetime=datetime(1990, 4, 29, 10, 31)), True) != base
+
+
+def test_static_part_reused_and_fortune_recomputed(monkeypatch):
+    clear_chart_caches()
+    calls = {"static": 0, "fortune": 0}
+    static, fortune = bazi_calculator.SECTION_BUILDERS["chart"], bazi_calculator.calculate_current_year_fortune
+
+    def counted_static(*args, **kwargs):
+        calls["static"] += 1
+        return static(*args, **kwargs)
+
+    def counted_fortune(*args, **kwargs):
+        calls["fortune"] += 1
+        return fortune(*args, **kwargs)
+
+    monkeypatch.setitem(bazi_calculator.SECTION_BUILDERS, "chart", counted_static)
+    monkeypatch.setattr(bazi_calculator, "calculate_current_year_fortune", counted_fortune)
+
+    first = bazi_calculator.calculate_bazi_data_sync(_request(), quick_mode=False)
+    second = bazi_calculator.calculate_bazi_data_sync(_request(name="李四"), quick_mode=False)
+    assert calls == {"static": 1, "fortune": 1}
+    assert first.model_dump() == second.model_dump()
+
+    # 当年运势过期后只重算年度部分
+    fortune_cache.clear()
+    third = bazi_calculator.calculate_bazi_data_sync(_request(), quick_mode=False)
+    assert calls == {"static": 1, "fortune": 2}
+    assert third.model_dump() == first.model_dump()
+    clear_chart_caches()
+
+
+def test_cached_response_is_isolated():
+    clear_chart_caches()
+    first = bazi_calculator.calculate_bazi_data_sync(_request(), quick_mode=True)
+    expected = first.model_dump()
+    first.major_cycles.clear()
+    first.na_yin["year_na_yin"][0] = "改动"
+    first.current_year_fortune["year"] = 0
+    assert bazi_calculator.calculate_bazi_data_sync(_request(), quick_mode=True).model_dump() == expected
+    clear_chart_caches()
+
+
+def test_pillar_analysis_shared_across_birth_times(monkeypatch):
+    clear_chart_caches()
+    fresh = bazi_calculator.calculate_bazi_data_sync(_request(birth_datetime=datetime(1990, 4, 29, 9, 5)), quick_mode=False)
+    clear_chart_caches()
+    calls = {"pillar": 0}
+    shen_sha = bazi_calculator.SECTION_BUILDERS["shen_sha_details"]
+
+    def counted(*args, **kwargs):
+        calls["pillar"] += 1
+        return shen_sha(*args, **kwargs)
+
+    monkeypatch.setitem(bazi_calculator.SECTION_BUILDERS, "shen_sha_details", counted)
+    # 同一时辰内的不同出生时刻：四柱相同，只重算大运等与时刻相关的字段
+    bazi_calculator.calculate_bazi_data_sync(_request(birth_datetime=datetime(1990, 4, 29, 10, 50)), quick_mode=False)
+    warm = bazi_calculator.calculate_bazi_data_sync(_request(birth_datetime=datetime(1990, 4, 29, 9, 5)), quick_mode=False)
+    assert calls["pillar"] == 1
+    assert warm.model_dump() == fresh.model_dump()
+    # 性别不同时大运、神煞可能不同，不共用
+    bazi_calculator.calculate_bazi_data_sync(_request(gender="女", birth_datetime=datetime(1990, 4, 29, 9, 5)), quick_mode=False)
+    assert calls["pillar"] == 2
+    clear_chart_caches()
+
+
+def test_pillar_key_includes_birth_month_in_full_mode():
+    from app.services.chart_cache import pillar_analysis_key
+    from app.services.core import Bazi, StemBranch
+
+    def bazi(month):
+        return Bazi(StemBranch("甲", "子"), StemBranch("丙", "寅"), StemBranch("甲", "子"), StemBranch("甲", "子"),
+                    gender="男", birth_time=datetime(1984, month, 20))
+
+    assert pillar_analysis_key(bazi(2), False) != pillar_analysis_key(bazi(3), False)
+    assert pillar_analysis_key(bazi(2), True) == pillar_analysis_key(bazi(3), True)
+
+
+def test_liunian_rolls_over_at_lichun():
+    from datetime import timedelta
+    from app.services.pillar_engine import get_pillar_engine, liunian_at
+
+    lichun = get_pillar_engine().store.term_time(2026, "立春")
+    assert liunian_at(lichun - timedelta(seconds=1)) == (2025, "乙", "巳")
+    assert liunian_at(lichun) == (2026, "丙", "午")
+    assert liunian_at(datetime(2026, 1, 1)).gan_zhi == "乙巳"
+
+
+def test_fortune_keyed_by_liunian(monkeypatch):
+    from app.services.pillar_engine import Liunian
+    from app.services.chart_cache import chart_cache_stats
+
+    clear_chart_caches()
+    current = [Liunian(2025, "乙", "巳")]
+    monkeypatch.setattr(bazi_calculator, "liunian_at", lambda now: current[0])
+    before = bazi_calculator.calculate_bazi_data_sync(_request(), quick_mode=True)
+    assert bazi_calculator.calculate_bazi_data_sync(_request(), quick_mode=True).current_year_fortune == \
+        before.current_year_fortune
+    current[0] = Liunian(2026, "丙", "午")
+    after = bazi_calculator.calculate_bazi_data_sync(_request(), quick_mode=True)
+    assert (before.current_year_fortune["gan_zhi"], after.current_year_fortune["gan_zhi"]) == ("乙巳", "丙午")
+    assert after.current_year_fortune["age"] == before.current_year_fortune["age"] + 1
+    stats = chart_cache_stats()
+    assert (stats["static"]["hits"], stats["static"]["misses"]) == (2, 1)
+    assert (stats["fortune"]["hits"], stats["fortune"]["misses"]) == (1, 2)
+    assert stats["fortune"]["hit_rate"] == round(1 / 3, 4)
+    clear_chart_caches()
+
+
+def test_current_year_ai_analysis_uses_liunian_year(monkeypatch):
+    """立春前当年运势 AI 分析的年份与命盘的流年一致"""
+    from fastapi.testclient import TestClient
+    from app.api.v1 import bazi as bazi_api
+    from app.main import app
+    from app.services.pillar_engine import Liunian
+
+    clear_chart_caches()
+    monkeypatch.setattr(bazi_calculator, "liunian_at", lambda now: Liunian(2025, "乙", "巳"))
+    years = []
+
+    async def analysis(bazi_data, year):
+        years.append(year)
+        return {"overall_analysis": year}
+
+    async def stream(bazi_data, year):
+        years.append(year)
+        yield "done", {"result": {}, "source": "mock"}
+
+    monkeypatch.setattr(bazi_api.deepseek_service, "generate_detailed_fortune_analysis", analysis)
+    monkeypatch.setattr(bazi_api.deepseek_service, "stream_detailed_fortune_analysis", stream)
+    body = {"gender": "男", "birth_datetime": "1990-10-20T10:00:00", "birth_place": "北京"}
+    with TestClient(app) as client:
+        response = client.post("/api/v1/bazi/current-year-ai-analysis", json=body)
+        client.post("/api/v1/bazi/current-year-ai-analysis/stream", json=body)
+    assert response.json()["current_year_fortune"]["year"] == 2025
+    assert years == ["2025", "2025"]
+    clear_chart_caches()
@@ -0,0 +1,71 @@
+"""
+测试排盘执行器：线程池执行结果与同步计算一致，超出并发上限时返回 503
+"""
+import asyncio
+import os
+import sys
+import threading
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.schemas.bazi import BaziCalculateRequest
+from app.services.bazi_calculator import calculate_bazi_data, calculate_bazi_data_sync
+from app.services.chart_executor import ChartExecutor, ChartExecutorBusy, set_chart_executor
+
+
+def test_thread_executor_runs_off_loop():
+    executor = ChartExecutor("thread", max_workers=2, max_queue=0)
+    try:
+        loop_thread = threading.get_ident()
+        worker_thread = asyncio.run(executor.run(threading.get_ident))
+        assert worker_thread != loop_thread
+        assert executor.in_flight == 0
+    finally:
+        executor.shutdown()
+
+
+def test_inline_executor_runs_on_loop():
+    executor = ChartExecutor("inline", max_workers=1, max_queue=0)
+    assert asyncio.run(executor.run(threading.get_ident)) == threading.get_ident()
+
+
+def test_rejects_when_saturated():
+    executor = ChartExecutor("thread", max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def scenario():
+        running = [asyncio.ensure_future(executor.run(release.wait, 5)) for _ in range(executor.limit)]
+        await asyncio.sleep(0)
+        with pytest.raises(ChartExecutorBusy) as excinfo:
+            await executor.run(release.wait, 5)
+        release.set()
+        await asyncio.gather(*running)
+        return excinfo.value
+
+    try:
+        busy = asyncio.run(scenario())
+        assert busy.status_code == 503
+        assert busy.headers["Retry-After"] == "1"
+        assert executor.in_flight == 0
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_unknown_kind():
+    with pytest.raises(ValueError):
+        ChartExecutor("fork")
+
+
+def test_async_result_matches_sync():
+    request = BaziCalculateRequest(gender="女", birth_datetime=datetime(1984, 2, 4, 23, 10), birth_place="上海")
+    previous = set_chart_executor(ChartExecutor("thread", max_workers=2))
+    try:
+        result = asyncio.run(calculate_bazi_data(request, quick_mode=True))
+    finally:
+        set_chart_executor(previous).shutdown()
+    expected = calculate_bazi_data_sync(request, quick_mode=True)
+    assert result.model_dump(exclude={"current_year_fortune"}) == expected.model_dump(exclude={"current_year_fortune"})
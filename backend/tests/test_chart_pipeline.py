@@ -0,0 +1,103 @@
+"""
+测试阶段图流水线：依赖校验与分层、单次执行内记忆化、各阶段耗时记录、并发执行与顺序执行结果一致
+"""
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.schemas.bazi import BaziCalculateRequest
+from app.services import bazi_calculator
+from app.services.chart_cache import clear_chart_caches
+from app.services.chart_pipeline import PipelineRun, Stage, StageGraph
+
+
+def _graph(calls=None, delay=0.0):
+    def stage(name, inputs, func):
+        def run(state):
+            if calls is not None:
+                calls.append(name)
+            time.sleep(delay)
+            return func(state)
+        return Stage(name, inputs, run)
+
+    return StageGraph([
+        stage("a", (), lambda s: 1),
+        stage("b", ("a",), lambda s: s.get("a") + 1),
+        stage("c", ("a",), lambda s: s.get("a") * 10),
+        stage("d", ("b", "c"), lambda s: s.get("b") + s.get("c")),
+    ])
+
+
+def test_graph_validation():
+    with pytest.raises(ValueError):
+        StageGraph([Stage("a", ("missing",), lambda s: 0)])
+    with pytest.raises(ValueError):
+        StageGraph([Stage("a", ("b",), lambda s: 0), Stage("b", ("a",), lambda s: 0)])
+
+
+def test_levels_group_independent_stages():
+    graph = _graph()
+    assert graph.order(["d"]) == ["a", "b", "c", "d"]
+    assert graph.levels(["d"]) == [["a"], ["b", "c"], ["d"]]
+    assert graph.levels(["b"]) == [["a"], ["b"]]
+
+
+def test_each_stage_runs_once_and_is_timed():
+    calls = []
+    run = PipelineRun(_graph(calls))
+    assert run.run(["d", "b"]) == {"d": 12, "b": 2}
+    assert run.get("d") == 12
+    assert calls == ["a", "b", "c", "d"]
+    assert list(run.timings) == ["a", "b", "c", "d"]
+    assert all(seconds >= 0 for seconds in run.timings.values())
+
+
+def test_parallel_levels():
+    threads = set()
+
+    def stage(name, inputs):
+        def run(state):
+            threads.add(threading.current_thread().name)
+            time.sleep(0.05)
+            return name
+        return Stage(name, inputs, run)
+
+    graph = StageGraph([stage("a", ()), stage("b", ()), stage("c", ()), stage("d", ("a", "b", "c"))])
+    with ThreadPoolExecutor(3) as pool:
+        run = PipelineRun(graph)
+        start = time.perf_counter()
+        assert run.run(["d"], pool) == {"d": "d"}
+        elapsed = time.perf_counter() - start
+    assert elapsed < 0.15
+    assert len(threads) >= 2
+    # 阶段耗时不含等待输入的时间
+    assert run.timings["d"] < 0.1
+
+
+def test_chart_timings_and_parallel_result(monkeypatch):
+    request = BaziCalculateRequest(gender="男", birth_datetime=datetime(1975, 8, 12, 14, 40), birth_place="广州")
+    clear_chart_caches()
+    sequential = bazi_calculator.run_chart_pipeline(request, quick_mode=False)
+    assert {"location", "solar_time", "chart", "analysis", "shen_sha_details", "current_year_fortune"} <= \
+        set(sequential.timings)
+
+    # 命盘缓存命中时只执行当年运势分段
+    cached = bazi_calculator.run_chart_pipeline(request, quick_mode=False)
+    assert list(cached.timings) == ["current_year_fortune"]
+
+    clear_chart_caches()
+    pool = ThreadPoolExecutor(4)
+    monkeypatch.setattr(bazi_calculator, "get_stage_pool", lambda: pool)
+    try:
+        parallel = bazi_calculator.run_chart_pipeline(request, quick_mode=False)
+    finally:
+        pool.shutdown()
+    assert parallel.result.model_dump() == sequential.result.model_dump()
+    clear_chart_caches()
@@ -0,0 +1,99 @@
+"""
+测试按字段计算：依赖图解析、只计算所请求的分段、部分字段与完整响应一致
+"""
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test_chart_sections.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.bazi import router
+from app.core.dependencies import get_current_user
+from app.db.session import get_db
+from app.schemas.bazi import BaziCalculateRequest
+from app.services import bazi_calculator
+from app.services.chart_cache import clear_chart_caches
+from app.services.chart_sections import (
+    SECTION_DEPENDENCIES, RESPONSE_FIELDS, parse_fields, resolve_sections
+)
+
+
+def _request():
+    return BaziCalculateRequest(gender="女", birth_datetime=datetime(1984, 2, 4, 23, 10), birth_place="上海")
+
+
+def test_parse_fields():
+    assert parse_fields(None) is None
+    assert parse_fields(" , ") is None
+    assert parse_fields("bazi_characters, major_cycles,bazi_characters") == ("bazi_characters", "major_cycles")
+    with pytest.raises(ValueError):
+        parse_fields("bazi_characters,lucky_number")
+
+
+def test_resolve_sections_orders_dependencies():
+    order = resolve_sections(["favorable_elements", "current_year_fortune"])
+    for name in order:
+        for dependency in SECTION_DEPENDENCIES[name]:
+            assert order.index(dependency) < order.index(name)
+    assert "shen_sha_details" not in order
+    assert resolve_sections(["bazi_characters", "major_cycles"]) == [
+        "location", "solar_time", "chart", "bazi_characters", "major_cycles"
+    ]
+
+
+def test_builders_cover_all_sections():
+    assert set(bazi_calculator.SECTION_BUILDERS) == set(SECTION_DEPENDENCIES)
+
+
+def test_only_requested_sections_computed(monkeypatch):
+    clear_chart_caches()
+    called = []
+    for name, builder in list(bazi_calculator.SECTION_BUILDERS.items()):
+        def traced(state, name=name, builder=builder):
+            called.append(name)
+            return builder(state)
+        monkeypatch.setitem(bazi_calculator.SECTION_BUILDERS, name, traced)
+
+    result = bazi_calculator.calculate_bazi_data_sync(_request(), quick_mode=False,
+                                                      fields=("bazi_characters", "major_cycles"))
+    assert set(result) == {"bazi_characters", "major_cycles"}
+    assert sorted(called) == ["bazi_characters", "chart", "location", "major_cycles", "solar_time"]
+    clear_chart_caches()
+
+
+@pytest.mark.parametrize("quick_mode", [True, False])
+def test_partial_matches_full(quick_mode):
+    clear_chart_caches()
+    partial = {
+        name: bazi_calculator.calculate_bazi_data_sync(_request(), quick_mode, (name,))[name]
+        for name in RESPONSE_FIELDS
+    }
+    clear_chart_caches()
+    full = bazi_calculator.calculate_bazi_data_sync(_request(), quick_mode).model_dump()
+    assert partial == full
+    # 完整结果已缓存时，部分字段直接取自缓存
+    assert bazi_calculator.calculate_bazi_data_sync(_request(), quick_mode, ("na_yin", "current_year_fortune")) == {
+        "na_yin": full["na_yin"], "current_year_fortune": full["current_year_fortune"]
+    }
+    clear_chart_caches()
+
+
+@pytest.mark.parametrize("path", ["/bazi/test-calculate", "/bazi/calculate-test", "/bazi/calculate-quick"])
+def test_fields_query_parameter(path):
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_current_user] = lambda: None
+    app.dependency_overrides[get_db] = lambda: None
+    body = _request().model_dump(mode="json")
+    with TestClient(app) as client:
+        response = client.post(f"{path}?fields=bazi_characters,zodiac_sign", json=body)
+        assert response.status_code == 200
+        assert set(response.json()) == {"bazi_characters", "zodiac_sign"}
+        assert client.post(f"{path}?fields=unknown", json=body).status_code == 422
+        assert "chart_id" in client.post(path, json=body).json()
@@ -0,0 +1,87 @@
+"""
+测试命盘会话：SQLite 持久化与过期、排盘端点返回 chart_id、后续端点凭 chart_id 不再重复排盘、会话缺少模式时补算
+"""
+import asyncio
+import os
+import sys
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test_chart_session.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.schemas.bazi import BaziCalculateRequest
+from app.services import chart_session as chart_session_module
+from app.services.bazi_calculator import calculate_bazi_data
+from app.services.chart_session import ChartSessionStore, chart_session_requests
+
+BODY = {"gender": "男", "birth_datetime": "1990-10-20T10:00:00", "birth_place": "北京"}
+
+
+def test_store_persists_to_sqlite_and_expires(tmp_path):
+    now = [1000.0]
+    path = str(tmp_path / "sessions.sqlite3")
+    request = BaziCalculateRequest(**BODY)
+    result = asyncio.run(calculate_bazi_data(request, quick_mode=True))
+    store = ChartSessionStore(maxsize=4, ttl=60, path=path, clock=lambda: now[0])
+    chart_id = store.create(request, True, result)
+    store.close()
+
+    reopened = ChartSessionStore(maxsize=4, ttl=60, path=path, clock=lambda: now[0])
+    session = reopened.get(chart_id)
+    assert session.request.birth_place == "北京"
+    assert session.result(True).model_dump() == result.model_dump()
+    assert session.result(False) is None
+    now[0] += 60
+    assert reopened.get(chart_id) is None
+    assert reopened.get("unknown") is None
+    reopened.close()
+
+
+def test_follow_up_uses_session_without_recalculating(monkeypatch):
+    monkeypatch.setattr(chart_session_module, "chart_sessions", ChartSessionStore(maxsize=8))
+    with TestClient(app) as client:
+        response = client.post("/api/v1/bazi/calculate-test", json=BODY)
+        assert response.status_code == 200
+        chart_id = response.json()["chart_id"]
+        assert chart_id
+
+        calls = []
+
+        async def no_calculate(request, quick_mode):
+            calls.append(quick_mode)
+            raise AssertionError("不应重复排盘")
+
+        monkeypatch.setattr(chart_session_module, "calculate_bazi_data", no_calculate)
+        hits = chart_session_requests.value(result="hit")
+        follow_up = client.post("/api/v1/bazi/life-ai-analysis", params={"years": 2, "chart_id": chart_id})
+    assert follow_up.status_code == 200
+    assert follow_up.json()["success"] and len(follow_up.json()["liunian"]) == 2
+    assert calls == [] and chart_session_requests.value(result="hit") == hits + 1
+
+
+def test_unknown_chart_id_and_missing_body(monkeypatch):
+    monkeypatch.setattr(chart_session_module, "chart_sessions", ChartSessionStore(maxsize=8))
+    with TestClient(app) as client:
+        missing = client.post("/api/v1/bazi/current-year-ai-analysis", params={"chart_id": "unknown"})
+        empty = client.post("/api/v1/bazi/life-ai-analysis")
+        fallback = client.post("/api/v1/bazi/life-ai-analysis", params={"years": 1, "chart_id": "unknown"}, json=BODY)
+    assert missing.status_code == 404 and "重新排盘" in missing.json()["detail"]
+    assert empty.status_code == 422
+    assert fallback.status_code == 200 and fallback.json()["success"]
+
+
+def test_missing_mode_is_computed_once(monkeypatch):
+    monkeypatch.setattr(chart_session_module, "chart_sessions", ChartSessionStore(maxsize=8))
+    with TestClient(app) as client:
+        chart_id = client.post("/api/v1/bazi/calculate-test", json=BODY).json()["chart_id"]  # 快速模式
+        upgrades = chart_session_requests.value(result="upgrade")
+        hits = chart_session_requests.value(result="hit")
+        for _ in range(2):
+            response = client.post("/api/v1/bazi/master-fortune-analysis", params={"chart_id": chart_id})
+            assert response.status_code == 200
+    assert chart_session_requests.value(result="upgrade") == upgrades + 1
+    assert chart_session_requests.value(result="hit") == hits + 1
+    session = chart_session_module.chart_sessions.get(chart_id)
+    assert session.result(True) is not None and session.result(False) is not None
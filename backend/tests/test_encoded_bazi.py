@@ -0,0 +1,77 @@
+"""
+测试整数编码的不可变命盘 EncodedBazi 及基于命盘值的大运缓存
+"""
+import os
+import pickle
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.core import Bazi, StemBranch, EncodedBazi, FortuneModel, jiazi_index
+from app.services.constants import JIAZI_TABLE, TIANGAN, DIZHI
+
+
+def _bazi():
+    return Bazi(StemBranch("庚", "午"), StemBranch("庚", "辰"), StemBranch("甲", "子"), StemBranch("己", "巳"),
+                gender="男", birth_time=datetime(1990, 4, 29, 10, 30))
+
+
+def test_jiazi_index_matches_table():
+    for i, ganzhi in enumerate(JIAZI_TABLE):
+        assert jiazi_index(TIANGAN.index(ganzhi[0]), DIZHI.index(ganzhi[1])) == i
+    assert jiazi_index(0, 1) == -1  # 甲丑阴阳不配
+
+
+def test_round_trip_and_value_equality():
+    bazi = _bazi()
+    encoded = bazi.encode()
+    assert encoded.stems == (6, 6, 0, 5)
+    assert encoded.branches == (6, 4, 0, 5)
+    assert encoded.jiazi == (JIAZI_TABLE.index("庚午"), JIAZI_TABLE.index("庚辰"), 0, JIAZI_TABLE.index("己巳"))
+    assert encoded.pillar_strings() == ["庚午", "庚辰", "甲子", "己巳"]
+    assert encoded.get_bazi_characters() == bazi.get_bazi_characters()
+
+    restored = encoded.to_bazi()
+    assert restored.get_bazi_characters() == bazi.get_bazi_characters()
+    assert restored.gender == bazi.gender and restored.birth_time == bazi.birth_time
+
+    other = EncodedBazi.from_pillars(["庚午", "庚辰", "甲子", "己巳"], "男", datetime(1990, 4, 29, 10, 30))
+    assert other == encoded and hash(other) == hash(encoded)
+    assert len({encoded, other}) == 1
+    assert EncodedBazi.from_pillars(["庚午", "庚辰", "甲子", "己巳"], "女") != encoded
+
+
+def test_immutable_and_picklable():
+    encoded = _bazi().encode()
+    with pytest.raises(AttributeError):
+        encoded.stems = (0, 0, 0, 0)
+    with pytest.raises(AttributeError):
+        encoded.extra = 1
+    assert pickle.loads(pickle.dumps(encoded)) == encoded
+
+
+def test_invalid_characters_rejected():
+    with pytest.raises(ValueError):
+        EncodedBazi.from_pillars(["甲子", "丙寅", "X辰", "庚申"])
+    with pytest.raises(ValueError):
+        EncodedBazi((0, 0, 0, 10), (0, 0, 0, 0))
+
+
+def test_stem_branch_hashable():
+    assert hash(StemBranch("甲", "子")) == hash(StemBranch("甲", "子"))
+    assert {StemBranch("甲", "子"), StemBranch("甲", "子")} == {StemBranch("甲", "子")}
+
+
+def test_da_yun_cache_hits_on_equal_charts():
+    FortuneModel._calculate_da_yun_cached.cache_clear()
+    first = FortuneModel.calculate_da_yun(_bazi())
+    second = FortuneModel.calculate_da_yun(_bazi())
+    info = FortuneModel._calculate_da_yun_cached.cache_info()
+    assert info.hits == 1 and info.misses == 1
+    assert [str(d.stem_branch) for d in first] == [str(d.stem_branch) for d in second]
+    # 阳年男命顺排：庚辰之后为辛巳
+    assert str(first[0].stem_branch) == "辛巳"
+    assert first[0] is not second[0]
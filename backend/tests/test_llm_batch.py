@@ -0,0 +1,138 @@
+"""
+测试大运、流年的批量 AI 分析：按 max_tokens 分批、批量结果与单项调用共用缓存、缺失条目逐项回退、一生运势端点（流年从立春划分的当年开始）
+"""
+import asyncio
+import os
+import re
+import sys
+from datetime import datetime
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test_llm_batch.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+from benchmarks.llm_stub_server import LLMStubServer
+from app.api.v1 import bazi as bazi_api
+from app.main import app
+from app.services import bazi_calculator
+from app.services import llm_cache as llm_cache_module
+from app.services.deepseek_service import DeepSeekService, llm_batch_items
+from app.services.llm_cache import LLMCache
+from app.services.chart_cache import clear_chart_caches
+from app.services.llm_client import LLMClient, close_llm_client, set_llm_client
+from app.services.pillar_engine import liunian_at
+
+BAZI_DATA = {
+    "gender": "男",
+    "solar_date": "1990-10-20 10:00",
+    "bazi": {"year": {"gan": "庚", "zhi": "午"}, "month": {"gan": "丙", "zhi": "戌"},
+             "day": {"gan": "戊", "zhi": "午"}, "hour": {"gan": "丁", "zhi": "巳"}},
+    "major_cycles": [],
+}
+DAYUN = [{"gan_zhi": gan_zhi, "start_age": 6 + 10 * i, "end_age": 15 + 10 * i}
+         for i, gan_zhi in enumerate(["丁亥", "戊子", "己丑", "庚寅", "辛卯", "壬辰", "癸巳"])]
+
+
+def responder(skip=()):
+    """批量提示词按列出的目标逐项回复（跳过 skip 中的目标），单项提示词回复固定内容"""
+    def respond(payload):
+        prompt = payload["messages"][-1]["content"]
+        if "批量" not in prompt:
+            return {"dayun_overview": {"summary": "单项"}}
+        targets = re.findall(r"^\d+\. (\S+?)（", prompt, re.M)
+        return {"items": [{"gan_zhi": target, "dayun_overview": {"summary": f"批量{target}"}}
+                          for target in targets if target not in skip]}
+    return respond
+
+
+def _run(stub, scenario, max_tokens=2100):
+    async def run():
+        set_llm_client(LLMClient())
+        try:
+            service = DeepSeekService()
+            service.base_url = stub.base_url
+            service.max_tokens = max_tokens  # 默认大运每批 3 项
+            return await scenario(service)
+        finally:
+            await close_llm_client()
+    return asyncio.run(run())
+
+
+def test_batches_split_by_max_tokens_and_share_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("DEEPSEEK_API_KEY", "stub-key")
+    monkeypatch.setattr(llm_cache_module, "llm_cache", LLMCache(str(tmp_path / "llm.sqlite3")))
+
+    async def scenario(service):
+        assert service.batch_size("dayun") == 3
+        results = await service.generate_dayun_analyses(BAZI_DATA, DAYUN)
+        single = await service.generate_dayun_analysis(BAZI_DATA, DAYUN[1])
+        again = await service.generate_dayun_analyses(BAZI_DATA, DAYUN)
+        return results, single, again
+
+    with LLMStubServer(responder=responder()) as stub:
+        results, single, again = _run(stub, scenario)
+    assert stub.requests == 3  # 3 + 3 + 1（最后一项走单项调用）
+    assert [payload["messages"][-1]["content"].count("岁）\n") for payload in stub.payloads[:2]] == [3, 3]
+    assert results[:6] == [{"dayun_overview": {"summary": f"批量{info['gan_zhi']}"}} for info in DAYUN[:6]]
+    assert results[6] == {"dayun_overview": {"summary": "单项"}}
+    assert single == results[1] and again == results
+    llm_cache_module.llm_cache.close()
+
+
+def test_missing_items_fall_back_to_single_calls(tmp_path, monkeypatch):
+    monkeypatch.setenv("DEEPSEEK_API_KEY", "stub-key")
+    monkeypatch.setattr(llm_cache_module, "llm_cache", LLMCache(str(tmp_path / "llm.sqlite3")))
+    fallback_before = llm_batch_items.value(kind="dayun", result="fallback")
+
+    async def scenario(service):
+        return await service.generate_dayun_analyses(BAZI_DATA, DAYUN[:3])
+
+    with LLMStubServer(responder=responder(skip={"戊子"})) as stub:
+        results = _run(stub, scenario)
+    # 跳过第 2 项后第 3 项错位：两项都回退为单项调用
+    assert results == [{"dayun_overview": {"summary": "批量丁亥"}},
+                       {"dayun_overview": {"summary": "单项"}},
+                       {"dayun_overview": {"summary": "单项"}}]
+    assert stub.requests == 3
+    assert llm_batch_items.value(kind="dayun", result="fallback") == fallback_before + 2
+    llm_cache_module.llm_cache.close()
+
+
+def test_invalid_batch_reply_falls_back(tmp_path, monkeypatch):
+    monkeypatch.setenv("DEEPSEEK_API_KEY", "stub-key")
+    monkeypatch.setattr(llm_cache_module, "llm_cache", LLMCache(str(tmp_path / "llm.sqlite3")))
+
+    async def scenario(service):
+        return await service.generate_liunian_analyses(BAZI_DATA, [2025, 2026])
+
+    with LLMStubServer(responder=lambda payload: {"liunian_overview": {"summary": "平"}}) as stub:
+        results = _run(stub, scenario, max_tokens=4096)  # 流年每批 2 项
+    assert results == [{"liunian_overview": {"summary": "平"}}] * 2
+    assert stub.requests == 3
+    assert "所属大运" in stub.payloads[0]["messages"][-1]["content"]
+    llm_cache_module.llm_cache.close()
+
+
+def test_life_analysis_endpoint_in_mock_mode():
+    body = {"gender": "男", "birth_datetime": "1990-10-20T10:00:00", "birth_place": "北京"}
+    with TestClient(app) as client:
+        response = client.post("/api/v1/bazi/life-ai-analysis", params={"years": 3}, json=body)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["success"] and len(data["liunian"]) == 3
+    assert data["dayun"][1]["gan_zhi"] == "戊子"
+    assert "戊子" in data["dayun"][1]["ai_analysis"]["dayun_overview"]["summary"]
+    assert data["liunian"][0]["ai_analysis"]["liunian_overview"]
+
+
+def test_life_analysis_starts_from_liunian_year_before_lichun(monkeypatch):
+    before_lichun = datetime(2026, 1, 20, 12)
+    monkeypatch.setattr(bazi_calculator, "liunian_at", lambda now: liunian_at(before_lichun))
+    monkeypatch.setattr(bazi_api, "liunian_at", lambda now: liunian_at(before_lichun))
+    clear_chart_caches()
+    body = {"gender": "男", "birth_datetime": "1990-10-20T10:00:00", "birth_place": "北京"}
+    with TestClient(app) as client:
+        response = client.post("/api/v1/bazi/life-ai-analysis", params={"years": 2}, json=body)
+    clear_chart_caches()
+    assert [item["year"] for item in response.json()["liunian"]] == [2025, 2026]
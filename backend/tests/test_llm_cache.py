@@ -0,0 +1,176 @@
+"""
+测试大模型结果缓存：SQLite 持久化、TTL 与容量淘汰、缓存键规范化、single-flight 合并并发请求
+"""
+import asyncio
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.llm_stub_server import LLMStubServer
+from app.services import llm_cache as llm_cache_module
+from app.services.core import Bazi, StemBranch
+from app.services.deepseek_service import DeepSeekService
+from app.services.llm_cache import LLMCache, SingleFlight, cached_llm_call, llm_cache_key
+from app.services.llm_client import LLMClient, close_llm_client, set_llm_client
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_persists_across_instances(tmp_path):
+    path = str(tmp_path / "llm.sqlite3")
+    cache = LLMCache(path)
+    cache.put("k", "liunian", "m", {"summary": "平稳"})
+    cache.close()
+    reopened = LLMCache(path)
+    assert reopened.get("k") == {"summary": "平稳"}
+    assert reopened.get("missing") is None
+    reopened.close()
+
+
+def test_ttl_and_size_eviction(tmp_path):
+    clock = FakeClock()
+    cache = LLMCache(str(tmp_path / "llm.sqlite3"), maxsize=2, ttl=60, clock=clock)
+    cache.put("a", "liunian", "m", {"v": 1})
+    clock.now += 1
+    cache.put("b", "liunian", "m", {"v": 2})
+    clock.now += 1
+    assert cache.get("a") == {"v": 1}  # a 成为最近访问
+    clock.now += 1
+    cache.put("c", "liunian", "m", {"v": 3})
+    assert cache.get("b") is None
+    assert len(cache) == 2
+    clock.now += 60
+    assert cache.get("a") is None
+    assert cache.get("c") is None
+    cache.close()
+
+
+def test_disabled_cache_stores_nothing(tmp_path):
+    cache = LLMCache(str(tmp_path / "llm.sqlite3"), maxsize=0)
+    cache.put("a", "liunian", "m", {"v": 1})
+    assert cache.get("a") is None
+    cache.close()
+
+
+def test_key_normalization():
+    data = {"bazi": {"year": "庚午", "month": "丙戌"}, "year": 2025, "at": datetime(2025, 1, 1)}
+    reordered = {"year": 2025, "at": datetime(2025, 1, 1), "bazi": {"month": "丙戌", "year": "庚午"}}
+    key = llm_cache_key("liunian", "deepseek-chat", 0.7, data)
+    assert key == llm_cache_key("liunian", "deepseek-chat", 0.7, reordered)
+    assert key != llm_cache_key("dayun", "deepseek-chat", 0.7, data)
+    assert key != llm_cache_key("liunian", "deepseek-reasoner", 0.7, data)
+    assert key != llm_cache_key("liunian", "deepseek-chat", 0.2, data)
+    assert key != llm_cache_key("liunian", "deepseek-chat", 0.7, dict(data, year=2026))
+
+
+def test_single_flight_coalesces_concurrent_calls(tmp_path):
+    cache = LLMCache(str(tmp_path / "llm.sqlite3"))
+    calls = []
+
+    async def upstream():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"summary": "吉"}
+
+    async def scenario():
+        return await asyncio.gather(*(
+            cached_llm_call("liunian", "m", 0.7, {"year": 2025}, upstream, cache=cache) for _ in range(5)
+        ))
+
+    assert asyncio.run(scenario()) == [{"summary": "吉"}] * 5
+    assert len(calls) == 1
+    assert asyncio.run(cached_llm_call("liunian", "m", 0.7, {"year": 2025}, upstream, cache=cache)) == {"summary": "吉"}
+    assert len(calls) == 1
+    cache.close()
+
+
+def test_errors_shared_but_not_cached(tmp_path):
+    cache = LLMCache(str(tmp_path / "llm.sqlite3"))
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("上游不可用")
+
+    async def error_result():
+        calls.append(1)
+        return {"error": "Failed to parse LLM response as JSON"}
+
+    async def scenario():
+        return await asyncio.gather(*(
+            cached_llm_call("dayun", "m", 0.7, {}, failing, cache=cache) for _ in range(3)
+        ), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert len(calls) == 1
+    for _ in range(2):
+        asyncio.run(cached_llm_call("dayun", "m", 0.7, {}, error_result, cache=cache))
+    assert len(calls) == 3
+    assert len(cache) == 0
+    cache.close()
+
+
+def test_follower_retries_when_leader_cancelled():
+    flights = SingleFlight()
+    calls = []
+
+    async def upstream():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def scenario():
+        leader = asyncio.ensure_future(flights.do("k", upstream))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(flights.do("k", upstream))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(scenario()) == "ok"
+    assert len(calls) == 2
+
+
+def test_deepseek_endpoints_share_one_upstream_call(tmp_path, monkeypatch):
+    monkeypatch.setenv("DEEPSEEK_API_KEY", "stub-key")
+    monkeypatch.setattr(llm_cache_module, "llm_cache", LLMCache(str(tmp_path / "llm.sqlite3")))
+    bazi = Bazi(StemBranch("庚", "午"), StemBranch("丙", "戌"), StemBranch("甲", "子"), StemBranch("己", "巳"),
+                "男", datetime(1990, 10, 20, 10, 0))
+    analysis_data = {"day_master_element": "木", "day_master_strength": "身弱",
+                     "five_elements_score": {"木": "20%"}, "major_cycles": []}
+
+    async def scenario(base_url):
+        set_llm_client(LLMClient())
+        try:
+            service = DeepSeekService()
+            service.base_url = base_url
+            concurrent = await asyncio.gather(*(
+                service.generate_master_fortune_analysis(bazi, analysis_data, 2025) for _ in range(4)
+            ))
+            again = await service.generate_master_fortune_analysis(bazi, analysis_data, 2025)
+            other_year = await service.generate_master_fortune_analysis(bazi, analysis_data, 2026)
+            dayun = await service.generate_dayun_deep_analysis(bazi, {"gan_zhi": "戊子", "start_age": 8, "end_age": 17},
+                                                              analysis_data)
+            return concurrent, again, other_year, dayun
+        finally:
+            await close_llm_client()
+
+    with LLMStubServer(latency=0.05) as stub:
+        concurrent, again, other_year, dayun = asyncio.run(scenario(stub.base_url))
+    assert all(result == again for result in concurrent)
+    assert other_year == again and dayun == again  # 替身服务返回固定内容
+    assert stub.requests == 3
+    assert "2025" in stub.payloads[0]["messages"][1]["content"]
+    llm_cache_module.llm_cache.close()
@@ -0,0 +1,135 @@
+"""
+测试大模型客户端：连接复用、并发上限、429/5xx 重试与退避、DeepSeekService 经共享客户端调用本地替身服务
+"""
+import asyncio
+import os
+import sys
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.llm_stub_server import LLMStubServer
+from app.services import llm_client
+from app.services.deepseek_service import DeepSeekService
+from app.services.llm_client import LLMClient, close_llm_client, get_llm_client, set_llm_client
+from app.services.metrics import llm_tokens
+
+
+def _payload():
+    return {"model": "stub", "messages": [{"role": "user", "content": "你好"}]}
+
+
+def test_connections_reused():
+    async def scenario(url):
+        client = LLMClient(max_concurrency=4)
+        try:
+            for _ in range(5):
+                result = await client.post_json(url, _payload())
+                assert result["choices"][0]["message"]["role"] == "assistant"
+        finally:
+            await client.aclose()
+
+    with LLMStubServer() as stub:
+        asyncio.run(scenario(stub.base_url + "/chat/completions"))
+    assert stub.requests == 5
+    assert stub.connections == 1
+
+
+def test_concurrency_bounded_by_semaphore():
+    async def scenario(url):
+        client = LLMClient(max_concurrency=2)
+        try:
+            await asyncio.gather(*(client.post_json(url, _payload()) for _ in range(6)))
+        finally:
+            await client.aclose()
+
+    with LLMStubServer(latency=0.05) as stub:
+        asyncio.run(scenario(stub.base_url + "/chat/completions"))
+    assert stub.requests == 6
+    assert stub.max_concurrent == 2
+
+
+def test_retries_retryable_status_then_succeeds():
+    async def scenario(url):
+        client = LLMClient(max_retries=3, base_delay=0.01)
+        try:
+            return await client.post_json(url, _payload())
+        finally:
+            await client.aclose()
+
+    before = llm_client.llm_retries.value(reason="429")
+    with LLMStubServer() as stub:
+        stub.fail_next(429, retry_after=0)
+        stub.fail_next(503)
+        result = asyncio.run(scenario(stub.base_url + "/chat/completions"))
+    assert "choices" in result
+    assert stub.requests == 3
+    assert llm_client.llm_retries.value(reason="429") == before + 1
+
+
+def test_gives_up_after_max_retries_and_skips_client_errors():
+    async def scenario(url):
+        client = LLMClient(max_retries=1, base_delay=0.01)
+        try:
+            with pytest.raises(httpx.HTTPStatusError) as exhausted:
+                await client.post_json(url, _payload())
+            with pytest.raises(httpx.HTTPStatusError) as rejected:
+                await client.post_json(url, _payload())
+            return exhausted.value.response.status_code, rejected.value.response.status_code
+        finally:
+            await client.aclose()
+
+    with LLMStubServer() as stub:
+        stub.fail_next(503, count=2)
+        stub.fail_next(400)
+        statuses = asyncio.run(scenario(stub.base_url + "/chat/completions"))
+    assert statuses == (503, 400)
+    assert stub.requests == 3
+
+
+def test_backoff_is_jittered_and_capped():
+    client = LLMClient(base_delay=0.5, max_delay=2.0)
+    delays = [client.backoff(attempt) for attempt in range(6) for _ in range(20)]
+    assert all(0 <= delay <= 2.0 for delay in delays)
+    assert len(set(delays)) > 1
+    assert client.backoff(0, retry_after=1.5) == 1.5
+    assert client.backoff(0, retry_after=30) == 2.0
+    asyncio.run(client.aclose())
+
+
+def test_shared_client_per_event_loop():
+    async def same_loop():
+        first = get_llm_client()
+        assert get_llm_client() is first
+        return first
+
+    first = asyncio.run(same_loop())
+    second = asyncio.run(same_loop())
+    assert second is not first
+    asyncio.run(close_llm_client())
+    assert llm_client._client is None
+
+
+def test_deepseek_service_uses_shared_client(monkeypatch):
+    monkeypatch.setenv("DEEPSEEK_API_KEY", "stub-key")
+    monkeypatch.setenv("DEEPSEEK_MODEL", "stub-model")
+
+    async def scenario(base_url):
+        set_llm_client(LLMClient(max_retries=2, base_delay=0.01))
+        try:
+            service = DeepSeekService()
+            service.base_url = base_url
+            return [await service._call_api_for_structured_json("请分析") for _ in range(3)]
+        finally:
+            await close_llm_client()
+
+    before = llm_tokens.value(model="stub-model", kind="completion")
+    with LLMStubServer() as stub:
+        stub.fail_next(502)
+        results = asyncio.run(scenario(stub.base_url))
+    assert results == [{"summary": "命局平和，稳中求进。", "advice": "宜守不宜攻。"}] * 3
+    assert stub.connections == 1
+    assert stub.payloads[0]["response_format"] == {"type": "json_object"}
+    assert llm_tokens.value(model="stub-model", kind="completion") > before
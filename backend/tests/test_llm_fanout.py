@@ -0,0 +1,124 @@
+"""
+测试大运 AI 分析并发扇出：有限并发、按完成先后产出、提前结束时取消未完成调用、经本地替身服务的 SSE 端点、简化大运
+"""
+import asyncio
+import json
+import os
+import sys
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test_llm_fanout.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+from benchmarks.llm_stub_server import LLMStubServer
+from app.api.v1 import bazi as bazi_api
+from app.main import app
+from app.services import llm_cache as llm_cache_module
+from app.services.calculators import FiveElementsCalculator
+from app.services.chart_cache import clear_chart_caches
+from app.services.llm_cache import LLMCache
+from app.services.llm_fanout import bounded_as_completed
+
+BODY = {"gender": "男", "birth_datetime": "1990-10-20T10:00:00", "birth_place": "北京"}
+
+
+def test_bounded_concurrency_and_completion_order():
+    running, peak = [0], [0]
+
+    def call(delay, fail=False):
+        async def run():
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+            try:
+                await asyncio.sleep(delay)
+                if fail:
+                    raise ValueError("上游错误")
+                return delay
+            finally:
+                running[0] -= 1
+        return run
+
+    async def scenario():
+        calls = [call(0.05), call(0.01), call(0.03, fail=True), call(0.03)]
+        return [item async for item in bounded_as_completed(calls, 2)]
+
+    results = asyncio.run(scenario())
+    assert peak[0] == 2
+    assert [index for index, _, _ in results] == [1, 2, 0, 3]
+    assert results[0][1:] == (0.01, None)
+    assert results[1][1] is None and isinstance(results[1][2], ValueError)
+
+
+def test_early_exit_cancels_pending_calls():
+    started, cancelled = [], []
+
+    def call(index):
+        async def run():
+            started.append(index)
+            try:
+                await asyncio.sleep(0.01 if index == 0 else 1)
+                return index
+            except asyncio.CancelledError:
+                cancelled.append(index)
+                raise
+        return run
+
+    async def scenario():
+        results = bounded_as_completed([call(i) for i in range(5)], 3)
+        first = await results.__anext__()
+        await results.aclose()
+        return first
+
+    assert asyncio.run(scenario()) == (0, 0, None)
+    assert 4 not in started  # 第 1 个调用完成后只腾出一个并发名额
+    assert sorted(cancelled) == sorted(set(started) - {0})
+
+
+def _events(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_all_dayun_endpoint_fans_out_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache_module, "llm_cache", LLMCache(str(tmp_path / "llm.sqlite3")))
+    service = bazi_api.deepseek_service
+    monkeypatch.setattr(service, "api_key", "stub-key")
+    monkeypatch.setattr(service, "force_mock", False)
+
+    with LLMStubServer(latency=0.1) as stub, TestClient(app) as client:
+        monkeypatch.setattr(service, "base_url", stub.base_url)
+        response = client.post("/api/v1/bazi/all-dayun-analysis/stream", params={"concurrency": 3}, json=BODY)
+    assert response.status_code == 200
+    events = _events(response.text)
+    plan, dayun, done = events[0], events[1:-1], events[-1]
+    assert plan[0] == "plan" and plan[1]["concurrency"] == 3
+    cycles = plan[1]["cycles"]
+    assert cycles[1] == {"index": 1, "gan_zhi": "戊子", "start_year": "2006", "end_year": "2015"}
+    assert sorted(data["index"] for _, data in dayun) == list(range(len(cycles)))
+    assert all(event == "dayun" and data["success"] for event, data in dayun)
+    assert dayun[0][1]["analysis"]["ai_analysis"] == {"summary": "命局平和，稳中求进。", "advice": "宜守不宜攻。"}
+    assert done == ("done", {"total": len(cycles), "failed": 0, "processing_time": done[1]["processing_time"]})
+    assert stub.requests == len(cycles)
+    assert stub.max_concurrent == 3
+    assert done[1]["processing_time"] < 0.1 * len(cycles) * 0.75  # 顺序调用需 0.1 * len(cycles) 秒
+    llm_cache_module.llm_cache.close()
+
+
+def test_all_dayun_endpoint_with_fallback_cycles(monkeypatch):
+    """大运计算出错时的简化大运（字符串起运年龄、只有起止年份）同样可以分析"""
+    def broken(*args, **kwargs):
+        raise ValueError("大运计算出错")
+
+    clear_chart_caches()
+    monkeypatch.setattr(FiveElementsCalculator, "calculate_precise_dayun", broken)
+    with TestClient(app) as client:
+        response = client.post("/api/v1/bazi/all-dayun-analysis/stream", json=BODY)
+    clear_chart_caches()
+    assert response.status_code == 200
+    events = _events(response.text)
+    assert events[0][1]["cycles"][0] == {"index": 0, "gan_zhi": "甲子", "start_year": "1998", "end_year": "2007"}
+    assert events[-1][0] == "done" and events[-1][1]["failed"] == 0
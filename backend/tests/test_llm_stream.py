@@ -0,0 +1,156 @@
+"""
+测试流式 AI 分析：增量 JSON 解析、SSE 编码、经本地替身服务的流式调用与缓存、SSE 端点
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test_llm_stream.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+from benchmarks.llm_stub_server import LLMStubServer
+from app.main import app
+from app.services import llm_cache as llm_cache_module
+from app.services.deepseek_service import DeepSeekService
+from app.services.llm_cache import LLMCache
+from app.services.llm_client import LLMClient, close_llm_client, set_llm_client
+from app.services.llm_stream import IncrementalJSONParser, format_sse
+
+DOCUMENT = {
+    "overview": {"summary": "逗号, 括号 {不闭合 与 \"引号\"", "score": "80"},
+    "monthly": [{"month": 1, "fortune": "顺"}, {"month": 2, "fortune": "平]"}],
+    "note": "反斜杠 \\ 结尾\\",
+    "score": 72,
+}
+
+
+def test_parser_emits_each_field_once_closed():
+    text = "```json\n" + json.dumps(DOCUMENT, ensure_ascii=False, indent=2) + "\n```"
+    for size in (1, 3, 7, len(text)):
+        parser = IncrementalJSONParser()
+        fields = []
+        for i in range(0, len(text), size):
+            fields.extend(parser.feed(text[i:i + size]))
+        assert fields == list(DOCUMENT.items())
+        assert parser.done and parser.result == DOCUMENT
+
+
+def test_parser_yields_field_before_document_ends():
+    parser = IncrementalJSONParser()
+    assert parser.feed('{"career_wealth": {"summary": "吉"}') == []
+    assert parser.feed(', "health"') == [("career_wealth", {"summary": "吉"})]
+    assert parser.feed(': "注意休息"}') == [("health", "注意休息")]
+    assert parser.done
+
+
+def test_parser_records_malformed_fields():
+    parser = IncrementalJSONParser()
+    assert parser.feed('{"a": 1, "b": tru, "c": 3}') == [("a", 1), ("c", 3)]
+    assert parser.done and parser.errors == ['"b": tru']
+
+
+def test_format_sse():
+    assert format_sse("field", {"key": "a", "value": "甲"}, 3) == 'id: 3\nevent: field\ndata: {"key":"a","value":"甲"}\n\n'
+
+
+def _collect(events):
+    async def run():
+        collected = []
+        async for event, data in events:
+            collected.append((time.perf_counter(), event, data))
+        return collected
+    return run
+
+
+def test_service_streams_fields_and_caches(tmp_path, monkeypatch):
+    monkeypatch.setenv("DEEPSEEK_API_KEY", "stub-key")
+    monkeypatch.setattr(llm_cache_module, "llm_cache", LLMCache(str(tmp_path / "llm.sqlite3")))
+    bazi_data = {"bazi_characters": {"day_stem": "甲"}, "major_cycles": []}
+
+    async def scenario(base_url):
+        set_llm_client(LLMClient(base_delay=0.01))
+        try:
+            service = DeepSeekService()
+            service.base_url = base_url
+            start = time.perf_counter()
+            first = await _collect(service.stream_detailed_fortune_analysis(bazi_data, "2025"))()
+            second = await _collect(service.stream_detailed_fortune_analysis(bazi_data, "2025"))()
+            return start, first, second
+        finally:
+            await close_llm_client()
+
+    with LLMStubServer(responder=lambda payload: DOCUMENT, chunk_chars=4, token_latency=0.005) as stub:
+        stub.fail_next(503)  # 收到响应头前的错误照常重试
+        start, first, second = asyncio.run(scenario(stub.base_url))
+    assert stub.requests == 2
+    assert stub.payloads[-1]["stream"] is True
+
+    fields = [data for _, event, data in first if event == "field"]
+    assert [(f["key"], f["value"]) for f in fields] == list(DOCUMENT.items())
+    assert "".join(data["text"] for _, event, data in first if event == "delta") == json.dumps(DOCUMENT, ensure_ascii=False)
+    first_field_at = next(at for at, event, _ in first if event == "field")
+    done_at, done, done_data = first[-1]
+    assert done == "done" and done_data == {"result": DOCUMENT, "source": "llm"}
+    assert first_field_at - start < (done_at - start) / 2
+
+    assert [event for _, event, _ in second] == ["field"] * len(DOCUMENT) + ["done"]
+    assert second[-1][2] == {"result": DOCUMENT, "source": "cache"}
+    llm_cache_module.llm_cache.close()
+
+
+def test_malformed_stream_is_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setenv("DEEPSEEK_API_KEY", "stub-key")
+    monkeypatch.setattr(llm_cache_module, "llm_cache", LLMCache(str(tmp_path / "llm.sqlite3")))
+    bazi_data = {"bazi_characters": {"day_stem": "甲"}, "major_cycles": []}
+
+    async def scenario(base_url):
+        set_llm_client(LLMClient())
+        try:
+            service = DeepSeekService()
+            service.base_url = base_url
+            first = await _collect(service.stream_detailed_fortune_analysis(bazi_data, "2025"))()
+            second = await _collect(service.stream_detailed_fortune_analysis(bazi_data, "2025"))()
+            return first, second
+        finally:
+            await close_llm_client()
+
+    malformed = '{"a": 1, "b": tru, "c": 3}'
+    with LLMStubServer(responder=lambda payload: malformed, chunk_chars=4) as stub:
+        first, second = asyncio.run(scenario(stub.base_url))
+    assert stub.requests == 2  # 第二次未命中缓存
+    for events in (first, second):
+        _, event, data = events[-1]
+        assert event == "done" and data["source"] == "llm"
+        assert data["result"] == {"error": "Failed to parse LLM response as JSON", "raw_response": malformed}
+    llm_cache_module.llm_cache.close()
+
+
+def _events(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_sse_endpoints_in_mock_mode():
+    body = {"gender": "男", "birth_datetime": "1990-10-20T10:00:00", "birth_place": "北京"}
+    with TestClient(app) as client:
+        dayun = client.post("/api/v1/bazi/single-dayun-analysis/stream",
+                            params={"cycle_gan_zhi": "戊子", "cycle_start_year": "1998", "cycle_end_year": "2007"},
+                            json=body)
+        current = client.post("/api/v1/bazi/current-year-ai-analysis/stream", json=body)
+    assert dayun.status_code == 200
+    assert dayun.headers["content-type"].startswith("text/event-stream")
+    events = _events(dayun.text)
+    assert events[0][0] == "analysis" and events[0][1]["gan_zhi"] == "戊子"
+    assert events[-1][0] == "done" and events[-1][1]["source"] == "mock"
+    assert {data["key"] for event, data in events if event == "field"} == set(events[-1][1]["result"])
+
+    events = _events(current.text)
+    assert events[-1][0] == "done"
+    assert [data["key"] for event, data in events if event == "field"] == list(events[-1][1]["result"])
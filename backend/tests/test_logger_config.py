@@ -0,0 +1,60 @@
+"""
+测试日志配置：queue 模式下记录经后台线程写出、停止时写出剩余记录、排盘明细日志采样
+"""
+import logging
+import logging.handlers
+import os
+import sys
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import logger_config
+from app.services.logger_config import LogSampler, detail_sampler, setup_logger, stop_log_listener
+
+
+def test_queue_mode_writes_in_background(monkeypatch):
+    monkeypatch.setenv("BAZI_LOG_MODE", "queue")
+    name = f"test_queue_{uuid.uuid4().hex[:8]}"
+    logger = setup_logger(name)
+    assert [type(handler) for handler in logger.handlers] == [logger_config._QueueHandler]
+
+    logger.info("排盘 %s 完成，耗时 %.2f ms", "甲子", 1.234)
+    stop_log_listener()
+    log_file = logger_config._log_file(name)
+    try:
+        with open(log_file, encoding="utf-8") as f:
+            assert "排盘 甲子 完成，耗时 1.23 ms" in f.read()
+        # 停止后再有记录时自动重启后台线程
+        logger.warning("重启后的记录")
+        assert logger_config._listener is not None
+    finally:
+        stop_log_listener()
+        os.remove(log_file)
+
+
+def test_sync_mode_keeps_direct_handlers(monkeypatch):
+    monkeypatch.setenv("BAZI_LOG_MODE", "sync")
+    name = f"test_sync_{uuid.uuid4().hex[:8]}"
+    logger = setup_logger(name)
+    try:
+        assert {type(handler) for handler in logger.handlers} == {logging.StreamHandler, logging.FileHandler}
+    finally:
+        for handler in logger.handlers:
+            handler.close()
+        os.remove(logger_config._log_file(name))
+
+
+def test_sampler():
+    sampler = LogSampler(3)
+    assert [sampler() for _ in range(7)] == [True, False, False, True, False, False, True]
+    assert all(LogSampler(0)() for _ in range(3))
+
+
+def test_detail_sampler_requires_debug():
+    logger = logging.getLogger(f"test_detail_{uuid.uuid4().hex[:8]}")
+    logger.setLevel(logging.INFO)
+    sample = detail_sampler(logger, every=2)
+    assert not any(sample() for _ in range(4))
+    logger.setLevel(logging.DEBUG)
+    assert [sample() for _ in range(4)] == [True, False, True, False]
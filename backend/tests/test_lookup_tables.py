@@ -0,0 +1,55 @@
+"""
+测试预计算查找表与 constants.py 一致
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import lookup_tables as lt
+from app.services.constants import (
+    TIANGAN, DIZHI, JIAZI_TABLE, CHANG_SHENG_MAPPING, XUNKONG_MAPPING, BRANCH_HIDDEN_STEMS
+)
+
+
+def test_table_shapes():
+    assert len(lt.TEN_GOD_TABLE) == 10 and all(len(row) == 10 for row in lt.TEN_GOD_TABLE)
+    assert len(lt.CHANG_SHENG_TABLE) == 10 and all(len(row) == 12 for row in lt.CHANG_SHENG_TABLE)
+    assert len(lt.NAYIN_TABLE) == 60 and len(lt.XUNKONG_TABLE) == 60
+    assert len(lt.HIDDEN_STEMS_TABLE) == 12
+    assert "未知" not in {god for row in lt.TEN_GOD_TABLE for god in row}
+
+
+def test_ten_god():
+    assert lt.ten_god("甲", "甲") == "比肩"
+    assert lt.ten_god("甲", "乙") == "劫财"
+    assert lt.ten_god("甲", "丙") == "食神"
+    assert lt.ten_god("甲", "戊") == "偏财"
+    assert lt.ten_god("甲", "庚") == "七杀"
+    assert lt.ten_god("甲", "辛") == "正官"
+    assert lt.ten_god("甲", "癸") == "正印"
+    assert lt.ten_god("甲", "X") == "未知"
+
+
+def test_chang_sheng_matches_constants():
+    for stem in TIANGAN:
+        for branch in DIZHI:
+            assert lt.chang_sheng(stem, branch) == CHANG_SHENG_MAPPING[stem][branch]
+    # 阴干逆行：乙长生在午、沐浴在巳
+    assert lt.chang_sheng_index(TIANGAN.index("乙"), DIZHI.index("午")) == 0
+    assert lt.chang_sheng_index(TIANGAN.index("乙"), DIZHI.index("巳")) == 1
+    assert lt.chang_sheng_index(-1, 0) == -1
+
+
+def test_jiazi_tables():
+    assert lt.nayin("甲", "子") == ("海中金", 3)
+    assert lt.nayin("甲", "丑") == ("未知", -1)
+    for ganzhi in JIAZI_TABLE:
+        assert lt.xunkong(ganzhi) == XUNKONG_MAPPING[ganzhi]
+
+
+def test_hidden_stems_sorted_by_weight():
+    for branch_idx, branch in enumerate(DIZHI):
+        entries = lt.HIDDEN_STEMS_TABLE[branch_idx]
+        assert {TIANGAN[s]: w for s, w in entries} == BRANCH_HIDDEN_STEMS[branch]
+        assert [w for _, w in entries] == sorted((w for _, w in entries), reverse=True)
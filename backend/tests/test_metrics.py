@@ -0,0 +1,96 @@
+"""
+测试指标：Prometheus 文本格式导出、路由耗时直方图、排盘分段耗时与 Server-Timing 响应头、缓存与执行器指标
+"""
+import os
+import sys
+from datetime import datetime
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test_metrics.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.schemas.bazi import BaziCalculateRequest
+from app.services.chart_cache import clear_chart_caches
+from app.services.metrics import (
+    MetricsRegistry, chart_stage_duration, http_request_duration, llm_tokens, record_llm_call
+)
+
+
+def _payload():
+    request = BaziCalculateRequest(gender="男", birth_datetime=datetime(1992, 11, 3, 7, 20), birth_place="杭州")
+    return request.model_dump(mode="json")
+
+
+def _requests(route, status):
+    # 路由标签为路由模板；不同 FastAPI 版本下是否含 include_router 的外层前缀不同
+    return sum(http_request_duration.count(method="POST", route=prefix + route, status=status)
+               for prefix in ("", "/api/v1"))
+
+
+def test_render_text_format():
+    registry = MetricsRegistry()
+    counter = registry.counter("demo_events_total", "事件数", ("kind",))
+    histogram = registry.histogram("demo_seconds", "耗时", (), buckets=(0.1, 1.0))
+    registry.register_collector("demo_size", "gauge", "大小", lambda: [("", {"name": 'a"b'}, 3)])
+    counter.inc(kind="x")
+    counter.inc(2, kind="x")
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value)
+    assert registry.render().splitlines() == [
+        "# HELP demo_events_total 事件数",
+        "# TYPE demo_events_total counter",
+        'demo_events_total{kind="x"} 3',
+        "# HELP demo_seconds 耗时",
+        "# TYPE demo_seconds histogram",
+        'demo_seconds_bucket{le="0.1"} 1',
+        'demo_seconds_bucket{le="1"} 2',
+        'demo_seconds_bucket{le="+Inf"} 3',
+        "demo_seconds_sum 5.55",
+        "demo_seconds_count 3",
+        "# HELP demo_size 大小",
+        "# TYPE demo_size gauge",
+        'demo_size{name="a\\"b"} 3',
+    ]
+
+
+def test_chart_route_timing_and_server_timing_header():
+    clear_chart_caches()
+    before = _requests("/bazi/calculate-test", "200")
+    stage_before = chart_stage_duration.count(stage="chart")
+    with TestClient(app) as client:
+        response = client.post("/api/v1/bazi/calculate-test", json=_payload())
+        invalid = client.post("/api/v1/bazi/calculate-test", json={})
+        metrics = client.get("/metrics")
+    assert response.status_code == 200
+    entries = [entry.split(";dur=")[0] for entry in response.headers["server-timing"].split(", ")]
+    assert {"location", "solar_time", "chart", "major_cycles", "total"} <= set(entries)
+    assert invalid.status_code == 422
+    assert _requests("/bazi/calculate-test", "200") == before + 1
+    assert _requests("/bazi/calculate-test", "422") >= 1
+    assert chart_stage_duration.count(stage="chart") == stage_before + 1
+
+    assert metrics.status_code == 200
+    assert metrics.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = metrics.text
+    assert 'bazi_chart_stage_duration_seconds_bucket{stage="chart",le="+Inf"}' in text
+    assert 'bazi_chart_cache_misses_total{cache="static"} 1' in text
+    assert "bazi_chart_executor_queue_depth" in text
+    clear_chart_caches()
+
+
+def test_iching_route_timed():
+    before = _requests("/iching/test-divine", "200")
+    with TestClient(app) as client:
+        response = client.post("/api/v1/iching/test-divine", json={"question": "测试", "divination_method": "coins"})
+    assert response.status_code == 200
+    assert _requests("/iching/test-divine", "200") == before + 1
+
+
+def test_llm_call_recorded():
+    before = llm_tokens.value(model="demo-model", kind="completion")
+    record_llm_call("demo-model", 1.5, "ok", {"prompt_tokens": 120, "completion_tokens": 30, "total_tokens": 150})
+    record_llm_call("demo-model", 0.2, "error")
+    assert llm_tokens.value(model="demo-model", kind="completion") == before + 30
+    assert llm_tokens.value(model="demo-model", kind="prompt") >= 120
@@ -0,0 +1,67 @@
+"""
+四柱纯算术排盘与 lunar_python 差分测试
+默认按日期步长抽样扫描全部年份的每个时辰；节交接时刻前后（±1 个时辰）全部校验。
+标记为 slow 的测试逐日校验 1900-2100 年每个时辰的起始时刻（约 25 分钟），默认不运行，
+用 pytest -m slow 执行（CI 中单独运行）。
+"""
+import os
+import sys
+from datetime import date, datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.pillar_engine import (
+    get_pillar_engine, lunar_four_pillars, calculate_four_pillars, MIN_YEAR, MAX_YEAR
+)
+from app.services.solar_terms_index import from_epoch
+
+# 每个时辰取一个时刻，子时分早子（0 点）与晚子（23 点）
+SLOT_HOURS = (0, 1, 3, 5, 7, 9, 11, 13, 15, 17, 19, 21, 23)
+DAY_STEP = 193
+SLOT_SECONDS = 2 * 3600
+
+
+def _assert_same(engine, dt):
+    assert engine.calculate(dt) == lunar_four_pillars(dt), dt
+
+
+def _sweep_days(engine, step, minute):
+    day = date(MIN_YEAR, 1, 1)
+    last = date(MAX_YEAR, 12, 31)
+    while day <= last:
+        for hour in SLOT_HOURS:
+            _assert_same(engine, datetime(day.year, day.month, day.day, hour, minute))
+        day += timedelta(days=step)
+
+
+def test_sampled_slots_across_supported_years():
+    _sweep_days(get_pillar_engine(), DAY_STEP, 30)
+
+
+@pytest.mark.slow
+def test_every_slot_boundary_across_supported_years():
+    """逐日校验每个时辰的起始时刻（0 点换日、23 点起晚子时）"""
+    _sweep_days(get_pillar_engine(), 1, 0)
+
+
+def test_every_jie_boundary():
+    engine = get_pillar_engine()
+    for instant in engine._jie_instants:
+        for delta in (-SLOT_SECONDS, -1, 0, SLOT_SECONDS):
+            dt = from_epoch(instant + delta)
+            if MIN_YEAR <= dt.year <= MAX_YEAR:
+                _assert_same(engine, dt)
+
+
+def test_known_chart_and_palaces():
+    pillars = calculate_four_pillars(datetime(1990, 4, 29, 10, 30))
+    assert pillars.pillars() == ("庚午", "庚辰", "甲子", "己巳")
+    assert pillars == lunar_four_pillars(datetime(1990, 4, 29, 10, 30))
+
+
+def test_out_of_range_falls_back_to_lunar_python():
+    dt = datetime(1850, 6, 1, 12, 0)
+    assert get_pillar_engine().calculate(dt) is None
+    assert calculate_four_pillars(dt) == lunar_four_pillars(dt)
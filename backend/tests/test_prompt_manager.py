@@ -0,0 +1,131 @@
+"""
+测试提示词生成：紧凑命盘编码的确定性与 token 预算、模板不重复角色设定、两种命盘数据结构、流年所属大运、提示词 token 估算上报
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.llm_stub_server import LLMStubServer
+from app.services import llm_cache as llm_cache_module
+from app.services.deepseek_service import DeepSeekService
+from app.services.llm_cache import LLMCache
+from app.services.llm_client import LLMClient, close_llm_client, set_llm_client
+from app.services.metrics import llm_prompt_tokens_estimated
+from app.services.prompt_manager import PromptManager
+
+CHART = {
+    "gender": "男",
+    "solar_date": "1990-10-20 10:00",
+    "bazi": {"year": {"gan": "庚", "zhi": "午"}, "month": {"gan": "丙", "zhi": "戌"},
+             "day": {"gan": "戊", "zhi": "午"}, "hour": {"gan": "丁", "zhi": "巳"}},
+    "nayin": {"year": "路旁土", "month": "屋上土", "day": "天上火", "hour": "沙中土"},
+    "five_elements": {"day_master_element": "土", "strength": "身强", "favorable_elements": ["金", "水"],
+                      "percentage": {"土": "28.000000000000004%", "火": "61%", "金": "11.5%", "木": "0%", "水": "0%"}},
+    "major_cycles": [{"gan_zhi": "丁亥", "start_age": 6, "end_age": 15},
+                     {"gan_zhi": "戊子", "start_age": 16, "end_age": 25},
+                     {"gan_zhi": "己丑", "start_age": 26, "end_age": 35},
+                     {"gan_zhi": "庚寅", "start_age": 36, "end_age": 45}],
+    "shen_sha_details": [{"name": "禄神", "position": "时", "active": True},
+                         {"name": "天乙贵人", "position": "", "active": False},
+                         {"name": "华盖", "position": "月", "active": True}],
+    "interactions": {"active_shensha": [{"name": "禄神", "position": "时"}],
+                     "stem_combinations": [{"type": "天干五合", "combination": "戊癸"}]},
+}
+
+# 排盘接口返回的结构（bazi_characters / na_yin 列表）
+RESPONSE_CHART = {
+    "bazi_characters": {"year_stem": "庚", "year_branch": "午", "month_stem": "丙", "month_branch": "戌",
+                        "day_stem": "戊", "day_branch": "午", "hour_stem": "丁", "hour_branch": "巳"},
+    "na_yin": {"year_na_yin": ["路旁土", "土"], "day_na_yin": ["天上火", "火"]},
+    "day_master_element": "土",
+    "day_master_strength": "身强",
+    "five_elements_score": {"金": 0.115, "火": 0.61},
+    "current_year_fortune": {"year": 2025, "age": 35, "gan_zhi": "乙巳", "ten_god": "正官"},
+    "major_cycles": [{"ganzhi": "戊子", "start_age": 16, "end_age": 25},
+                     {"ganzhi": "己丑", "start_age": 26, "end_age": 35}],
+}
+
+
+def test_compact_encoding_is_deterministic():
+    reordered = dict(reversed(list(CHART.items())))
+    reordered["five_elements"] = dict(CHART["five_elements"],
+                                      percentage=dict(reversed(list(CHART["five_elements"]["percentage"].items()))))
+    text = PromptManager.encode_chart_compact(CHART, token_budget=1000)
+    assert text == PromptManager.encode_chart_compact(reordered, token_budget=1000)
+    assert text.splitlines() == [
+        "性别男 生1990-10-20 10:00",
+        "四柱 庚午(路旁土) 丙戌(屋上土) 戊午(天上火) 丁巳(沙中土)",
+        "日主 戊土 身强",
+        "五行% 金12 木0 水0 火61 土28",
+        "喜用 金 水",
+        "大运 丁亥6-15 戊子16-25 己丑26-35 庚寅36-45",
+        "神煞 禄神(时) 华盖(月)",
+        "互动 天干五合:戊癸",
+    ]
+
+
+def test_token_budget_drops_low_priority_items():
+    full = PromptManager.encode_chart_compact(CHART, token_budget=1000)
+    core = PromptManager.encode_chart_compact(CHART, token_budget=0)
+    assert core.splitlines() == full.splitlines()[:4]
+    for budget in range(PromptManager.estimate_tokens(core), PromptManager.estimate_tokens(full) + 1):
+        text = PromptManager.encode_chart_compact(CHART, token_budget=budget)
+        assert PromptManager.estimate_tokens(text) <= budget
+    partial = PromptManager.encode_chart_compact(CHART, token_budget=PromptManager.estimate_tokens(full) - 8)
+    assert "大运 丁亥6-15" in partial and "互动" not in partial
+
+
+def test_response_shape_and_markdown_fallback(monkeypatch):
+    text = PromptManager.format_bazi_data_for_prompt(RESPONSE_CHART)
+    assert "四柱 庚午(路旁土) 丙戌 戊午(天上火) 丁巳" in text
+    assert "五行% 金12 火61" in text and "流年 2025乙巳 正官" in text
+    monkeypatch.setenv("BAZI_PROMPT_FORMAT", "markdown")
+    markdown = PromptManager.format_bazi_data_for_prompt(CHART)
+    assert "年柱: 庚午 (纳音: 路旁土)" in markdown and "禄神(时)" in markdown
+    assert PromptManager.prompt_signature().startswith("markdown:")
+
+
+def test_templates_do_not_repeat_persona():
+    persona = PromptManager.get_master_persona_prompt()
+    prompts = [
+        PromptManager.generate_comprehensive_analysis_prompt(CHART),
+        PromptManager.generate_dayun_analysis_prompt(CHART, {"gan_zhi": "戊子", "start_age": 16, "end_age": 25}),
+        PromptManager.generate_liunian_analysis_prompt(CHART, 2012),
+        PromptManager.generate_single_dayun_prompt(CHART, {"gan_zhi": "戊子", "start_year": 2006, "end_year": 2015}),
+    ]
+    for prompt in prompts:
+        assert persona[:20] not in prompt and "八字大师" not in prompt
+    assert "所属大运：戊子 (16-25岁)" in prompts[2]
+    assert "前期2006-2009年" in prompts[3]
+
+
+def test_find_dayun_for_year():
+    assert PromptManager.find_dayun_for_year(CHART, 2018) == "己丑 (26-35岁)"
+    assert PromptManager.find_dayun_for_year(RESPONSE_CHART, 2008) == "戊子 (16-25岁)"
+    assert PromptManager.find_dayun_for_year(CHART, 1992) == "无"
+
+
+def test_estimated_prompt_tokens_reported(tmp_path, monkeypatch):
+    monkeypatch.setenv("DEEPSEEK_API_KEY", "stub-key")
+    monkeypatch.setattr(llm_cache_module, "llm_cache", LLMCache(str(tmp_path / "llm.sqlite3")))
+    service_model = DeepSeekService().model
+    before = llm_prompt_tokens_estimated.count(model=service_model, prompt="liunian")
+
+    async def scenario(base_url):
+        set_llm_client(LLMClient())
+        try:
+            service = DeepSeekService()
+            service.base_url = base_url
+            await service.generate_detailed_fortune_analysis(CHART, "2025")
+        finally:
+            await close_llm_client()
+
+    with LLMStubServer() as stub:
+        asyncio.run(scenario(stub.base_url))
+    assert llm_prompt_tokens_estimated.count(model=service_model, prompt="liunian") == before + 1
+    messages = stub.payloads[0]["messages"]
+    assert [m["role"] for m in messages] == ["system", "user"]
+    assert "八字大师" in messages[0]["content"] and "八字大师" not in messages[1]["content"]
+    llm_cache_module.llm_cache.close()
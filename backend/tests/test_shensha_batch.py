@@ -0,0 +1,117 @@
+"""
+测试神煞批量计算：在 CSV 案例库上与逐盘 ShenShaCalculator 结果完全一致
+"""
+import csv
+import glob
+import json
+import os
+import sys
+from datetime import datetime
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.services.core import Bazi, StemBranch
+from app.services.calculators import ShenShaCalculator
+from app.services.constants import JIAZI_TABLE, TIANGAN, DIZHI
+from app.services.shensha_batch import calculate_shensha_batch_for_charts, encode_charts
+
+POSITION_COLUMNS = {"年": 0, "月": 1, "日": 2, "时": 3}
+
+
+def load_case_charts():
+    """读取仓库根目录下的八字案例 CSV，返回可解析的命盘列表"""
+    charts = []
+    for path in sorted(glob.glob(os.path.join(BACKEND_DIR, "..", "八字命理案例数据*.csv"))):
+        with open(path, encoding="utf-8-sig") as f:
+            for row in csv.DictReader(f):
+                try:
+                    pillars = [row[k][:2] for k in ("标准_年柱", "标准_月柱", "标准_日柱", "标准_时柱")]
+                    birth_time = datetime(int(row["阳历生日_年"]), int(row["阳历生日_月"]),
+                                          int(row["阳历生日_日"]), int(row["阳历生日_时"] or 0))
+                    bazi = Bazi(*(StemBranch(p[0], p[1]) for p in pillars), gender=row["性别"], birth_time=birth_time)
+                except (KeyError, ValueError, IndexError):
+                    continue
+                if any(p.stem not in TIANGAN or p.branch not in DIZHI for p in (bazi.year, bazi.month, bazi.day, bazi.hour)):
+                    continue
+                charts.append(bazi)
+    return charts
+
+
+def synthetic_charts():
+    """覆盖全部六十甲子日柱与十二个月份的合成命盘"""
+    charts = []
+    for i, day in enumerate(JIAZI_TABLE):
+        for month in range(1, 13):
+            year, month_pillar, hour = JIAZI_TABLE[(i * 7) % 60], JIAZI_TABLE[(i * 5 + month) % 60], JIAZI_TABLE[(i * 11 + month) % 60]
+            charts.append(Bazi(*(StemBranch(p[0], p[1]) for p in (year, month_pillar, day, hour)),
+                               gender="女", birth_time=datetime(2000, month, 15)))
+    return charts
+
+
+def expected_mask(position: str) -> list:
+    mask = [False] * 4
+    for name in position.replace("柱", "").replace(", ", ""):
+        mask[POSITION_COLUMNS[name]] = True
+    return mask
+
+
+def test_batch_matches_per_chart_calculation():
+    charts = load_case_charts() + synthetic_charts()
+    assert charts
+    calculator = ShenShaCalculator()
+    result = calculate_shensha_batch_for_charts(charts)
+    assert result.active.shape == (len(charts), len(calculator.rules))
+    assert result.positions.shape == (len(charts), len(calculator.rules), 4)
+
+    for i, chart in enumerate(charts):
+        per_chart = calculator.calculate(chart)
+        for j, key in enumerate(result.keys):
+            sha = per_chart[key]
+            assert bool(result.active[i, j]) == sha.active, (i, key)
+            if sha.active:
+                assert result.positions[i, j].tolist() == expected_mask(sha.position), (i, key, sha.position)
+
+
+def test_encode_rejects_invalid_characters():
+    bad = Bazi(StemBranch("甲", "子"), StemBranch("X", "寅"), StemBranch("戊", "辰"), StemBranch("庚", "申"), gender="男")
+    try:
+        encode_charts([bad])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("无效干支应抛出 ValueError")
+
+
+def test_empty_batch():
+    result = calculate_shensha_batch_for_charts([])
+    assert result.active.shape[0] == 0
+    assert result.active.dtype == np.bool_
+
+
+def test_batch_matches_on_custom_rules(tmp_path):
+    """月令、德合、童子煞等在默认规则中不易触发的计算方法同样一致"""
+    rules = [
+        {"key": "month_test", "name": "月测", "calc_method": "month_based",
+         "month_rules": {str(m): [TIANGAN[m % 10], TIANGAN[(m + 3) % 10]] for m in range(1, 13)}},
+        {"key": "yuedehe_test", "name": "月德合测", "calc_method": "stem_combination", "base_method": "月德"},
+        {"key": "tiandehe_test", "name": "天德合测", "calc_method": "stem_combination"},
+        {"key": "tongzi_test", "name": "童子测", "calc_method": "complex_formula", "formula_type": "童子煞"},
+        {"key": "day_test", "name": "日测", "calc_method": "specific_days", "specific_days": JIAZI_TABLE[::7]},
+    ]
+    rule_file = tmp_path / "rules.json"
+    rule_file.write_text(json.dumps({"rules": rules}, ensure_ascii=False), encoding="utf-8")
+
+    charts = synthetic_charts()
+    calculator = ShenShaCalculator(str(rule_file))
+    result = calculate_shensha_batch_for_charts(charts, rule_file=str(rule_file))
+    assert result.active.any(axis=0).all()
+    for i, chart in enumerate(charts):
+        per_chart = calculator.calculate(chart)
+        for j, key in enumerate(result.keys):
+            sha = per_chart[key]
+            assert bool(result.active[i, j]) == sha.active, (i, key)
+            if sha.active:
+                assert result.positions[i, j].tolist() == expected_mask(sha.position), (i, key, sha.position)
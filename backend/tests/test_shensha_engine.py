@@ -0,0 +1,96 @@
+"""
+测试神煞规则编译引擎：查表结果与逐条规则计算一致，规则文件变更时热重载，损坏的规则文件只解析一次
+"""
+import json
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.core import Bazi, StemBranch
+from app.services.calculators import ShenShaCalculator
+from app.services.constants import JIAZI_TABLE
+from app.services import shensha_engine
+from app.services.shensha_engine import get_compiled_rules
+
+
+def _make_bazi(year, month, day, hour, birth_month=2):
+    pillars = [StemBranch(p[0], p[1]) for p in (year, month, day, hour)]
+    return Bazi(*pillars, gender="男", birth_time=datetime(1990, birth_month, 15, 12))
+
+
+def test_rules_compiled_once_per_process():
+    """多个计算器实例共享同一份编译规则"""
+    a = ShenShaCalculator()
+    b = ShenShaCalculator()
+    assert a.rules is b.rules
+    assert get_compiled_rules() is a._rule_set
+
+
+def test_compiled_matches_dispatch():
+    """查表计算与原 if/elif 派发结果一致"""
+    calculator = ShenShaCalculator()
+    for i, day in enumerate(JIAZI_TABLE):
+        bazi = _make_bazi(JIAZI_TABLE[(i * 7) % 60], JIAZI_TABLE[(i * 5 + 3) % 60], day,
+                          JIAZI_TABLE[(i * 11) % 60], birth_month=i % 12 + 1)
+        result = calculator.calculate(bazi)
+        for rule in calculator.rules:
+            expected = calculator._dispatch_shensha_calculation(rule, bazi)
+            actual = result[rule["key"]]
+            if expected is None:
+                assert not actual.active
+            else:
+                assert actual.active
+                assert actual.position == expected.position
+                assert abs(actual.strength - expected.strength) < 1e-9
+
+
+def test_hot_reload_on_mtime_change(tmp_path):
+    """规则文件 mtime 变化后自动重新编译"""
+    rule = {
+        "key": "test_sha", "name": "测试煞", "calc_method": "base_zhi_lookup",
+        "base_zhi_types": ["day_branch"], "rules": {"子": "午"}
+    }
+    rule_file = tmp_path / "rules.json"
+    rule_file.write_text(json.dumps({"rules": [rule]}, ensure_ascii=False), encoding="utf-8")
+
+    calculator = ShenShaCalculator(str(rule_file))
+    bazi = _make_bazi("甲子", "丙寅", "戊子", "戊午")
+    assert calculator.calculate(bazi)["test_sha"].position == "时"
+
+    rule["rules"] = {"子": "寅"}
+    rule_file.write_text(json.dumps({"rules": [rule]}, ensure_ascii=False), encoding="utf-8")
+    stat = os.stat(rule_file)
+    os.utime(rule_file, (stat.st_atime, stat.st_mtime + 10))
+
+    assert calculator.calculate(bazi)["test_sha"].position == "月"
+    assert ShenShaCalculator(str(rule_file)).rules_dict["test_sha"]["rules"] == {"子": "寅"}
+
+
+def test_broken_rule_file_parsed_once(tmp_path, monkeypatch):
+    """规则文件损坏时沿用旧规则，同一 mtime 只解析一次"""
+    rule = {
+        "key": "test_sha", "name": "测试煞", "calc_method": "base_zhi_lookup",
+        "base_zhi_types": ["day_branch"], "rules": {"子": "午"}
+    }
+    rule_file = tmp_path / "rules.json"
+    rule_file.write_text(json.dumps({"rules": [rule]}, ensure_ascii=False), encoding="utf-8")
+    original = get_compiled_rules(str(rule_file))
+
+    rule_file.write_text('{"rules": [', encoding="utf-8")
+    stat = os.stat(rule_file)
+    os.utime(rule_file, (stat.st_atime, stat.st_mtime + 10))
+    loads = []
+    real_load = shensha_engine.json.load
+    monkeypatch.setattr(shensha_engine.json, "load", lambda f: loads.append(f.name) or real_load(f))
+
+    for _ in range(3):
+        assert get_compiled_rules(str(rule_file)) is original
+    assert len(loads) == 1
+
+    rule["rules"] = {"子": "寅"}
+    rule_file.write_text(json.dumps({"rules": [rule]}, ensure_ascii=False), encoding="utf-8")
+    os.utime(rule_file, (stat.st_atime, stat.st_mtime + 20))
+    assert get_compiled_rules(str(rule_file)).rules_dict["test_sha"]["rules"] == {"子": "寅"}
+    assert len(loads) == 2
@@ -0,0 +1,74 @@
+"""
+测试节气索引：前后最近节气查找与逐项扫描一致
+"""
+import json
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.solar_terms_index import (
+    SolarTermIndex, get_solar_term_index, parse_term_time, SOLAR_TERM_CODES, JIE_CODES, BACKEND_DIR, DEFAULT_SOLAR_TERMS_FILE
+)
+from app.services.calculators import FiveElementsCalculator
+
+
+def _flat_terms():
+    with open(os.path.join(BACKEND_DIR, DEFAULT_SOLAR_TERMS_FILE), "r", encoding="utf-8") as f:
+        data = json.load(f)
+    terms = [(parse_term_time(text), name) for year in data.values() for name, text in year.items()]
+    return sorted(terms, key=lambda term: term[0])
+
+
+def test_index_loaded_once():
+    index = get_solar_term_index()
+    assert index is get_solar_term_index()
+    assert len(index) == len(_flat_terms())
+    assert all(code in JIE_CODES for code in index.jie_codes)
+
+
+def test_lookup_matches_linear_scan():
+    index = get_solar_term_index()
+    jie = [term for term in _flat_terms() if SOLAR_TERM_CODES[term[1]] in JIE_CODES]
+    rng = random.Random(11)
+    samples = [term_dt for term_dt, _ in jie[::37]]  # 恰好落在节气时刻
+    samples += [datetime(1901, 1, 1) + timedelta(minutes=rng.randrange(0, 148 * 365 * 1440)) for _ in range(300)]
+    for dt in samples:
+        prev_term = next_term = None
+        for term_dt, name in jie:
+            if term_dt <= dt:
+                prev_term = (term_dt, name)
+            if term_dt > dt and not next_term:
+                next_term = (term_dt, name)
+        prev_found, next_found = index.surrounding(dt)
+        assert (prev_found.time, prev_found.name) == prev_term
+        assert (next_found.time, next_found.name) == next_term
+
+
+def test_out_of_range_and_explicit_terms():
+    index = get_solar_term_index()
+    assert index.previous(datetime(1800, 1, 1)) is None
+    assert index.next(datetime(2200, 1, 1)) is None
+
+    custom = SolarTermIndex.from_terms([
+        {"name": "惊蛰", "datetime": "2024-03-05 10:23:00"},
+        {"name": "立春", "datetime": "2024-02-04 16:27"},
+        {"name": "雨水", "datetime": "2024-02-19 12:13"},
+    ])
+    prev_term, next_term = custom.surrounding(datetime(2024, 2, 20), jie_only=False)
+    assert (prev_term.name, next_term.name) == ("雨水", "惊蛰")
+    assert custom.previous(datetime(2024, 2, 20)).name == "立春"
+    assert custom.next(datetime(2024, 3, 5, 10, 23)) is None
+
+
+def test_precise_dayun_uses_index():
+    # 1990-04-29 10:30 阳年男顺排，下一个节为 1990-05-06 立夏
+    start_date, start_days, luck_pillars, start_age = FiveElementsCalculator.calculate_precise_dayun(
+        datetime(1990, 4, 29, 10, 30), "男", "庚", "庚辰"
+    )
+    ref = get_solar_term_index().next(datetime(1990, 4, 29, 10, 30))
+    assert ref.name == "立夏"
+    assert start_days == (ref.time - datetime(1990, 4, 29, 10, 30)).days
+    assert [str(d.stem_branch) for d in luck_pillars[:2]] == ["辛巳", "壬午"]
@@ -0,0 +1,58 @@
+"""
+测试二进制节气库：构建、内存映射读取与节气表 JSON 一致
+"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.solar_terms_index import SolarTermIndex, parse_term_time, BACKEND_DIR
+from app.services.solar_terms_store import (
+    build_store, SolarTermStore, get_solar_term_store, HEADER, TERMS_PER_YEAR, START_YEAR, END_YEAR
+)
+
+SOURCE = os.path.join(BACKEND_DIR, "solar_terms_data.json")
+
+
+def _build(tmp_path):
+    out = str(tmp_path / "terms.bin")
+    build_store(SOURCE, out)
+    return out
+
+
+def test_store_round_trip(tmp_path):
+    store = SolarTermStore(_build(tmp_path))
+    assert (store.start_year, store.end_year) == (START_YEAR, END_YEAR)
+    assert os.path.getsize(store.path) == HEADER.size + (END_YEAR - START_YEAR + 1) * TERMS_PER_YEAR * 8
+
+    with open(SOURCE, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    for year_key, terms in data.items():
+        year = int(year_key)
+        assert store.year_terms(year) == {name: parse_term_time(text) for name, text in terms.items()}
+    assert store.term_time(2024, "立春") == parse_term_time(data["2024"]["立春"])
+    assert store.term_time(2024, 2) == store.term_time(2024, "立春")
+
+
+def test_missing_and_out_of_range(tmp_path):
+    store = SolarTermStore(_build(tmp_path))
+    assert store.term_time(2100, "立春") is None  # 节气表只到 2050 年
+    assert store.term_time(1899, "立春") is None
+    assert store.term_time(2024, "不存在") is None
+    assert store.year_terms(2200) == {}
+
+
+def test_index_from_store_matches_json(tmp_path):
+    from_store = SolarTermStore(_build(tmp_path)).to_index()
+    from_json = SolarTermIndex.from_json(SOURCE)
+    assert from_store.instants == from_json.instants
+    assert from_store.codes == from_json.codes
+    assert from_store.jie_instants == from_json.jie_instants
+
+
+def test_invalid_store_is_ignored(tmp_path):
+    bad = tmp_path / "bad.bin"
+    bad.write_bytes(b"not a store")
+    assert get_solar_term_store(str(bad)) is None
+    assert get_solar_term_store(str(tmp_path / "absent.bin")) is None
@@ -0,0 +1,67 @@
+"""
+测试日主旺衰查表计分：与查表前实现的计分结果一致、LRU 缓存命中、计分明细
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.core import Bazi, StemBranch
+from app.services.calculators import FiveElementsCalculator
+from app.services import strength_scorer
+
+
+# 查表前 FiveElementsCalculator.calculate_day_master_strength 的计分结果（总分, 旺衰），
+# 覆盖月令同类（助身）、生身、克身、泄身与无系数各情形及五档旺衰
+BASELINE_SCORES = [
+    ("甲丙甲甲", "寅寅寅子", 14.169999999999998, "极强"),   # 月令同类
+    ("戊丙戊丁", "午戌午巳", 10.230999999999998, "极强"),   # 月令同类
+    ("丙甲甲丁", "午午午巳", 7.908000000000001, "极强"),    # 月令生身
+    ("丁癸甲癸", "酉午子卯", 4.08, "身强"),                 # 月令生身
+    ("庚庚甲辛", "申申申酉", -4.16, "极弱"),                # 月令克身
+    ("庚庚甲己", "午辰子巳", 0.26100000000000023, "极弱"),  # 月令泄身
+    ("己戊乙庚", "未辰丑辰", -0.18899999999999986, "极弱"), # 月令泄身
+    ("壬壬甲癸", "子子子亥", 1.84, "平和"),                 # 无月令系数
+    ("丙庚癸戊", "辰申亥午", 1.4200000000000004, "身弱"),   # 无月令系数
+]
+
+
+def _bazi(stems, branches):
+    return Bazi(*(StemBranch(s, b) for s, b in zip(stems, branches)), gender="男")
+
+
+@pytest.mark.parametrize("stems,branches,total,strength", BASELINE_SCORES)
+def test_table_score_matches_baseline(stems, branches, total, strength):
+    bazi = _bazi(stems, branches)
+    assert strength_scorer.score_pillars(*strength_scorer.encode_pillars(bazi)) == \
+        (pytest.approx(total, abs=1e-9), strength)
+    assert FiveElementsCalculator.calculate_day_master_strength(bazi) == strength
+
+
+def test_same_pillars_hit_cache():
+    strength_scorer.score_pillars.cache_clear()
+    bazi = _bazi("庚庚甲己", "午辰子巳")
+    first = FiveElementsCalculator.calculate_day_master_strength(bazi)
+    second = FiveElementsCalculator.calculate_day_master_strength(_bazi("庚庚甲己", "午辰子巳"))
+    info = strength_scorer.score_pillars.cache_info()
+    assert first == second
+    assert (info.hits, info.misses) == (1, 1)
+
+
+def test_detailed_matches_fast_path():
+    bazi = _bazi("庚庚甲己", "午辰子巳")
+    detail = FiveElementsCalculator.calculate_day_master_strength_detailed(bazi)
+    assert detail["strength"] == FiveElementsCalculator.calculate_day_master_strength(bazi)
+    assert detail["day_stem"] == "甲" and detail["day_element"] == "木"
+    assert detail["calculation_steps"][0] == "第一步：天干基础分计算"
+    assert "日干甲(木)：+1.0分(同类)" in detail["detail_scores"]
+    assert "月支辰藏乙(木,中气)：+1.2分(同类)" in detail["detail_scores"]
+    assert "月令辰(土)泄身：系数×0.9" in detail["detail_scores"]
+
+
+def test_invalid_stem_returns_unknown():
+    bazi = _bazi("X庚甲己", "午辰子巳")
+    assert FiveElementsCalculator.calculate_day_master_strength(bazi) == "未知"
+    assert FiveElementsCalculator.calculate_day_master_strength_detailed(bazi)["strength"] == "未知"
@@ -0,0 +1,72 @@
+// frontend/src/services/aiStream.js
+// 读取后端流式 AI 分析端点（Server-Sent Events）。EventSource 不支持 POST，这里用 fetch 读取响应流并按 SSE 格式拆分事件。
+import axiosInstance from '../plugins/axios';
+
+/**
+ * 调用流式分析端点，每收到一个事件调用 onEvent(event, data)
+ * 事件：analysis（本地分析）、delta（模型输出片段）、field（闭合的顶层字段）、done（完整结果）、error；
+ * 全部大运分析端点另有 plan（大运列表）与 dayun（单个大运完成）
+ * @returns {Promise<object|null>} done 事件中的完整结果
+ */
+export const streamAnalysis = async (path, body, { onEvent = () => {}, signal } = {}) => {
+    const headers = { 'Content-Type': 'application/json', Accept: 'text/event-stream' };
+    const token = localStorage.getItem('access_token');
+    if (token) {
+        headers.Authorization = `Bearer ${token}`;
+    }
+
+    const response = await fetch(`${axiosInstance.defaults.baseURL}${path}`, {
+        method: 'POST',
+        headers,
+        body: JSON.stringify(body),
+        signal,
+    });
+    if (!response.ok || !response.body) {
+        throw new Error(`流式分析请求失败 (${response.status})`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder('utf-8');
+    let buffer = '';
+    let result = null;
+
+    const dispatch = (block) => {
+        let event = 'message';
+        const dataLines = [];
+        for (const line of block.split('\n')) {
+            if (line.startsWith('event:')) {
+                event = line.slice(6).trim();
+            } else if (line.startsWith('data:')) {
+                dataLines.push(line.slice(5).trim());
+            }
+        }
+        if (!dataLines.length) {
+            return;
+        }
+        const data = JSON.parse(dataLines.join('\n'));
+        if (event === 'error') {
+            throw new Error(data.message || 'AI分析失败');
+        }
+        if (event === 'done') {
+            result = data.result;
+        }
+        onEvent(event, data);
+    };
+
+    for (;;) {
+        const { value, done } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            dispatch(buffer.slice(0, boundary));
+            buffer = buffer.slice(boundary + 2);
+        }
+    }
+    if (buffer.trim()) {
+        dispatch(buffer);
+    }
+    return result;
+};